@@ -0,0 +1,31 @@
+"""Add kpi_snapshot table
+
+Revision ID: 006_add_kpi_snapshot
+Revises: 004_add_stage_history
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006_add_kpi_snapshot'
+down_revision = '004_add_stage_history'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Contadores pré-calculados dos KPIs (populados pela reconciliação na primeira leitura)
+    op.create_table(
+        'kpi_snapshot',
+        sa.Column('metric', sa.String(length=64), nullable=False),
+        sa.Column('dimension', sa.String(length=255), nullable=False, server_default=''),
+        sa.Column('value', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('metric', 'dimension')
+    )
+
+
+def downgrade():
+    op.drop_table('kpi_snapshot')
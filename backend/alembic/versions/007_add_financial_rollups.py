@@ -0,0 +1,42 @@
+"""Add financial rollup tables
+
+Revision ID: 007_add_financial_rollups
+Revises: 006_add_kpi_snapshot
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007_add_financial_rollups'
+down_revision = '006_add_kpi_snapshot'
+branch_labels = None
+depends_on = None
+
+ROLLUP_TABLES = ('financial_rollup_daily', 'financial_rollup_monthly')
+
+
+def upgrade():
+    # Totais por balde de tempo (populados pelo recálculo na primeira leitura)
+    for table in ROLLUP_TABLES:
+        op.create_table(
+            table,
+            sa.Column('project_id', sa.Integer(), nullable=False),
+            sa.Column('location_id', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('movement_type', sa.String(length=30), nullable=False),
+            sa.Column('status', sa.String(length=30), nullable=False),
+            sa.Column('bucket', sa.Date(), nullable=False),
+            sa.Column('movement_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('amount', sa.Float(), nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('project_id', 'location_id', 'movement_type', 'status', 'bucket')
+        )
+        # Séries do portfólio inteiro filtram só por período
+        op.create_index(f'ix_{table}_bucket', table, ['bucket'])
+
+
+def downgrade():
+    for table in ROLLUP_TABLES:
+        op.drop_index(f'ix_{table}_bucket', table_name=table)
+        op.drop_table(table)
@@ -0,0 +1,103 @@
+"""Budget ledger opening balance
+
+Revision ID: 008_budget_ledger_opening_balance
+Revises: 007_add_financial_rollups
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008_budget_ledger_opening_balance'
+down_revision = '007_add_financial_rollups'
+branch_labels = None
+depends_on = None
+
+OPENING_BALANCE_REFERENCE = 'ledger:saldo-inicial'
+
+# Valores gravados pelo Enum do SQLAlchemy (nomes dos membros)
+movement_type = sa.Enum('GASTO', 'RECEITA_EXTRA', 'AJUSTE', 'REEMBOLSO', name='movementtype', create_type=False)
+movement_status = sa.Enum('PENDING', 'APPROVED', 'REJECTED', 'CANCELLED', name='movementstatus', create_type=False)
+
+projects = sa.table(
+    'projects',
+    sa.column('id', sa.Integer),
+    sa.column('created_by', sa.Integer),
+    sa.column('budget_spent', sa.Float),
+)
+movements = sa.table(
+    'financial_movements',
+    sa.column('project_id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    sa.column('movement_type', movement_type),
+    sa.column('status', movement_status),
+    sa.column('amount', sa.Float),
+    sa.column('currency', sa.String),
+    sa.column('exchange_rate', sa.Float),
+    sa.column('description', sa.Text),
+    sa.column('reference', sa.String),
+    sa.column('movement_date', sa.DateTime(timezone=True)),
+    sa.column('approved_at', sa.DateTime(timezone=True)),
+    sa.column('approved_by', sa.Integer),
+    sa.column('created_at', sa.DateTime(timezone=True)),
+    sa.column('updated_at', sa.DateTime(timezone=True)),
+)
+
+
+def upgrade():
+    # budget_spent passa a ser a soma das movimentações aprovadas: a diferença entre o valor
+    # digitado até aqui e o ledger vira um AJUSTE aprovado de saldo inicial por projeto
+    bind = op.get_bind()
+    sign = sa.case(
+        (movements.c.movement_type.in_(['GASTO', 'AJUSTE']), 1),
+        (movements.c.movement_type == 'REEMBOLSO', -1),
+        else_=0,
+    )
+    ledger = (
+        sa.select(
+            movements.c.project_id,
+            sa.func.sum(sign * movements.c.amount * sa.func.coalesce(sa.func.nullif(movements.c.exchange_rate, 0), 1)).label('spent'),
+        )
+        .where(movements.c.status == 'APPROVED')
+        .group_by(movements.c.project_id)
+        .subquery()
+    )
+    rows = bind.execute(
+        sa.select(projects.c.id, projects.c.created_by, projects.c.budget_spent, sa.func.coalesce(ledger.c.spent, 0))
+        .select_from(projects.outerjoin(ledger, ledger.c.project_id == projects.c.id))
+    ).fetchall()
+
+    opening = []
+    for project_id, created_by, budget_spent, spent in rows:
+        difference = (budget_spent or 0) - (spent or 0)
+        if abs(difference) > 0.005:
+            opening.append({
+                'project_id': project_id,
+                'user_id': created_by,
+                'movement_type': 'AJUSTE',
+                'status': 'APPROVED',
+                'amount': difference,
+                'currency': 'BRL',
+                'description': 'Saldo inicial do ledger do orçamento',
+                'reference': OPENING_BALANCE_REFERENCE,
+                'movement_date': sa.func.now(),
+                'approved_at': sa.func.now(),
+                'approved_by': created_by,
+                'created_at': sa.func.now(),
+                'updated_at': sa.func.now(),
+            })
+    for row in opening:
+        bind.execute(movements.insert().values(**row))
+
+    # Rollups já montados não enxergam as novas linhas: recalcula na próxima leitura
+    if opening:
+        bind.execute(sa.text(
+            "UPDATE kpi_snapshot SET value = 1 WHERE metric = '_meta' AND dimension = 'financial_rollups_stale'"
+        ))
+
+
+def downgrade():
+    op.execute(
+        movements.delete().where(movements.c.reference == OPENING_BALANCE_REFERENCE)
+    )
@@ -0,0 +1,219 @@
+"""Typed dates and range indexes for agenda_events
+
+Revision ID: 009_agenda_event_typed_dates
+Revises: 008_budget_ledger_opening_balance
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from datetime import date, datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009_agenda_event_typed_dates'
+down_revision = '008_budget_ledger_opening_balance'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+# PostgreSQL: ids gravados pela versão anterior durante o backfill (tabela e gatilho temporários)
+CHANGES_TABLE = 'agenda_events_009_changes'
+
+INDEXES = [
+    ('ix_agenda_events_start_date_project_id', ['start_date', 'project_id']),
+    ('ix_agenda_events_start_date_location_id', ['start_date', 'location_id']),
+    ('ix_agenda_events_span_days', ['span_days']),
+]
+
+agenda = sa.table(
+    'agenda_events',
+    sa.column('id', sa.Integer),
+    sa.column('start_date', sa.String),
+    sa.column('end_date', sa.String),
+    sa.column('start_day', sa.Date),
+    sa.column('end_day', sa.Date),
+    sa.column('start_at', sa.DateTime(timezone=True)),
+    sa.column('end_at', sa.DateTime(timezone=True)),
+    sa.column('span_days', sa.Integer),
+    sa.column('created_at', sa.DateTime(timezone=True)),
+)
+
+
+def _parse(value):
+    """(dia, horário) de uma string ISO; horário só quando a string tem hora"""
+    if not value:
+        return None, None
+    text = str(value).strip().replace('Z', '+00:00')
+    try:
+        if len(text) > 10:
+            moment = datetime.fromisoformat(text)
+            return moment.date(), moment
+        return date.fromisoformat(text), None
+    except ValueError:
+        return None, None
+
+
+def _backfill(bind, only=None):
+    """
+    Converte as strings em lotes por faixa de id (cada lote é uma transação curta no PostgreSQL).
+    `only` restringe às linhas que atendem à condição (repasse final antes da troca).
+    """
+    update = agenda.update().where(agenda.c.id == sa.bindparam('row_id')).values(
+        start_day=sa.bindparam('new_start_day'),
+        end_day=sa.bindparam('new_end_day'),
+        start_at=sa.bindparam('new_start_at'),
+        end_at=sa.bindparam('new_end_at'),
+        span_days=sa.bindparam('new_span_days'),
+    )
+    last_id, converted = 0, 0
+    while True:
+        query = (
+            sa.select(agenda.c.id, agenda.c.start_date, agenda.c.end_date, agenda.c.created_at)
+            .where(agenda.c.id > last_id)
+            .order_by(agenda.c.id)
+            .limit(BATCH_SIZE)
+        )
+        if only is not None:
+            query = query.where(only)
+        rows = bind.execute(query).fetchall()
+        if not rows:
+            return converted
+
+        params = []
+        for row_id, start_text, end_text, created_at in rows:
+            start_day, start_at = _parse(start_text)
+            end_day, end_at = _parse(end_text)
+            if start_day is None:
+                # Data ilegível: usa o dia de criação para não perder o evento
+                print(f"[009] agenda_events.id={row_id}: start_date inválido {start_text!r}, usando created_at")
+                start_day = created_at.date() if isinstance(created_at, datetime) else date.today()
+            span = max((end_day - start_day).days, 0) if end_day else 0
+            params.append({
+                'row_id': row_id,
+                'new_start_day': start_day,
+                'new_end_day': end_day,
+                'new_start_at': start_at,
+                'new_end_at': end_at,
+                'new_span_days': span,
+            })
+        bind.execute(update, params)
+        converted += len(params)
+        last_id = rows[-1][0]
+
+
+def _track_changes():
+    """
+    Gatilho que anota os ids inseridos ou com datas alteradas enquanto o backfill roda.
+    CREATE TRIGGER espera as transações que estão gravando na tabela: tudo o que foi confirmado
+    antes dele é lido pelo backfill, e toda gravação posterior fica anotada.
+    """
+    op.execute(f'CREATE TABLE {CHANGES_TABLE} (id integer NOT NULL)')
+    op.execute(f"""
+        CREATE FUNCTION {CHANGES_TABLE}_log() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO {CHANGES_TABLE} (id) VALUES (NEW.id);
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(
+        f'CREATE TRIGGER {CHANGES_TABLE}_trigger AFTER INSERT OR UPDATE OF start_date, end_date '
+        f'ON agenda_events FOR EACH ROW EXECUTE PROCEDURE {CHANGES_TABLE}_log()'
+    )
+
+
+def _drop_change_tracking():
+    op.execute(f'DROP TRIGGER IF EXISTS {CHANGES_TABLE}_trigger ON agenda_events')
+    op.execute(f'DROP FUNCTION IF EXISTS {CHANGES_TABLE}_log()')
+    op.execute(f'DROP TABLE IF EXISTS {CHANGES_TABLE}')
+
+
+def upgrade():
+    bind = op.get_bind()
+    is_postgres = bind.dialect.name == 'postgresql'
+
+    # 1. Colunas novas ao lado das antigas (sem reescrever a tabela)
+    op.add_column('agenda_events', sa.Column('start_day', sa.Date(), nullable=True))
+    op.add_column('agenda_events', sa.Column('end_day', sa.Date(), nullable=True))
+    op.add_column('agenda_events', sa.Column('start_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('agenda_events', sa.Column('end_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('agenda_events', sa.Column('span_days', sa.Integer(), nullable=False, server_default='0'))
+
+    # 2. Backfill em lotes; no PostgreSQL cada lote é confirmado e a tabela segue disponível,
+    #    com o gatilho anotando o que a versão anterior gravar nesse meio-tempo
+    if is_postgres:
+        with op.get_context().autocommit_block():
+            _track_changes()
+            converted = _backfill(bind)
+    else:
+        converted = _backfill(bind)
+    print(f"[009] {converted} eventos convertidos")
+
+    # 3. Repasse das linhas gravadas durante o backfill (novas ou editadas depois do lote delas).
+    #    No PostgreSQL as escritas ficam bloqueadas (leituras seguem) até a troca das colunas
+    pending = agenda.c.start_day.is_(None)
+    if is_postgres:
+        op.execute('LOCK TABLE agenda_events IN EXCLUSIVE MODE')
+        changes = sa.table(CHANGES_TABLE, sa.column('id', sa.Integer))
+        pending = sa.or_(pending, agenda.c.id.in_(sa.select(changes.c.id)))
+    print(f"[009] {_backfill(bind, only=pending)} eventos gravados durante o backfill reconvertidos")
+    if is_postgres:
+        _drop_change_tracking()
+
+    # 4. Troca das colunas (renomear é só metadado)
+    with op.batch_alter_table('agenda_events') as batch:
+        batch.drop_column('start_date')
+        batch.drop_column('end_date')
+    with op.batch_alter_table('agenda_events') as batch:
+        batch.alter_column('start_day', new_column_name='start_date', existing_type=sa.Date(), nullable=False)
+        batch.alter_column('end_day', new_column_name='end_date', existing_type=sa.Date(), nullable=True)
+
+    # 5. Índices de intervalo (CONCURRENTLY no PostgreSQL, sem bloquear escritas)
+    if is_postgres:
+        with op.get_context().autocommit_block():
+            for name, columns in INDEXES:
+                op.create_index(name, 'agenda_events', columns, postgresql_concurrently=True)
+    else:
+        for name, columns in INDEXES:
+            op.create_index(name, 'agenda_events', columns)
+
+
+def downgrade():
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='agenda_events')
+
+    op.add_column('agenda_events', sa.Column('start_text', sa.String(), nullable=True))
+    op.add_column('agenda_events', sa.Column('end_text', sa.String(), nullable=True))
+    typed = sa.table(
+        'agenda_events',
+        sa.column('id', sa.Integer),
+        sa.column('start_date', sa.Date),
+        sa.column('end_date', sa.Date),
+        sa.column('start_at', sa.DateTime(timezone=True)),
+        sa.column('end_at', sa.DateTime(timezone=True)),
+        sa.column('start_text', sa.String),
+        sa.column('end_text', sa.String),
+    )
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(typed.c.id, typed.c.start_date, typed.c.end_date, typed.c.start_at, typed.c.end_at)).fetchall()
+    for row_id, start_day, end_day, start_at, end_at in rows:
+        start = start_at or start_day
+        end = end_at or end_day
+        bind.execute(
+            typed.update().where(typed.c.id == row_id).values(
+                start_text=start.isoformat() if start else None,
+                end_text=end.isoformat() if end else None,
+            )
+        )
+
+    with op.batch_alter_table('agenda_events') as batch:
+        batch.drop_column('start_date')
+        batch.drop_column('end_date')
+        batch.drop_column('start_at')
+        batch.drop_column('end_at')
+        batch.drop_column('span_days')
+    with op.batch_alter_table('agenda_events') as batch:
+        batch.alter_column('start_text', new_column_name='start_date', existing_type=sa.String(), nullable=False)
+        batch.alter_column('end_text', new_column_name='end_date', existing_type=sa.String(), nullable=True)
@@ -0,0 +1,29 @@
+"""Index for per-location booking lookups on project_locations
+
+Revision ID: 010_project_location_booking_index
+Revises: 009_agenda_event_typed_dates
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '010_project_location_booking_index'
+down_revision = '009_agenda_event_typed_dates'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_project_locations_location_id_rental_start'
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # CONCURRENTLY não bloqueia escritas em project_locations
+        with op.get_context().autocommit_block():
+            op.create_index(INDEX_NAME, 'project_locations', ['location_id', 'rental_start'], postgresql_concurrently=True)
+    else:
+        op.create_index(INDEX_NAME, 'project_locations', ['location_id', 'rental_start'])
+
+
+def downgrade():
+    op.drop_index(INDEX_NAME, table_name='project_locations')
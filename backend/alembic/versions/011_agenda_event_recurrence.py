@@ -0,0 +1,40 @@
+"""Recurrence columns for agenda_events
+
+Revision ID: 011_agenda_event_recurrence
+Revises: 010_project_location_booking_index
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '011_agenda_event_recurrence'
+down_revision = '010_project_location_booking_index'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_agenda_events_recurrence_until'
+
+
+def upgrade():
+    # Colunas nulas: eventos existentes continuam avulsos, sem reescrever a tabela
+    op.add_column('agenda_events', sa.Column('recurrence_rule', sa.String(length=500), nullable=True))
+    op.add_column('agenda_events', sa.Column('recurrence_exceptions', sa.JSON(), nullable=True))
+    op.add_column('agenda_events', sa.Column('recurrence_overrides', sa.JSON(), nullable=True))
+    op.add_column('agenda_events', sa.Column('recurrence_until', sa.Date(), nullable=True))
+
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index(INDEX_NAME, 'agenda_events', ['recurrence_until'], postgresql_concurrently=True)
+    else:
+        op.create_index(INDEX_NAME, 'agenda_events', ['recurrence_until'])
+
+
+def downgrade():
+    op.drop_index(INDEX_NAME, table_name='agenda_events')
+    with op.batch_alter_table('agenda_events') as batch:
+        batch.drop_column('recurrence_until')
+        batch.drop_column('recurrence_overrides')
+        batch.drop_column('recurrence_exceptions')
+        batch.drop_column('recurrence_rule')
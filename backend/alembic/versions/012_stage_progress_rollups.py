@@ -0,0 +1,54 @@
+"""Incremental stage progress sums on project_locations and projects
+
+Revision ID: 012_stage_progress_rollups
+Revises: 011_agenda_event_recurrence
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '012_stage_progress_rollups'
+down_revision = '011_agenda_event_recurrence'
+branch_labels = None
+depends_on = None
+
+PROGRESS_TABLES = ('project_locations', 'projects')
+PROGRESS_COLUMNS = (
+    ('stage_count', sa.Integer()),
+    ('stage_weight_total', sa.Float()),
+    ('stage_weighted_completion', sa.Float()),
+    ('stages_pending', sa.Integer()),
+    ('stages_in_progress', sa.Integer()),
+    ('stages_completed', sa.Integer()),
+    ('stages_cancelled', sa.Integer()),
+    ('stages_on_hold', sa.Integer()),
+    ('stages_critical', sa.Integer()),
+)
+
+
+def upgrade():
+    # Somas zeradas: o recálculo na primeira leitura (linha de controle ausente) preenche os valores
+    for table in PROGRESS_TABLES:
+        for name, type_ in PROGRESS_COLUMNS:
+            op.add_column(table, sa.Column(name, type_, nullable=False, server_default='0'))
+
+    op.create_table(
+        'stage_deadline_rollups',
+        sa.Column('project_location_id', sa.Integer(), nullable=False),
+        sa.Column('due_day', sa.Date(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('open_stages', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('project_location_id', 'due_day')
+    )
+    op.create_index('ix_stage_deadline_rollups_project_id', 'stage_deadline_rollups', ['project_id'])
+
+
+def downgrade():
+    op.drop_index('ix_stage_deadline_rollups_project_id', table_name='stage_deadline_rollups')
+    op.drop_table('stage_deadline_rollups')
+    for table in PROGRESS_TABLES:
+        with op.batch_alter_table(table) as batch:
+            for name, _ in reversed(PROGRESS_COLUMNS):
+                batch.drop_column(name)
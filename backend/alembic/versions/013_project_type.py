@@ -0,0 +1,25 @@
+"""Project type (selects the default stage templates)
+
+Revision ID: 013_project_type
+Revises: 012_stage_progress_rollups
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '013_project_type'
+down_revision = '012_stage_progress_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nulo = templates padrão
+    op.add_column('projects', sa.Column('project_type', sa.String(length=50), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('projects') as batch:
+        batch.drop_column('project_type')
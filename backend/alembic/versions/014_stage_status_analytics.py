@@ -0,0 +1,52 @@
+"""Compacted stage status intervals and daily time-in-status metrics
+
+Revision ID: 014_stage_status_analytics
+Revises: 013_project_type
+Create Date: 2026-10-20 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '014_stage_status_analytics'
+down_revision = '013_project_type'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'stage_status_intervals',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('stage_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('ended_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('changes', sa.Integer(), nullable=False, server_default='1'),
+        sa.ForeignKeyConstraint(['stage_id'], ['project_location_stages.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_stage_status_intervals_stage_id', 'stage_status_intervals', ['stage_id'])
+
+    # Vazia: o recálculo periódico (ao iniciar a aplicação) materializa as métricas; até lá as leituras vêm vazias
+    op.create_table(
+        'stage_status_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('stage_type', sa.String(length=30), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('seconds', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('entries', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completions', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cycle_seconds', sa.Float(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('day', 'project_id', 'stage_type', 'status')
+    )
+    op.create_index('ix_stage_status_daily_project_id', 'stage_status_daily', ['project_id'])
+
+
+def downgrade():
+    op.drop_index('ix_stage_status_daily_project_id', table_name='stage_status_daily')
+    op.drop_table('stage_status_daily')
+    op.drop_index('ix_stage_status_intervals_stage_id', table_name='stage_status_intervals')
+    op.drop_table('stage_status_intervals')
@@ -0,0 +1,36 @@
+"""Persisted overdue flags on stages, rentals and demands
+
+Revision ID: 015_overdue_flags
+Revises: 014_stage_status_analytics
+Create Date: 2026-10-20 01:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '015_overdue_flags'
+down_revision = '014_stage_status_analytics'
+branch_labels = None
+depends_on = None
+
+# Tabela -> (índice, coluna do prazo)
+OVERDUE_TABLES = (
+    ('project_location_stages', 'ix_project_location_stages_overdue_at_planned_end_date', 'planned_end_date'),
+    ('project_locations', 'ix_project_locations_overdue_at_rental_end', 'rental_end'),
+    ('location_demands', 'ix_location_demands_overdue_at_due_date', 'due_date'),
+)
+
+
+def upgrade():
+    # Nulo: a primeira varredura marca os atrasos existentes sem notificar
+    for table, index, due_column in OVERDUE_TABLES:
+        op.add_column(table, sa.Column('overdue_at', sa.DateTime(timezone=True), nullable=True))
+        op.create_index(index, table, ['overdue_at', due_column])
+
+
+def downgrade():
+    for table, index, _ in reversed(OVERDUE_TABLES):
+        op.drop_index(index, table_name=table)
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column('overdue_at')
@@ -11,6 +11,7 @@ from .project_location_stages import router as project_location_stages_router
 from .project_visit_locations import router as project_visit_locations_router
 from .project_stages import router as project_stages_router
 from .location_demands import router as location_demands_router
+from .financial_movements import router as financial_movements_router
 from . import auth
 
 __all__ = [
@@ -27,5 +28,6 @@ __all__ = [
     "project_visit_locations_router",
     "project_stages_router",
     "location_demands_router",
+    "financial_movements_router",
     "auth"
 ]
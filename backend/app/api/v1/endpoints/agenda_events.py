@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
@@ -11,9 +11,13 @@ from ....schemas.agenda_event import (
     AgendaEventUpdate,
     AgendaEventResponse,
     AgendaEventListResponse,
-    AgendaEventFilter
+    AgendaEventFilter,
+    AgendaOccurrenceUpdate,
+    AgendaDensityResponse
 )
 from ....services.agenda_event_service import AgendaEventService
+from ....services.ics_feed_service import IcsFeedService
+from ....core.auth import get_current_active_user
 # from ....core.auth import get_current_user
 
 router = APIRouter()
@@ -70,12 +74,33 @@ def get_agenda_events(
 def get_events_by_date_range(
     start_date: date = Query(..., description="Data de início"),
     end_date: date = Query(..., description="Data de fim"),
+    overlap: bool = Query(True, description="Incluir eventos em andamento no período (não só os que começam nele)"),
+    project_id: Optional[int] = Query(None),
+    location_id: Optional[int] = Query(None),
     db: Session = Depends(get_db)
     # current_user: User = Depends(get_current_user)  # Temporariamente desabilitado para teste
 ):
     """Buscar eventos por período"""
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="Data de fim deve ser posterior à data de início")
+    service = AgendaEventService(db)
+    return service.get_events_by_date_range(start_date, end_date, overlap, project_id, location_id)
+
+@router.get("/density", response_model=AgendaDensityResponse)
+def get_events_density(
+    start_date: date = Query(..., alias="from", description="Data de início"),
+    end_date: date = Query(..., alias="to", description="Data de fim"),
+    group: str = Query("day", description="Agrupamento: day ou week"),
+    project_id: Optional[int] = Query(None),
+    location_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Quantidade de eventos por dia ou semana (por tipo e prioridade) para visões de mês e ano"""
     service = AgendaEventService(db)
-    return service.get_events_by_date_range(start_date, end_date)
+    try:
+        return service.get_density(start_date, end_date, group, project_id, location_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/upcoming", response_model=List[AgendaEventResponse])
 def get_upcoming_events(
@@ -97,6 +122,37 @@ def get_events_by_type(
     service = AgendaEventService(db)
     return service.get_events_by_type(event_type)
 
+@router.get("/feeds")
+def get_agenda_feeds(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """URLs iCalendar (ICS) para assinar a agenda no celular: geral e por projeto acessível"""
+    base_url = str(request.base_url).rstrip("/")
+    return IcsFeedService(db).feed_urls(current_user, base_url)
+
+@router.get("/feeds/{token}.ics")
+def get_agenda_feed(
+    token: str,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Feed ICS (autenticado pelo token); responde 304 quando o cliente já tem a versão atual"""
+    feed = IcsFeedService(db).get_feed(token)
+    if feed is None:
+        raise HTTPException(status_code=404, detail="Feed não encontrado")
+
+    headers = {
+        "ETag": feed.etag,
+        "Last-Modified": feed.last_modified_header,
+        "Cache-Control": "private, no-cache",
+    }
+    if feed.not_modified(if_none_match, if_modified_since):
+        return Response(status_code=304, headers=headers)
+    return Response(content=feed.body, media_type="text/calendar; charset=utf-8", headers=headers)
+
 @router.get("/{event_id}", response_model=AgendaEventResponse)
 def get_agenda_event(
     event_id: int,
@@ -137,6 +193,39 @@ def delete_agenda_event(
         raise HTTPException(status_code=404, detail="Evento não encontrado")
     return {"message": "Evento deletado com sucesso"}
 
+@router.put("/{event_id}/occurrences/{occurrence_date}", response_model=AgendaEventResponse)
+def update_agenda_event_occurrence(
+    event_id: int,
+    occurrence_date: date,
+    occurrence_data: AgendaOccurrenceUpdate,
+    db: Session = Depends(get_db)
+):
+    """Alterar uma única ocorrência de um evento recorrente"""
+    service = AgendaEventService(db)
+    try:
+        occurrence = service.update_occurrence(event_id, occurrence_date, occurrence_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not occurrence:
+        raise HTTPException(status_code=404, detail="Evento não encontrado")
+    return occurrence
+
+@router.delete("/{event_id}/occurrences/{occurrence_date}")
+def delete_agenda_event_occurrence(
+    event_id: int,
+    occurrence_date: date,
+    db: Session = Depends(get_db)
+):
+    """Remover uma única ocorrência de um evento recorrente"""
+    service = AgendaEventService(db)
+    try:
+        success = service.delete_occurrence(event_id, occurrence_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not success:
+        raise HTTPException(status_code=404, detail="Evento não encontrado")
+    return {"message": "Ocorrência removida com sucesso"}
+
 @router.post("/generate-from-project-location/{project_location_id}")
 def generate_events_from_project_location(
     project_location_id: int,
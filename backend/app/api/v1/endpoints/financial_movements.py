@@ -0,0 +1,141 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import date, datetime
+import math
+
+from ....core.database import get_db
+from ....core.auth import get_admin_user, get_current_user
+from ....models.user import User
+from ....models.financial import MovementType, MovementStatus
+from ....schemas.financial_movement import (
+    FinancialMovementCreate,
+    FinancialMovementResponse,
+    FinancialMovementListResponse,
+    FinancialSeriesResponse,
+)
+from ....services.budget_ledger_service import BudgetLedgerService
+from ....services.financial_movement_service import FinancialMovementService
+from ....services.financial_rollup_service import FinancialRollupService, GRANULARITIES, GROUP_COLUMNS, MONTH
+
+router = APIRouter(prefix="/financial-movements", tags=["financial-movements"])
+
+
+@router.post("/", response_model=FinancialMovementResponse)
+def create_movement(
+    movement_data: FinancialMovementCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Registra uma movimentação financeira (pendente de aprovação)"""
+    try:
+        return FinancialMovementService(db).create_movement(movement_data, user_id=current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/", response_model=FinancialMovementListResponse)
+def get_movements(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    project_id: Optional[int] = Query(None, description="Filtrar por projeto"),
+    location_id: Optional[int] = Query(None, description="Filtrar por locação"),
+    movement_type: Optional[MovementType] = Query(None, description="Filtrar por tipo"),
+    status: Optional[MovementStatus] = Query(None, description="Filtrar por status"),
+    date_from: Optional[datetime] = Query(None, description="Movimentos a partir de"),
+    date_to: Optional[datetime] = Query(None, description="Movimentos até"),
+    db: Session = Depends(get_db)
+):
+    """Lista movimentações com filtros e paginação"""
+    movements, total = FinancialMovementService(db).get_movements(
+        skip=skip, limit=limit, project_id=project_id, location_id=location_id,
+        movement_type=movement_type, status=status, date_from=date_from, date_to=date_to,
+    )
+    return FinancialMovementListResponse(
+        movements=movements,
+        total=total,
+        page=skip // limit + 1,
+        size=limit,
+        total_pages=math.ceil(total / limit) if total > 0 else 1
+    )
+
+
+@router.get("/series", response_model=FinancialSeriesResponse)
+def get_movement_series(
+    start: date = Query(..., description="Início do período (inclusive)"),
+    end: date = Query(..., description="Fim do período (inclusive)"),
+    granularity: str = Query(MONTH, description=f"Balde de tempo: {', '.join(GRANULARITIES)}"),
+    project_id: Optional[int] = Query(None, description="Filtrar por projeto"),
+    location_id: Optional[int] = Query(None, description="Filtrar por locação (0 = sem locação)"),
+    movement_type: Optional[MovementType] = Query(None, description="Filtrar por tipo"),
+    status: Optional[MovementStatus] = Query(MovementStatus.APPROVED, description="Filtrar por status"),
+    group_by: Optional[str] = Query(None, description=f"Separar séries por: {', '.join(GROUP_COLUMNS)}"),
+    db: Session = Depends(get_db)
+):
+    """Série temporal de quantidade e valor (na moeda do orçamento), lida dos rollups"""
+    try:
+        return FinancialRollupService(db).series(
+            start, end, granularity=granularity, project_id=project_id, location_id=location_id,
+            movement_type=movement_type, status=status, group_by=group_by,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/ledger/verify")
+def verify_budget_ledger(
+    fix: bool = Query(True, description="Corrigir os projetos divergentes"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Recalcula o valor gasto de todos os projetos a partir das movimentações aprovadas (apenas administradores)"""
+    return BudgetLedgerService(db).verify(fix=fix)
+
+
+@router.get("/{movement_id}", response_model=FinancialMovementResponse)
+def get_movement(movement_id: int, db: Session = Depends(get_db)):
+    """Obtém uma movimentação"""
+    movement = FinancialMovementService(db).get_movement(movement_id)
+    if not movement:
+        raise HTTPException(status_code=404, detail="Movimentação não encontrada")
+    return movement
+
+
+def _transition(action, movement_id: int, current_user: User):
+    try:
+        movement = action(movement_id, user_id=current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not movement:
+        raise HTTPException(status_code=404, detail="Movimentação não encontrada")
+    return movement
+
+
+@router.post("/{movement_id}/approve", response_model=FinancialMovementResponse)
+def approve_movement(
+    movement_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Aprova uma movimentação pendente"""
+    return _transition(FinancialMovementService(db).approve_movement, movement_id, current_user)
+
+
+@router.post("/{movement_id}/reject", response_model=FinancialMovementResponse)
+def reject_movement(
+    movement_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Rejeita uma movimentação pendente"""
+    return _transition(FinancialMovementService(db).reject_movement, movement_id, current_user)
+
+
+@router.post("/{movement_id}/cancel", response_model=FinancialMovementResponse)
+def cancel_movement(
+    movement_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Cancela uma movimentação pendente ou aprovada"""
+    return _transition(FinancialMovementService(db).cancel_movement, movement_id, current_user)
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form, Body
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
 from ....schemas.location import LocationCreate, LocationUpdate, LocationResponse
 from ....schemas.location_search import LocationSearchRequest, LocationSearchResponse
 from ....services.location_service import LocationService
 from ....services.location_search_service import LocationSearchService
+from ....services.location_export_service import LocationExportService, iter_file
 from ....core.database import get_db
 from ....models.location import Location
 from ....models.tag import Tag, LocationTag
@@ -467,66 +470,70 @@ def restore_location(location_id: int, db: Session = Depends(get_db)):
 
 @router.get("/stats/overview")
 def get_locations_overview(db: Session = Depends(get_db)):
-    """Obtém estatísticas gerais das locações"""
-    from sqlalchemy import func, case
-
-    # Total de locações
-    total_locations = db.query(Location).count()
-
-    # Por status
-    by_status = db.query(
-        Location.status,
-        func.count(Location.id).label('count')
-    ).group_by(Location.status).all()
-
-    # Por tipo de espaço
-    by_space_type = db.query(
-        Location.space_type,
-        func.count(Location.id).label('count')
-    ).group_by(Location.space_type).all()
-
-    # Por cidade
-    by_city = db.query(
-        Location.city,
-        func.count(Location.id).label('count')
-    ).group_by(Location.city).order_by(func.count(Location.id).desc()).limit(10).all()
-
-    # Escolher um valor de preço representativo (prioriza cinema > publicidade)
-    price_expr = func.coalesce(Location.price_day_cinema, Location.price_day_publicidade)
-    price_ranges = db.query(
-        case(
-            (price_expr <= 1000, 'Até R$ 1.000'),
-            (price_expr <= 5000, 'R$ 1.001 - R$ 5.000'),
-            (price_expr <= 10000, 'R$ 5.001 - R$ 10.000'),
-            else_='Acima de R$ 10.000'
-        ).label('price_range'),
-        func.count(Location.id).label('count')
-    ).filter(price_expr.isnot(None)).group_by('price_range').all()
+    """Obtém estatísticas gerais das locações (uma varredura, em cache até a próxima escrita)"""
+    from ....services.location_stats_service import LocationStatsService
 
+    return LocationStatsService(db).get_overview()
+
+def _export_filters(
+    status: Optional[str] = Query(None, description="Status da locação"),
+    space_type: Optional[str] = Query(None, description="Tipo de espaço"),
+    city: Optional[str] = Query(None, description="Cidade"),
+    project_id: Optional[int] = Query(None, description="ID do projeto"),
+    supplier_id: Optional[int] = Query(None, description="ID do fornecedor"),
+    sector_type: Optional[str] = Query(None, description="Tipo de setor"),
+    search: Optional[str] = Query(None, description="Termo de busca"),
+) -> dict:
+    """Mesmos filtros da listagem (LocationService.get_locations)"""
     return {
-        "total_locations": total_locations,
-        "by_status": {item.status: item.count for item in by_status},
-        "by_space_type": {item.space_type: item.count for item in by_space_type},
-        "by_city": {item.city: item.count for item in by_city},
-        "price_ranges": {item.price_range: item.count for item in price_ranges}
+        "status": status,
+        "space_type": space_type,
+        "city": city,
+        "project_id": project_id,
+        "supplier_id": supplier_id,
+        "sector_type": sector_type,
+        "search": search,
     }
 
+def _export_filename(extension: str) -> str:
+    return f"locacoes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
 @router.get("/export/csv")
 def export_locations_csv(
-    status: Optional[str] = Query(None),
-    space_type: Optional[str] = Query(None),
-    city: Optional[str] = Query(None),
+    filters: dict = Depends(_export_filters),
     db: Session = Depends(get_db)
 ):
-    """Exporta locações para CSV"""
-    raise HTTPException(status_code=501, detail="Exportação CSV ainda não implementada")
+    """Exporta locações para CSV (streaming)"""
+    export_service = LocationExportService(db)
+    return StreamingResponse(
+        export_service.iter_csv(filters),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f"attachment; filename={_export_filename('csv')}"}
+    )
+
+@router.get("/export/ndjson")
+def export_locations_ndjson(
+    filters: dict = Depends(_export_filters),
+    db: Session = Depends(get_db)
+):
+    """Exporta locações em NDJSON (um objeto JSON por linha, streaming)"""
+    export_service = LocationExportService(db)
+    return StreamingResponse(
+        export_service.iter_ndjson(filters),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename={_export_filename('ndjson')}"}
+    )
 
 @router.get("/export/excel")
 def export_locations_excel(
-    status: Optional[str] = Query(None),
-    space_type: Optional[str] = Query(None),
-    city: Optional[str] = Query(None),
+    filters: dict = Depends(_export_filters),
     db: Session = Depends(get_db)
 ):
-    """Exporta locações para Excel"""
-    raise HTTPException(status_code=501, detail="Exportação Excel ainda não implementada")
+    """Exporta locações para Excel (openpyxl write-only + arquivo temporário)"""
+    export_service = LocationExportService(db)
+    output = export_service.write_xlsx(filters)
+    return StreamingResponse(
+        iter_file(output),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f"attachment; filename={_export_filename('xlsx')}"}
+    )
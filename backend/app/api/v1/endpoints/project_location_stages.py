@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Body
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import date
 from ....schemas.project_location_stage import (
     ProjectLocationStageCreate,
     ProjectLocationStageUpdate,
@@ -13,9 +14,12 @@ from ....schemas.project_location_stage import (
     StageHistoryResponse
 )
 from ....services.project_location_stage_service import ProjectLocationStageService
+from ....services.stage_schedule_service import StageScheduleService
+from ....services.stage_status_analytics_service import StageStatusAnalyticsService
 from ....core.database import get_db
-from ....core.auth import get_current_user
+from ....core.auth import get_admin_user, get_current_user
 from ....models.user import User
+from ....models.project_location_stage import LocationStageType
 
 router = APIRouter(prefix="/project-location-stages", tags=["project-location-stages"])
 
@@ -112,7 +116,10 @@ def update_stage(
 ):
     """Atualiza uma etapa"""
     stage_service = ProjectLocationStageService(db)
-    stage = stage_service.update_stage(stage_id, stage_data)
+    try:
+        stage = stage_service.update_stage(stage_id, stage_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     if not stage:
         raise HTTPException(status_code=404, detail="Etapa não encontrada")
@@ -184,12 +191,73 @@ def get_project_progress_summary(project_id: int, db: Session = Depends(get_db))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
+@router.get("/project/{project_id}/schedule")
+def get_project_schedule(project_id: int, db: Session = Depends(get_db)):
+    """Cronograma (Gantt) do projeto com folgas e caminho crítico"""
+    return StageScheduleService(db).project_schedule(project_id)
+
+@router.get("/project-location/{project_location_id}/schedule")
+def get_location_schedule(project_location_id: int, db: Session = Depends(get_db)):
+    """Cronograma (Gantt) das etapas de uma locação"""
+    schedule = StageScheduleService(db).location_schedule(project_location_id)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="Locação do projeto não encontrada")
+    return schedule
+
+@router.get("/analytics/time-in-status")
+def get_time_in_status(
+    start: date = Query(..., description="Início do período (inclusive)"),
+    end: date = Query(..., description="Fim do período (inclusive)"),
+    project_id: Optional[int] = Query(None, description="Filtrar por projeto"),
+    stage_type: Optional[LocationStageType] = Query(None, description="Filtrar por tipo de etapa"),
+    db: Session = Depends(get_db)
+):
+    """Dias somados em cada status, lidos das métricas diárias materializadas"""
+    try:
+        return StageStatusAnalyticsService(db).time_in_status(start, end, project_id=project_id, stage_type=stage_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/analytics/cycle-times")
+def get_cycle_times(
+    start: date = Query(..., description="Início do período (inclusive)"),
+    end: date = Query(..., description="Fim do período (inclusive)"),
+    project_id: Optional[int] = Query(None, description="Filtrar por projeto"),
+    db: Session = Depends(get_db)
+):
+    """Tempo médio de ciclo (andamento até conclusão) por tipo de etapa"""
+    try:
+        return StageStatusAnalyticsService(db).cycle_times(start, end, project_id=project_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/analytics/bottlenecks")
+def get_bottlenecks(
+    start: date = Query(..., description="Início do período (inclusive)"),
+    end: date = Query(..., description="Fim do período (inclusive)"),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Tipos de etapa e etapas abertas que mais seguram os projetos"""
+    try:
+        return StageStatusAnalyticsService(db).bottlenecks(start, end, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/analytics/compact")
+def compact_stage_history(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Compacta o histórico além da retenção em períodos fechados (apenas administradores; descarta autor e notas)"""
+    return StageStatusAnalyticsService(db).compact()
+
 @router.get("/templates/default")
-def get_default_templates():
+def get_default_templates(project_type: Optional[str] = Query(None, description="Tipo do projeto (templates configurados por tipo)")):
     """Obtém templates padrão para etapas"""
     from ....services.project_location_stage_service import ProjectLocationStageService
     stage_service = ProjectLocationStageService(None)  # Não precisa de DB para templates
-    templates = stage_service._get_default_templates()
+    templates = stage_service._get_default_templates(project_type)
 
     return {"templates": templates}
 
@@ -236,3 +304,11 @@ def get_stage_history(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao buscar histórico: {str(e)}")
+
+@router.get("/{stage_id}/timeline")
+def get_stage_timeline(stage_id: int, db: Session = Depends(get_db)):
+    """Períodos da etapa em cada status (inclui o histórico já compactado)"""
+    stage_service = ProjectLocationStageService(db)
+    if not stage_service.get_stage(stage_id):
+        raise HTTPException(status_code=404, detail="Etapa não encontrada")
+    return StageStatusAnalyticsService(db).stage_timeline(stage_id)
@@ -1,31 +1,48 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import date
 from ....schemas.project_location import (
     ProjectLocationCreate,
     ProjectLocationUpdate,
     ProjectLocationResponse,
     ProjectLocationFilter,
     ProjectLocationCostSummary,
-    ProjectLocationTimeline
+    ProjectLocationTimeline,
+    BookingConflict
 )
 from ....services.project_location_service import ProjectLocationService
+from ....services.booking_conflict_service import BookingConflictError, BookingConflictService
 from ....services.project_location_calendar_service import project_location_calendar_service
+from ....services.calendar_regeneration_service import CALENDAR_REGENERATION_CHUNK, JOB_KIND as CALENDAR_JOB_KIND, run_calendar_regeneration
 from ....core.database import get_db
+from ....core.jobs import job_registry
+from ....core.auth import get_admin_user, get_current_active_user
+from ....models.user import User
 
 router = APIRouter(prefix="/project-locations", tags=["project-locations"])
 
+
+def _conflict_exception(error: BookingConflictError) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=jsonable_encoder({"message": str(error), "conflicts": error.conflicts}),
+    )
+
+
 @router.post("/", response_model=ProjectLocationResponse)
 def create_project_location(
     location_data: ProjectLocationCreate,
+    allow_conflicts: bool = Query(False, description="Grava mesmo com conflito de reserva (conflitos voltam em booking_conflicts)"),
     db: Session = Depends(get_db),
     current_user_id: int = 1  # TODO: Implementar autenticação
 ):
-    """Cria uma nova locação em um projeto"""
+    """Cria uma nova locação em um projeto (409 se a locação já estiver reservada por outro projeto)"""
     try:
         print(f"DEBUG: Received create_project_location request. Data: {location_data}")
         location_service = ProjectLocationService(db)
-        project_location = location_service.create_project_location(location_data)
+        project_location = location_service.create_project_location(location_data, allow_conflicts=allow_conflicts)
 
         # Criar eventos do calendário automaticamente
         try:
@@ -36,6 +53,8 @@ def create_project_location(
             # Não falhar a requisição se criação de eventos falhar
 
         return project_location
+    except BookingConflictError as e:
+        raise _conflict_exception(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -107,6 +126,46 @@ def get_project_locations(
     except Exception as e:
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
+@router.post("/calendar/regenerate", status_code=202)
+def start_calendar_regeneration(
+    after_id: int = Query(0, ge=0, description="Começar após este id de locação"),
+    resume_job_id: Optional[str] = Query(None, description="Retomar do ponto em que esta tarefa parou"),
+    chunk_size: int = Query(CALENDAR_REGENERATION_CHUNK, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    Regenera em segundo plano os eventos de calendário de todas as locações de projeto (apenas administradores).
+    Acompanhe o progresso em /jobs/{id}; se a tarefa falhar, retome com resume_job_id.
+    """
+    if resume_job_id:
+        previous = job_registry.get(resume_job_id)
+        if not previous or previous.kind != CALENDAR_JOB_KIND:
+            raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+        if not previous.finished:
+            raise HTTPException(status_code=409, detail="Tarefa ainda está em execução")
+        after_id = previous.result.get("last_project_location_id", 0)
+
+    job = job_registry.create(CALENDAR_JOB_KIND, owner_id=current_user.id)
+    job_registry.submit(job, run_calendar_regeneration, db.get_bind(), after_id=after_id, chunk_size=chunk_size)
+    data = job.to_dict()
+    data["status_url"] = f"/api/v1/jobs/{job.id}"
+    return data
+
+@router.get("/conflicts", response_model=List[BookingConflict])
+def get_booking_conflicts(
+    project_id: Optional[int] = Query(None),
+    location_id: Optional[int] = Query(None),
+    date_from: Optional[date] = Query(None, description="Data inicial (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, description="Data final (YYYY-MM-DD)"),
+    db: Session = Depends(get_db)
+):
+    """Reservas de projetos diferentes que se sobrepõem na mesma locação"""
+    try:
+        return BookingConflictService(db).report(project_id, location_id, date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/{location_id}", response_model=ProjectLocationResponse)
 def get_project_location(location_id: int, db: Session = Depends(get_db)):
     """Obtém detalhes de uma locação específica de projeto"""
@@ -122,11 +181,15 @@ def get_project_location(location_id: int, db: Session = Depends(get_db)):
 def update_project_location(
     location_id: int,
     location_data: ProjectLocationUpdate,
+    allow_conflicts: bool = Query(False, description="Grava mesmo com conflito de reserva (conflitos voltam em booking_conflicts)"),
     db: Session = Depends(get_db)
 ):
-    """Atualiza uma locação de projeto"""
+    """Atualiza uma locação de projeto (409 se as novas datas colidirem com a reserva de outro projeto)"""
     location_service = ProjectLocationService(db)
-    project_location = location_service.update_project_location(location_id, location_data)
+    try:
+        project_location = location_service.update_project_location(location_id, location_data, allow_conflicts=allow_conflicts)
+    except BookingConflictError as e:
+        raise _conflict_exception(e)
 
     if not project_location:
         raise HTTPException(status_code=404, detail="Locação de projeto não encontrada")
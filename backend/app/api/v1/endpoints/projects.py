@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List
 from ....schemas.project import ProjectCreate, ProjectUpdate, ProjectResponse
@@ -166,6 +166,7 @@ def remove_tag(
 
 from fastapi.responses import StreamingResponse
 from ....services.project_report_service import ProjectReportService
+from ....services.location_export_service import iter_file
 
 @router.get("/{project_id}/report")
 def get_project_report(
@@ -184,27 +185,56 @@ def get_project_report(
 @router.get("/{project_id}/report/excel")
 def export_project_report_excel(
     project_id: int,
+    multi_sheet: bool = Query(False, description="Gera abas separadas para locações, etapas e movimentações financeiras"),
     db: Session = Depends(get_db)
 ):
-    """Exporta relatório do projeto para Excel"""
+    """Exporta relatório do projeto para Excel (write-only, enviado em streaming)"""
     report_service = ProjectReportService(db)
 
     try:
-        excel_buffer = report_service.export_to_excel(project_id)
+        excel_file = report_service.export_to_excel(project_id, multi_sheet=multi_sheet)
     except ImportError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    if not excel_buffer:
+    if not excel_file:
         raise HTTPException(status_code=404, detail="Projeto não encontrado")
 
     # Get project name for filename
-    report = report_service.get_project_report(project_id)
-    project_name = report['projeto']['nome'].replace(' ', '_')[:30] if report else f"projeto_{project_id}"
+    project_name = (report_service.get_project_name(project_id) or f"projeto_{project_id}").replace(' ', '_')[:30]
 
     filename = f"relatorio_{project_name}.xlsx"
 
     return StreamingResponse(
-        excel_buffer,
+        iter_file(excel_file),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
+
+# --- Portfolio Report Endpoints ---
+
+from ....schemas.project import PortfolioReportRequest
+from ....services.portfolio_report_service import JOB_KIND as PORTFOLIO_JOB_KIND, run_portfolio_export
+from ....core.jobs import job_registry
+
+@router.post("/reports/portfolio", status_code=202)
+def start_portfolio_report(
+    request: PortfolioReportRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Inicia a exportação em lote dos relatórios (Excel + PDF por projeto, em um zip).
+    Acompanhe o progresso em /jobs/{id} e baixe o resultado em /jobs/{id}/download.
+    """
+    job = job_registry.create(PORTFOLIO_JOB_KIND, owner_id=current_user.id)
+    job_registry.submit(
+        job,
+        run_portfolio_export,
+        db.get_bind(),
+        project_ids=request.project_ids,
+        status=request.status,
+        include_pdf=request.include_pdf,
+    )
+    data = job.to_dict()
+    data["status_url"] = f"/api/v1/jobs/{job.id}"
+    return data
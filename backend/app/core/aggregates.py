@@ -0,0 +1,30 @@
+"""
+Contagens por registro pai via subconsulta agrupada
+Evita o padrão N+1 (um COUNT por linha da listagem): a contagem vem na mesma consulta
+da página (with_count), sem consultas extras por linha.
+"""
+from sqlalchemy import func, select
+from sqlalchemy.orm import Query
+
+
+def count_subquery(child_key, *where, label: str = "count"):
+    """SELECT child_key AS key, COUNT(*) AS <label> ... GROUP BY child_key"""
+    return (
+        select(child_key.label("key"), func.count().label(label))
+        .where(*where)
+        .group_by(child_key)
+        .subquery()
+    )
+
+
+def with_count(query: Query, parent_key, child_key, *where, label: str = "count") -> Query:
+    """
+    Junta a contagem de filhos a uma consulta ORM existente.
+    Cada linha passa a ser (entidade, <label>), com 0 para pais sem filhos.
+    O join é com uma linha por pai, então não altera paginação (limit/offset).
+    """
+    counts = count_subquery(child_key, *where, label=label)
+    return query.outerjoin(counts, counts.c.key == parent_key).add_columns(
+        func.coalesce(counts.c[label], 0).label(label)
+    )
+
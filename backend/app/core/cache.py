@@ -0,0 +1,123 @@
+"""
+Cache em memória do processo com TTL e coalescência de requisições (single-flight)
+Requisições simultâneas pela mesma chave aguardam um único cálculo em vez de repetir a consulta.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlightCache:
+    def __init__(self, ttl: float, wait_timeout: float = 30.0):
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        # Incrementado a cada invalidação: cálculos iniciados antes não são gravados
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+        return None
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                generation = self._generation
+                self.misses += 1
+
+        if not leader:
+            if not flight.event.wait(self.wait_timeout):
+                raise TimeoutError(f"Tempo esgotado aguardando cálculo de {key!r}")
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and generation == self._generation:
+                    self._entries[key] = (time.monotonic() + self.ttl, flight.value)
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Remove uma chave (ou todas, se nenhuma for informada)"""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def invalidate_on_write(
+    cache: SingleFlightCache,
+    models: Tuple[type, ...],
+    flag: str,
+    on_invalidate: Optional[Callable[[], Any]] = None,
+):
+    """
+    Invalida o cache quando uma transação que escreveu em `models` é confirmada.
+    Escritas são marcadas em session.info no flush (ou em insert()/update()/delete() em massa)
+    e a invalidação acontece no commit; rollback descarta a marca.
+    `on_invalidate` é chamado logo após cada invalidação (ex.: avisar clientes via SSE).
+    """
+    def touches(objects) -> bool:
+        return any(isinstance(obj, models) for obj in objects)
+
+    @event.listens_for(Session, "after_flush")
+    def _mark_dirty(session, flush_context):
+        if touches(session.new) or touches(session.dirty) or touches(session.deleted):
+            session.info[flag] = True
+
+    @event.listens_for(Session, "do_orm_execute")
+    def _mark_dirty_bulk(orm_execute_state):
+        # insert()/update()/delete() em massa não passam pelo flush
+        if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, models):
+            orm_execute_state.session.info[flag] = True
+
+    @event.listens_for(Session, "after_commit")
+    def _invalidate(session):
+        if session.info.pop(flag, False):
+            cache.invalidate()
+            if on_invalidate is not None:
+                on_invalidate()
+
+    @event.listens_for(Session, "after_rollback")
+    def _discard_flag(session):
+        session.info.pop(flag, None)
@@ -0,0 +1,253 @@
+"""
+Tabela colunar em memória (NumPy) para consultas analíticas
+Categóricos são codificados por dicionário (int32), medidas ficam em float64 (NaN = nulo) e
+referências inteiras apontam para chaves de outras tabelas (junção vetorizada por chave).
+Filtros viram máscaras booleanas e agrupamentos usam bincount sobre o código combinado das
+dimensões, sem laço em Python por linha.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+AGGREGATES = ("count", "sum", "avg", "min", "max")
+
+
+class DictionaryColumn:
+    """Valores distintos de um categórico e seus códigos"""
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self.index: Dict[Any, int] = {}
+
+    def encode(self, value: Any) -> int:
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value: Any) -> Optional[int]:
+        return self.index.get(value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class ColumnTable:
+    """
+    Linhas identificadas por chave inteira (id do registro). Exclusões marcam a linha como
+    morta; compact() reescreve os arrays quando as linhas mortas passam da metade.
+    """
+
+    def __init__(
+        self,
+        categoricals: Sequence[str],
+        measures: Sequence[str] = (),
+        references: Sequence[str] = (),
+        capacity: int = 1024,
+    ):
+        self.dictionaries = {name: DictionaryColumn() for name in categoricals}
+        self.codes = {name: np.zeros(capacity, dtype=np.int32) for name in categoricals}
+        self.measures = {name: np.full(capacity, np.nan) for name in measures}
+        self.references = {name: np.full(capacity, -1, dtype=np.int64) for name in references}
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.row_keys = np.full(capacity, -1, dtype=np.int64)
+        # Chave -> linha (array denso indexado pela chave; -1 = ausente)
+        self.key_rows = np.full(0, -1, dtype=np.int64)
+        self.size = 0
+        self.dead = 0
+        # Dimensões de outras tabelas alcançadas por uma referência: nome -> (referência, tabela, dimensão)
+        self.joins: Dict[str, Tuple[str, "ColumnTable", str]] = {}
+
+    # ----- Escrita -----
+
+    @property
+    def capacity(self) -> int:
+        return len(self.alive)
+
+    def __len__(self) -> int:
+        return self.size - self.dead
+
+    def _grow(self, needed: int):
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, self.capacity * 2)
+
+        def grown(array: np.ndarray, fill) -> np.ndarray:
+            out = np.full(capacity, fill, dtype=array.dtype)
+            out[:self.size] = array[:self.size]
+            return out
+
+        self.codes = {name: grown(array, 0) for name, array in self.codes.items()}
+        self.measures = {name: grown(array, np.nan) for name, array in self.measures.items()}
+        self.references = {name: grown(array, -1) for name, array in self.references.items()}
+        self.alive = grown(self.alive, False)
+        self.row_keys = grown(self.row_keys, -1)
+
+    def _map_key(self, key: int, row: int):
+        if key >= len(self.key_rows):
+            grown = np.full(max(key + 1, len(self.key_rows) * 2), -1, dtype=np.int64)
+            grown[:len(self.key_rows)] = self.key_rows
+            self.key_rows = grown
+        self.key_rows[key] = row
+
+    def _write(self, row: int, record: Dict[str, Any]):
+        for name, dictionary in self.dictionaries.items():
+            self.codes[name][row] = dictionary.encode(record.get(name))
+        for name, array in self.measures.items():
+            value = record.get(name)
+            array[row] = np.nan if value is None else value
+        for name, array in self.references.items():
+            value = record.get(name)
+            array[row] = -1 if value is None else value
+
+    def row_of(self, key: int) -> int:
+        return int(self.key_rows[key]) if 0 <= key < len(self.key_rows) else -1
+
+    def upsert(self, key: int, record: Dict[str, Any]):
+        row = self.row_of(key)
+        if row < 0:
+            self._grow(self.size + 1)
+            row = self.size
+            self.size += 1
+            self.alive[row] = True
+            self.row_keys[row] = key
+            self._map_key(key, row)
+        self._write(row, record)
+
+    def delete(self, key: int):
+        row = self.row_of(key)
+        if row < 0:
+            return
+        self.alive[row] = False
+        self.key_rows[key] = -1
+        self.dead += 1
+        if self.dead > max(1024, self.size // 2):
+            self.compact()
+
+    def load(self, records: Iterable[Tuple[int, Dict[str, Any]]]):
+        for key, record in records:
+            self.upsert(key, record)
+
+    def compact(self):
+        """Remove as linhas mortas e refaz o mapa chave -> linha"""
+        keep = np.nonzero(self.alive[:self.size])[0]
+        self.codes = {name: array[keep] for name, array in self.codes.items()}
+        self.measures = {name: array[keep] for name, array in self.measures.items()}
+        self.references = {name: array[keep] for name, array in self.references.items()}
+        self.row_keys = self.row_keys[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.size, self.dead = len(keep), 0
+        self.key_rows[:] = -1
+        self.key_rows[self.row_keys] = np.arange(len(keep))
+
+    # ----- Leitura -----
+
+    def join(self, name: str, reference: str, table: "ColumnTable", dimension: str):
+        """Expõe `table.dimension` como dimensão desta tabela, seguindo a referência"""
+        self.joins[name] = (reference, table, dimension)
+
+    @property
+    def dimensions(self) -> List[str]:
+        return list(self.dictionaries) + list(self.joins)
+
+    def rows_for_keys(self, keys: np.ndarray) -> np.ndarray:
+        """Linhas das chaves informadas (-1 para chave ausente ou excluída), vetorizado"""
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        valid = (keys >= 0) & (keys < len(self.key_rows))
+        rows[valid] = self.key_rows[keys[valid]]
+        return rows
+
+    def resolve(self, name: str) -> Tuple[np.ndarray, DictionaryColumn]:
+        """Códigos da dimensão para todas as linhas (dimensões de junção são coletadas da outra tabela)"""
+        if name in self.dictionaries:
+            return self.codes[name][:self.size], self.dictionaries[name]
+        if name not in self.joins:
+            raise KeyError(name)
+        reference, table, dimension = self.joins[name]
+        rows = table.rows_for_keys(self.references[reference][:self.size])
+        dictionary = table.dictionaries[dimension]
+        missing = dictionary.encode(None)
+        codes = table.codes[dimension][np.maximum(rows, 0)] if table.size else np.zeros(len(rows), dtype=np.int32)
+        return np.where(rows >= 0, codes, missing), dictionary
+
+    def mask(
+        self,
+        filters: Optional[Dict[str, Sequence[Any]]] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+    ) -> np.ndarray:
+        mask = self.alive[:self.size].copy()
+        for name, wanted in (filters or {}).items():
+            codes, dictionary = self.resolve(name)
+            wanted_codes = [code for code in (dictionary.lookup(value) for value in wanted) if code is not None]
+            mask &= np.isin(codes, np.array(wanted_codes, dtype=np.int32))
+        for name, (low, high) in (ranges or {}).items():
+            values = self.measures[name][:self.size]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        return mask
+
+    def aggregate(
+        self,
+        group_by: Sequence[str] = (),
+        aggregates: Sequence[Tuple[str, Optional[str]]] = (("count", None),),
+        filters: Optional[Dict[str, Sequence[Any]]] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Agrupa as linhas filtradas pelas dimensões e calcula as agregações pedidas,
+        ex.: aggregates=[("count", None), ("sum", "amount")] -> colunas "count" e "sum_amount".
+        """
+        for function, measure in aggregates:
+            if function not in AGGREGATES:
+                raise ValueError(f"Agregação inválida: {function}")
+            if function != "count" and measure not in self.measures:
+                raise ValueError(f"Medida inválida: {measure}")
+
+        rows = np.nonzero(self.mask(filters, ranges))[0]
+        resolved = [self.resolve(name) for name in group_by]
+        if resolved:
+            sizes = [max(len(dictionary), 1) for _, dictionary in resolved]
+            combined = np.ravel_multi_index([codes[rows] for codes, _ in resolved], sizes)
+            groups, inverse = np.unique(combined, return_inverse=True)
+            inverse = inverse.reshape(-1)
+        else:
+            sizes, groups, inverse = [], np.zeros(1, dtype=np.int64), np.zeros(len(rows), dtype=np.int64)
+        n_groups = len(groups)
+
+        columns: Dict[str, np.ndarray] = {}
+        for function, measure in aggregates:
+            if function == "count":
+                columns["count"] = np.bincount(inverse, minlength=n_groups)
+                continue
+            values = self.measures[measure][rows]
+            valid = ~np.isnan(values)
+            positions, values = inverse[valid], values[valid]
+            label = f"{function}_{measure}"
+            if function in ("sum", "avg"):
+                totals = np.bincount(positions, weights=values, minlength=n_groups)
+                if function == "avg":
+                    counts = np.bincount(positions, minlength=n_groups)
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        totals = np.where(counts > 0, totals / np.maximum(counts, 1), np.nan)
+                columns[label] = totals
+            else:
+                ufunc: Callable = np.minimum if function == "min" else np.maximum
+                out = np.full(n_groups, np.inf if function == "min" else -np.inf)
+                ufunc.at(out, positions, values)
+                columns[label] = np.where(np.isinf(out), np.nan, out)
+
+        keys = np.unravel_index(groups, sizes) if resolved else []
+        result = []
+        for position in range(n_groups):
+            item = {
+                name: dictionary.values[int(keys[i][position])]
+                for i, (name, (_, dictionary)) in enumerate(zip(group_by, resolved))
+            }
+            for label, array in columns.items():
+                value = array[position]
+                item[label] = int(value) if label == "count" else (None if np.isnan(value) else float(value))
+            result.append(item)
+        return result
@@ -0,0 +1,212 @@
+"""
+Pub/sub em memória do processo para Server-Sent Events
+Eventos publicados por tópico recebem um id sequencial e ficam num buffer circular, de onde
+clientes reconectando com Last-Event-ID recebem o que perderam. Publicação é síncrona
+(chamada de hooks de commit em threads do pool) e a entrega usa a fila asyncio de cada assinante.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+SSE_REPLAY_BUFFER = int(os.getenv("SSE_REPLAY_BUFFER", "1000"))
+SSE_SUBSCRIBER_QUEUE = int(os.getenv("SSE_SUBSCRIBER_QUEUE", "256"))
+# Intervalo sugerido ao EventSource para reconectar (ms)
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "3000"))
+
+# Enviado quando o histórico pedido não está mais no buffer: o cliente deve recarregar tudo
+RESYNC_EVENT = "resync"
+
+
+class BrokerEvent:
+    __slots__ = ("seq", "id", "topic", "name", "data")
+
+    def __init__(self, seq: int, event_id: str, topic: str, name: str, data: Dict[str, Any]):
+        self.seq = seq
+        self.id = event_id
+        self.topic = topic
+        self.name = name
+        self.data = data
+
+    def encode(self) -> str:
+        payload = json.dumps({"topic": self.topic, **self.data}, default=str, ensure_ascii=False)
+        return f"id: {self.id}\nevent: {self.name}\ndata: {payload}\n\n"
+
+
+class Subscription:
+    def __init__(self, broker: "EventBroker", topics: Set[str], loop: asyncio.AbstractEventLoop):
+        self.broker = broker
+        self.topics = topics
+        self.loop = loop
+        self.queue: "asyncio.Queue[BrokerEvent]" = asyncio.Queue(maxsize=SSE_SUBSCRIBER_QUEUE)
+        # Fila cheia (cliente lento): o próximo envio pede resync em vez de perder eventos em silêncio
+        self.overflowed = False
+
+    def deliver(self, broker_event: BrokerEvent):
+        try:
+            self.queue.put_nowait(broker_event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    def __init__(self, buffer_size: int = SSE_REPLAY_BUFFER):
+        # Ids são "<boot>-<seq>": ids de outra execução do processo não são comparáveis
+        self.boot = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._buffer: Deque[BrokerEvent] = deque(maxlen=buffer_size)
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def publish(self, topic: str, name: str, data: Optional[Dict[str, Any]] = None) -> BrokerEvent:
+        with self._lock:
+            self._seq += 1
+            broker_event = BrokerEvent(self._seq, f"{self.boot}-{self._seq}", topic, name, data or {})
+            self._buffer.append(broker_event)
+            subscribers = [s for s in self._subscribers if topic in s.topics]
+            self.published += 1
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, broker_event)
+        return broker_event
+
+    def _parse_id(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Sequência do último evento recebido pelo cliente; None se o id não for desta execução"""
+        boot, _, seq = (last_event_id or "").partition("-")
+        if boot != self.boot or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def subscribe(
+        self, topics: Iterable[str], last_event_id: Optional[str] = None
+    ) -> Tuple[Subscription, List[BrokerEvent], bool]:
+        """
+        Registra o assinante e devolve (assinatura, eventos perdidos, precisa_resync).
+        Registro e leitura do buffer acontecem sob o mesmo lock: nenhum evento cai entre os dois.
+        """
+        subscription = Subscription(self, set(topics), asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.append(subscription)
+            if not last_event_id:
+                return subscription, [], False
+            seq = self._parse_id(last_event_id)
+            oldest = self._buffer[0].seq if self._buffer else self._seq + 1
+            if seq is None or seq + 1 < oldest:
+                return subscription, [], True
+            missed = [e for e in self._buffer if e.seq > seq and e.topic in subscription.topics]
+        return subscription, missed, False
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+event_broker = EventBroker()
+
+
+def _resync_message(broker: EventBroker) -> str:
+    return f"event: {RESYNC_EVENT}\ndata: {json.dumps({'boot': broker.boot})}\n\n"
+
+
+async def sse_stream(
+    subscription: Subscription,
+    missed: List[BrokerEvent],
+    resync: bool,
+    is_disconnected: Callable[[], Any],
+    heartbeat: float = SSE_HEARTBEAT_INTERVAL,
+) -> AsyncIterator[str]:
+    """Corpo text/event-stream: replay, eventos ao vivo e comentários de heartbeat"""
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        if resync:
+            yield _resync_message(subscription.broker)
+        for broker_event in missed:
+            yield broker_event.encode()
+        last_sent = time.monotonic()
+        while True:
+            if await is_disconnected():
+                break
+            timeout = max(0.0, heartbeat - (time.monotonic() - last_sent))
+            try:
+                broker_event = await asyncio.wait_for(subscription.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                # Comentário mantém a conexão viva em proxies que encerram conexões ociosas
+                yield ": heartbeat\n\n"
+            else:
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    yield _resync_message(subscription.broker)
+                yield broker_event.encode()
+            last_sent = time.monotonic()
+    finally:
+        subscription.close()
+
+
+def publish_on_write(
+    models: Tuple[type, ...],
+    flag: str,
+    messages: Callable[[Any, str], Iterable[Tuple[str, str, Dict[str, Any]]]],
+    bulk_messages: Optional[Callable[[type], Iterable[Tuple[str, str, Dict[str, Any]]]]] = None,
+    broker: EventBroker = event_broker,
+):
+    """
+    Publica eventos quando uma transação que escreveu em `models` é confirmada.
+    `messages(objeto, ação)` devolve (tópico, evento, dados) para cada objeto gravado no flush
+    (ação: created, updated ou deleted); `bulk_messages(modelo)` cobre insert()/update()/delete()
+    em massa, que não passam pelo flush. Rollback descarta o que foi coletado.
+    """
+    def collect(session, objects, action: str):
+        pending = session.info.setdefault(flag, {})
+        for obj in objects:
+            if isinstance(obj, models):
+                for topic, name, data in messages(obj, action):
+                    # Várias gravações do mesmo registro numa transação viram um único evento
+                    pending[(topic, name, data.get("id"))] = data
+
+    @event.listens_for(Session, "before_flush")
+    def _collect_deleted(session, flush_context, instances):
+        # Antes do DELETE: atributos expirados ainda podem ser lidos do banco
+        collect(session, session.deleted, "deleted")
+
+    @event.listens_for(Session, "after_flush")
+    def _collect(session, flush_context):
+        collect(session, session.new, "created")
+        collect(session, [obj for obj in session.dirty if obj not in session.deleted], "updated")
+
+    @event.listens_for(Session, "do_orm_execute")
+    def _collect_bulk(orm_execute_state):
+        if bulk_messages is None:
+            return
+        if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, models):
+            pending = orm_execute_state.session.info.setdefault(flag, {})
+            for topic, name, data in bulk_messages(mapper.class_):
+                pending[(topic, name, None)] = data
+
+    @event.listens_for(Session, "after_commit")
+    def _publish(session):
+        for (topic, name, _), data in session.info.pop(flag, {}).items():
+            broker.publish(topic, name, data)
+
+    @event.listens_for(Session, "after_rollback")
+    def _discard(session):
+        session.info.pop(flag, None)
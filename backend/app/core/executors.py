@@ -0,0 +1,120 @@
+"""
+Executores dedicados para trabalho bloqueante (CPU e I/O) fora do event loop
+"""
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+# Configurações (podem ser sobrescritas via env)
+CPU_WORKERS = int(os.getenv("EXPORT_CPU_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+IO_WORKERS = int(os.getenv("EXPORT_IO_WORKERS", "8"))
+# Tarefas longas em segundo plano (exportações em lote etc.)
+JOB_WORKERS = int(os.getenv("BACKGROUND_JOB_WORKERS", "2"))
+# Em ambientes sem fork (ou com 1 vCPU) pode-se desativar o pool de processos
+USE_PROCESS_POOL = os.getenv("EXPORT_USE_PROCESS_POOL", "true").lower() in {"1", "true", "on", "yes"}
+
+_cpu_executor: Optional[Executor] = None
+_io_executor: Optional[ThreadPoolExecutor] = None
+_job_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_cpu_executor() -> Executor:
+    """Retorna o pool (lazy) usado para trabalho pesado de CPU"""
+    global _cpu_executor
+    if _cpu_executor is None:
+        if USE_PROCESS_POOL:
+            _cpu_executor = ProcessPoolExecutor(max_workers=CPU_WORKERS)
+        else:
+            _cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu-export")
+    return _cpu_executor
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Retorna o pool (lazy) usado para I/O bloqueante (banco, downloads)"""
+    global _io_executor
+    if _io_executor is None:
+        _io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io-export")
+    return _io_executor
+
+
+def get_job_executor() -> ThreadPoolExecutor:
+    """Retorna o pool (lazy) que executa tarefas em segundo plano"""
+    global _job_executor
+    if _job_executor is None:
+        _job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="background-job")
+    return _job_executor
+
+
+async def run_cpu_bound(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Executa `func` no pool de CPU sem bloquear o event loop.
+    Com o pool de processos, `func` e seus argumentos precisam ser serializáveis (pickle).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), partial(func, *args, **kwargs))
+
+
+async def run_io_bound(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Executa `func` no pool de I/O sem bloquear o event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), partial(func, *args, **kwargs))
+
+
+def shutdown_executors():
+    """Encerra os pools (chamado no shutdown da aplicação)"""
+    global _cpu_executor, _io_executor, _job_executor
+    if _cpu_executor is not None:
+        _cpu_executor.shutdown(wait=False, cancel_futures=True)
+        _cpu_executor = None
+    if _io_executor is not None:
+        _io_executor.shutdown(wait=False, cancel_futures=True)
+        _io_executor = None
+    if _job_executor is not None:
+        _job_executor.shutdown(wait=False, cancel_futures=True)
+        _job_executor = None
+
+
+class RouteConcurrencyLimiter:
+    """
+    Limita o número de execuções simultâneas de uma rota.
+    Requisições excedentes aguardam até `queue_timeout` segundos e depois recebem 503.
+    """
+
+    def __init__(self, name: str, limit: int, queue_timeout: float = 30.0):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_timeout = queue_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.active = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # O semáforo fica vinculado ao loop em execução (ex.: TestClient cria loops novos)
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.limit)
+            self._loop = loop
+            self.active = 0
+        return self._semaphore
+
+    async def __aenter__(self):
+        semaphore = self._get_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Limite de exportações simultâneas atingido ({self.name}). Tente novamente em instantes.",
+                headers={"Retry-After": "5"},
+            )
+        self.active += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.active -= 1
+        self._semaphore.release()
+        return False
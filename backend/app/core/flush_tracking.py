@@ -0,0 +1,196 @@
+"""
+Manutenção incremental de tabelas derivadas (contadores, rollups) a partir dos flushes do ORM
+Cada modelo acompanhado declara os campos relevantes e uma função que converte esses valores
+em contribuições (chave, valor). Inclusões somam, exclusões subtraem e alterações subtraem a
+contribuição antiga e somam a nova; os deltas são gravados na mesma transação da escrita.
+"""
+from collections import defaultdict
+from itertools import chain
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+Number = Union[int, float]
+Value = Union[Number, Tuple[Number, ...]]
+Contribution = Tuple[Hashable, Value]
+ContributionsFn = Callable[[Dict[str, Any]], Iterator[Contribution]]
+
+
+def add_contributions(deltas: Dict[Hashable, Value], contributions: Iterable[Contribution], sign: int = 1):
+    """Acumula contribuições escalares ou vetoriais (tuplas somadas posição a posição)"""
+    for key, value in contributions:
+        if isinstance(value, tuple):
+            current = deltas.get(key) or (0,) * len(value)
+            deltas[key] = tuple(c + sign * v for c, v in zip(current, value))
+        else:
+            deltas[key] = (deltas.get(key) or 0) + sign * value
+
+
+def is_zero(value: Value) -> bool:
+    if isinstance(value, tuple):
+        return not any(value)
+    return not value
+
+
+def upsert_increment(connection, table, key_columns: Sequence[str], value_columns: Sequence[str], rows: List[Dict[str, Any]]):
+    """
+    Soma os valores das linhas nas colunas acumuladoras (INSERT ... ON CONFLICT DO UPDATE).
+    Em bancos sem upsert faz UPDATE e, se nenhuma linha existir, INSERT.
+    """
+    if not rows:
+        return
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table)
+        set_ = {name: table.c[name] + stmt.excluded[name] for name in value_columns}
+        if "updated_at" in table.c:
+            set_["updated_at"] = func.now()
+        stmt = stmt.on_conflict_do_update(index_elements=[table.c[name] for name in key_columns], set_=set_)
+        connection.execute(stmt, rows)
+        return
+
+    for row in rows:
+        values = {name: table.c[name] + row[name] for name in value_columns}
+        if "updated_at" in table.c:
+            values["updated_at"] = func.now()
+        result = connection.execute(
+            update(table).where(*[table.c[name] == row[name] for name in key_columns]).values(**values)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(**row))
+
+
+class FlushDeltaTracker:
+    """
+    Registra os hooks de sessão que mantêm uma tabela derivada.
+    `apply_deltas(connection, deltas)` grava os deltas acumulados no flush;
+    `mark_stale(connection)` sinaliza que a tabela precisa de recálculo (escrita em massa
+    ou exclusão cujo valor anterior não pôde ser lido).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        tracked: Dict[type, Tuple[Sequence[str], ContributionsFn]],
+        apply_deltas: Callable[[Any, Dict[Hashable, Value]], None],
+        mark_stale: Callable[[Any], None],
+    ):
+        self.name = name
+        self.tracked = tracked
+        self.apply_deltas = apply_deltas
+        self.mark_stale = mark_stale
+        self._previous_key = f"{name}_previous"
+
+    def listen(self) -> "FlushDeltaTracker":
+        event.listen(Session, "before_flush", self._capture_previous_values)
+        event.listen(Session, "after_flush", self._apply_flush_deltas)
+        event.listen(Session, "after_rollback", self._discard_previous_values)
+        event.listen(Session, "do_orm_execute", self._mark_stale_on_bulk_dml)
+        return self
+
+    def _spec(self, obj):
+        return self.tracked.get(type(obj))
+
+    @staticmethod
+    def _current_values(obj, fields: Sequence[str]) -> Dict[str, Any]:
+        return {name: getattr(obj, name) for name in fields}
+
+    @staticmethod
+    def _loaded_values(obj, fields: Sequence[str]) -> Optional[Dict[str, Any]]:
+        """Valores anteriores a partir do histórico em memória (None se algum não foi carregado)"""
+        state = inspect(obj)
+        values = {}
+        for name in fields:
+            history = state.attrs[name].history
+            if history.deleted:
+                values[name] = history.deleted[0]
+            elif history.unchanged:
+                values[name] = history.unchanged[0]
+            else:
+                return None
+        return values
+
+    def _capture_previous_values(self, session, flush_context, instances):
+        """
+        Lê do banco (uma consulta por modelo) os valores anteriores dos objetos alterados/excluídos.
+        Depois de um commit os atributos expiram e o histórico em memória não traz o valor antigo.
+        """
+        pending: Dict[type, List[int]] = defaultdict(list)
+        for obj in chain(session.dirty, session.deleted):
+            spec = self._spec(obj)
+            if spec is None:
+                continue
+            state = inspect(obj)
+            if state.identity is None:
+                continue
+            if obj in session.deleted or any(state.attrs[name].history.has_changes() for name in spec[0]):
+                pending[type(obj)].append(state.identity[0])
+        if not pending:
+            return
+
+        previous = session.info.setdefault(self._previous_key, {})
+        connection = session.connection()
+        for model, ids in pending.items():
+            fields = self.tracked[model][0]
+            rows = connection.execute(
+                select(model.id, *[getattr(model, name) for name in fields]).where(model.id.in_(ids))
+            )
+            for row in rows:
+                previous[(model, row[0])] = dict(zip(fields, row[1:]))
+
+    def _apply_flush_deltas(self, session, flush_context):
+        previous = session.info.pop(self._previous_key, {})
+        deltas: Dict[Hashable, Value] = {}
+        stale = False
+
+        for obj in session.new:
+            spec = self._spec(obj)
+            if spec:
+                add_contributions(deltas, spec[1](self._current_values(obj, spec[0])), +1)
+
+        for obj in session.dirty:
+            spec = self._spec(obj)
+            if spec is None or obj in session.deleted:
+                continue
+            old = previous.get((type(obj), inspect(obj).identity[0]))
+            if old is None:
+                # Nenhum campo acompanhado mudou
+                continue
+            add_contributions(deltas, spec[1](old), -1)
+            add_contributions(deltas, spec[1](self._current_values(obj, spec[0])), +1)
+
+        for obj in session.deleted:
+            spec = self._spec(obj)
+            if spec is None:
+                continue
+            identity = inspect(obj).identity
+            old = previous.get((type(obj), identity[0])) if identity else None
+            if old is None:
+                # Excluído em cascata durante o flush: usa o que estiver carregado
+                old = self._loaded_values(obj, spec[0])
+            if old is None:
+                stale = True
+                continue
+            add_contributions(deltas, spec[1](old), -1)
+
+        deltas = {key: value for key, value in deltas.items() if not is_zero(value)}
+        if stale:
+            self.mark_stale(session.connection())
+        if deltas:
+            self.apply_deltas(session.connection(), deltas)
+
+    def _discard_previous_values(self, session):
+        session.info.pop(self._previous_key, None)
+
+    def _mark_stale_on_bulk_dml(self, orm_execute_state):
+        # insert()/update()/delete() em massa não passam pelo flush: a próxima leitura recalcula
+        if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in self.tracked:
+            self.mark_stale(orm_execute_state.session.connection())
@@ -0,0 +1,79 @@
+"""
+Estruturas de intervalos fechados [início, fim] (datas ou números)
+- IntervalIndex: intervalos ordenados pelo início com a maior duração guardada; a busca por
+  sobreposição é uma bisseção mais a varredura só dos candidatos que ainda podem alcançar a janela
+- sweep_overlaps: todos os pares sobrepostos de uma lista por varredura (sweep-line), sem
+  comparar cada par
+"""
+import heapq
+from bisect import bisect_right
+from typing import Any, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+# (início, fim, chave, dados)
+Interval = Tuple[Any, Any, Hashable, Any]
+
+
+def _span(start, end):
+    return end - start
+
+
+class IntervalIndex:
+    def __init__(self, intervals: Iterable[Interval] = ()):
+        self._items: List[Interval] = []
+        self._starts: List[Any] = []
+        self.max_span = None
+        for interval in sorted(intervals, key=lambda i: i[0]):
+            self._append(interval)
+
+    def _append(self, interval: Interval):
+        self._items.append(interval)
+        self._starts.append(interval[0])
+        self._grow(interval)
+
+    def _grow(self, interval: Interval):
+        span = _span(interval[0], interval[1])
+        if self.max_span is None or span > self.max_span:
+            self.max_span = span
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, start, end, key: Hashable, data: Any = None):
+        position = bisect_right(self._starts, start)
+        self._starts.insert(position, start)
+        self._items.insert(position, (start, end, key, data))
+        self._grow((start, end))
+
+    def remove(self, key: Hashable):
+        """Remove os intervalos da chave (max_span só diminui numa reconstrução)"""
+        kept = [item for item in self._items if item[2] != key]
+        self._items = kept
+        self._starts = [item[0] for item in kept]
+
+    def overlapping(self, start, end, exclude: Optional[Hashable] = None) -> Iterator[Interval]:
+        """Intervalos que tocam [start, end]: nenhum começa depois de `end` nem antes de start - max_span"""
+        if not self._items:
+            return
+        position = bisect_right(self._starts, end) - 1
+        floor = start - self.max_span
+        while position >= 0 and self._starts[position] >= floor:
+            item = self._items[position]
+            if item[1] >= start and (exclude is None or item[2] != exclude):
+                yield item
+            position -= 1
+
+
+def sweep_overlaps(intervals: Iterable[Interval]) -> Iterator[Tuple[Interval, Interval]]:
+    """
+    Pares sobrepostos em O(n log n + pares): percorre os intervalos pelo início mantendo um heap
+    dos ativos ordenado pelo fim; ao entrar um intervalo, os que terminaram antes dele saem e
+    todos os que restam o sobrepõem.
+    """
+    active: List[Tuple[Any, int, Interval]] = []
+    for order, interval in enumerate(sorted(intervals, key=lambda i: (i[0], i[1]))):
+        while active and active[0][0] < interval[0]:
+            heapq.heappop(active)
+        for _, _, other in active:
+            yield other, interval
+        heapq.heappush(active, (interval[1], order, interval))
+
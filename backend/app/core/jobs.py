@@ -0,0 +1,241 @@
+"""
+Registro em memória de tarefas em segundo plano (exportações em lote e afins)
+O cliente inicia a tarefa, acompanha o progresso pelo id e baixa o resultado ao final.
+"""
+import os
+import threading
+import time
+import traceback
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+from .executors import get_job_executor
+
+# Quantidade de tarefas finalizadas mantidas para consulta (as mais antigas são descartadas)
+JOB_HISTORY_LIMIT = int(os.getenv("BACKGROUND_JOB_HISTORY", "100"))
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    status: JobStatus = JobStatus.PENDING
+    total: int = 0
+    completed: int = 0
+    message: Optional[str] = None
+    result: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    file_path: Optional[str] = None
+    filename: Optional[str] = None
+    media_type: Optional[str] = None
+    owner_id: Optional[int] = None  # Usuário que iniciou (None: tarefas do sistema, só administradores veem)
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @property
+    def progress(self) -> float:
+        if self.status == JobStatus.COMPLETED:
+            return 100.0
+        if not self.total:
+            return 0.0
+        return round(self.completed / self.total * 100, 1)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.COMPLETED, JobStatus.FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status.value,
+            "total": self.total,
+            "completed": self.completed,
+            "progress": self.progress,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "has_file": bool(self.file_path),
+            "owner_id": self.owner_id,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobRegistry:
+    """Tarefas do processo atual; as atualizações vêm da thread que executa a tarefa"""
+
+    def __init__(self, history_limit: int = JOB_HISTORY_LIMIT):
+        self.history_limit = history_limit
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def create(self, kind: str, total: int = 0, owner_id: Optional[int] = None) -> Job:
+        job = Job(id=uuid.uuid4().hex, kind=kind, total=total, owner_id=owner_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_finished()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self, kind: Optional[str] = None, owner_id: Optional[int] = None) -> List[Job]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if kind:
+            jobs = [job for job in jobs if job.kind == kind]
+        if owner_id is not None:
+            jobs = [job for job in jobs if job.owner_id == owner_id]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def start(self, job: Job, total: Optional[int] = None, message: Optional[str] = None):
+        with self._lock:
+            job.status = JobStatus.RUNNING
+            job.started_at = datetime.now(timezone.utc)
+            if total is not None:
+                job.total = total
+            if message:
+                job.message = message
+
+    def advance(self, job: Job, step: int = 1, message: Optional[str] = None):
+        with self._lock:
+            job.completed += step
+            if message:
+                job.message = message
+
+    def checkpoint(self, job: Job, **values: Any):
+        """Grava o ponto de retomada no resultado parcial (consultável se a tarefa falhar)"""
+        with self._lock:
+            job.result = {**job.result, **values}
+
+    def complete(
+        self,
+        job: Job,
+        result: Optional[Dict[str, Any]] = None,
+        file_path: Optional[str] = None,
+        filename: Optional[str] = None,
+        media_type: Optional[str] = None,
+    ):
+        with self._lock:
+            job.status = JobStatus.COMPLETED
+            job.finished_at = datetime.now(timezone.utc)
+            job.result = result or {}
+            job.file_path = file_path
+            job.filename = filename
+            job.media_type = media_type
+
+    def fail(self, job: Job, error: str):
+        with self._lock:
+            job.status = JobStatus.FAILED
+            job.finished_at = datetime.now(timezone.utc)
+            job.error = error
+
+    def submit(self, job: Job, func: Callable[..., Any], *args, **kwargs):
+        """
+        Executa `func(job, *args, **kwargs)` no pool de tarefas em segundo plano.
+        Exceções não tratadas marcam a tarefa como falha.
+        """
+        def runner():
+            try:
+                func(job, *args, **kwargs)
+            except Exception as e:
+                print(f"❌ Tarefa {job.kind} ({job.id}) falhou: {e}")
+                traceback.print_exc()
+                self.fail(job, str(e))
+
+        return get_job_executor().submit(runner)
+
+    def _evict_finished(self):
+        """Descarta as tarefas finalizadas mais antigas (e seus arquivos) acima do limite"""
+        finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.created_at)
+        for job in finished[:max(0, len(self._jobs) - self.history_limit)]:
+            self._jobs.pop(job.id, None)
+            if job.file_path and os.path.exists(job.file_path):
+                try:
+                    os.remove(job.file_path)
+                except OSError:
+                    pass
+
+
+job_registry = JobRegistry()
+
+
+class PeriodicScheduler:
+    """
+    Dispara tarefas recorrentes (reconciliações, verificações) em intervalos fixos.
+    Cada execução vira uma tarefa no job_registry, consultável em /jobs.
+    """
+
+    def __init__(self, registry: JobRegistry = job_registry, tick: float = 1.0):
+        self.registry = registry
+        self.tick = tick
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, kind: str, interval: float, func: Callable[..., Any], *args, run_at_start: bool = False, **kwargs):
+        """Agenda `func(job, *args, **kwargs)` a cada `interval` segundos (intervalo <= 0 desativa)"""
+        if interval <= 0:
+            return
+        self._tasks[kind] = {
+            "interval": interval,
+            "func": func,
+            "args": args,
+            "kwargs": kwargs,
+            "next_run": time.monotonic() + (0 if run_at_start else interval),
+            "running": None,
+        }
+
+    def trigger(self, kind: str) -> bool:
+        """
+        Antecipa a próxima execução de uma tarefa registrada para o próximo ciclo.
+        Se ela já estiver rodando, não cria outra. Retorna False se o tipo não estiver agendado.
+        """
+        task = self._tasks.get(kind)
+        if task is None:
+            return False
+        task["next_run"] = min(task["next_run"], time.monotonic())
+        return True
+
+    def run_due(self):
+        """Submete as tarefas vencidas (uma execução por vez para cada tipo)"""
+        now = time.monotonic()
+        for kind, task in self._tasks.items():
+            running = task["running"]
+            if now < task["next_run"] or (running is not None and not running.done()):
+                continue
+            task["next_run"] = now + task["interval"]
+            job = self.registry.create(kind)
+            task["running"] = self.registry.submit(job, task["func"], *task["args"], **task["kwargs"])
+
+    def _loop(self):
+        while not self._stop.wait(self.tick):
+            self.run_due()
+
+    def start(self):
+        if self._thread is None and self._tasks:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="periodic-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+periodic_scheduler = PeriodicScheduler()
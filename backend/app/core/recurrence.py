@@ -0,0 +1,120 @@
+"""
+Regras de recorrência no formato RRULE (RFC 5545) sobre python-dateutil
+A expansão é sempre limitada a uma janela de datas e os resultados ficam num LRU pequeno
+chaveado por (regra, início da série, janela): a expansão é função pura desses valores, então o
+cache nunca precisa de invalidação e meses já vistos numa visão de calendário saem de memória.
+Horários são expandidos no relógio de parede (sem fuso) e o fuso da série é reaplicado depois.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from dateutil.rrule import rrule, rrulestr
+
+RECURRENCE_CACHE_SIZE = int(os.getenv("RECURRENCE_CACHE_SIZE", "2048"))
+# Limite de ocorrências por série (regras sem COUNT/UNTIL são infinitas; isso protege expansões enormes)
+RECURRENCE_MAX_OCCURRENCES = int(os.getenv("RECURRENCE_MAX_OCCURRENCES", "5000"))
+
+# Frequências abaixo de diária não fazem sentido na agenda e gerariam expansões enormes
+ALLOWED_FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+
+
+def normalize_rule(rule: str) -> str:
+    """
+    Regra canônica (maiúsculas, sem prefixo RRULE:); ValueError se inválida.
+    UNTIL em UTC ("...Z") vira horário local de parede, como o início da série.
+    """
+    text = (rule or "").strip().upper()
+    if text.startswith("RRULE:"):
+        text = text[len("RRULE:"):]
+    if not text:
+        raise ValueError("Regra de recorrência vazia")
+    parts = []
+    for part in text.split(";"):
+        key, _, value = part.partition("=")
+        if not value:
+            raise ValueError(f"Parte inválida na regra de recorrência: {part!r}")
+        if key == "DTSTART":
+            raise ValueError("DTSTART não é aceito na regra: o início da série é a data do evento")
+        if key == "FREQ" and value not in ALLOWED_FREQUENCIES:
+            raise ValueError(f"Frequência não suportada: {value} (use {', '.join(ALLOWED_FREQUENCIES)})")
+        if key == "UNTIL" and value.endswith("Z"):
+            value = value[:-1]
+        parts.append(f"{key}={value}")
+    normalized = ";".join(parts)
+    if not any(part.startswith("FREQ=") for part in parts):
+        raise ValueError("Regra de recorrência sem FREQ")
+    try:
+        _parse(normalized, datetime(2000, 1, 1))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Regra de recorrência inválida: {e}")
+    return normalized
+
+
+def series_start(start_date: date, start_at: Optional[datetime]) -> datetime:
+    """Início da série no relógio de parede (DTSTART)"""
+    if start_at is not None:
+        return start_at.replace(tzinfo=None)
+    return datetime.combine(start_date, time())
+
+
+@lru_cache(maxsize=RECURRENCE_CACHE_SIZE)
+def _parse(rule: str, dtstart: datetime) -> rrule:
+    return rrulestr(rule, dtstart=dtstart, cache=False)
+
+
+def last_occurrence(rule: str, dtstart: datetime) -> Optional[datetime]:
+    """Última ocorrência de regras finitas (COUNT/UNTIL); None para séries sem fim"""
+    if "COUNT=" not in rule and "UNTIL=" not in rule:
+        return None
+    last = None
+    for index, moment in enumerate(_parse(rule, dtstart)):
+        if index >= RECURRENCE_MAX_OCCURRENCES:
+            break
+        last = moment
+    return last
+
+
+class ExpansionCache:
+    """LRU de janelas expandidas: (regra, início, janela) -> ocorrências"""
+
+    def __init__(self, size: int = RECURRENCE_CACHE_SIZE):
+        self.size = size
+        self._entries: "OrderedDict[Tuple, Tuple[datetime, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def occurrences(self, rule: str, dtstart: datetime, window_start: date, window_end: date) -> Tuple[datetime, ...]:
+        key = (rule, dtstart, window_start, window_end)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+        expanded = tuple(
+            _parse(rule, dtstart).between(
+                datetime.combine(window_start, time.min),
+                datetime.combine(window_end, time.max),
+                inc=True,
+            )[:RECURRENCE_MAX_OCCURRENCES]
+        )
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = expanded
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return expanded
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+expansion_cache = ExpansionCache()
@@ -0,0 +1,175 @@
+"""
+Método do caminho crítico (CPM) sobre um grafo de tarefas com dependências término-início
+Ida (ordem topológica): início mais cedo = maior término mais cedo dos predecessores, sem
+antecipar o início planejado da tarefa (restrição "não começar antes de").
+Volta: término mais tarde = menor início mais tarde dos sucessores (ou o fim do cronograma).
+Folga = início mais tarde - início mais cedo; folga zero define o caminho crítico.
+"""
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# Folga abaixo disso conta como zero (arredondamento de horários)
+CRITICAL_TOLERANCE = timedelta(minutes=1)
+
+
+class DependencyCycleError(ValueError):
+    """Dependências circulares; `cycle` traz as tarefas envolvidas"""
+
+    def __init__(self, cycle: List[Hashable]):
+        self.cycle = cycle
+        super().__init__(f"Dependência circular entre etapas: {', '.join(str(node) for node in cycle)}")
+
+
+@dataclass
+class ScheduleTask:
+    id: Hashable
+    duration: timedelta
+    predecessors: Tuple[Hashable, ...] = ()
+    start: Optional[datetime] = None  # Início planejado (restrição para tarefas com predecessores)
+    fixed: bool = False  # Concluída: mantém as datas, não é deslocada
+
+
+@dataclass
+class Timing:
+    earliest_start: datetime
+    earliest_finish: datetime
+    latest_start: datetime
+    latest_finish: datetime
+    slack: timedelta
+    critical: bool
+
+
+def successors_of(tasks: Dict[Hashable, ScheduleTask]) -> Dict[Hashable, List[Hashable]]:
+    successors: Dict[Hashable, List[Hashable]] = defaultdict(list)
+    for task in tasks.values():
+        for predecessor in task.predecessors:
+            if predecessor in tasks:
+                successors[predecessor].append(task.id)
+    return successors
+
+
+def topological_order(tasks: Dict[Hashable, ScheduleTask], only: Optional[Set[Hashable]] = None) -> List[Hashable]:
+    """
+    Ordem de Kahn (empates pela ordem de inserção); predecessores fora de `tasks` são ignorados.
+    `only` restringe a ordenação a um subgrafo. DependencyCycleError se houver ciclo.
+    """
+    nodes = [task_id for task_id in tasks if only is None or task_id in only]
+    position = {task_id: index for index, task_id in enumerate(nodes)}
+    indegree = {task_id: 0 for task_id in nodes}
+    successors: Dict[Hashable, List[Hashable]] = defaultdict(list)
+    for task_id in nodes:
+        for predecessor in set(tasks[task_id].predecessors):
+            if predecessor in position:
+                indegree[task_id] += 1
+                successors[predecessor].append(task_id)
+
+    ready = [(position[task_id], task_id) for task_id, degree in indegree.items() if degree == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        _, task_id = heapq.heappop(ready)
+        order.append(task_id)
+        for successor in successors[task_id]:
+            indegree[successor] -= 1
+            if indegree[successor] == 0:
+                heapq.heappush(ready, (position[successor], successor))
+
+    if len(order) < len(nodes):
+        raise DependencyCycleError(_find_cycle(tasks, [task_id for task_id in nodes if indegree[task_id] > 0]))
+    return order
+
+
+def _find_cycle(tasks: Dict[Hashable, ScheduleTask], candidates: List[Hashable]) -> List[Hashable]:
+    """Um ciclo entre os nós que sobraram na ordenação (seguindo predecessores até repetir)"""
+    remaining = set(candidates)
+    node = candidates[0]
+    path: List[Hashable] = []
+    seen: Dict[Hashable, int] = {}
+    while node not in seen:
+        seen[node] = len(path)
+        path.append(node)
+        node = next(p for p in tasks[node].predecessors if p in remaining)
+    return list(reversed(path[seen[node]:]))
+
+
+def critical_path(tasks: Dict[Hashable, ScheduleTask], anchor: datetime) -> Dict[Hashable, Timing]:
+    """Tempos CPM de todas as tarefas; tarefas sem data nem predecessores começam em `anchor`"""
+    order = topological_order(tasks)
+    earliest: Dict[Hashable, Tuple[datetime, datetime]] = {}
+    for task_id in order:
+        task = tasks[task_id]
+        starts = [earliest[p][1] for p in task.predecessors if p in earliest]
+        if task.fixed and task.start is not None:
+            start = task.start
+        else:
+            if task.start is not None:
+                starts.append(task.start)
+            start = max(starts) if starts else anchor
+        earliest[task_id] = (start, start + task.duration)
+
+    if not earliest:
+        return {}
+    finish = max(end for _, end in earliest.values())
+    successors = successors_of(tasks)
+    latest: Dict[Hashable, Tuple[datetime, datetime]] = {}
+    for task_id in reversed(order):
+        latest_finish = min((latest[s][0] for s in successors[task_id]), default=finish)
+        latest[task_id] = (latest_finish - tasks[task_id].duration, latest_finish)
+
+    timings = {}
+    for task_id in order:
+        slack = latest[task_id][0] - earliest[task_id][0]
+        timings[task_id] = Timing(
+            earliest_start=earliest[task_id][0],
+            earliest_finish=earliest[task_id][1],
+            latest_start=latest[task_id][0],
+            latest_finish=latest[task_id][1],
+            slack=slack,
+            critical=slack <= CRITICAL_TOLERANCE,
+        )
+    return timings
+
+
+def descendants(tasks: Dict[Hashable, ScheduleTask], roots: Iterable[Hashable]) -> Set[Hashable]:
+    """Tarefas alcançáveis a partir de `roots` pelos sucessores (incluindo as próprias raízes)"""
+    successors = successors_of(tasks)
+    seen: Set[Hashable] = set()
+    stack = [root for root in roots if root in tasks]
+    while stack:
+        task_id = stack.pop()
+        if task_id in seen:
+            continue
+        seen.add(task_id)
+        stack.extend(successors[task_id])
+    return seen
+
+
+def propagate(tasks: Dict[Hashable, ScheduleTask], changed: Iterable[Hashable]) -> Dict[Hashable, datetime]:
+    """
+    Empurra para frente as tarefas afetadas pela mudança de `changed` (só o subgrafo descendente).
+    Uma tarefa é deslocada quando começaria antes do término de algum predecessor; a duração
+    é mantida. Antecipar um predecessor não puxa os sucessores (a folga fica no cronograma).
+    Retorna {tarefa: novo início} apenas das tarefas deslocadas.
+    """
+    affected = descendants(tasks, changed)
+    moved: Dict[Hashable, datetime] = {}
+
+    def finish(task_id: Hashable) -> Optional[datetime]:
+        task = tasks[task_id]
+        start = moved.get(task_id, task.start)
+        return start + task.duration if start is not None else None
+
+    for task_id in topological_order(tasks, only=affected):
+        task = tasks[task_id]
+        if task.fixed:
+            continue
+        required = [end for end in (finish(p) for p in task.predecessors if p in tasks) if end is not None]
+        if not required:
+            continue
+        start = max(required)
+        if task.start is None or start > task.start:
+            moved[task_id] = start
+    return moved
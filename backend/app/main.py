@@ -6,11 +6,20 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
-from .api.v1.endpoints import visits_router, projects_router, locations_router, users_router, setup_router, quick_setup, auth, project_location_stages_router, project_locations_router, agenda_events, suppliers, tags_router, notifications_router, custom_filters_router, project_visit_locations_router, project_stages_router, location_demands
+from .api.v1.endpoints import visits_router, projects_router, locations_router, users_router, setup_router, quick_setup, auth, project_location_stages_router, project_locations_router, agenda_events, suppliers, tags_router, notifications_router, custom_filters_router, project_visit_locations_router, project_stages_router, location_demands, financial_movements_router
 from .api.v1.endpoints import presentations as presentations_router
 from .routers.export import router as export_router
 from .routers.dashboard import router as dashboard_router
+from .routers.jobs import router as jobs_router
+from .routers.analytics import router as analytics_router
+from .routers.events import router as events_router
 from .core.database import create_tables
+from .core.executors import shutdown_executors
+from .core.jobs import periodic_scheduler
+from .services.hooks import register_hooks
+
+# Hooks de sessão que mantêm os dados derivados (snapshot de KPIs, ledger, rollups, progresso, atrasos)
+register_hooks()
 
 # Criar aplicação FastAPI
 class UTF8JSONResponse(JSONResponse):
@@ -159,10 +168,14 @@ app.include_router(notifications_router, prefix="/api/v1", dependencies=dependen
 app.include_router(export_router, prefix="/api/v1", dependencies=dependency)
 app.include_router(custom_filters_router, prefix="/api/v1/custom-filters", dependencies=dependency)
 app.include_router(dashboard_router, prefix="/api/v1", dependencies=dependency)
+app.include_router(jobs_router, prefix="/api/v1", dependencies=dependency)
+app.include_router(analytics_router, prefix="/api/v1", dependencies=dependency)
+app.include_router(events_router, prefix="/api/v1", dependencies=dependency)
 app.include_router(presentations_router.router, prefix="/api/v1", dependencies=dependency)
 app.include_router(project_visit_locations_router, prefix="/api/v1", dependencies=dependency)
 app.include_router(project_stages_router, prefix="/api/v1/project-stages", dependencies=dependency)
 app.include_router(location_demands.router, prefix="/api/v1/location-demands", dependencies=dependency)
+app.include_router(financial_movements_router, prefix="/api/v1", dependencies=dependency)
 
 # Servir arquivos estáticos (fotos)
 import os
@@ -176,6 +189,34 @@ async def startup_event():
     # Criar tabelas do banco de dados
     create_tables()
 
+    # Tarefas periódicas (reconciliação do snapshot de KPIs, rollups financeiros, ledger do orçamento, progresso e histórico das etapas, atrasos)
+    from .core.database import engine
+    from .services.budget_ledger_service import BUDGET_LEDGER_VERIFY_INTERVAL, run_budget_ledger_verify
+    from .services.financial_rollup_service import FINANCIAL_ROLLUP_REBUILD_INTERVAL, FINANCIAL_ROLLUP_REBUILD_JOB, run_financial_rollup_rebuild
+    from .services.kpi_snapshot_service import KPI_RECONCILE_INTERVAL, KPI_RECONCILE_JOB, run_kpi_reconcile
+    from .services.overdue_service import OVERDUE_SCAN_INTERVAL, run_overdue_scan
+    from .services.stage_progress_service import STAGE_PROGRESS_RECONCILE_INTERVAL, STAGE_PROGRESS_RECONCILE_JOB, run_stage_progress_reconcile
+    from .services.stage_status_analytics_service import (
+        STAGE_STATUS_ANALYTICS_INTERVAL, STAGE_STATUS_ANALYTICS_JOB, STAGE_STATUS_REFRESH_INTERVAL, STAGE_STATUS_REFRESH_JOB,
+        run_stage_status_analytics, run_stage_status_refresh,
+    )
+
+    periodic_scheduler.register(KPI_RECONCILE_JOB, KPI_RECONCILE_INTERVAL, run_kpi_reconcile, engine, run_at_start=True)
+    periodic_scheduler.register(FINANCIAL_ROLLUP_REBUILD_JOB, FINANCIAL_ROLLUP_REBUILD_INTERVAL, run_financial_rollup_rebuild, engine)
+    periodic_scheduler.register("budget_ledger_verify", BUDGET_LEDGER_VERIFY_INTERVAL, run_budget_ledger_verify, engine)
+    periodic_scheduler.register(STAGE_PROGRESS_RECONCILE_JOB, STAGE_PROGRESS_RECONCILE_INTERVAL, run_stage_progress_reconcile, engine)
+    periodic_scheduler.register(STAGE_STATUS_ANALYTICS_JOB, STAGE_STATUS_ANALYTICS_INTERVAL, run_stage_status_analytics, engine)
+    periodic_scheduler.register(STAGE_STATUS_REFRESH_JOB, STAGE_STATUS_REFRESH_INTERVAL, run_stage_status_refresh, engine, run_at_start=True)
+    periodic_scheduler.register("overdue_scan", OVERDUE_SCAN_INTERVAL, run_overdue_scan, engine, run_at_start=True)
+    periodic_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Evento executado no encerramento da aplicação"""
+    # Encerrar tarefas periódicas e pools de exportação
+    periodic_scheduler.stop()
+    shutdown_executors()
+
 @app.get("/")
 async def root():
     """Endpoint raiz"""
@@ -28,6 +28,10 @@ from .project_visit_photo import ProjectVisitPhoto, PhotoComment
 from .project_visit_workflow import ProjectVisitWorkflowStage, WorkflowStageStatus
 from .project_location_photo import ProjectLocationPhoto, ProjectLocationPhotoComment
 from .location_demand import LocationDemand, DemandPriority, DemandStatus
+from .kpi_snapshot import KpiSnapshot
+from .financial_rollup import FinancialRollupDaily, FinancialRollupMonthly
+from .stage_progress import StageDeadlineRollup
+from .stage_status_analytics import StageStatusInterval, StageStatusDaily
 
 __all__ = [
     "Base",
@@ -59,5 +63,9 @@ __all__ = [
     "ProjectVisitWorkflowStage", "WorkflowStageStatus",
     "ProjectLocationPhoto", "ProjectLocationPhotoComment",
     "UserProject", "ProjectAccessLevel",
-    "LocationDemand", "DemandPriority", "DemandStatus"
+    "LocationDemand", "DemandPriority", "DemandStatus",
+    "KpiSnapshot",
+    "FinancialRollupDaily", "FinancialRollupMonthly",
+    "StageDeadlineRollup",
+    "StageStatusInterval", "StageStatusDaily"
 ]
@@ -1,6 +1,8 @@
-from sqlalchemy import Column, String, Text, Date, Time, Integer, ForeignKey, Enum, JSON, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Text, Date, DateTime, Time, Integer, ForeignKey, Enum, JSON, Boolean, Index, event
+from sqlalchemy.orm import relationship, validates
+from datetime import date, datetime, timedelta
 from .base import Base, TimestampMixin
+from ..core.recurrence import last_occurrence, normalize_rule, series_start
 import enum
 
 class EventType(str, enum.Enum):
@@ -30,7 +32,16 @@ class EventStatus(str, enum.Enum):
 
 class AgendaEvent(Base, TimestampMixin):
     __tablename__ = "agenda_events"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Visões de calendário filtram por período e projeto/locação
+        Index("ix_agenda_events_start_date_project_id", "start_date", "project_id"),
+        Index("ix_agenda_events_start_date_location_id", "start_date", "location_id"),
+        # Eventos longos (span_days acima do limite curto) nas consultas de sobreposição
+        Index("ix_agenda_events_span_days", "span_days"),
+        # Séries que ainda alcançam uma janela (nulo em eventos avulsos)
+        Index("ix_agenda_events_recurrence_until", "recurrence_until"),
+        {'extend_existing': True},
+    )
 
     # Informações básicas
     title = Column(String(255), nullable=False)
@@ -39,10 +50,21 @@ class AgendaEvent(Base, TimestampMixin):
     status = Column(Enum(EventStatus), default=EventStatus.SCHEDULED)
 
     # Datas e horários
-    # Datas e horários
-    start_date = Column(String, nullable=False)  # Armazenado como ISO string no DB atual
-    end_date = Column(String, nullable=True)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=True)
+    # Horários de eventos com hora marcada (nulos em eventos de dia inteiro)
+    start_at = Column(DateTime(timezone=True), nullable=True)
+    end_at = Column(DateTime(timezone=True), nullable=True)
     all_day = Column(Boolean, default=False)
+    # Dias entre start_date e end_date (0 para eventos de um dia), mantido no flush
+    span_days = Column(Integer, nullable=False, default=0)
+
+    # Recorrência: uma linha por série, expandida só dentro da janela consultada
+    recurrence_rule = Column(String(500), nullable=True)  # RRULE sem DTSTART, ex.: FREQ=WEEKLY;BYDAY=MO
+    recurrence_exceptions = Column(JSON, nullable=True)  # Datas ISO das ocorrências removidas (EXDATE)
+    recurrence_overrides = Column(JSON, nullable=True)  # {data ISO original: {campo: valor}} por ocorrência
+    # Último dia ocupado pela série (date.max se não tiver fim), mantido no flush
+    recurrence_until = Column(Date, nullable=True)
 
     # Mantendo compatibilidade de nomes na classe se necessário, mas mapeando para colunas reais
     # ou simplesmente alterando o modelo. Vamos alterar para refletir a realidade.
@@ -73,6 +95,40 @@ class AgendaEvent(Base, TimestampMixin):
     def __repr__(self):
         return f"<AgendaEvent(id={self.id}, title='{self.title}', date='{self.start_date}', type='{self.event_type}')>"
 
+    @validates("start_date", "end_date")
+    def _validate_date(self, key, value):
+        """Aceita date, datetime ou string ISO; o horário de um datetime vai para start_at/end_at"""
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value) if len(value) > 10 else date.fromisoformat(value)
+        time_key = "start_at" if key == "start_date" else "end_at"
+        if isinstance(value, datetime):
+            setattr(self, time_key, value)
+            value = value.date()
+        elif getattr(self, time_key) is not None and (value is None or getattr(self, time_key).date() != value):
+            # Dia mudou sem horário: o horário anterior não vale mais
+            setattr(self, time_key, None)
+        return value
+
+    @validates("recurrence_rule")
+    def _validate_recurrence_rule(self, key, value):
+        return normalize_rule(value) if value else None
+
+    @validates("recurrence_exceptions")
+    def _validate_recurrence_exceptions(self, key, value):
+        """Guarda as exceções como datas ISO ordenadas (JSON)"""
+        if not value:
+            return None
+        return sorted({item.isoformat() if isinstance(item, date) else str(item)[:10] for item in value})
+
+    @property
+    def is_recurring(self) -> bool:
+        return bool(self.recurrence_rule)
+
+    @property
+    def last_date(self):
+        """Último dia ocupado pelo evento"""
+        return self.end_date or self.start_date
+
     @classmethod
     def create_from_project_location(cls, project_location, event_type: EventType):
         """Cria evento da agenda baseado em uma locação de projeto"""
@@ -150,3 +206,28 @@ class AgendaEvent(Base, TimestampMixin):
                 "currency": project.budget_currency
             }
         )
+
+
+@event.listens_for(AgendaEvent, "before_insert")
+@event.listens_for(AgendaEvent, "before_update")
+def _set_span_days(mapper, connection, target):
+    if target.start_date and target.end_date:
+        target.span_days = max((target.end_date - target.start_date).days, 0)
+    else:
+        target.span_days = 0
+    target.recurrence_until = _recurrence_until(target)
+
+
+def _recurrence_until(target: AgendaEvent):
+    """Último dia ocupado por alguma ocorrência (incluindo ocorrências movidas por override)"""
+    if not target.recurrence_rule:
+        return None
+    last = last_occurrence(target.recurrence_rule, series_start(target.start_date, target.start_at))
+    if last is None:
+        return date.max
+    until = last.date() + timedelta(days=target.span_days or 0)
+    for override in (target.recurrence_overrides or {}).values():
+        moved = override.get("end_date") or override.get("start_date")
+        if moved:
+            until = max(until, date.fromisoformat(str(moved)[:10]))
+    return until
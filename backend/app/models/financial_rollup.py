@@ -0,0 +1,37 @@
+from sqlalchemy import Column, String, Integer, Float, Date, DateTime
+from sqlalchemy.sql import func
+from .base import Base
+
+
+class FinancialRollupMixin:
+    """
+    Totais de movimentações financeiras por balde de tempo
+    Chave: projeto, locação (0 = sem locação), tipo, status e início do balde.
+    O valor é convertido para a moeda do orçamento (amount * exchange_rate quando informado).
+    """
+    project_id = Column(Integer, primary_key=True)
+    location_id = Column(Integer, primary_key=True, default=0)
+    movement_type = Column(String(30), primary_key=True)
+    status = Column(String(30), primary_key=True)
+    bucket = Column(Date, primary_key=True, index=True)
+    movement_count = Column(Integer, nullable=False, default=0)
+    amount = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class FinancialRollupDaily(FinancialRollupMixin, Base):
+    """Balde diário (bucket = dia do movimento em UTC)"""
+    __tablename__ = "financial_rollup_daily"
+    __table_args__ = {'extend_existing': True}
+
+    def __repr__(self):
+        return f"<FinancialRollupDaily(project_id={self.project_id}, bucket={self.bucket}, amount={self.amount})>"
+
+
+class FinancialRollupMonthly(FinancialRollupMixin, Base):
+    """Balde mensal (bucket = primeiro dia do mês)"""
+    __tablename__ = "financial_rollup_monthly"
+    __table_args__ = {'extend_existing': True}
+
+    def __repr__(self):
+        return f"<FinancialRollupMonthly(project_id={self.project_id}, bucket={self.bucket}, amount={self.amount})>"
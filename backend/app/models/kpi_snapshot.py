@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, Float, DateTime
+from sqlalchemy.sql import func
+from .base import Base
+
+
+class KpiSnapshot(Base):
+    """
+    Contadores pré-calculados dos KPIs (uma linha por métrica e dimensão)
+    Ex.: ("projects_by_status", "active") -> 12, ("active_budget_total", "") -> 1500000.0
+    Mantidos pelos hooks de flush e corrigidos periodicamente pela reconciliação.
+    """
+    __tablename__ = "kpi_snapshot"
+    __table_args__ = {'extend_existing': True}
+
+    metric = Column(String(64), primary_key=True)
+    dimension = Column(String(255), primary_key=True, default="")
+    value = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<KpiSnapshot(metric='{self.metric}', dimension='{self.dimension}', value={self.value})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum, Integer, JSON
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum, Integer, JSON, Index
 from sqlalchemy.orm import relationship
 from .base import Base, TimestampMixin
 import enum
@@ -27,7 +27,11 @@ class LocationDemand(Base, TimestampMixin):
     Substitui o sistema fixo de etapas por demandas flexíveis.
     """
     __tablename__ = "location_demands"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Varredura de atrasos (overdue_at nulo + faixa de prazo) e filtro por atraso
+        Index("ix_location_demands_overdue_at_due_date", "overdue_at", "due_date"),
+        {'extend_existing': True},
+    )
 
     # Relacionamentos principais
     project_location_id = Column(Integer, ForeignKey("project_locations.id", ondelete="CASCADE"), nullable=False)
@@ -49,6 +53,7 @@ class LocationDemand(Base, TimestampMixin):
     # Datas
     due_date = Column(DateTime(timezone=True), nullable=True)
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    overdue_at = Column(DateTime(timezone=True), nullable=True)  # Marcada pela varredura de atrasos (nulo = em dia)
 
     # Integração com agenda
     agenda_event_id = Column(Integer, ForeignKey("agenda_events.id", ondelete="SET NULL"), nullable=True)
@@ -70,7 +75,7 @@ class LocationDemand(Base, TimestampMixin):
     @property
     def is_overdue(self) -> bool:
         """Verifica se a demanda está atrasada"""
-        if not self.due_date or self.status == DemandStatus.COMPLETED:
+        if not self.due_date or self.status in (DemandStatus.COMPLETED, DemandStatus.CANCELLED):
             return False
         from datetime import datetime, timezone
         now = datetime.now(timezone.utc)
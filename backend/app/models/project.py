@@ -1,6 +1,7 @@
 from sqlalchemy import Column, String, Text, Boolean, Enum, Date, ForeignKey, Integer, JSON, Float, Computed
 from sqlalchemy.orm import relationship
 from .base import Base, TimestampMixin
+from .stage_progress import StageProgressMixin
 import enum
 
 class ProjectStatus(str, enum.Enum):
@@ -10,7 +11,7 @@ class ProjectStatus(str, enum.Enum):
     ON_HOLD = "on_hold"
     CANCELLED = "cancelled"
 
-class Project(Base, TimestampMixin):
+class Project(Base, TimestampMixin, StageProgressMixin):
     __tablename__ = "projects"
     __table_args__ = {'extend_existing': True}
 
@@ -19,6 +20,7 @@ class Project(Base, TimestampMixin):
     title = Column(String(255), nullable=True)  # Adicionado para compatibilidade com frontend
     description = Column(Text, nullable=True)
     status = Column(Enum(ProjectStatus), default=ProjectStatus.ACTIVE)
+    project_type = Column(String(50), nullable=True)  # Ex.: cinema, publicidade (define as etapas padrão)
 
     # Cliente e orçamento
     client_name = Column(String(255), nullable=True)
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum, Integer, Float, Boolean, JSON, Date
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum, Integer, Float, Boolean, JSON, Date, Index
 from sqlalchemy.orm import relationship
 from .base import Base, TimestampMixin
+from .stage_progress import StageProgressMixin
 import enum
 
 class RentalStatus(str, enum.Enum):
@@ -11,13 +12,19 @@ class RentalStatus(str, enum.Enum):
     OVERDUE = "overdue"                  # Atrasada
     CANCELLED = "cancelled"              # Cancelada
 
-class ProjectLocation(Base, TimestampMixin):
+class ProjectLocation(Base, TimestampMixin, StageProgressMixin):
     """
     Relacionamento entre Projeto e Locação
     Representa uma locação específica dentro de um projeto
     """
     __tablename__ = "project_locations"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Carga das reservas de uma locação (detecção de dupla reserva)
+        Index("ix_project_locations_location_id_rental_start", "location_id", "rental_start"),
+        # Varredura de atrasos (overdue_at nulo + faixa de rental_end) e filtro por atraso
+        Index("ix_project_locations_overdue_at_rental_end", "overdue_at", "rental_end"),
+        {'extend_existing': True},
+    )
 
     # Relacionamentos obrigatórios
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
@@ -37,8 +44,9 @@ class ProjectLocation(Base, TimestampMixin):
 
     # Status da locação
     status = Column(Enum(RentalStatus), default=RentalStatus.RESERVED)
+    overdue_at = Column(DateTime(timezone=True), nullable=True)  # Marcada pela varredura de atrasos (nulo = em dia)
 
-    # Progresso geral da locação (calculado a partir das etapas)
+    # Progresso geral da locação (mantido a partir das somas de StageProgressMixin)
     completion_percentage = Column(Float, default=0.0)  # 0.0 a 100.0
 
     # Responsáveis específicos para esta locação
@@ -100,7 +108,7 @@ class ProjectLocation(Base, TimestampMixin):
     @property
     def is_overdue(self) -> bool:
         """Verifica se a locação está atrasada"""
-        if not self.rental_end or self.status == RentalStatus.RETURNED:
+        if not self.rental_end or self.status in (RentalStatus.RETURNED, RentalStatus.CANCELLED):
             return False
         from datetime import date
         return date.today() > self.rental_end
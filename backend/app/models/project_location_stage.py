@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum, Integer, Float, Boolean, JSON
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum, Integer, Float, Boolean, JSON, Index
 from sqlalchemy.orm import relationship
 from .base import Base, TimestampMixin
 import enum
@@ -29,7 +29,11 @@ class ProjectLocationStage(Base, TimestampMixin):
     Define o fluxo completo desde a visitação até a entrega
     """
     __tablename__ = "project_location_stages"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Varredura de atrasos (overdue_at nulo + faixa de prazo) e filtro por atraso
+        Index("ix_project_location_stages_overdue_at_planned_end_date", "overdue_at", "planned_end_date"),
+        {'extend_existing': True},
+    )
 
     # Relacionamentos obrigatórios
     project_location_id = Column(Integer, ForeignKey("project_locations.id"), nullable=False)
@@ -48,6 +52,7 @@ class ProjectLocationStage(Base, TimestampMixin):
     planned_end_date = Column(DateTime(timezone=True), nullable=True)
     actual_start_date = Column(DateTime(timezone=True), nullable=True)
     actual_end_date = Column(DateTime(timezone=True), nullable=True)
+    overdue_at = Column(DateTime(timezone=True), nullable=True)  # Marcada pela varredura de atrasos (nulo = em dia)
 
     # Responsáveis
     responsible_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, Float, Date
+from .base import Base
+
+
+class StageProgressMixin:
+    """
+    Somas das etapas de locação mantidas de forma incremental (ver stage_progress_service)
+    Em ProjectLocation cobrem as etapas da locação; em Project, as de todas as locações do projeto.
+    """
+    stage_count = Column(Integer, nullable=False, default=0, server_default="0")
+    stage_weight_total = Column(Float, nullable=False, default=0.0, server_default="0")
+    stage_weighted_completion = Column(Float, nullable=False, default=0.0, server_default="0")  # Σ peso × conclusão
+    stages_pending = Column(Integer, nullable=False, default=0, server_default="0")
+    stages_in_progress = Column(Integer, nullable=False, default=0, server_default="0")
+    stages_completed = Column(Integer, nullable=False, default=0, server_default="0")
+    stages_cancelled = Column(Integer, nullable=False, default=0, server_default="0")
+    stages_on_hold = Column(Integer, nullable=False, default=0, server_default="0")
+    stages_critical = Column(Integer, nullable=False, default=0, server_default="0")
+
+    @property
+    def stage_progress(self) -> float:
+        """Progresso ponderado pelas etapas (0.0 a 100.0)"""
+        if not self.stage_weight_total or self.stage_weight_total <= 0:
+            return 0.0
+        return self.stage_weighted_completion / self.stage_weight_total
+
+
+class StageDeadlineRollup(Base):
+    """
+    Etapas em aberto (não concluídas) por dia de prazo
+    Atraso depende do relógio: as etapas atrasadas são a soma dos dias anteriores a hoje.
+    """
+    __tablename__ = "stage_deadline_rollups"
+    __table_args__ = {'extend_existing': True}
+
+    project_location_id = Column(Integer, primary_key=True)
+    due_day = Column(Date, primary_key=True)
+    project_id = Column(Integer, nullable=False, index=True)
+    open_stages = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<StageDeadlineRollup(project_location_id={self.project_location_id}, due_day={self.due_day}, open_stages={self.open_stages})>"
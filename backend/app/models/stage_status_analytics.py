@@ -0,0 +1,44 @@
+from sqlalchemy import Column, String, Integer, Float, Date, DateTime, ForeignKey
+from .base import Base
+
+
+class StageStatusInterval(Base):
+    """
+    Períodos fechados de uma etapa em um status, compactados do histórico antigo
+    Trechos consecutivos no mesmo status (ex.: só o percentual mudou) viram um período;
+    `changes` guarda quantas linhas de histórico foram absorvidas.
+    """
+    __tablename__ = "stage_status_intervals"
+    __table_args__ = {'extend_existing': True}
+
+    id = Column(Integer, primary_key=True)
+    stage_id = Column(Integer, ForeignKey("project_location_stages.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String(20), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    ended_at = Column(DateTime(timezone=True), nullable=False)
+    changes = Column(Integer, nullable=False, default=1)
+
+    def __repr__(self):
+        return f"<StageStatusInterval(stage={self.stage_id}, {self.status}, {self.started_at}->{self.ended_at})>"
+
+
+class StageStatusDaily(Base):
+    """
+    Tempo das etapas em cada status por dia (UTC), projeto e tipo de etapa
+    `entries` conta as entradas no status no dia; `completions` e `cycle_seconds`
+    (início do andamento até a conclusão) só aparecem nas linhas de status concluído.
+    """
+    __tablename__ = "stage_status_daily"
+    __table_args__ = {'extend_existing': True}
+
+    day = Column(Date, primary_key=True)
+    project_id = Column(Integer, primary_key=True, index=True)
+    stage_type = Column(String(30), primary_key=True)
+    status = Column(String(20), primary_key=True)
+    seconds = Column(Float, nullable=False, default=0.0)
+    entries = Column(Integer, nullable=False, default=0)
+    completions = Column(Integer, nullable=False, default=0)
+    cycle_seconds = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<StageStatusDaily(day={self.day}, project_id={self.project_id}, {self.stage_type}/{self.status}, seconds={self.seconds})>"
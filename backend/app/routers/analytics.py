@@ -0,0 +1,53 @@
+"""
+Analytics endpoints - consultas com filtros cruzados sobre o cubo colunar em memória
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.core.auth import get_admin_user, get_current_active_user
+from app.models.user import User
+from app.schemas.analytics import AnalyticsQuery, AnalyticsQueryResponse
+from app.services.analytics_cube_service import AnalyticsService
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+@router.post("/query", response_model=AnalyticsQueryResponse)
+def query_analytics(
+    query: AnalyticsQuery,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Agrupa, filtra e soma um dataset do cubo (sem consultar o banco quando o cubo está atualizado)"""
+    try:
+        return AnalyticsService(db).query(
+            query.dataset,
+            group_by=query.group_by,
+            aggregates=query.aggregates(),
+            filters=query.filters,
+            ranges={name: tuple(bounds) for name, bounds in query.ranges.items()},
+            order_by=query.order_by,
+            descending=query.descending,
+            limit=query.limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/datasets")
+def list_analytics_datasets(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Datasets do cubo com suas dimensões, medidas e quantidade de linhas"""
+    return AnalyticsService(db).datasets()
+
+
+@router.post("/refresh")
+def refresh_analytics(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Recarrega o cubo inteiro a partir do banco (apenas administradores)"""
+    return AnalyticsService(db).refresh()
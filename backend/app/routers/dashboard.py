@@ -3,18 +3,19 @@ Dashboard endpoints - KPIs e métricas para produtora de locação
 """
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import and_
 from datetime import datetime, timedelta
-from typing import List, Optional
 
 from app.core.database import get_db
-from app.core.auth import get_current_active_user
+from app.core.auth import get_admin_user, get_current_active_user
+from app.core.aggregates import with_count
 from app.models.user import User
 from app.models.project import Project, ProjectStatus
-from app.models.location import Location, LocationStatus
+from app.models.location import Location
 from app.models.project_location import ProjectLocation
 from app.models.agenda_event import AgendaEvent
-from app.models.financial import FinancialMovement
+from app.services.dashboard_service import DashboardService
+from app.services.kpi_snapshot_service import KpiSnapshotService
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
@@ -24,61 +25,8 @@ def get_dashboard_stats(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Retorna KPIs gerais do dashboard"""
-    today = datetime.now().date()
-    start_of_month = today.replace(day=1)
-
-    # Total de projetos
-    total_projects = db.query(func.count(Project.id)).scalar() or 0
-
-    # Projetos ativos
-    active_projects = db.query(func.count(Project.id)).filter(
-        Project.status == ProjectStatus.ACTIVE
-    ).scalar() or 0
-
-    # Total de locações
-    total_locations = db.query(func.count(Location.id)).scalar() or 0
-
-    # Locações aprovadas
-    approved_locations = db.query(func.count(Location.id)).filter(
-        Location.status == LocationStatus.APPROVED
-    ).scalar() or 0
-
-    # Orçamento total de projetos ativos
-    total_budget = db.query(func.coalesce(func.sum(Project.budget_total), 0)).filter(
-        Project.status == ProjectStatus.ACTIVE
-    ).scalar() or 0
-
-    # Orçamento gasto
-    budget_spent = db.query(func.coalesce(func.sum(Project.budget_spent), 0)).filter(
-        Project.status == ProjectStatus.ACTIVE
-    ).scalar() or 0
-
-    # Eventos dos próximos 7 dias
-    next_week = today + timedelta(days=7)
-    upcoming_events = db.query(func.count(AgendaEvent.id)).filter(
-        and_(
-            AgendaEvent.start_date >= today.isoformat(),
-            AgendaEvent.start_date <= next_week.isoformat()
-        )
-    ).scalar() or 0
-
-    # Usuários ativos
-    active_users = db.query(func.count(User.id)).filter(
-        User.is_active == True
-    ).scalar() or 0
-
-    return {
-        "total_projects": total_projects,
-        "active_projects": active_projects,
-        "total_locations": total_locations,
-        "approved_locations": approved_locations,
-        "total_budget": float(total_budget),
-        "budget_spent": float(budget_spent),
-        "budget_remaining": float(total_budget - budget_spent),
-        "upcoming_events": upcoming_events,
-        "active_users": active_users,
-    }
+    """Retorna KPIs gerais do dashboard (lidos do snapshot pré-calculado, servidos do cache compartilhado)"""
+    return DashboardService(db).get_stats()
 
 
 @router.get("/projects")
@@ -88,17 +36,16 @@ def get_active_projects(
     current_user: User = Depends(get_current_active_user)
 ):
     """Retorna projetos ativos com resumo"""
-    projects = db.query(Project).filter(
-        Project.status == ProjectStatus.ACTIVE
+    # Contagem de locações via subconsulta agrupada (sem COUNT por projeto)
+    rows = with_count(
+        db.query(Project).filter(Project.status == ProjectStatus.ACTIVE),
+        Project.id,
+        ProjectLocation.project_id,
+        label="location_count",
     ).order_by(Project.updated_at.desc()).limit(limit).all()
 
     result = []
-    for p in projects:
-        # Contar locações do projeto
-        location_count = db.query(func.count(ProjectLocation.id)).filter(
-            ProjectLocation.project_id == p.id
-        ).scalar() or 0
-
+    for p, location_count in rows:
         result.append({
             "id": p.id,
             "name": p.name or p.title,
@@ -127,8 +74,8 @@ def get_upcoming_events(
 
     events = db.query(AgendaEvent).filter(
         and_(
-            AgendaEvent.start_date >= today.isoformat(),
-            AgendaEvent.start_date <= next_month.isoformat()
+            AgendaEvent.start_date >= today,
+            AgendaEvent.start_date <= next_month
         )
     ).order_by(AgendaEvent.start_date.asc()).limit(limit).all()
 
@@ -183,47 +130,13 @@ def get_financial_summary(
     current_user: User = Depends(get_current_active_user)
 ):
     """Retorna resumo financeiro"""
-    today = datetime.now().date()
-    start_of_month = today.replace(day=1)
-    start_of_year = today.replace(month=1, day=1)
-
-    # Orçamento total de todos os projetos ativos
-    total_budget = db.query(func.coalesce(func.sum(Project.budget_total), 0)).filter(
-        Project.status == ProjectStatus.ACTIVE
-    ).scalar() or 0
+    return DashboardService(db).get_financial_summary()
 
-    # Total gasto
-    total_spent = db.query(func.coalesce(func.sum(Project.budget_spent), 0)).filter(
-        Project.status == ProjectStatus.ACTIVE
-    ).scalar() or 0
 
-    # Projetos por status de orçamento
-    projects_over_budget = db.query(func.count(Project.id)).filter(
-        and_(
-            Project.status == ProjectStatus.ACTIVE,
-            Project.budget_spent > Project.budget_total
-        )
-    ).scalar() or 0
-
-    # Top 5 projetos por orçamento
-    top_projects = db.query(Project).filter(
-        Project.status == ProjectStatus.ACTIVE
-    ).order_by(Project.budget_total.desc()).limit(5).all()
-
-    return {
-        "total_budget": float(total_budget),
-        "total_spent": float(total_spent),
-        "remaining": float(total_budget - total_spent),
-        "utilization_percent": round(total_spent / (total_budget or 1) * 100, 1),
-        "projects_over_budget": projects_over_budget,
-        "top_projects_by_budget": [
-            {
-                "id": p.id,
-                "name": p.name or p.title,
-                "budget_total": float(p.budget_total or 0),
-                "budget_spent": float(p.budget_spent or 0),
-                "remaining": float((p.budget_total or 0) - (p.budget_spent or 0)),
-            }
-            for p in top_projects
-        ]
-    }
+@router.post("/kpi-snapshot/reconcile")
+def reconcile_kpi_snapshot(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Recalcula os contadores pré-calculados e retorna os desvios corrigidos (apenas administradores)"""
+    return KpiSnapshotService(db).reconcile()
@@ -0,0 +1,57 @@
+"""
+Events endpoints - Server-Sent Events com atualizações de KPIs, notificações e agenda
+Substitui o polling dos painéis: o cliente mantém uma conexão aberta e recarrega os dados
+apenas quando chega um evento do tópico correspondente.
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.core.auth import get_current_active_user
+from app.core.events import event_broker, sse_stream
+from app.models.user import User
+from app.services.realtime_service import resolve_topics
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    topics: Optional[str] = Query(None, description="Tópicos separados por vírgula (padrão: kpis, agenda e suas notificações)"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    since: Optional[str] = Query(None, description="Último id recebido, para clientes que não enviam Last-Event-ID"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Fluxo text/event-stream com heartbeats; reconexões retomam a partir do Last-Event-ID"""
+    try:
+        requested = [topic.strip() for topic in topics.split(",") if topic.strip()] if topics else None
+        subscribed = resolve_topics(current_user, requested)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # A conexão fica aberta por muito tempo: devolve a conexão do banco ao pool já
+    db.close()
+
+    subscription, missed, resync = event_broker.subscribe(subscribed, last_event_id or since)
+    return StreamingResponse(
+        sse_stream(subscription, missed, resync, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stats")
+def get_event_stats(current_user: User = Depends(get_current_active_user)):
+    """Assinantes conectados e eventos publicados neste processo"""
+    return {
+        "subscribers": event_broker.subscriber_count,
+        "published": event_broker.published,
+        "boot": event_broker.boot,
+    }
@@ -3,17 +3,48 @@ from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 import io
+import os
 import uuid
 from datetime import datetime
 
 from app.core.database import get_db
+from app.core.executors import RouteConcurrencyLimiter, run_cpu_bound, run_io_bound
 from app.schemas.presentation_export import PresentationExportRequest, PresentationExportResponse
-from app.services.presentation_export_service import PresentationExportService
+from app.services.presentation_export_service import PresentationExportService, render_presentation
 from app.core.auth import get_current_user
 from app.models.user import User
 
 router = APIRouter(prefix="/export", tags=["export"])
 
+# Limites de exportações simultâneas por rota (o restante aguarda na fila ou recebe 503)
+EXPORT_QUEUE_TIMEOUT = float(os.getenv("EXPORT_QUEUE_TIMEOUT", "30"))
+export_limiters = {
+    "presentation": RouteConcurrencyLimiter(
+        "presentation", int(os.getenv("EXPORT_PRESENTATION_MAX_CONCURRENT", "2")), EXPORT_QUEUE_TIMEOUT
+    ),
+    "download": RouteConcurrencyLimiter(
+        "download", int(os.getenv("EXPORT_DOWNLOAD_MAX_CONCURRENT", "2")), EXPORT_QUEUE_TIMEOUT
+    ),
+    "presentation_download": RouteConcurrencyLimiter(
+        "presentation_download", int(os.getenv("EXPORT_PRESENTATION_DOWNLOAD_MAX_CONCURRENT", "2")), EXPORT_QUEUE_TIMEOUT
+    ),
+}
+
+
+async def generate_presentation_bytes(
+    request: PresentationExportRequest,
+    db: Session,
+    limiter: RouteConcurrencyLimiter
+) -> bytes:
+    """
+    Gera o PPTX fora do event loop: consulta e downloads no pool de I/O,
+    montagem dos slides no pool de processos.
+    """
+    export_service = PresentationExportService(db)
+    async with limiter:
+        snapshot = await run_io_bound(export_service.build_snapshot, request)
+        return await run_cpu_bound(render_presentation, snapshot)
+
 
 @router.post("/presentation", response_model=PresentationExportResponse)
 async def export_presentation(
@@ -52,11 +83,8 @@ async def export_presentation(
                 detail="Valores de ordem inválidos"
             )
 
-        # Criar serviço de exportação
-        export_service = PresentationExportService(db)
-
         # Gerar apresentação
-        presentation_bytes = export_service.create_presentation(request)
+        presentation_bytes = await generate_presentation_bytes(request, db, export_limiters["presentation"])
 
         # Gerar nome único para o arquivo
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -80,6 +108,8 @@ async def export_presentation(
             download_url=f"/api/export/download/{file_id}"
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -141,11 +171,8 @@ async def download_presentation(
                 detail="Valores de ordem inválidos"
             )
 
-        # Criar serviço de exportação
-        export_service = PresentationExportService(db)
-
         # Gerar apresentação
-        presentation_bytes = export_service.create_presentation(request)
+        presentation_bytes = await generate_presentation_bytes(request, db, export_limiters["download"])
 
         # Gerar nome do arquivo
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -164,6 +191,8 @@ async def download_presentation(
             }
         )
 
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(
             status_code=400,
@@ -207,11 +236,8 @@ async def export_and_download_presentation(
                 detail="Valores de ordem inválidos"
             )
 
-        # Criar serviço de exportação
-        export_service = PresentationExportService(db)
-
         # Gerar apresentação
-        presentation_bytes = export_service.create_presentation(request)
+        presentation_bytes = await generate_presentation_bytes(request, db, export_limiters["presentation_download"])
 
         # Gerar nome do arquivo
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -230,6 +256,8 @@ async def export_and_download_presentation(
             }
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -0,0 +1,60 @@
+"""
+Jobs endpoints - acompanhamento de tarefas em segundo plano
+"""
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from app.core.auth import get_current_active_user
+from app.core.jobs import JobStatus, job_registry
+from app.models.user import User, UserRole
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _job_response(job) -> dict:
+    data = job.to_dict()
+    data["download_url"] = f"/api/v1/jobs/{job.id}/download" if job.file_path else None
+    return data
+
+
+def _visible_job(job_id: str, user: User):
+    """Tarefa do usuário (administradores veem todas); 404 também para tarefas de outros"""
+    job = job_registry.get(job_id)
+    if not job or (user.role != UserRole.ADMIN and job.owner_id != user.id):
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    return job
+
+
+@router.get("")
+def list_jobs(
+    kind: Optional[str] = Query(None, description="Filtrar pelo tipo da tarefa"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Lista as tarefas recentes (mais novas primeiro)"""
+    owner_id = None if current_user.role == UserRole.ADMIN else current_user.id
+    return [_job_response(job) for job in job_registry.list(kind, owner_id=owner_id)]
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str, current_user: User = Depends(get_current_active_user)):
+    """Status e progresso de uma tarefa"""
+    return _job_response(_visible_job(job_id, current_user))
+
+
+@router.get("/{job_id}/download")
+def download_job_result(job_id: str, current_user: User = Depends(get_current_active_user)):
+    """Baixa o arquivo gerado por uma tarefa concluída"""
+    job = _visible_job(job_id, current_user)
+    if job.status != JobStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail="Tarefa ainda não foi concluída")
+    if not job.file_path or not os.path.exists(job.file_path):
+        raise HTTPException(status_code=404, detail="Arquivo da tarefa não está disponível")
+
+    return FileResponse(
+        job.file_path,
+        media_type=job.media_type or "application/octet-stream",
+        filename=job.filename or os.path.basename(job.file_path),
+    )
@@ -1,7 +1,23 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field, root_validator, validator
+from typing import Optional, Dict, Any, List
 from datetime import datetime, date, time
 from ..models.agenda_event import EventType, EventStatus
+from ..core.recurrence import normalize_rule
+
+
+def _split_datetimes(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Compatibilidade: 'YYYY-MM-DDTHH:MM' em start_date/end_date vira dia + start_at/end_at"""
+    if not isinstance(values, dict):
+        return values
+    for date_key, time_key in (("start_date", "start_at"), ("end_date", "end_at")):
+        value = values.get(date_key)
+        if isinstance(value, str) and len(value) > 10:
+            values.setdefault(time_key, value)
+            values[date_key] = value[:10]
+        elif isinstance(value, datetime):
+            values.setdefault(time_key, value)
+            values[date_key] = value.date()
+    return values
 
 class AgendaEventBase(BaseModel):
     title: str = Field(..., min_length=1, max_length=255, description="Título do evento")
@@ -10,9 +26,10 @@ class AgendaEventBase(BaseModel):
     status: EventStatus = Field(EventStatus.SCHEDULED, description="Status do evento")
 
     # Datas e horários
-    # Datas e horários
-    start_date: str = Field(..., description="Data de início (ISO string)")
-    end_date: Optional[str] = Field(None, description="Data de fim (ISO string)")
+    start_date: date = Field(..., description="Data de início")
+    end_date: Optional[date] = Field(None, description="Data de fim")
+    start_at: Optional[datetime] = Field(None, description="Horário de início (eventos com hora marcada)")
+    end_at: Optional[datetime] = Field(None, description="Horário de fim")
     all_day: bool = Field(False, description="Evento de dia inteiro")
 
     # event_date: date ... (REMOVED)
@@ -32,6 +49,18 @@ class AgendaEventBase(BaseModel):
     color: Optional[str] = Field(None, description="Cor do evento no calendário (hex)")
     priority: int = Field(1, description="Prioridade do evento (1=baixa, 2=média, 3=alta)")
 
+    # Recorrência (RRULE sem DTSTART: a série começa em start_date/start_at)
+    recurrence_rule: Optional[str] = Field(None, description="Regra de recorrência, ex.: FREQ=WEEKLY;BYDAY=MO;COUNT=10")
+    recurrence_exceptions: Optional[List[date]] = Field(None, description="Ocorrências removidas da série")
+
+    @root_validator(pre=True)
+    def split_datetimes(cls, values):
+        return _split_datetimes(values)
+
+    @validator("recurrence_rule")
+    def validate_recurrence_rule(cls, value):
+        return normalize_rule(value) if value else None
+
 class AgendaEventCreate(AgendaEventBase):
     pass
 
@@ -40,8 +69,10 @@ class AgendaEventUpdate(BaseModel):
     description: Optional[str] = None
     event_type: Optional[EventType] = None
     status: Optional[EventStatus] = None
-    start_date: Optional[str] = None
-    end_date: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    start_at: Optional[datetime] = None
+    end_at: Optional[datetime] = None
     all_day: Optional[bool] = None
     # event_date: Optional[date] = None
     # start_time: Optional[time] = None
@@ -55,12 +86,45 @@ class AgendaEventUpdate(BaseModel):
     metadata_json: Optional[Dict[str, Any]] = None
     color: Optional[str] = None
     priority: Optional[int] = None
+    recurrence_rule: Optional[str] = None
+    recurrence_exceptions: Optional[List[date]] = None
+
+    @root_validator(pre=True)
+    def split_datetimes(cls, values):
+        return _split_datetimes(values)
+
+    @validator("recurrence_rule")
+    def validate_recurrence_rule(cls, value):
+        return normalize_rule(value) if value else None
+
+class AgendaOccurrenceUpdate(BaseModel):
+    """Alteração de uma única ocorrência de uma série (as demais não mudam)"""
+    title: Optional[str] = Field(None, min_length=1, max_length=255)
+    description: Optional[str] = None
+    status: Optional[EventStatus] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    start_at: Optional[datetime] = None
+    end_at: Optional[datetime] = None
+    all_day: Optional[bool] = None
+    location_id: Optional[int] = None
+    color: Optional[str] = None
+    priority: Optional[int] = None
+
+    @root_validator(pre=True)
+    def split_datetimes(cls, values):
+        return _split_datetimes(values)
 
 class AgendaEventResponse(AgendaEventBase):
     id: int
     created_at: datetime
     updated_at: datetime
 
+    # Séries: overrides gravados; ocorrências expandidas trazem a série e a data original
+    recurrence_overrides: Optional[Dict[str, Dict[str, Any]]] = None
+    series_id: Optional[int] = None
+    occurrence_date: Optional[date] = None
+
     class Config:
         from_attributes = True
 
@@ -79,3 +143,16 @@ class AgendaEventFilter(BaseModel):
     project_id: Optional[int] = Field(None, description="ID do projeto")
     location_id: Optional[int] = Field(None, description="ID da locação")
     priority: Optional[int] = Field(None, description="Prioridade mínima")
+
+class AgendaDensityBucket(BaseModel):
+    start: date = Field(..., description="Dia (ou segunda-feira da semana) do balde")
+    total: int
+    by_type: Dict[str, int]
+    by_priority: Dict[str, int]
+
+class AgendaDensityResponse(BaseModel):
+    start_date: date
+    end_date: date
+    group: str
+    total_events: int
+    buckets: List[AgendaDensityBucket]
@@ -0,0 +1,44 @@
+from pydantic import BaseModel, Field, validator
+from typing import Any, Dict, List, Optional
+
+
+class AnalyticsQuery(BaseModel):
+    """Consulta ao cubo analítico: filtros por dimensão, faixas por medida e agrupamento"""
+    dataset: str = Field(..., description="locations, project_locations ou financial_movements")
+    group_by: List[str] = Field(default_factory=list, description="Dimensões do agrupamento")
+    measures: List[str] = Field(
+        default_factory=lambda: ["count"],
+        description="Agregações no formato 'count' ou 'função:medida' (sum, avg, min, max)",
+    )
+    filters: Dict[str, List[Any]] = Field(default_factory=dict, description="Dimensão -> valores aceitos")
+    ranges: Dict[str, List[Optional[float]]] = Field(default_factory=dict, description="Medida -> [mínimo, máximo]")
+    order_by: Optional[str] = None
+    descending: bool = True
+    limit: Optional[int] = Field(None, ge=1, le=10000)
+
+    @validator('measures')
+    def validate_measures(cls, v):
+        if not v:
+            raise ValueError('Informe ao menos uma agregação')
+        for item in v:
+            function, _, measure = item.partition(':')
+            if (function == 'count') == bool(measure):
+                raise ValueError(f'Agregação inválida: {item}')
+        return v
+
+    @validator('ranges')
+    def validate_ranges(cls, v):
+        for name, bounds in v.items():
+            if len(bounds) != 2:
+                raise ValueError(f'Faixa de {name} deve ter [mínimo, máximo]')
+        return v
+
+    def aggregates(self):
+        return [(function, measure or None) for function, _, measure in (item.partition(':') for item in self.measures)]
+
+
+class AnalyticsQueryResponse(BaseModel):
+    dataset: str
+    rows: List[Dict[str, Any]]
+    total_rows: int
+    query_ms: float
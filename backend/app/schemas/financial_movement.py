@@ -0,0 +1,77 @@
+from pydantic import BaseModel, Field, validator
+from typing import Optional, List, Any
+from datetime import datetime
+from ..models.financial import MovementType, MovementStatus
+
+
+class FinancialMovementBase(BaseModel):
+    """Base schema for FinancialMovement"""
+    movement_type: MovementType = Field(..., description="Tipo do movimento")
+    amount: float = Field(..., description="Valor do movimento (negativo só em ajustes)")
+    currency: str = Field("BRL", min_length=3, max_length=3, description="Moeda do valor")
+    exchange_rate: Optional[float] = Field(None, gt=0, description="Taxa de câmbio para a moeda do orçamento")
+    description: str = Field(..., min_length=1, description="Descrição do movimento")
+    reference: Optional[str] = Field(None, max_length=255, description="Referência externa (nota fiscal, etc.)")
+    movement_date: datetime = Field(..., description="Data efetiva do movimento")
+    tags: Optional[List[str]] = Field(None, description="Tags para categorização")
+    attachments: Optional[List[str]] = Field(None, description="URLs de anexos")
+
+    @validator('amount')
+    def amount_must_be_positive_unless_adjustment(cls, v, values):
+        if v == 0 or (v < 0 and values.get('movement_type') != MovementType.AJUSTE):
+            raise ValueError('amount deve ser positivo (apenas ajustes aceitam valor negativo)')
+        return v
+
+
+class FinancialMovementCreate(FinancialMovementBase):
+    """Schema for creating a new FinancialMovement"""
+    project_id: int = Field(..., description="ID do projeto")
+    location_id: Optional[int] = Field(None, description="ID da locação (opcional para ajustes)")
+
+
+class FinancialMovementResponse(FinancialMovementBase):
+    """Schema for FinancialMovement response"""
+    id: int
+    project_id: int
+    location_id: Optional[int] = None
+    user_id: int
+    status: MovementStatus
+    approved_at: Optional[datetime] = None
+    approved_by: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class FinancialMovementListResponse(BaseModel):
+    """Schema for paginated list of movements"""
+    movements: List[FinancialMovementResponse]
+    total: int
+    page: int
+    size: int
+    total_pages: int
+
+
+class FinancialSeriesPoint(BaseModel):
+    bucket: str = Field(..., description="Início do balde (YYYY-MM-DD)")
+    count: int
+    amount: float
+
+
+class FinancialSeries(BaseModel):
+    key: Optional[Any] = Field(None, description="Valor do agrupamento (nulo quando não agrupado)")
+    total_count: int
+    total_amount: float
+    points: List[FinancialSeriesPoint]
+
+
+class FinancialSeriesResponse(BaseModel):
+    """Série temporal de movimentações a partir dos rollups"""
+    granularity: str
+    start: str
+    end: str
+    currency: str
+    group_by: Optional[str] = None
+    series: List[FinancialSeries]
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime, date
 from ..models.project import ProjectStatus
@@ -8,6 +8,7 @@ from .tag import TagResponse
 class ProjectBase(BaseModel):
     title: str  # Mudado de 'name' para 'title' para compatibilidade com frontend
     description: Optional[str] = None
+    project_type: Optional[str] = Field(None, max_length=50, description="Tipo do projeto (define as etapas padrão)")
     client_name: Optional[str] = None
     client_email: Optional[str] = None
     client_phone: Optional[str] = None
@@ -27,6 +28,7 @@ class ProjectUpdate(BaseModel):
     title: Optional[str] = None  # Mudado de 'name' para 'title'
     description: Optional[str] = None
     status: Optional[ProjectStatus] = None
+    project_type: Optional[str] = Field(None, max_length=50)
     client_name: Optional[str] = None
     client_email: Optional[str] = None
     client_phone: Optional[str] = None
@@ -57,6 +59,7 @@ class ProjectResponse(ProjectBase):
             'id': obj.id,
             'title': obj.name,  # Mapear name para title
             'description': obj.description,
+            'project_type': obj.project_type,
             'client_name': obj.client_name,
             'client_email': obj.client_email,
             'client_phone': obj.client_phone,
@@ -75,3 +78,9 @@ class ProjectResponse(ProjectBase):
             'updated_at': obj.updated_at,
         }
         return cls(**data)
+
+class PortfolioReportRequest(BaseModel):
+    """Parâmetros da exportação em lote dos relatórios de projeto"""
+    project_ids: Optional[List[int]] = None  # Vazio = todos os projetos com o status informado
+    status: Optional[ProjectStatus] = ProjectStatus.ACTIVE
+    include_pdf: bool = True
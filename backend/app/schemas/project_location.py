@@ -56,6 +56,22 @@ class ProjectLocationUpdate(BaseModel):
     filming_end_date: Optional[date] = None
     delivery_date: Optional[date] = None
 
+class BookingConflict(BaseModel):
+    """Sobreposição entre a reserva e a de outro projeto na mesma locação"""
+    location_id: int
+    project_location_id: Optional[int] = None
+    project_id: int
+    window: str  # rental, filming ou technical_visit
+    start: date
+    end: date
+    other_project_location_id: int
+    other_project_id: int
+    other_window: str
+    other_start: date
+    other_end: date
+    overlap_start: date
+    overlap_end: date
+
 from .project_location_stage import ProjectLocationStageResponse
 from .location import LocationResponse
 from .user import UserResponse
@@ -75,6 +91,9 @@ class ProjectLocationResponse(ProjectLocationBase):
     coordinator_user: Optional[UserResponse] = None
     stages: Optional[List[ProjectLocationStageResponse]] = None
 
+    # Conflitos aceitos na gravação (allow_conflicts=true)
+    booking_conflicts: List[BookingConflict] = []
+
     class Config:
         from_attributes = True
 
@@ -1,13 +1,172 @@
+import os
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from typing import List, Optional
-from datetime import date, datetime
+from sqlalchemy import Date, and_, case, or_, func, literal, select
+from typing import Any, Dict, List, Optional, Union
+from datetime import date, datetime, timedelta
+from ..core.recurrence import expansion_cache, series_start
 from ..models.agenda_event import AgendaEvent, EventType, EventStatus
-from ..schemas.agenda_event import AgendaEventCreate, AgendaEventUpdate, AgendaEventFilter
+from ..schemas.agenda_event import AgendaEventCreate, AgendaEventUpdate, AgendaEventFilter, AgendaOccurrenceUpdate
 from ..models.project import Project
 from ..models.location import Location
 from ..models.project_location import ProjectLocation
 
+# Eventos de até tantos dias são buscados por faixa de start_date; os mais longos (poucos) pelo índice de span_days
+AGENDA_SHORT_SPAN_DAYS = int(os.getenv("AGENDA_SHORT_SPAN_DAYS", "31"))
+
+def overlapping_window(window_start: date, window_end: date):
+    """
+    Condição de eventos que ocupam algum dia de [window_start, window_end].
+    Eventos curtos começam no máximo AGENDA_SHORT_SPAN_DAYS antes da janela: varredura de intervalo
+    no índice de start_date. Os longos são poucos e saem do índice de span_days, sem alargar a faixa
+    dos demais.
+    """
+    return and_(
+        AgendaEvent.start_date <= window_end,
+        func.coalesce(AgendaEvent.end_date, AgendaEvent.start_date) >= window_start,
+        or_(
+            and_(
+                AgendaEvent.span_days <= AGENDA_SHORT_SPAN_DAYS,
+                AgendaEvent.start_date >= window_start - timedelta(days=AGENDA_SHORT_SPAN_DAYS),
+            ),
+            AgendaEvent.span_days > AGENDA_SHORT_SPAN_DAYS,
+        ),
+        # Séries são expandidas à parte (series_window)
+        AgendaEvent.recurrence_until.is_(None),
+    )
+
+
+def series_window(window_start: date, window_end: date):
+    """Condição de séries recorrentes com alguma ocorrência possível em [window_start, window_end]"""
+    return and_(
+        AgendaEvent.recurrence_until >= window_start,
+        AgendaEvent.start_date <= window_end,
+    )
+
+
+# Campos que uma ocorrência pode sobrescrever (recurrence_overrides)
+OCCURRENCE_FIELDS = (
+    "title", "description", "status", "start_date", "end_date", "start_at", "end_at",
+    "all_day", "location_id", "color", "priority",
+)
+
+
+def override_value(field: str, value: Any) -> Any:
+    """Valor do override como gravado no JSON -> tipo do atributo"""
+    if value is None:
+        return None
+    if field in ("start_date", "end_date"):
+        return date.fromisoformat(str(value)[:10])
+    if field in ("start_at", "end_at"):
+        return datetime.fromisoformat(value)
+    if field == "status":
+        return EventStatus(value)
+    return value
+
+
+class EventOccurrence:
+    """
+    Ocorrência expandida de uma série: lê os atributos da série, com datas deslocadas para o dia
+    da ocorrência e os campos sobrescritos dela. Não é gravada; `id` é o da série.
+    """
+
+    def __init__(self, series: AgendaEvent, moment: datetime, override: Optional[Dict[str, Any]] = None):
+        self._series = series
+        self.series_id = series.id
+        self.occurrence_date = moment.date()
+        self.start_date = moment.date()
+        self.end_date = self.start_date + (series.end_date - series.start_date) if series.end_date else None
+        self.start_at = None
+        self.end_at = None
+        if series.start_at is not None:
+            self.start_at = datetime.combine(self.start_date, series.start_at.timetz())
+            if series.end_at is not None:
+                self.end_at = self.start_at + (series.end_at - series.start_at)
+        for field, value in (override or {}).items():
+            if field in OCCURRENCE_FIELDS:
+                setattr(self, field, override_value(field, value))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._series, name)
+
+    @property
+    def last_date(self) -> date:
+        return self.end_date or self.start_date
+
+
+AgendaItem = Union[AgendaEvent, EventOccurrence]
+
+
+def expand_series(series: AgendaEvent, window_start: date, window_end: date, overlap: bool = True) -> List[EventOccurrence]:
+    """
+    Ocorrências da série dentro da janela (com overlap, também as que começaram antes e ainda
+    ocupam a janela). A expansão da regra vem do cache de janelas; exceções e overrides são
+    aplicados por cima.
+    """
+    span = timedelta(days=max((series.end_date - series.start_date).days, 0) if series.end_date else 0)
+    dtstart = series_start(series.start_date, series.start_at)
+    excluded = set(series.recurrence_exceptions or [])
+    overrides = series.recurrence_overrides or {}
+
+    def in_window(occurrence: EventOccurrence) -> bool:
+        if overlap:
+            return occurrence.start_date <= window_end and occurrence.last_date >= window_start
+        return window_start <= occurrence.start_date <= window_end
+
+    lookback = window_start - span if overlap else window_start
+    occurrences = []
+    for moment in expansion_cache.occurrences(series.recurrence_rule, dtstart, lookback, window_end):
+        key = moment.date().isoformat()
+        if key not in excluded and key not in overrides:
+            occurrences.append(EventOccurrence(series, moment))
+
+    # Ocorrências alteradas podem ter mudado de dia: entram pela data efetiva
+    for key, override in overrides.items():
+        if key in excluded:
+            continue
+        original = date.fromisoformat(key)
+        moments = expansion_cache.occurrences(series.recurrence_rule, dtstart, original, original)
+        if moments:
+            occurrence = EventOccurrence(series, moments[0], override)
+            if in_window(occurrence):
+                occurrences.append(occurrence)
+    return sorted(occurrences, key=lambda o: o.start_date)
+
+
+def _sort_key(item: AgendaItem):
+    return item.start_date, item.id, getattr(item, "occurrence_date", None) or date.min
+
+
+def _matches(occurrence: EventOccurrence, filters: Optional[AgendaEventFilter]) -> bool:
+    """Filtros que podem mudar por ocorrência (status, locação, prioridade) conferidos após o override"""
+    if not filters:
+        return True
+    if filters.status and occurrence.status != filters.status:
+        return False
+    if filters.location_id and occurrence.location_id != filters.location_id:
+        return False
+    if filters.priority and (occurrence.priority or 0) < filters.priority:
+        return False
+    return True
+
+
+# Maior janela aceita pela densidade do calendário (visões de ano com folga)
+DENSITY_MAX_DAYS = 1100
+DENSITY_GROUPS = ("day", "week")
+
+
+def _bucket_index(day: date, start: date, group: str) -> int:
+    if group == "week":
+        # Semanas ISO: o balde é a segunda-feira
+        return ((day - timedelta(days=day.weekday())) - (start - timedelta(days=start.weekday()))).days // 7
+    return (day - start).days
+
+
+def _bucket_date(index: int, start: date, group: str) -> date:
+    if group == "week":
+        return start - timedelta(days=start.weekday()) + timedelta(weeks=index)
+    return start + timedelta(days=index)
+
+
 class AgendaEventService:
     def __init__(self, db: Session):
         self.db = db
@@ -29,9 +188,14 @@ class AgendaEventService:
         skip: int = 0,
         limit: int = 100,
         filters: Optional[AgendaEventFilter] = None
-    ) -> List[AgendaEvent]:
-        """Buscar eventos com filtros"""
+    ) -> List[AgendaItem]:
+        """
+        Buscar eventos com filtros
+        Com start_date e end_date, séries recorrentes viram as ocorrências que começam no período;
+        sem período fechado, séries aparecem como uma linha só.
+        """
         query = self.db.query(AgendaEvent)
+        window = filters and filters.start_date and filters.end_date
 
         if filters:
             if filters.start_date:
@@ -49,20 +213,77 @@ class AgendaEventService:
             if filters.priority:
                 query = query.filter(AgendaEvent.priority >= filters.priority)
 
-        return query.offset(skip).limit(limit).all()
+        if not window:
+            return query.order_by(AgendaEvent.start_date, AgendaEvent.id).offset(skip).limit(limit).all()
+
+        # Avulsos e ocorrências intercalados por data: basta ler skip + limit avulsos
+        singles = query.filter(AgendaEvent.recurrence_until.is_(None)).order_by(
+            AgendaEvent.start_date, AgendaEvent.id
+        ).limit(skip + limit).all()
+        occurrences = self._expand(
+            filters.start_date, filters.end_date, overlap=False,
+            project_id=filters.project_id, location_id=None, filters=filters,
+        )
+        return sorted(singles + occurrences, key=_sort_key)[skip:skip + limit]
+
+    def _expand(
+        self,
+        start_date: date,
+        end_date: date,
+        overlap: bool,
+        project_id: Optional[int] = None,
+        location_id: Optional[int] = None,
+        filters: Optional[AgendaEventFilter] = None,
+    ) -> List[EventOccurrence]:
+        """Ocorrências das séries que alcançam a janela (filtros da série no SQL, os da ocorrência depois)"""
+        query = self.db.query(AgendaEvent).filter(series_window(start_date, end_date))
+        if project_id:
+            query = query.filter(AgendaEvent.project_id == project_id)
+        if location_id:
+            query = query.filter(AgendaEvent.location_id == location_id)
+        if filters and filters.event_type:
+            query = query.filter(AgendaEvent.event_type == filters.event_type)
+        occurrences = []
+        for series in query.all():
+            occurrences.extend(
+                occurrence for occurrence in expand_series(series, start_date, end_date, overlap)
+                if _matches(occurrence, filters)
+            )
+        return occurrences
 
     def get_events_by_date_range(
         self,
         start_date: date,
-        end_date: date
-    ) -> List[AgendaEvent]:
-        """Buscar eventos por período"""
-        return self.db.query(AgendaEvent).filter(
-            and_(
-                AgendaEvent.start_date >= start_date.isoformat() if isinstance(start_date, date) else start_date,
-                AgendaEvent.start_date <= end_date.isoformat() if isinstance(end_date, date) else end_date
+        end_date: date,
+        overlap: bool = True,
+        project_id: Optional[int] = None,
+        location_id: Optional[int] = None
+    ) -> List[AgendaItem]:
+        """
+        Buscar eventos por período.
+        Com overlap, inclui eventos que começaram antes e ainda estão em andamento no período;
+        sem, apenas os que começam dentro dele. Séries recorrentes entram como ocorrências.
+        """
+        if overlap:
+            condition = overlapping_window(start_date, end_date)
+        else:
+            condition = and_(
+                AgendaEvent.start_date >= start_date,
+                AgendaEvent.start_date <= end_date,
+                AgendaEvent.recurrence_until.is_(None),
             )
-        ).order_by(AgendaEvent.start_date).all()
+
+        query = self.db.query(AgendaEvent).filter(condition)
+        if project_id:
+            query = query.filter(AgendaEvent.project_id == project_id)
+        if location_id:
+            query = query.filter(AgendaEvent.location_id == location_id)
+        singles = query.order_by(AgendaEvent.start_date, AgendaEvent.id).all()
+        occurrences = self._expand(
+            start_date, end_date, overlap, project_id,
+            filters=AgendaEventFilter(location_id=location_id) if location_id else None,
+        )
+        return sorted(singles + occurrences, key=_sort_key)
 
     def update_event(self, event_id: int, event_data: AgendaEventUpdate) -> Optional[AgendaEvent]:
         """Atualizar evento"""
@@ -78,6 +299,121 @@ class AgendaEventService:
         self.db.refresh(db_event)
         return db_event
 
+    def get_density(
+        self,
+        start_date: date,
+        end_date: date,
+        group: str = "day",
+        project_id: Optional[int] = None,
+        location_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Quantidade de eventos por dia/semana, por tipo e prioridade, para visões de mês e ano.
+        Eventos de vários dias contam em cada balde que ocupam. Uma consulta agrupada devolve os
+        intervalos já recortados à janela ((início, fim, tipo, prioridade) -> quantidade); cada
+        grupo soma +n no balde inicial e -n após o final, e uma soma acumulada monta os baldes.
+        Séries recorrentes entram pelas ocorrências expandidas na janela.
+        """
+        if group not in DENSITY_GROUPS:
+            raise ValueError(f"group deve ser um de: {', '.join(DENSITY_GROUPS)}")
+        if end_date < start_date:
+            raise ValueError("Data de fim deve ser posterior à data de início")
+        if (end_date - start_date).days >= DENSITY_MAX_DAYS:
+            raise ValueError(f"Janela máxima de {DENSITY_MAX_DAYS} dias")
+
+        last_day = func.coalesce(AgendaEvent.end_date, AgendaEvent.start_date)
+        clipped_start = case((AgendaEvent.start_date < start_date, literal(start_date, Date)), else_=AgendaEvent.start_date)
+        clipped_end = case((last_day > end_date, literal(end_date, Date)), else_=last_day)
+        query = select(
+            clipped_start, clipped_end, AgendaEvent.event_type, AgendaEvent.priority, func.count(AgendaEvent.id)
+        ).where(overlapping_window(start_date, end_date))
+        if project_id:
+            query = query.where(AgendaEvent.project_id == project_id)
+        if location_id:
+            query = query.where(AgendaEvent.location_id == location_id)
+        spans = [
+            (first, last, event_type, priority, count)
+            for first, last, event_type, priority, count in self.db.execute(query.group_by(clipped_start, clipped_end, AgendaEvent.event_type, AgendaEvent.priority))
+        ]
+        for occurrence in self._expand(start_date, end_date, True, project_id,
+                                       filters=AgendaEventFilter(location_id=location_id) if location_id else None):
+            spans.append((max(occurrence.start_date, start_date), min(occurrence.last_date, end_date),
+                          occurrence.event_type, occurrence.priority, 1))
+
+        size = _bucket_index(end_date, start_date, group) + 1
+        deltas: Dict[tuple, List[int]] = {}
+        for first, last, event_type, priority, count in spans:
+            key = (event_type.value if hasattr(event_type, "value") else event_type, priority)
+            row = deltas.setdefault(key, [0] * (size + 1))
+            row[_bucket_index(first, start_date, group)] += count
+            row[_bucket_index(last, start_date, group) + 1] -= count
+
+        buckets: Dict[int, Dict[str, Any]] = {}
+        for (event_type, priority), row in deltas.items():
+            running = 0
+            for index in range(size):
+                running += row[index]
+                if not running:
+                    continue
+                bucket = buckets.setdefault(index, {"total": 0, "by_type": {}, "by_priority": {}})
+                bucket["total"] += running
+                bucket["by_type"][event_type] = bucket["by_type"].get(event_type, 0) + running
+                priority_key = str(priority) if priority is not None else "none"
+                bucket["by_priority"][priority_key] = bucket["by_priority"].get(priority_key, 0) + running
+
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "group": group,
+            "total_events": sum(span[4] for span in spans),
+            # Só baldes com eventos: o payload não cresce com dias vazios
+            "buckets": [{"start": _bucket_date(index, start_date, group), **buckets[index]} for index in sorted(buckets)],
+        }
+
+    def _series_occurrence(self, event_id: int, occurrence_date: date):
+        """(série, momento original) de uma ocorrência; ValueError se não for série ou a data não for ocorrência"""
+        series = self.get_event(event_id)
+        if not series:
+            return None, None
+        if not series.recurrence_rule:
+            raise ValueError("Evento não é recorrente")
+        dtstart = series_start(series.start_date, series.start_at)
+        moments = expansion_cache.occurrences(series.recurrence_rule, dtstart, occurrence_date, occurrence_date)
+        if not moments or occurrence_date.isoformat() in (series.recurrence_exceptions or []):
+            raise ValueError(f"{occurrence_date.isoformat()} não é uma ocorrência da série")
+        return series, moments[0]
+
+    def update_occurrence(self, event_id: int, occurrence_date: date, data: AgendaOccurrenceUpdate) -> Optional[EventOccurrence]:
+        """Altera uma ocorrência da série (gravado como override na própria linha da série)"""
+        series, moment = self._series_occurrence(event_id, occurrence_date)
+        if not series:
+            return None
+        key = occurrence_date.isoformat()
+        overrides = dict(series.recurrence_overrides or {})
+        override = dict(overrides.get(key, {}))
+        for field, value in data.dict(exclude_unset=True).items():
+            override[field] = value.value if isinstance(value, EventStatus) else (
+                value.isoformat() if isinstance(value, (date, datetime)) else value
+            )
+        overrides[key] = override
+        # Atribuição nova: o JSON não rastreia mutações internas
+        series.recurrence_overrides = overrides
+        self.db.commit()
+        self.db.refresh(series)
+        return EventOccurrence(series, moment, override)
+
+    def delete_occurrence(self, event_id: int, occurrence_date: date) -> bool:
+        """Remove uma ocorrência da série (EXDATE)"""
+        series, _ = self._series_occurrence(event_id, occurrence_date)
+        if not series:
+            return False
+        key = occurrence_date.isoformat()
+        series.recurrence_exceptions = list(series.recurrence_exceptions or []) + [key]
+        if key in (series.recurrence_overrides or {}):
+            series.recurrence_overrides = {k: v for k, v in series.recurrence_overrides.items() if k != key}
+        self.db.commit()
+        return True
+
     def delete_event(self, event_id: int) -> bool:
         """Deletar evento"""
         db_event = self.get_event(event_id)
@@ -168,13 +504,10 @@ class AgendaEventService:
         today = date.today()
         end_date = date.fromordinal(today.toordinal() + days)
 
-        return self.db.query(AgendaEvent).filter(
-            and_(
-                AgendaEvent.start_date >= today.isoformat(),
-                AgendaEvent.start_date <= end_date.isoformat(),
-                AgendaEvent.status != EventStatus.CANCELLED
-            )
-        ).order_by(AgendaEvent.start_date).all()
+        return [
+            item for item in self.get_events_by_date_range(today, end_date, overlap=False)
+            if item.status != EventStatus.CANCELLED
+        ]
 
     def get_events_by_type(self, event_type: EventType) -> List[AgendaEvent]:
         """Buscar eventos por tipo"""
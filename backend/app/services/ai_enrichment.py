@@ -1,14 +1,117 @@
 import os
-from typing import List, Dict, Any
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 
 # Simple abstraction to allow plugging different AI providers later.
 # Currently supports OpenAI (if OPENAI_API_KEY set) else returns input unchanged.
+# Results are cached per page / per caption by content hash, so only changed items are sent.
+
+AI_TIMEOUT_SECONDS = float(os.getenv("AI_ENRICHMENT_TIMEOUT", "30"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_ENRICHMENT_MAX_CONCURRENCY", "4"))
+AI_PAGES_PER_CHUNK = int(os.getenv("AI_ENRICHMENT_PAGES_PER_CHUNK", "20"))
+AI_PHOTOS_PER_CHUNK = int(os.getenv("AI_ENRICHMENT_PHOTOS_PER_CHUNK", "40"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_ENRICHMENT_CACHE_MAX_ENTRIES", "5000"))
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_ENRICHMENT_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+class OpenAIEnrichmentProvider:
+    """Provider OpenAI assíncrono (SDK >= 1.0, com fallback para a API legada)"""
+
+    def __init__(self, api_key: str, model: Optional[str] = None):
+        self.api_key = api_key
+        self.model = model or os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+        self._client = None
+
+    async def complete(self, system_prompt: str, user_content: str) -> Optional[str]:
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ]
+        try:
+            from openai import AsyncOpenAI  # type: ignore
+        except ImportError:
+            # SDK legado (< 1.0)
+            import openai  # type: ignore
+            openai.api_key = self.api_key
+            completion = await openai.ChatCompletion.acreate(
+                model=self.model, messages=messages, temperature=0.5, max_tokens=1200,
+            )
+            return completion.choices[0].message["content"] if completion.choices else None
+
+        if self._client is None:
+            self._client = AsyncOpenAI(api_key=self.api_key)
+        completion = await self._client.chat.completions.create(
+            model=self.model, messages=messages, temperature=0.5, max_tokens=1200,
+        )
+        return completion.choices[0].message.content if completion.choices else None
+
+
+class EnrichmentCache:
+    """Cache LRU em memória (por processo) com TTL, indexado por hash de conteúdo"""
+
+    def __init__(self, max_entries: int = AI_CACHE_MAX_ENTRIES, ttl_seconds: float = AI_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _content_hash(*parts: Any) -> str:
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    size = max(1, size)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
 
 class AIEnrichmentService:
-    def __init__(self):
+    def __init__(
+        self,
+        provider=None,
+        cache: Optional[EnrichmentCache] = None,
+        pages_per_chunk: int = AI_PAGES_PER_CHUNK,
+        photos_per_chunk: int = AI_PHOTOS_PER_CHUNK,
+        max_concurrency: int = AI_MAX_CONCURRENCY,
+        timeout: float = AI_TIMEOUT_SECONDS,
+    ):
         self.provider_key = os.getenv("OPENAI_API_KEY")
-        self.enabled = bool(self.provider_key)
-        # Lazy import to avoid dependency issues if key not provided
+        if provider is None and self.provider_key:
+            provider = OpenAIEnrichmentProvider(self.provider_key)
+        self.provider = provider
+        self.enabled = provider is not None
+        self.cache = cache if cache is not None else EnrichmentCache()
+        self.pages_per_chunk = pages_per_chunk
+        self.photos_per_chunk = photos_per_chunk
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
 
     async def enrich_presentation(self, payload: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -21,21 +124,114 @@ class AIEnrichmentService:
           "summary": {"enabled": bool}
         }
         options: { improveTitles: bool, generateNotes: bool, fillMissingCaptions: bool, executiveSummary: bool }
+
+        Only items whose content hash is not cached are sent; large decks are split
+        into chunks requested in parallel (bounded by max_concurrency, each with a timeout).
         """
+        payload.setdefault("meta", {})
         if not self.enabled:
             # No AI key: return payload unchanged, mark flag
-            payload.setdefault("meta", {})
             payload["meta"]["ai_enriched"] = False
             return payload
 
-        try:
-            import openai  # type: ignore
-            openai.api_key = self.provider_key
-        except Exception:
-            payload.setdefault("meta", {})
-            payload["meta"]["ai_enriched"] = False
-            return payload
+        system_prompt = self._build_system_prompt(options)
+        options_key = {k: bool(options.get(k)) for k in sorted(options)}
+        model = getattr(self.provider, "model", None)
+
+        cover = payload.get("cover") or {}
+        pages = payload.get("pages") or []
+        photos = payload.get("photos") or []
+
+        # Itens a enviar: (tipo, chave do cache, dados enviados ao modelo)
+        cover_item = None
+        if cover:
+            cover_data = {k: (v[:140] if isinstance(v, str) else v) for k, v in cover.items() if k in ("title", "subtitle")}
+            summary_input = None
+            if options.get("executiveSummary"):
+                # Resumo executivo depende do deck inteiro: usa só títulos (compacto)
+                summary_input = [(p.get("title") or "")[:120] for p in pages]
+            cover_item = (
+                _content_hash("cover", cover_data, summary_input, options_key, model),
+                {"cover": cover_data, "page_titles": summary_input},
+            )
+
+        def page_key(page: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+            data = {
+                "title": (page.get("title") or "")[:120],
+                "notes": (page.get("notes") or "")[:240],
+                "layout": page.get("layout"),
+            }
+            return _content_hash("page", data, options_key, model), data
+
+        # Sem id a resposta do modelo não tem como voltar ao item: não é enviado nem cacheado
+        page_items = [(page, *page_key(page)) for page in pages if page.get("id") is not None]
+
+        def photo_key(photo: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+            data = {"caption": ""}
+            if photo.get("url"):
+                data["url"] = photo["url"]
+            # A chave cobre tudo o que vai ao modelo (id + conteúdo): trocar a URL gera nova legenda
+            return _content_hash("photo", str(photo["id"]), data, options_key, model), data
+
+        photo_items = []
+        if options.get("fillMissingCaptions"):
+            for photo in photos:
+                if photo.get("caption") or photo.get("id") is None:
+                    continue
+                photo_items.append((photo, *photo_key(photo)))
+
+        # Aplicar resultados em cache
+        hits = 0
+        enriched_any = False
+        pending_pages = []
+        for page, key, data in page_items:
+            cached = self.cache.get(key)
+            if cached is not None:
+                page.update(cached)
+                hits += 1
+                enriched_any = True
+            else:
+                pending_pages.append((page, key, data))
+
+        pending_photos = []
+        for photo, key, data in photo_items:
+            cached = self.cache.get(key)
+            if cached is not None:
+                photo.update(cached)
+                hits += 1
+                enriched_any = True
+            else:
+                pending_photos.append((photo, key, data))
+
+        pending_cover = None
+        if cover_item is not None:
+            cached = self.cache.get(cover_item[0])
+            if cached is not None:
+                self._apply_cover(payload, cached)
+                hits += 1
+                enriched_any = True
+            else:
+                pending_cover = cover_item
+
+        # Montar requisições em lotes e enviar em paralelo
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = []
+        if pending_cover is not None:
+            tasks.append(self._enrich_cover(semaphore, system_prompt, options, payload, pending_cover))
+        for chunk in _chunks(pending_pages, self.pages_per_chunk):
+            tasks.append(self._enrich_items(semaphore, system_prompt, options, "pages", chunk, ("title", "notes"), page_key))
+        for chunk in _chunks(pending_photos, self.photos_per_chunk):
+            tasks.append(self._enrich_items(semaphore, system_prompt, options, "photos", chunk, ("caption",)))
+
+        results = await asyncio.gather(*tasks) if tasks else []
+        enriched_any = enriched_any or any(results)
 
+        payload["meta"]["ai_enriched"] = enriched_any
+        payload["meta"]["ai_cache_hits"] = hits
+        payload["meta"]["ai_requests"] = len(tasks)
+        return payload
+
+    def _build_system_prompt(self, options: Dict[str, Any]) -> str:
         # Build compact prompt
         instructions = [
             "Você é um assistente que melhora uma apresentação de locações para clientes corporativos.",
@@ -47,52 +243,81 @@ class AIEnrichmentService:
         if options.get("generateNotes"): instructions.append("Crie notas claras e concisas destacando valor da locação.")
         if options.get("fillMissingCaptions"): instructions.append("Preencha captions ausentes de forma descritiva curta.")
         if options.get("executiveSummary"): instructions.append("Adicione campo executive_summary (≤450 chars) em meta.")
+        return "\n".join(instructions)
 
-        system_prompt = "\n".join(instructions)
-
-        # Trim payload for prompt (avoid huge fields)
-        trimmed = {
-            "cover": {k: (v[:140] if isinstance(v, str) else v) for k,v in (payload.get("cover") or {}).items()},
-            "pages": [
-                {"id": p.get("id"), "title": (p.get("title") or '')[:120], "notes": (p.get("notes") or '')[:240], "layout": p.get("layout")} for p in payload.get("pages", [])
-            ][:40],  # hard cap
-            "photos": [
-                {"id": ph.get("id"), "caption": (ph.get("caption") or '')[:120]} for ph in payload.get("photos", [])
-            ][:80],
-            "summary": payload.get("summary", {}),
-        }
-
-        import json
-        user_content = json.dumps({"presentation": trimmed, "options": options}, ensure_ascii=False)
-
+    async def _call(self, semaphore: asyncio.Semaphore, system_prompt: str, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Uma chamada ao provider com limite de concorrência e timeout; None em caso de falha"""
+        user_content = json.dumps(body, ensure_ascii=False)
+        async with semaphore:
+            try:
+                raw = await asyncio.wait_for(self.provider.complete(system_prompt, user_content), timeout=self.timeout)
+            except Exception as e:
+                print(f"Erro no enriquecimento por IA: {e!r}")
+                return None
+        if not raw:
+            return None
         try:
-            completion = openai.ChatCompletion.create(
-                model=os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_content}
-                ],
-                temperature=0.5,
-                max_tokens=1200,
-            )
-            raw = completion.choices[0].message["content"] if completion.choices else None
-            if not raw:
-                return payload
-            # attempt to parse
             enriched = json.loads(raw)
-            # Merge back maintaining unknown future keys
-            for key in ["cover", "pages", "photos", "summary"]:
-                if key in enriched:
-                    payload[key] = enriched[key]
-            # meta
-            payload.setdefault("meta", {})
-            payload["meta"]["ai_enriched"] = True
-            if "executive_summary" in (enriched.get("meta") or {}):
-                payload["meta"]["executive_summary"] = enriched["meta"]["executive_summary"]
-            return payload
-        except Exception:
-            payload.setdefault("meta", {})
-            payload["meta"]["ai_enriched"] = False
-            return payload
+        except ValueError:
+            return None
+        return enriched if isinstance(enriched, dict) else None
+
+    async def _enrich_cover(self, semaphore, system_prompt, options, payload, cover_item) -> bool:
+        key, data = cover_item
+        body = {"presentation": {"cover": data["cover"]}, "options": options}
+        if data.get("page_titles") is not None:
+            body["presentation"]["pages"] = [{"title": t} for t in data["page_titles"]]
+        enriched = await self._call(semaphore, system_prompt, body)
+        if not enriched:
+            return False
+        result = {}
+        if isinstance(enriched.get("cover"), dict):
+            result["cover"] = {k: v for k, v in enriched["cover"].items() if k in ("title", "subtitle")}
+        executive_summary = (enriched.get("meta") or {}).get("executive_summary")
+        if executive_summary:
+            result["executive_summary"] = executive_summary
+        if not result:
+            return False
+        self.cache.set(key, result)
+        self._apply_cover(payload, result)
+        return True
+
+    async def _enrich_items(self, semaphore, system_prompt, options, kind: str, chunk, fields: Tuple[str, ...], key_fn=None) -> bool:
+        body = {
+            "presentation": {kind: [dict(data, id=item.get("id")) for item, _key, data in chunk]},
+            "options": options,
+        }
+        enriched = await self._call(semaphore, system_prompt, body)
+        if not enriched:
+            return False
+        by_id = {
+            str(entry["id"]): entry
+            for entry in (enriched.get(kind) or [])
+            if isinstance(entry, dict) and entry.get("id") is not None
+        }
+        applied = False
+        for item, key, _data in chunk:
+            if item.get("id") is None:
+                continue
+            entry = by_id.get(str(item["id"]))
+            if not entry:
+                continue
+            result = {f: entry[f] for f in fields if entry.get(f) is not None}
+            if not result:
+                continue
+            self.cache.set(key, result)
+            item.update(result)
+            if key_fn is not None:
+                # Conteúdo já enriquecido (reenviado pelo cliente) não volta ao modelo
+                self.cache.set(key_fn(item)[0], result)
+            applied = True
+        return applied
+
+    def _apply_cover(self, payload: Dict[str, Any], result: Dict[str, Any]):
+        if result.get("cover"):
+            payload.setdefault("cover", {})
+            payload["cover"].update(result["cover"])
+        if result.get("executive_summary"):
+            payload["meta"]["executive_summary"] = result["executive_summary"]
 
 ai_enrichment_service = AIEnrichmentService()
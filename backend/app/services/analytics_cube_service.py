@@ -0,0 +1,343 @@
+"""
+Cubo analítico em memória para dashboards com filtros cruzados
+Locações, locações de projeto e movimentações financeiras são carregadas em tabelas colunares
+(core.columnar) e consultadas sem tocar no banco transacional. Escritas confirmadas pelo ORM
+atualizam o cubo incrementalmente; escritas em massa (ou o tempo máximo de vida) disparam uma
+recarga completa na próxima consulta.
+"""
+import os
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from ..core.columnar import ColumnTable
+from ..models.financial import FinancialMovement
+from ..models.location import Location
+from ..models.project_location import ProjectLocation
+from .financial_rollup_service import converted_amount
+from .location_stats_service import price_range_label
+
+# Recarga completa depois desse tempo (escritas de outros processos não chegam por eventos)
+ANALYTICS_CUBE_MAX_AGE = float(os.getenv("ANALYTICS_CUBE_MAX_AGE", "600"))
+ANALYTICS_LOAD_BATCH = int(os.getenv("ANALYTICS_LOAD_BATCH", "5000"))
+
+LOCATIONS = "locations"
+PROJECT_LOCATIONS = "project_locations"
+FINANCIAL_MOVEMENTS = "financial_movements"
+
+# Dimensões da locação disponíveis nos fatos que referenciam location_id
+LOCATION_DIMENSIONS = ("city", "state", "space_type", "sector_type", "price_band")
+
+_PENDING_CHANGES = "analytics_cube_changes"
+
+
+def _enum(value: Any) -> Any:
+    return value.value if hasattr(value, "value") else value
+
+
+def _month(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value[:7]
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m")
+    return None
+
+
+# ===== Registro de cada modelo no cubo =====
+
+def _location_record(v: Dict[str, Any]) -> Dict[str, Any]:
+    price = v["price_day_cinema"] if v["price_day_cinema"] is not None else v["price_day_publicidade"]
+    return {
+        "city": v["city"],
+        "state": v["state"],
+        "space_type": _enum(v["space_type"]),
+        "sector_type": _enum(v["sector_type"]),
+        "status": _enum(v["status"]),
+        "price_band": price_range_label(price),
+        # created_at vem do servidor: no INSERT ainda não foi lido, vale o momento da gravação
+        "month": _month(v["created_at"] or datetime.now(timezone.utc)),
+        "price_day": price,
+    }
+
+
+def _project_location_record(v: Dict[str, Any]) -> Dict[str, Any]:
+    start, end = v["rental_start"], v["rental_end"]
+    return {
+        "project_id": v["project_id"],
+        "status": _enum(v["status"]),
+        "month": _month(start),
+        "location_id": v["location_id"],
+        "daily_rate": v["daily_rate"],
+        "total_cost": v["total_cost"],
+        "rental_days": (end - start).days + 1 if start and end else None,
+    }
+
+
+def _movement_record(v: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "project_id": v["project_id"],
+        "movement_type": _enum(v["movement_type"]),
+        "status": _enum(v["status"]),
+        "currency": v["currency"],
+        "month": _month(v["movement_date"]),
+        "location_id": v["location_id"],
+        "amount": converted_amount(v["amount"], v["exchange_rate"]),
+        "amount_original": v["amount"],
+    }
+
+
+# dataset -> (modelo, campos lidos, conversão em registro, categóricos, medidas, referências)
+DATASETS: Dict[str, Tuple[type, Sequence[str], Callable, Sequence[str], Sequence[str], Sequence[str]]] = {
+    LOCATIONS: (
+        Location,
+        ("city", "state", "space_type", "sector_type", "status", "price_day_cinema", "price_day_publicidade", "created_at"),
+        _location_record,
+        ("city", "state", "space_type", "sector_type", "status", "price_band", "month"),
+        ("price_day",),
+        (),
+    ),
+    PROJECT_LOCATIONS: (
+        ProjectLocation,
+        ("project_id", "location_id", "status", "rental_start", "rental_end", "daily_rate", "total_cost"),
+        _project_location_record,
+        ("project_id", "status", "month"),
+        ("daily_rate", "total_cost", "rental_days"),
+        ("location_id",),
+    ),
+    FINANCIAL_MOVEMENTS: (
+        FinancialMovement,
+        ("project_id", "location_id", "movement_type", "status", "currency", "amount", "exchange_rate", "movement_date"),
+        _movement_record,
+        ("project_id", "movement_type", "status", "currency", "month"),
+        ("amount", "amount_original"),
+        ("location_id",),
+    ),
+}
+MODEL_DATASETS = {spec[0]: name for name, spec in DATASETS.items()}
+
+
+class AnalyticsCube:
+    """
+    Tabelas colunares do processo; leituras e escritas serializadas por um lock (consultas levam ms).
+    Recargas são serializadas por um lock próprio: mudanças confirmadas durante a carga ficam
+    num buffer e são reaplicadas nas tabelas novas antes da troca.
+    """
+
+    def __init__(self, max_age: float = ANALYTICS_CUBE_MAX_AGE):
+        self.max_age = max_age
+        self.tables: Dict[str, ColumnTable] = {}
+        self.built_at: Optional[float] = None
+        self.stale = True
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        # Durante uma recarga: mudanças a reaplicar e se houve escrita em massa (None fora da recarga)
+        self._buffer: Optional[List[Tuple[str, int, Optional[Dict[str, Any]]]]] = None
+        self._invalidated_during_build = False
+
+    def _new_tables(self) -> Dict[str, ColumnTable]:
+        tables = {
+            name: ColumnTable(categoricals, measures, references)
+            for name, (_, _, _, categoricals, measures, references) in DATASETS.items()
+        }
+        for fact in (PROJECT_LOCATIONS, FINANCIAL_MOVEMENTS):
+            for dimension in LOCATION_DIMENSIONS:
+                tables[fact].join(f"location_{dimension}", "location_id", tables[LOCATIONS], dimension)
+        return tables
+
+    def _load(self, db: Session) -> Dict[str, ColumnTable]:
+        """Carrega todos os datasets em tabelas novas (uma consulta em lotes por modelo)"""
+        tables = self._new_tables()
+        for name, (model, fields, to_record, *_) in DATASETS.items():
+            rows = db.execute(
+                select(model.id, *[getattr(model, field) for field in fields])
+                .execution_options(yield_per=ANALYTICS_LOAD_BATCH)
+            )
+            tables[name].load((row[0], to_record(dict(zip(fields, row[1:])))) for row in rows)
+        return tables
+
+    @staticmethod
+    def _apply_to(tables: Dict[str, ColumnTable], changes: List[Tuple[str, int, Optional[Dict[str, Any]]]]):
+        for dataset, key, record in changes:
+            table = tables[dataset]
+            if record is None:
+                table.delete(key)
+            else:
+                table.upsert(key, record)
+
+    def _fresh(self) -> bool:
+        with self._lock:
+            expired = self.built_at is None or time.monotonic() - self.built_at > self.max_age
+            return not (self.stale or expired)
+
+    def _build(self, db: Session):
+        with self._lock:
+            self._buffer = []
+            self._invalidated_during_build = False
+        try:
+            tables = self._load(db)
+        except Exception:
+            with self._lock:
+                self._buffer = None
+            raise
+        with self._lock:
+            # Reaplicar é idempotente: upsert/exclusão com o valor confirmado mais recente
+            self._apply_to(tables, self._buffer)
+            self.tables = tables
+            self.built_at = time.monotonic()
+            self.stale = self._invalidated_during_build
+            self._buffer = None
+
+    def build(self, db: Session):
+        """Recarga completa (uma por vez; mudanças confirmadas durante a carga não se perdem)"""
+        with self._build_lock:
+            self._build(db)
+
+    def ensure_fresh(self, db: Session):
+        if self._fresh():
+            return
+        with self._build_lock:
+            # Outra requisição pode ter recarregado enquanto esta esperava
+            if not self._fresh():
+                self._build(db)
+
+    def invalidate(self):
+        with self._lock:
+            self.stale = True
+            if self._buffer is not None:
+                self._invalidated_during_build = True
+
+    def apply(self, changes: List[Tuple[str, int, Optional[Dict[str, Any]]]]):
+        """Aplica eventos (dataset, id, registro ou None para exclusão) de uma transação confirmada"""
+        with self._lock:
+            if self._buffer is not None:
+                self._buffer.extend(changes)
+            if self.built_at is None or self.stale:
+                return
+            self._apply_to(self.tables, changes)
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: {
+                    "rows": len(table),
+                    "dimensions": table.dimensions,
+                    "measures": list(table.measures),
+                }
+                for name, table in (self.tables or self._new_tables()).items()
+            }
+
+    def query(
+        self,
+        dataset: str,
+        group_by: Sequence[str] = (),
+        aggregates: Sequence[Tuple[str, Optional[str]]] = (("count", None),),
+        filters: Optional[Dict[str, Sequence[Any]]] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+        order_by: Optional[str] = None,
+        descending: bool = True,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        if dataset not in DATASETS:
+            raise ValueError(f"Dataset inválido: {dataset}")
+        with self._lock:
+            table = self.tables[dataset]
+            for name in list(group_by) + list(filters or {}):
+                if name not in table.dimensions:
+                    raise ValueError(f"Dimensão inválida para {dataset}: {name}")
+            for name in ranges or {}:
+                if name not in table.measures:
+                    raise ValueError(f"Medida inválida para {dataset}: {name}")
+            rows = table.aggregate(group_by, aggregates, filters, ranges)
+
+        if order_by:
+            if rows and order_by not in rows[0]:
+                raise ValueError(f"Coluna de ordenação inválida: {order_by}")
+            present = [row for row in rows if row.get(order_by) is not None]
+            missing = [row for row in rows if row.get(order_by) is None]
+            rows = sorted(present, key=lambda row: row[order_by], reverse=descending) + missing
+        return rows[:limit] if limit else rows
+
+
+analytics_cube = AnalyticsCube()
+
+
+# ===== Eventos de escrita =====
+
+def _snapshot(session, obj, fields: Sequence[str]) -> Dict[str, Any]:
+    """Valores atuais do objeto; colunas geradas pelo servidor num INSERT não são recarregadas"""
+    unloaded = inspect(obj).unloaded if obj in session.new else ()
+    return {field: None if field in unloaded else getattr(obj, field) for field in fields}
+
+
+def _collect_cube_changes(session, flush_context):
+    """Registra os valores gravados; só entram no cubo se a transação for confirmada"""
+    changes = session.info.setdefault(_PENDING_CHANGES, [])
+    for obj in list(session.new) + list(session.dirty):
+        dataset = MODEL_DATASETS.get(type(obj))
+        if dataset and obj not in session.deleted:
+            _, fields, to_record, *_ = DATASETS[dataset]
+            changes.append((dataset, obj.id, to_record(_snapshot(session, obj, fields))))
+    for obj in session.deleted:
+        dataset = MODEL_DATASETS.get(type(obj))
+        if dataset and obj.id is not None:
+            changes.append((dataset, obj.id, None))
+
+
+def _invalidate_cube_on_bulk_dml(orm_execute_state):
+    # insert()/update()/delete() em massa não passam pelo flush: recarga na próxima consulta
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in MODEL_DATASETS:
+        orm_execute_state.session.info[_PENDING_CHANGES + "_bulk"] = True
+
+
+def _apply_cube_changes(session):
+    changes = session.info.pop(_PENDING_CHANGES, None)
+    if session.info.pop(_PENDING_CHANGES + "_bulk", False):
+        analytics_cube.invalidate()
+    elif changes:
+        analytics_cube.apply(changes)
+
+
+def _discard_cube_changes(session):
+    session.info.pop(_PENDING_CHANGES, None)
+    session.info.pop(_PENDING_CHANGES + "_bulk", None)
+
+
+def register_analytics_cube_hooks():
+    """Chamado por services.hooks.register_hooks"""
+    event.listen(Session, "after_flush", _collect_cube_changes)
+    event.listen(Session, "do_orm_execute", _invalidate_cube_on_bulk_dml)
+    event.listen(Session, "after_commit", _apply_cube_changes)
+    event.listen(Session, "after_rollback", _discard_cube_changes)
+
+
+class AnalyticsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def query(self, dataset: str, **kwargs) -> Dict[str, Any]:
+        analytics_cube.ensure_fresh(self.db)
+        started = time.perf_counter()
+        rows = analytics_cube.query(dataset, **kwargs)
+        return {
+            "dataset": dataset,
+            "rows": rows,
+            "total_rows": len(rows),
+            "query_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    def datasets(self) -> Dict[str, Any]:
+        analytics_cube.ensure_fresh(self.db)
+        return analytics_cube.describe()
+
+    def refresh(self) -> Dict[str, Any]:
+        analytics_cube.build(self.db)
+        return analytics_cube.describe()
@@ -0,0 +1,296 @@
+"""
+Detecção de dupla reserva de locações (ProjectLocation)
+Cada reserva ocupa a locação nas janelas de aluguel, filmagem e visita técnica. Dois projetos
+diferentes não podem ocupar a mesma locação em janelas que se sobrepõem.
+- Na criação/edição a linha da locação é travada (SELECT ... FOR UPDATE) até o commit e a reserva
+  é conferida contra as reservas lidas do banco nessa transação: gravações concorrentes na mesma
+  locação ficam em fila e a segunda enxerga a primeira
+- Gravações que só sinalizam conflito (allow_conflicts) usam um índice de intervalos da locação
+  em cache, descartado quando uma escrita confirmada toca a locação
+- O relatório (/project-locations/conflicts) varre as reservas de cada locação com sweep-line
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, event, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from ..core.intervals import Interval, IntervalIndex, sweep_overlaps
+from ..models.location import Location
+from ..models.project_location import ProjectLocation, RentalStatus
+
+# Escritas de outros processos não chegam pelos hooks: o índice de uma locação é remontado depois desse tempo
+BOOKING_INDEX_MAX_AGE = float(os.getenv("BOOKING_INDEX_MAX_AGE", "60"))
+
+RENTAL_WINDOW = "rental"
+FILMING_WINDOW = "filming"
+TECHNICAL_VISIT_WINDOW = "technical_visit"
+
+_TOUCHED_LOCATIONS = "booking_index_touched_locations"
+_BULK_WRITE = "booking_index_bulk_write"
+
+BOOKING_COLUMNS = (
+    ProjectLocation.id, ProjectLocation.project_id, ProjectLocation.location_id,
+    ProjectLocation.rental_start, ProjectLocation.rental_end,
+    ProjectLocation.filming_start_date, ProjectLocation.filming_end_date,
+    ProjectLocation.technical_visit_date,
+)
+
+
+class BookingConflictError(ValueError):
+    def __init__(self, conflicts: List[Dict[str, Any]]):
+        self.conflicts = conflicts
+        super().__init__(f"Locação já reservada por outro projeto nas datas informadas ({len(conflicts)} conflito(s))")
+
+
+def booking_windows(values: Dict[str, Any]) -> List[Tuple[str, date, date]]:
+    """Janelas (tipo, início, fim) em que a reserva ocupa a locação"""
+    windows = []
+    if values.get("rental_start") and values.get("rental_end"):
+        windows.append((RENTAL_WINDOW, values["rental_start"], values["rental_end"]))
+    if values.get("filming_start_date"):
+        windows.append((FILMING_WINDOW, values["filming_start_date"], values.get("filming_end_date") or values["filming_start_date"]))
+    if values.get("technical_visit_date"):
+        windows.append((TECHNICAL_VISIT_WINDOW, values["technical_visit_date"], values["technical_visit_date"]))
+    # Janela invertida (fim antes do início) não ocupa nada
+    return [(kind, start, end) for kind, start, end in windows if end >= start]
+
+
+def _intervals(row: Dict[str, Any]) -> List[Interval]:
+    return [
+        (start, end, row["id"], {"project_id": row["project_id"], "kind": kind})
+        for kind, start, end in booking_windows(row)
+    ]
+
+
+def _conflict(location_id: int, mine: Interval, other: Interval) -> Dict[str, Any]:
+    return {
+        "location_id": location_id,
+        "project_location_id": mine[2],
+        "project_id": mine[3]["project_id"],
+        "window": mine[3]["kind"],
+        "start": mine[0],
+        "end": mine[1],
+        "other_project_location_id": other[2],
+        "other_project_id": other[3]["project_id"],
+        "other_window": other[3]["kind"],
+        "other_start": other[0],
+        "other_end": other[1],
+        "overlap_start": max(mine[0], other[0]),
+        "overlap_end": min(mine[1], other[1]),
+    }
+
+
+def location_index(db: Session, location_id: int) -> IntervalIndex:
+    """Índice de intervalos com as reservas ativas da locação, lidas agora do banco"""
+    rows = db.execute(
+        select(*BOOKING_COLUMNS).where(
+            ProjectLocation.location_id == location_id,
+            ProjectLocation.status != RentalStatus.CANCELLED,
+        )
+    ).mappings()
+    return IntervalIndex(interval for row in rows for interval in _intervals(row))
+
+
+class BookingIndexCache:
+    """Índice de intervalos por locação, montado sob demanda"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes: Dict[int, Tuple[IntervalIndex, float]] = {}
+        self.builds = 0
+
+    def get(self, db: Session, location_id: int) -> IntervalIndex:
+        with self._lock:
+            entry = self._indexes.get(location_id)
+        if entry and time.monotonic() - entry[1] < BOOKING_INDEX_MAX_AGE:
+            return entry[0]
+        index = location_index(db, location_id)
+        with self._lock:
+            self._indexes[location_id] = (index, time.monotonic())
+            self.builds += 1
+        return index
+
+    def invalidate(self, location_ids: Iterable[int]):
+        with self._lock:
+            for location_id in location_ids:
+                self._indexes.pop(location_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+booking_index_cache = BookingIndexCache()
+
+
+# ===== Manutenção do índice por hooks de sessão =====
+
+def _collect_previous_locations(session, flush_context, instances):
+    # Reserva movida de locação: o índice da locação anterior também muda.
+    # Removidas são lidas aqui, antes do DELETE, quando os atributos ainda podem ser carregados
+    touched = session.info.setdefault(_TOUCHED_LOCATIONS, set())
+    for obj in session.dirty:
+        if isinstance(obj, ProjectLocation):
+            touched.update(inspect(obj).attrs.location_id.history.deleted or ())
+    for obj in session.deleted:
+        if isinstance(obj, ProjectLocation):
+            touched.add(obj.location_id)
+
+
+def _collect_touched_locations(session, flush_context):
+    touched = session.info.setdefault(_TOUCHED_LOCATIONS, set())
+    for obj in list(session.new) + [obj for obj in session.dirty if obj not in session.deleted]:
+        if isinstance(obj, ProjectLocation):
+            touched.add(obj.location_id)
+
+
+def _flag_bulk_write(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is ProjectLocation:
+        orm_execute_state.session.info[_BULK_WRITE] = True
+
+
+def _invalidate_touched_locations(session):
+    touched = session.info.pop(_TOUCHED_LOCATIONS, set())
+    if session.info.pop(_BULK_WRITE, False):
+        booking_index_cache.clear()
+    elif touched:
+        booking_index_cache.invalidate(touched)
+
+
+def _discard_touched_locations(session):
+    # Um índice montado dentro da transação pode ter visto as linhas desfeitas: descarta também
+    booking_index_cache.invalidate(session.info.pop(_TOUCHED_LOCATIONS, set()))
+    if session.info.pop(_BULK_WRITE, False):
+        booking_index_cache.clear()
+
+
+def register_booking_index_hooks():
+    """Chamado por services.hooks.register_hooks"""
+    event.listen(Session, "before_flush", _collect_previous_locations)
+    event.listen(Session, "after_flush", _collect_touched_locations)
+    event.listen(Session, "do_orm_execute", _flag_bulk_write)
+    event.listen(Session, "after_commit", _invalidate_touched_locations)
+    event.listen(Session, "after_rollback", _discard_touched_locations)
+
+
+class BookingConflictService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def lock_location(self, location_id: int):
+        """Trava a linha da locação até o fim da transação (gravações de reservas nela entram em fila)"""
+        self.db.execute(select(Location.id).where(Location.id == location_id).with_for_update())
+
+    def find_conflicts(
+        self,
+        location_id: int,
+        project_id: int,
+        values: Dict[str, Any],
+        project_location_id: Optional[int] = None,
+        fresh: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Conflitos de uma reserva (nova ou editada) com reservas de outros projetos na mesma locação.
+        `fresh` lê as reservas do banco na transação atual em vez do índice em cache.
+        """
+        if values.get("status") == RentalStatus.CANCELLED:
+            return []
+        index = location_index(self.db, location_id) if fresh else booking_index_cache.get(self.db, location_id)
+        conflicts = []
+        for kind, start, end in booking_windows(values):
+            mine = (start, end, project_location_id, {"project_id": project_id, "kind": kind})
+            for other in index.overlapping(start, end, exclude=project_location_id):
+                if other[3]["project_id"] != project_id:
+                    conflicts.append(_conflict(location_id, mine, other))
+        return sorted(conflicts, key=lambda c: (c["overlap_start"], c["other_project_location_id"]))
+
+    def check(
+        self,
+        location_id: int,
+        project_id: int,
+        values: Dict[str, Any],
+        project_location_id: Optional[int] = None,
+        allow_conflicts: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Lança BookingConflictError se houver conflito, a menos que `allow_conflicts` (aí só sinaliza).
+        Para impedir a dupla reserva a locação fica travada até o commit de quem chamou e a conferência
+        usa as reservas atuais do banco, não o índice em cache.
+        """
+        if allow_conflicts:
+            conflicts = self.find_conflicts(location_id, project_id, values, project_location_id)
+        else:
+            self.lock_location(location_id)
+            conflicts = self.find_conflicts(location_id, project_id, values, project_location_id, fresh=True)
+        if conflicts and not allow_conflicts:
+            raise BookingConflictError(conflicts)
+        if conflicts:
+            print(f"⚠️ Reserva da locação {location_id} pelo projeto {project_id} gravada com {len(conflicts)} conflito(s)")
+        return conflicts
+
+    def report(
+        self,
+        project_id: Optional[int] = None,
+        location_id: Optional[int] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Conflitos entre projetos por locação (de um projeto, de uma locação e/ou num intervalo de datas).
+        Com projeto, entram as reservas de outros projetos nas mesmas locações.
+        """
+        if date_from and date_to and date_to < date_from:
+            raise ValueError("date_to deve ser igual ou posterior a date_from")
+
+        query = select(*BOOKING_COLUMNS).where(ProjectLocation.status != RentalStatus.CANCELLED)
+        if location_id is not None:
+            query = query.where(ProjectLocation.location_id == location_id)
+        if project_id is not None:
+            project_locations = select(ProjectLocation.location_id).where(ProjectLocation.project_id == project_id)
+            query = query.where(ProjectLocation.location_id.in_(project_locations))
+        if date_from or date_to:
+            query = query.where(or_(*self._window_filters(date_from or date.min, date_to or date.max)))
+
+        by_location: Dict[int, List[Interval]] = defaultdict(list)
+        for row in self.db.execute(query).mappings():
+            by_location[row["location_id"]].extend(_intervals(row))
+
+        conflicts = []
+        for current_location, intervals in by_location.items():
+            for first, second in sweep_overlaps(intervals):
+                if first[3]["project_id"] == second[3]["project_id"]:
+                    continue
+                if project_id is not None and second[3]["project_id"] == project_id:
+                    first, second = second, first
+                elif project_id is not None and first[3]["project_id"] != project_id:
+                    continue
+                conflict = _conflict(current_location, first, second)
+                if date_from and conflict["overlap_end"] < date_from:
+                    continue
+                if date_to and conflict["overlap_start"] > date_to:
+                    continue
+                conflicts.append(conflict)
+        return sorted(conflicts, key=lambda c: (c["location_id"], c["overlap_start"], c["project_location_id"]))
+
+    @staticmethod
+    def _window_filters(start: date, end: date) -> List[Any]:
+        """Reservas com alguma janela tocando [start, end]"""
+        return [
+            and_(ProjectLocation.rental_start <= end, ProjectLocation.rental_end >= start),
+            and_(
+                ProjectLocation.filming_start_date <= end,
+                or_(
+                    ProjectLocation.filming_end_date >= start,
+                    and_(ProjectLocation.filming_end_date.is_(None), ProjectLocation.filming_start_date >= start),
+                ),
+            ),
+            ProjectLocation.technical_visit_date.between(start, end),
+        ]
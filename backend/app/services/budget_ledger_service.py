@@ -0,0 +1,160 @@
+"""
+Ledger do orçamento dos projetos
+Project.budget_spent é a projeção das movimentações aprovadas: cada aprovação, rejeição,
+cancelamento ou correção de uma movimentação soma/subtrai o valor convertido no projeto,
+na mesma transação da escrita (sem somar de novo todas as movimentações).
+budget_remaining é coluna calculada pelo banco e acompanha automaticamente.
+Uma verificação periódica recalcula os totais em lote e corrige desvios.
+"""
+import os
+from typing import Any, Dict, Iterator, List
+
+from sqlalchemy import bindparam, case, func, select, update
+from sqlalchemy.orm import Session
+
+from ..core.flush_tracking import Contribution, FlushDeltaTracker
+from ..core.jobs import Job, job_registry
+from ..models.financial import FinancialMovement, MovementStatus, MovementType
+from ..models.project import Project
+from .financial_rollup_service import converted_amount, converted_amount_expression
+from .kpi_snapshot_service import TRACKED_MODELS, apply_external_changes
+
+# Intervalo da verificação periódica em segundos (0 desativa)
+BUDGET_LEDGER_VERIFY_INTERVAL = float(os.getenv("BUDGET_LEDGER_VERIFY_INTERVAL", "3600"))
+
+# Efeito de cada tipo de movimentação aprovada no valor gasto do projeto
+# (receita extra não é gasto: aparece só nos rollups financeiros)
+LEDGER_SIGNS = {
+    MovementType.GASTO: 1,
+    MovementType.AJUSTE: 1,
+    MovementType.REEMBOLSO: -1,
+    MovementType.RECEITA_EXTRA: 0,
+}
+
+TOLERANCE = 0.005
+
+
+def signed_amount_expression():
+    """Equivalente SQL do efeito de uma movimentação aprovada no valor gasto"""
+    return case(
+        *[(FinancialMovement.movement_type == movement_type, sign) for movement_type, sign in LEDGER_SIGNS.items()],
+        else_=0,
+    ) * converted_amount_expression()
+
+
+# ===== Manutenção incremental =====
+
+def _movement_contributions(v: Dict[str, Any]) -> Iterator[Contribution]:
+    if v["status"] != MovementStatus.APPROVED or v["project_id"] is None:
+        return
+    sign = LEDGER_SIGNS.get(v["movement_type"], 0)
+    if sign:
+        yield v["project_id"], sign * converted_amount(v["amount"], v["exchange_rate"])
+
+
+TRACKED_FIELDS = ("project_id", "movement_type", "status", "amount", "exchange_rate")
+
+
+def apply_budget_deltas(connection, deltas: Dict[int, float]):
+    """
+    Soma os deltas em budget_spent com UPDATE relativo (seguro com aprovações concorrentes).
+    Como o UPDATE não passa pelo ORM, os contadores do snapshot de KPIs são ajustados aqui.
+    """
+    projects = Project.__table__
+    kpi_fields = TRACKED_MODELS[Project][0]
+    before = {
+        row.id: dict(row._mapping)
+        for row in connection.execute(
+            select(projects.c.id, *[projects.c[name] for name in kpi_fields]).where(projects.c.id.in_(list(deltas)))
+        )
+    }
+    connection.execute(
+        update(projects)
+        .where(projects.c.id == bindparam("project_key"))
+        .values(budget_spent=func.coalesce(projects.c.budget_spent, 0) + bindparam("delta")),
+        [{"project_key": project_id, "delta": delta} for project_id, delta in deltas.items()],
+    )
+
+    changes = []
+    for project_id, delta in deltas.items():
+        old = before.get(project_id)
+        if old is None:
+            continue
+        old = {name: old[name] for name in kpi_fields}
+        changes.append((old, {**old, "budget_spent": (old["budget_spent"] or 0) + delta}))
+    apply_external_changes(connection, Project, changes)
+
+
+def warn_ledger_bypassed(connection):
+    # Escrita em massa em financial_movements: a próxima verificação corrige os totais
+    print("⚠️ Movimentações alteradas fora do ORM: valor gasto dos projetos pendente de verificação")
+
+
+budget_ledger_tracker = FlushDeltaTracker(
+    "budget_ledger",
+    {FinancialMovement: (TRACKED_FIELDS, _movement_contributions)},
+    apply_budget_deltas,
+    warn_ledger_bypassed,
+)  # Registrado por services.hooks.register_hooks
+
+
+class BudgetLedgerService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def expected_spent(self) -> Dict[int, float]:
+        """Valor gasto de cada projeto derivado das movimentações aprovadas (uma consulta agrupada)"""
+        rows = self.db.execute(
+            select(FinancialMovement.project_id, func.sum(signed_amount_expression()))
+            .where(FinancialMovement.status == MovementStatus.APPROVED)
+            .group_by(FinancialMovement.project_id)
+        )
+        return {project_id: float(total or 0) for project_id, total in rows}
+
+    def verify(self, fix: bool = True) -> Dict[str, Any]:
+        """
+        Compara budget_spent de todos os projetos com o ledger e, se pedido, corrige os desvios
+        com um único UPDATE em lote (o snapshot de KPIs é marcado para reconciliação).
+        A correção trava os projetos divergentes e recalcula a soma no próprio UPDATE: aprovações
+        confirmadas entre a comparação e a correção entram na soma em vez de serem sobrescritas.
+        """
+        expected = self.expected_spent()
+        mismatches: List[Dict[str, Any]] = []
+        projects = 0
+        for project_id, actual in self.db.execute(select(Project.id, Project.budget_spent)):
+            projects += 1
+            target = expected.get(project_id, 0.0)
+            if abs((actual or 0) - target) > TOLERANCE:
+                mismatches.append({"project_id": project_id, "expected": round(target, 2), "actual": actual or 0})
+
+        if fix and mismatches:
+            ids = [m["project_id"] for m in mismatches]
+            self.db.execute(select(Project.id).where(Project.id.in_(ids)).order_by(Project.id).with_for_update())
+            ledger = (
+                select(func.coalesce(func.sum(signed_amount_expression()), 0))
+                .where(FinancialMovement.project_id == Project.id, FinancialMovement.status == MovementStatus.APPROVED)
+                .scalar_subquery()
+            )
+            self.db.execute(
+                update(Project)
+                .where(Project.id.in_(ids), func.abs(func.coalesce(Project.budget_spent, 0) - ledger) > TOLERANCE)
+                .values(budget_spent=ledger)
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+
+        if mismatches:
+            print(f"⚠️ Ledger do orçamento: {len(mismatches)} projetos com valor gasto divergente")
+        return {"projects": projects, "mismatches": mismatches, "fixed": fix and bool(mismatches)}
+
+
+def run_budget_ledger_verify(job: Job, bind):
+    """Tarefa periódica: verifica e corrige o ledger com uma sessão própria"""
+    job_registry.start(job, total=1, message="Verificando valor gasto dos projetos")
+    db = Session(bind=bind)
+    try:
+        result = BudgetLedgerService(db).verify(fix=True)
+    finally:
+        db.close()
+    job_registry.advance(job)
+    job_registry.complete(job, result={"projects": result["projects"], "mismatches": len(result["mismatches"])})
@@ -0,0 +1,162 @@
+"""
+Regeneração em lote dos eventos de calendário gerados a partir das ProjectLocations
+Usada depois de migrações de dados (ex.: migrate_production_dates.py), quando a agenda deixa de
+refletir as datas das locações. Percorre as locações em lotes por id (keyset) com os nomes de
+locação e projeto na mesma consulta, calcula os eventos desejados em memória e aplica o lote com
+INSERT/UPDATE/DELETE em massa e um commit. O último id confirmado é o ponto de retomada.
+Mesma regra de update_events: cor, status e prioridade editados no calendário são preservados.
+"""
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from ..core.jobs import Job, job_registry
+from ..models.agenda_event import AgendaEvent, EventStatus
+from ..models.location import Location
+from ..models.project import Project
+from ..models.project_location import ProjectLocation
+from .project_location_calendar_service import GENERATED_EVENT_TYPES, SYNCED_FIELDS, ProjectLocationCalendarService
+
+CALENDAR_REGENERATION_CHUNK = int(os.getenv("CALENDAR_REGENERATION_CHUNK", "1000"))
+JOB_KIND = "calendar_regeneration"
+
+# Campos da ProjectLocation usados por build_desired_events
+SOURCE_COLUMNS = (
+    ProjectLocation.id, ProjectLocation.project_id, ProjectLocation.location_id,
+    ProjectLocation.rental_start, ProjectLocation.rental_end, ProjectLocation.daily_rate, ProjectLocation.total_cost,
+    ProjectLocation.visit_date, ProjectLocation.visit_time,
+    ProjectLocation.technical_visit_date, ProjectLocation.technical_visit_time,
+    ProjectLocation.filming_start_date, ProjectLocation.filming_end_date,
+    ProjectLocation.filming_start_time, ProjectLocation.filming_end_time,
+    ProjectLocation.delivery_date, ProjectLocation.delivery_time,
+)
+
+
+def _span_days(data: Dict[str, Any]) -> int:
+    if data["start_date"] and data["end_date"]:
+        return max((data["end_date"] - data["start_date"]).days, 0)
+    return 0
+
+
+class CalendarRegenerationService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def count(self, after_id: int = 0) -> int:
+        return self.db.execute(select(func.count(ProjectLocation.id)).where(ProjectLocation.id > after_id)).scalar() or 0
+
+    def regenerate_chunk(self, after_id: int = 0, chunk_size: int = CALENDAR_REGENERATION_CHUNK) -> Tuple[Optional[int], Dict[str, int]]:
+        """
+        Sincroniza um lote de locações com id > after_id.
+        Retorna (último id do lote ou None se acabou, contagens do lote).
+        """
+        sources = self.db.execute(
+            select(*SOURCE_COLUMNS, Location.title.label("location_name"), Project.name.label("project_name"))
+            .outerjoin(Location, Location.id == ProjectLocation.location_id)
+            .outerjoin(Project, Project.id == ProjectLocation.project_id)
+            .where(ProjectLocation.id > after_id)
+            .order_by(ProjectLocation.id)
+            .limit(chunk_size)
+        ).all()
+        if not sources:
+            return None, {"locations": 0, "inserted": 0, "updated": 0, "deleted": 0}
+
+        existing: Dict[int, List[Any]] = defaultdict(list)
+        for row in self.db.execute(
+            select(AgendaEvent.id, AgendaEvent.project_location_id, AgendaEvent.event_type,
+                   *(getattr(AgendaEvent, field) for field in SYNCED_FIELDS))
+            .where(
+                AgendaEvent.project_location_id.in_([source.id for source in sources]),
+                AgendaEvent.event_type.in_(GENERATED_EVENT_TYPES),
+            )
+            .order_by(AgendaEvent.id)
+        ):
+            existing[row.project_location_id].append(row)
+
+        now = datetime.now(timezone.utc)
+        inserts, updates, deletes = [], [], []
+        for source in sources:
+            # Locação ou projeto ausente: nenhum evento desejado (como em desired_events)
+            desired = (
+                ProjectLocationCalendarService.build_desired_events(source, source.location_name, source.project_name)
+                if source.location_name is not None and source.project_name is not None else {}
+            )
+            current = {}
+            for event in existing.get(source.id, []):
+                if event.event_type in desired and event.event_type not in current:
+                    current[event.event_type] = event
+                else:
+                    deletes.append(event.id)
+
+            for event_type, data in desired.items():
+                event = current.get(event_type)
+                if event is None:
+                    inserts.append({
+                        **data,
+                        "event_type": event_type,
+                        "status": EventStatus.SCHEDULED,
+                        "project_location_id": source.id,
+                        "span_days": _span_days(data),
+                    })
+                elif any(getattr(event, field) != data[field] for field in SYNCED_FIELDS):
+                    # Bulk UPDATE não passa pelos listeners do modelo: span_days e updated_at vão explícitos
+                    updates.append({
+                        "id": event.id,
+                        **{field: data[field] for field in SYNCED_FIELDS},
+                        "span_days": _span_days(data),
+                        "updated_at": now,
+                    })
+
+        if deletes:
+            self.db.execute(delete(AgendaEvent).where(AgendaEvent.id.in_(deletes)))
+        if inserts:
+            self.db.execute(insert(AgendaEvent), inserts)
+        if updates:
+            self.db.execute(update(AgendaEvent), updates)
+        self.db.commit()
+        return sources[-1].id, {
+            "locations": len(sources),
+            "inserted": len(inserts),
+            "updated": len(updates),
+            "deleted": len(deletes),
+        }
+
+    def regenerate(
+        self,
+        after_id: int = 0,
+        chunk_size: int = CALENDAR_REGENERATION_CHUNK,
+        on_chunk: Optional[Callable[[int, Dict[str, int]], None]] = None,
+    ) -> Dict[str, int]:
+        """Percorre todas as locações com id > after_id; `on_chunk(último_id, contagens)` após cada commit"""
+        totals = {"locations": 0, "inserted": 0, "updated": 0, "deleted": 0, "last_project_location_id": after_id}
+        while True:
+            last_id, counts = self.regenerate_chunk(after_id, chunk_size)
+            if last_id is None:
+                return totals
+            for key, value in counts.items():
+                totals[key] += value
+            totals["last_project_location_id"] = after_id = last_id
+            if on_chunk:
+                on_chunk(last_id, counts)
+
+
+def run_calendar_regeneration(job: Job, bind, after_id: int = 0, chunk_size: int = CALENDAR_REGENERATION_CHUNK):
+    """Tarefa em segundo plano com sessão própria; o checkpoint fica no resultado parcial da tarefa"""
+    db = Session(bind=bind)
+    try:
+        service = CalendarRegenerationService(db)
+        job_registry.start(job, total=service.count(after_id), message="Regenerando eventos do calendário")
+        job_registry.checkpoint(job, last_project_location_id=after_id)
+
+        def on_chunk(last_id: int, counts: Dict[str, int]):
+            job_registry.checkpoint(job, last_project_location_id=last_id)
+            job_registry.advance(job, counts["locations"], message=f"Locações até id {last_id} sincronizadas")
+
+        result = service.regenerate(after_id, chunk_size, on_chunk)
+    finally:
+        db.close()
+    job_registry.complete(job, result=result)
@@ -0,0 +1,153 @@
+"""
+Serviço de KPIs do Dashboard
+Os indicadores são lidos do snapshot pré-calculado (kpi_snapshot) e servidos de um cache
+compartilhado pelo processo, invalidado quando os dados de origem mudam.
+A agregação ao vivo (compute_kpis) fica disponível para verificação.
+"""
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, case, func, or_, select, true
+from sqlalchemy.orm import Session
+
+from ..core.cache import SingleFlightCache, invalidate_on_write
+from ..core.events import event_broker
+from ..models.agenda_event import AgendaEvent
+from ..models.financial import FinancialMovement
+from ..models.location import Location, LocationStatus
+from ..models.project import Project, ProjectStatus
+from ..models.project_location_stage import ProjectLocationStage, StageStatus
+from ..models.user import User
+from .kpi_snapshot_service import KpiSnapshotService
+from .realtime_service import KPIS_TOPIC
+
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "30"))
+
+# Escritas nesses modelos invalidam o cache do dashboard
+# (movimentações alteram budget_spent dos projetos pelo ledger, fora do ORM)
+DASHBOARD_SOURCE_MODELS = (Project, Location, AgendaEvent, ProjectLocationStage, User, FinancialMovement)
+
+dashboard_cache = SingleFlightCache(ttl=DASHBOARD_CACHE_TTL)
+
+
+def register_dashboard_cache_hooks():
+    """Chamado por services.hooks.register_hooks"""
+    invalidate_on_write(
+        dashboard_cache,
+        DASHBOARD_SOURCE_MODELS,
+        "dashboard_cache_dirty",
+        on_invalidate=lambda: event_broker.publish(KPIS_TOPIC, "kpis.changed"),
+    )
+
+
+class DashboardService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def compute_kpis(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """Todos os KPIs do dashboard agregados ao vivo, em uma ida ao banco"""
+        today = today or date.today()
+        next_week = today + timedelta(days=7)
+        is_active = Project.status == ProjectStatus.ACTIVE
+
+        project_stats = select(
+            func.count(Project.id).label("total_projects"),
+            func.coalesce(func.sum(case((is_active, 1), else_=0)), 0).label("active_projects"),
+            func.coalesce(func.sum(case((is_active, Project.budget_total), else_=0)), 0).label("total_budget"),
+            func.coalesce(func.sum(case((is_active, Project.budget_spent), else_=0)), 0).label("budget_spent"),
+            func.coalesce(func.sum(case((and_(is_active, Project.budget_spent > Project.budget_total), 1), else_=0)), 0).label("projects_over_budget"),
+        ).subquery()
+        location_stats = select(
+            func.count(Location.id).label("total_locations"),
+            func.coalesce(func.sum(case((Location.status == LocationStatus.APPROVED, 1), else_=0)), 0).label("approved_locations"),
+        ).subquery()
+        # Eventos com início entre hoje e o sétimo dia (inclusive)
+        upcoming_events = select(func.count(AgendaEvent.id)).where(
+            AgendaEvent.start_date >= today,
+            AgendaEvent.start_date <= next_week,
+        ).scalar_subquery()
+        # Etapas não concluídas com prazo em dias anteriores a hoje
+        overdue_stages = select(func.count(ProjectLocationStage.id)).where(
+            ProjectLocationStage.planned_end_date < datetime.combine(today, time.min, tzinfo=timezone.utc),
+            or_(ProjectLocationStage.status.is_(None), ProjectLocationStage.status != StageStatus.COMPLETED),
+        ).scalar_subquery()
+        active_users = select(func.count(User.id)).where(User.is_active == True).scalar_subquery()
+
+        row = self.db.execute(
+            select(
+                project_stats,
+                location_stats,
+                upcoming_events.label("upcoming_events"),
+                overdue_stages.label("overdue_stages"),
+                active_users.label("active_users"),
+            )
+            # Subconsultas de uma linha cada: junção cruzada explícita
+            .select_from(project_stats.join(location_stats, true()))
+        ).mappings().one()
+
+        total_budget = float(row["total_budget"] or 0)
+        budget_spent = float(row["budget_spent"] or 0)
+        return {
+            "total_projects": row["total_projects"] or 0,
+            "active_projects": int(row["active_projects"] or 0),
+            "total_locations": row["total_locations"] or 0,
+            "approved_locations": int(row["approved_locations"] or 0),
+            "total_budget": total_budget,
+            "budget_spent": budget_spent,
+            "budget_remaining": total_budget - budget_spent,
+            "projects_over_budget": int(row["projects_over_budget"] or 0),
+            "upcoming_events": row["upcoming_events"] or 0,
+            "overdue_stages": row["overdue_stages"] or 0,
+            "active_users": row["active_users"] or 0,
+        }
+
+    def get_kpis(self) -> Dict[str, Any]:
+        today = date.today()
+        return dashboard_cache.get_or_compute(
+            ("kpis", today), lambda: KpiSnapshotService(self.db).dashboard_kpis(today)
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        kpis = self.get_kpis()
+        return {
+            "total_projects": kpis["total_projects"],
+            "active_projects": kpis["active_projects"],
+            "total_locations": kpis["total_locations"],
+            "approved_locations": kpis["approved_locations"],
+            "total_budget": kpis["total_budget"],
+            "budget_spent": kpis["budget_spent"],
+            "budget_remaining": kpis["budget_remaining"],
+            "upcoming_events": kpis["upcoming_events"],
+            "overdue_stages": kpis["overdue_stages"],
+            "active_users": kpis["active_users"],
+        }
+
+    def _compute_top_projects(self):
+        top_projects = self.db.query(
+            Project.id, Project.name, Project.title, Project.budget_total, Project.budget_spent
+        ).filter(
+            Project.status == ProjectStatus.ACTIVE
+        ).order_by(Project.budget_total.desc()).limit(5).all()
+        return [
+            {
+                "id": p.id,
+                "name": p.name or p.title,
+                "budget_total": float(p.budget_total or 0),
+                "budget_spent": float(p.budget_spent or 0),
+                "remaining": float((p.budget_total or 0) - (p.budget_spent or 0)),
+            }
+            for p in top_projects
+        ]
+
+    def get_financial_summary(self) -> Dict[str, Any]:
+        kpis = self.get_kpis()
+        top_projects = dashboard_cache.get_or_compute("top_projects_by_budget", self._compute_top_projects)
+        return {
+            "total_budget": kpis["total_budget"],
+            "total_spent": kpis["budget_spent"],
+            "remaining": kpis["budget_remaining"],
+            "utilization_percent": round(kpis["budget_spent"] / (kpis["total_budget"] or 1) * 100, 1),
+            "projects_over_budget": kpis["projects_over_budget"],
+            "top_projects_by_budget": top_projects,
+        }
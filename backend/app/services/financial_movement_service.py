@@ -0,0 +1,90 @@
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from datetime import datetime, timezone
+
+from ..models.financial import FinancialMovement, MovementStatus, MovementType
+from ..models.project import Project
+from ..schemas.financial_movement import FinancialMovementCreate
+
+
+class FinancialMovementService:
+    """Movimentações financeiras dos projetos e seu fluxo de aprovação"""
+
+    # Status de origem permitidos em cada transição
+    TRANSITIONS = {
+        MovementStatus.APPROVED: (MovementStatus.PENDING,),
+        MovementStatus.REJECTED: (MovementStatus.PENDING,),
+        MovementStatus.CANCELLED: (MovementStatus.PENDING, MovementStatus.APPROVED),
+    }
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create_movement(self, movement_data: FinancialMovementCreate, user_id: int) -> FinancialMovement:
+        if not self.db.get(Project, movement_data.project_id):
+            raise ValueError(f"Projeto {movement_data.project_id} não encontrado")
+        movement = FinancialMovement(
+            **movement_data.model_dump(),
+            user_id=user_id,
+            status=MovementStatus.PENDING,
+        )
+        self.db.add(movement)
+        self.db.commit()
+        self.db.refresh(movement)
+        return movement
+
+    def get_movement(self, movement_id: int) -> Optional[FinancialMovement]:
+        return self.db.get(FinancialMovement, movement_id)
+
+    def get_movements(
+        self,
+        skip: int = 0,
+        limit: int = 50,
+        project_id: Optional[int] = None,
+        location_id: Optional[int] = None,
+        movement_type: Optional[MovementType] = None,
+        status: Optional[MovementStatus] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ) -> Tuple[List[FinancialMovement], int]:
+        query = self.db.query(FinancialMovement)
+        if project_id:
+            query = query.filter(FinancialMovement.project_id == project_id)
+        if location_id:
+            query = query.filter(FinancialMovement.location_id == location_id)
+        if movement_type:
+            query = query.filter(FinancialMovement.movement_type == movement_type)
+        if status:
+            query = query.filter(FinancialMovement.status == status)
+        if date_from:
+            query = query.filter(FinancialMovement.movement_date >= date_from)
+        if date_to:
+            query = query.filter(FinancialMovement.movement_date <= date_to)
+
+        total = query.count()
+        movements = query.order_by(FinancialMovement.movement_date.desc()).offset(skip).limit(limit).all()
+        return movements, total
+
+    def _transition(self, movement_id: int, target: MovementStatus, user_id: int) -> Optional[FinancialMovement]:
+        # Linha travada até o commit: aprovações/cancelamentos simultâneos não aplicam o delta do ledger duas vezes
+        movement = self.db.get(FinancialMovement, movement_id, with_for_update=True, populate_existing=True)
+        if not movement:
+            return None
+        if movement.status not in self.TRANSITIONS[target]:
+            raise ValueError(f"Movimento com status '{movement.status.value}' não pode passar para '{target.value}'")
+        movement.status = target
+        if target == MovementStatus.APPROVED:
+            movement.approved_at = datetime.now(timezone.utc)
+            movement.approved_by = user_id
+        self.db.commit()
+        self.db.refresh(movement)
+        return movement
+
+    def approve_movement(self, movement_id: int, user_id: int) -> Optional[FinancialMovement]:
+        return self._transition(movement_id, MovementStatus.APPROVED, user_id)
+
+    def reject_movement(self, movement_id: int, user_id: int) -> Optional[FinancialMovement]:
+        return self._transition(movement_id, MovementStatus.REJECTED, user_id)
+
+    def cancel_movement(self, movement_id: int, user_id: int) -> Optional[FinancialMovement]:
+        return self._transition(movement_id, MovementStatus.CANCELLED, user_id)
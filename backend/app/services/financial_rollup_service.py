@@ -0,0 +1,355 @@
+"""
+Rollups diários e mensais das movimentações financeiras
+Hooks de flush convertem cada inclusão/aprovação/cancelamento de FinancialMovement em deltas
+(quantidade e valor convertido) nos baldes do dia e do mês, na mesma transação da escrita.
+As séries por período leem só os rollups: o custo depende do número de baldes, não de movimentos.
+"""
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from ..core.flush_tracking import Contribution, FlushDeltaTracker, upsert_increment
+from ..core.jobs import Job, job_registry, periodic_scheduler
+from ..models.financial import FinancialMovement, MovementStatus, MovementType
+from ..models.financial_rollup import FinancialRollupDaily, FinancialRollupMonthly
+from ..models.kpi_snapshot import KpiSnapshot
+from .kpi_snapshot_service import META_METRIC, mark_stale
+
+# Moeda em que os valores dos rollups são expressos (amount * exchange_rate)
+BASE_CURRENCY = os.getenv("FINANCIAL_BASE_CURRENCY", "BRL")
+
+# Intervalo do recálculo periódico em segundos (0 desativa)
+FINANCIAL_ROLLUP_REBUILD_INTERVAL = float(os.getenv("FINANCIAL_ROLLUP_REBUILD_INTERVAL", "3600"))
+FINANCIAL_ROLLUP_REBUILD_JOB = "financial_rollup_rebuild"
+
+# Linha de controle em kpi_snapshot: valor > 0 antecipa o recálculo periódico dos rollups
+ROLLUP_STALE_DIMENSION = "financial_rollups_stale"
+
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+GRANULARITIES = (DAY, WEEK, MONTH)
+
+# Dimensão -> coluna dos rollups usada para separar as séries
+GROUP_COLUMNS = {
+    "project": "project_id",
+    "location": "location_id",
+    "movement_type": "movement_type",
+    "status": "status",
+}
+
+_KEY_COLUMNS = ("project_id", "location_id", "movement_type", "status", "bucket")
+_VALUE_COLUMNS = ("movement_count", "amount")
+
+
+def converted_amount(amount: Optional[float], exchange_rate: Optional[float]) -> float:
+    """Valor na moeda base (sem taxa de câmbio informada, o valor já está na moeda base)"""
+    return float(amount or 0) * (exchange_rate or 1)
+
+
+def converted_amount_expression():
+    """Equivalente SQL de converted_amount"""
+    return FinancialMovement.amount * func.coalesce(func.nullif(FinancialMovement.exchange_rate, 0), 1)
+
+
+def day_bucket(value: Any) -> Optional[date]:
+    """Dia (UTC) de uma data/hora do movimento"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.date()
+    return value
+
+
+def month_bucket(day: date) -> date:
+    return day.replace(day=1)
+
+
+def week_bucket(day: date) -> date:
+    """Segunda-feira da semana ISO"""
+    return day - timedelta(days=day.weekday())
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _enum_value(value: Any) -> str:
+    return value.value if hasattr(value, "value") else str(value)
+
+
+# ===== Manutenção incremental =====
+
+def _movement_contributions(v: Dict[str, Any]) -> Iterator[Contribution]:
+    day = day_bucket(v["movement_date"])
+    if day is None or v["project_id"] is None:
+        return
+    key = (
+        v["project_id"],
+        v["location_id"] or 0,
+        _enum_value(v["movement_type"]),
+        _enum_value(v["status"] or MovementStatus.PENDING),
+    )
+    value = (1, converted_amount(v["amount"], v["exchange_rate"]))
+    yield (DAY, *key, day), value
+    yield (MONTH, *key, month_bucket(day)), value
+
+
+TRACKED_FIELDS = ("project_id", "location_id", "movement_type", "status", "amount", "exchange_rate", "movement_date")
+
+
+def apply_deltas(connection, deltas: Dict[Tuple, Tuple[int, float]]):
+    """Soma os deltas nos baldes diários e mensais (upsert na mesma transação da escrita)"""
+    rows: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for (granularity, *key), (count, amount) in deltas.items():
+        rows[granularity].append({**dict(zip(_KEY_COLUMNS, key)), "movement_count": count, "amount": amount})
+    upsert_increment(connection, FinancialRollupDaily.__table__, _KEY_COLUMNS, _VALUE_COLUMNS, rows[DAY])
+    upsert_increment(connection, FinancialRollupMonthly.__table__, _KEY_COLUMNS, _VALUE_COLUMNS, rows[MONTH])
+
+
+def mark_rollups_stale(connection):
+    mark_stale(connection, ROLLUP_STALE_DIMENSION)
+
+
+financial_rollup_tracker = FlushDeltaTracker(
+    "financial_rollup",
+    {FinancialMovement: (TRACKED_FIELDS, _movement_contributions)},
+    apply_deltas,
+    mark_rollups_stale,
+)  # Registrado por services.hooks.register_hooks
+
+
+class FinancialRollupService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    # ----- Recálculo completo -----
+
+    def compute_daily(self) -> Dict[Tuple, Tuple[int, float]]:
+        """
+        Baldes diários recalculados a partir das movimentações (uma consulta agrupada).
+        O dia sai de day_bucket, como no caminho incremental: date() no banco usaria o fuso da sessão.
+        """
+        rows = self.db.execute(
+            select(
+                FinancialMovement.project_id,
+                func.coalesce(FinancialMovement.location_id, 0),
+                FinancialMovement.movement_type,
+                FinancialMovement.status,
+                FinancialMovement.movement_date,
+                func.count(FinancialMovement.id),
+                func.coalesce(func.sum(converted_amount_expression()), 0),
+            ).group_by(
+                FinancialMovement.project_id,
+                func.coalesce(FinancialMovement.location_id, 0),
+                FinancialMovement.movement_type,
+                FinancialMovement.status,
+                FinancialMovement.movement_date,
+            )
+        )
+        daily: Dict[Tuple, List[float]] = defaultdict(lambda: [0, 0.0])
+        for project_id, location_id, movement_type, status, moment, count, amount in rows:
+            totals = daily[(project_id, location_id, _enum_value(movement_type), _enum_value(status or MovementStatus.PENDING), day_bucket(moment))]
+            totals[0] += count
+            totals[1] += float(amount)
+        return {key: (count, amount) for key, (count, amount) in daily.items()}
+
+    def rebuild(self) -> Dict[str, Any]:
+        """
+        Substitui os rollups pelos valores recalculados e retorna os desvios dos baldes diários.
+        Os mensais são somados a partir dos diários, sem nova leitura das movimentações.
+        """
+        daily = self.compute_daily()
+        monthly: Dict[Tuple, List[float]] = defaultdict(lambda: [0, 0.0])
+        for (*key, bucket), (count, amount) in daily.items():
+            totals = monthly[(*key, month_bucket(bucket))]
+            totals[0] += count
+            totals[1] += amount
+
+        table = FinancialRollupDaily.__table__
+        current = {
+            tuple(row[:5]): (row.movement_count, row.amount)
+            for row in self.db.execute(select(*[table.c[name] for name in _KEY_COLUMNS + _VALUE_COLUMNS]))
+        }
+        drift = [
+            key for key in set(daily) | set(current)
+            if daily.get(key, (0, 0.0))[0] != current.get(key, (0, 0.0))[0]
+            or abs(daily.get(key, (0, 0.0))[1] - current.get(key, (0, 0.0))[1]) > 1e-6
+        ]
+
+        def to_rows(buckets):
+            return [
+                {**dict(zip(_KEY_COLUMNS, key)), "movement_count": int(count), "amount": amount}
+                for key, (count, amount) in buckets.items()
+                if count
+            ]
+
+        self.db.execute(delete(FinancialRollupDaily))
+        self.db.execute(delete(FinancialRollupMonthly))
+        daily_rows, monthly_rows = to_rows(daily), to_rows(monthly)
+        if daily_rows:
+            self.db.execute(insert(FinancialRollupDaily), daily_rows)
+            self.db.execute(insert(FinancialRollupMonthly), monthly_rows)
+        self.db.execute(delete(KpiSnapshot).where(
+            KpiSnapshot.metric == META_METRIC, KpiSnapshot.dimension == ROLLUP_STALE_DIMENSION
+        ))
+        self.db.execute(insert(KpiSnapshot).values(metric=META_METRIC, dimension=ROLLUP_STALE_DIMENSION, value=0))
+        self.db.commit()
+
+        if drift:
+            print(f"⚠️ Rollups financeiros recalculados com {len(drift)} desvios")
+        return {"daily_buckets": len(daily_rows), "monthly_buckets": len(monthly_rows), "drift": len(drift)}
+
+    def ensure_fresh(self):
+        """
+        Rollups nunca montados ou marcados (escrita em massa): antecipa o recálculo periódico,
+        que roda com sessão própria; a leitura segue com os baldes gravados.
+        """
+        stale = self.db.execute(
+            select(KpiSnapshot.value).where(
+                KpiSnapshot.metric == META_METRIC, KpiSnapshot.dimension == ROLLUP_STALE_DIMENSION
+            )
+        ).scalar()
+        if stale is None or stale > 0:
+            periodic_scheduler.trigger(FINANCIAL_ROLLUP_REBUILD_JOB)
+
+    # ----- Séries -----
+
+    def _bucket_totals(
+        self,
+        model,
+        start: date,
+        end: date,
+        filters: List[Any],
+        group_column: Optional[str],
+    ) -> List[Tuple[Any, date, int, float]]:
+        """(grupo, balde, quantidade, valor) somados por balde no intervalo [start, end]"""
+        if start > end:
+            return []
+        group = getattr(model, group_column) if group_column else None
+        columns = [model.bucket, func.sum(model.movement_count), func.sum(model.amount)]
+        group_by = [model.bucket]
+        if group is not None:
+            columns.insert(0, group)
+            group_by.insert(0, group)
+        rows = self.db.execute(
+            select(*columns).where(model.bucket >= start, model.bucket <= end, *filters).group_by(*group_by)
+        )
+        if group is None:
+            return [(None, bucket, int(count or 0), float(amount or 0)) for bucket, count, amount in rows]
+        return [(key, bucket, int(count or 0), float(amount or 0)) for key, bucket, count, amount in rows]
+
+    def series(
+        self,
+        start: date,
+        end: date,
+        granularity: str = MONTH,
+        project_id: Optional[int] = None,
+        location_id: Optional[int] = None,
+        movement_type: Optional[MovementType] = None,
+        status: Optional[MovementStatus] = MovementStatus.APPROVED,
+        group_by: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Série temporal (quantidade e valor na moeda base) entre start e end, inclusive.
+        Meses inteiros vêm do rollup mensal; as pontas parciais e as semanas, do diário.
+        Baldes sem movimentação aparecem com zero.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Granularidade inválida: {granularity}")
+        if group_by is not None and group_by not in GROUP_COLUMNS:
+            raise ValueError(f"Agrupamento inválido: {group_by}")
+        if start > end:
+            raise ValueError("A data inicial deve ser anterior à final")
+        self.ensure_fresh()
+
+        def filters_for(model):
+            filters = []
+            if project_id is not None:
+                filters.append(model.project_id == project_id)
+            if location_id is not None:
+                filters.append(model.location_id == location_id)
+            if movement_type is not None:
+                filters.append(model.movement_type == movement_type.value)
+            if status is not None:
+                filters.append(model.status == status.value)
+            return filters
+
+        group_column = GROUP_COLUMNS.get(group_by) if group_by else None
+        rows: List[Tuple[Any, date, int, float]] = []
+        if granularity == MONTH:
+            first_full = start if start.day == 1 else _next_month(start)
+            after_last_full = _next_month(end) if (end + timedelta(days=1)).day == 1 else month_bucket(end)
+            if first_full < after_last_full:
+                rows += self._bucket_totals(
+                    FinancialRollupMonthly, first_full, after_last_full - timedelta(days=1),
+                    filters_for(FinancialRollupMonthly), group_column,
+                )
+                rows += self._bucket_totals(
+                    FinancialRollupDaily, start, first_full - timedelta(days=1),
+                    filters_for(FinancialRollupDaily), group_column,
+                )
+                rows += self._bucket_totals(
+                    FinancialRollupDaily, after_last_full, end, filters_for(FinancialRollupDaily), group_column,
+                )
+            else:
+                rows += self._bucket_totals(FinancialRollupDaily, start, end, filters_for(FinancialRollupDaily), group_column)
+        else:
+            rows += self._bucket_totals(FinancialRollupDaily, start, end, filters_for(FinancialRollupDaily), group_column)
+
+        fold = {DAY: lambda d: d, WEEK: week_bucket, MONTH: month_bucket}[granularity]
+        buckets = []
+        cursor = fold(start)
+        while cursor <= end:
+            buckets.append(cursor)
+            cursor = {DAY: cursor + timedelta(days=1), WEEK: cursor + timedelta(days=7), MONTH: _next_month(cursor)}[granularity]
+
+        # Sem agrupamento a série única existe mesmo sem movimentação (baldes zerados)
+        totals: Dict[Any, Dict[date, List[float]]] = {None: {b: [0, 0.0] for b in buckets}} if group_by is None else {}
+        for key, bucket, count, amount in rows:
+            if key not in totals:
+                totals[key] = {b: [0, 0.0] for b in buckets}
+            point = totals[key][fold(day_bucket(bucket))]
+            point[0] += count
+            point[1] += amount
+
+        series = []
+        for key in sorted(totals, key=lambda k: (k is None, str(k))):
+            points = [
+                {"bucket": bucket.isoformat(), "count": int(count), "amount": round(amount, 2)}
+                for bucket, (count, amount) in totals[key].items()
+            ]
+            series.append({
+                "key": key,
+                "total_count": sum(p["count"] for p in points),
+                "total_amount": round(sum(p["amount"] for p in points), 2),
+                "points": points,
+            })
+        return {
+            "granularity": granularity,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "currency": BASE_CURRENCY,
+            "group_by": group_by,
+            "series": series,
+        }
+
+
+def run_financial_rollup_rebuild(job: Job, bind):
+    """Tarefa periódica: recalcula os rollups com uma sessão própria"""
+    job_registry.start(job, total=1, message="Recalculando rollups financeiros")
+    db = Session(bind=bind)
+    try:
+        result = FinancialRollupService(db).rebuild()
+    finally:
+        db.close()
+    job_registry.advance(job)
+    job_registry.complete(job, result=result)
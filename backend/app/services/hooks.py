@@ -0,0 +1,44 @@
+"""
+Registro explícito dos hooks de sessão que mantêm dados derivados: os persistidos (snapshot de
+KPIs, valor gasto pelo ledger, rollups financeiros, progresso das etapas, atrasos) e os caches do
+processo (dashboard, estatísticas de locações, cubo de análise, feeds ICS, índice de reservas)
+e avisos em tempo real.
+Toda entrada que grava no banco (API, scripts, tarefas) chama register_hooks() uma vez antes de
+abrir sessões; importar um serviço não registra nada por efeito colateral.
+"""
+import threading
+
+_registered = False
+_lock = threading.Lock()
+
+
+def register_hooks():
+    """Registra os hooks uma única vez por processo (chamadas repetidas não fazem nada)"""
+    global _registered
+    with _lock:
+        if _registered:
+            return
+        from .analytics_cube_service import register_analytics_cube_hooks
+        from .booking_conflict_service import register_booking_index_hooks
+        from .budget_ledger_service import budget_ledger_tracker
+        from .dashboard_service import register_dashboard_cache_hooks
+        from .financial_rollup_service import financial_rollup_tracker
+        from .ics_feed_service import register_ics_feed_hooks
+        from .kpi_snapshot_service import kpi_snapshot_tracker
+        from .location_stats_service import register_location_stats_hooks
+        from .overdue_service import register_overdue_hooks
+        from .realtime_service import register_realtime_hooks
+        from .stage_progress_service import register_stage_progress_hooks
+
+        kpi_snapshot_tracker.listen()
+        budget_ledger_tracker.listen()
+        financial_rollup_tracker.listen()
+        register_stage_progress_hooks()
+        register_overdue_hooks()
+        register_dashboard_cache_hooks()
+        register_location_stats_hooks()
+        register_analytics_cube_hooks()
+        register_ics_feed_hooks()
+        register_booking_index_hooks()
+        register_realtime_hooks()
+        _registered = True
@@ -0,0 +1,426 @@
+"""
+Feeds iCalendar (ICS) da agenda por usuário e por projeto
+Tokens assinados (HMAC) identificam o feed sem sessão; o acesso aos projetos (UserProject)
+é conferido a cada geração. Cada VEVENT serializado fica em cache por evento e cada feed guarda
+o corpo pronto com ETag forte: escritas confirmadas em AgendaEvent descartam só os eventos
+tocados e avançam a versão dos projetos afetados, então polls sem mudança viram 304 sem
+consultar os eventos.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from ..core.auth import SECRET_KEY
+from ..models.agenda_event import AgendaEvent, EventStatus
+from ..models.user import User, UserRole
+from ..models.user_project import UserProject
+from .agenda_event_service import OCCURRENCE_FIELDS, override_value, overlapping_window, series_window
+
+ICS_FEED_SECRET = os.getenv("ICS_FEED_SECRET", SECRET_KEY)
+# Eventos encerrados há mais tempo que isso ficam fora do feed
+ICS_FEED_PAST_DAYS = int(os.getenv("ICS_FEED_PAST_DAYS", "90"))
+# Escritas de outros processos não chegam pelos hooks: o feed é remontado depois desse tempo
+ICS_FEED_MAX_AGE = float(os.getenv("ICS_FEED_MAX_AGE", "300"))
+
+USER_FEED = "u"
+PROJECT_FEED = "p"
+# Versão de "todos os projetos" (feeds de administradores e eventos sem projeto)
+ALL_PROJECTS = 0
+
+_TOUCHED_EVENTS = "ics_feed_touched_events"
+_TOUCHED_PROJECTS = "ics_feed_touched_projects"
+_TOUCHED_MEMBERSHIPS = "ics_feed_touched_memberships"
+
+
+# ===== Tokens =====
+
+def _signature(payload: str) -> str:
+    digest = hmac.new(ICS_FEED_SECRET.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode()
+
+
+def feed_token(kind: str, user_id: int, project_id: Optional[int] = None) -> str:
+    payload = f"{kind}.{user_id}" + (f".{project_id}" if project_id is not None else "")
+    return f"{payload}.{_signature(payload)}"
+
+
+def parse_feed_token(token: str) -> Optional[Tuple[str, int, Optional[int]]]:
+    """(tipo, usuário, projeto) de um token válido; None se a assinatura não conferir"""
+    payload, _, signature = token.rpartition(".")
+    if not payload or not hmac.compare_digest(signature, _signature(payload)):
+        return None
+    parts = payload.split(".")
+    try:
+        if parts[0] == USER_FEED and len(parts) == 2:
+            return USER_FEED, int(parts[1]), None
+        if parts[0] == PROJECT_FEED and len(parts) == 3:
+            return PROJECT_FEED, int(parts[1]), int(parts[2])
+    except ValueError:
+        return None
+    return None
+
+
+# ===== Serialização =====
+
+def _escape(text: str) -> str:
+    return (text or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+
+def _fold(line: str) -> str:
+    """Quebra linhas em 75 octetos (RFC 5545 §3.1)"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    chunks, current = [], b""
+    for char in line:
+        piece = char.encode("utf-8")
+        if len(current) + len(piece) > (75 if not chunks else 74):
+            chunks.append(current.decode("utf-8"))
+            current = b""
+        current += piece
+    chunks.append(current.decode("utf-8"))
+    return "\r\n ".join(chunks)
+
+
+def _utc_stamp(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _moment(value: datetime) -> str:
+    # Horário sem fuso é "flutuante": o cliente mostra no fuso local
+    return _utc_stamp(value) if value.tzinfo else value.strftime("%Y%m%dT%H%M%S")
+
+
+def _timed(row: Dict[str, Any]) -> bool:
+    return bool(row["start_at"]) and not row["all_day"]
+
+
+def _day_value(row: Dict[str, Any], name: str, day: date) -> str:
+    """Propriedade de data de uma ocorrência (EXDATE/RECURRENCE-ID) no mesmo tipo do DTSTART"""
+    if _timed(row):
+        return f"{name}:{_moment(datetime.combine(day, row['start_at'].timetz()))}"
+    return f"{name};VALUE=DATE:{day.strftime('%Y%m%d')}"
+
+
+def _occurrence_row(row: Dict[str, Any], day: date, override: Dict[str, Any]) -> Dict[str, Any]:
+    """Linha da série deslocada para a ocorrência `day` com os campos sobrescritos"""
+    shift = day - row["start_date"]
+    occurrence = dict(row, start_date=day)
+    for field in ("end_date", "start_at", "end_at"):
+        if occurrence[field] is not None:
+            occurrence[field] = occurrence[field] + shift
+    for field, value in override.items():
+        if field in OCCURRENCE_FIELDS and field in occurrence:
+            occurrence[field] = override_value(field, value)
+    return occurrence
+
+
+def serialize_event(row: Dict[str, Any]) -> str:
+    """VEVENT do evento; séries levam RRULE/EXDATE e um VEVENT com RECURRENCE-ID por ocorrência alterada"""
+    text = _vevent(row)
+    if row.get("recurrence_rule"):
+        exceptions = set(row["recurrence_exceptions"] or [])
+        for key, override in sorted((row["recurrence_overrides"] or {}).items()):
+            if key not in exceptions:
+                day = date.fromisoformat(key)
+                # RECURRENCE-ID aponta o horário original da ocorrência, não o sobrescrito
+                text += _vevent(_occurrence_row(row, day, override), _day_value(row, "RECURRENCE-ID", day))
+    return text
+
+
+def _vevent(row: Dict[str, Any], recurrence_id: Optional[str] = None) -> str:
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:agenda-event-{row['id']}@cinema-erp",
+        f"DTSTAMP:{_utc_stamp(row['updated_at'] or datetime.now(timezone.utc))}",
+    ]
+    if _timed(row):
+        lines.append(f"DTSTART:{_moment(row['start_at'])}")
+        if row["end_at"]:
+            lines.append(f"DTEND:{_moment(row['end_at'])}")
+    else:
+        # DTEND de eventos de dia inteiro é exclusivo
+        last_day = row["end_date"] or row["start_date"]
+        lines.append(f"DTSTART;VALUE=DATE:{row['start_date'].strftime('%Y%m%d')}")
+        lines.append(f"DTEND;VALUE=DATE:{(last_day + timedelta(days=1)).strftime('%Y%m%d')}")
+    if recurrence_id is not None:
+        lines.append(recurrence_id)
+    elif row.get("recurrence_rule"):
+        lines.append(f"RRULE:{row['recurrence_rule']}")
+        for key in row["recurrence_exceptions"] or []:
+            lines.append(_day_value(row, "EXDATE", date.fromisoformat(key)))
+    lines.append(f"SUMMARY:{_escape(row['title'])}")
+    if row["description"]:
+        lines.append(f"DESCRIPTION:{_escape(row['description'])}")
+    status = row["status"]
+    lines.append("STATUS:" + ("CANCELLED" if status == EventStatus.CANCELLED else "CONFIRMED"))
+    if row["updated_at"]:
+        lines.append(f"LAST-MODIFIED:{_utc_stamp(row['updated_at'])}")
+    lines.append("END:VEVENT")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
+
+
+def _calendar(name: str, vevents: Iterable[str]) -> str:
+    header = "\r\n".join([
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Cinema ERP//Agenda//PT-BR",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        _fold(f"X-WR-CALNAME:{_escape(name)}"),
+    ]) + "\r\n"
+    return header + "".join(vevents) + "END:VCALENDAR\r\n"
+
+
+# ===== Caches =====
+
+class IcsFeedCache:
+    """VEVENTs por evento, versões por projeto e corpos prontos por feed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.vevents: Dict[int, Tuple[Any, str]] = {}
+        self.project_versions: Dict[int, int] = defaultdict(int)
+        self.membership_versions: Dict[int, int] = defaultdict(int)
+        # feed -> (versões vistas, corpo, etag, last_modified, montado_em)
+        self.feeds: Dict[str, Tuple[Any, str, str, datetime, float]] = {}
+        self.serialized = 0
+
+    def touch(self, event_ids: Iterable[int], project_ids: Iterable[Optional[int]], user_ids: Iterable[int] = ()):
+        with self._lock:
+            for event_id in event_ids:
+                self.vevents.pop(event_id, None)
+            self.project_versions[ALL_PROJECTS] += 1
+            for project_id in project_ids:
+                if project_id:
+                    self.project_versions[project_id] += 1
+            for user_id in user_ids:
+                self.membership_versions[user_id] += 1
+
+    def clear(self):
+        with self._lock:
+            self.vevents.clear()
+            self.feeds.clear()
+
+    def versions(self, project_ids: Optional[List[int]], user_id: int) -> Tuple:
+        with self._lock:
+            projects = (
+                (self.project_versions[ALL_PROJECTS],) if project_ids is None
+                else tuple(self.project_versions[p] for p in project_ids)
+            )
+            return projects, self.membership_versions[user_id]
+
+    def cached_feed(self, key: str, versions: Tuple) -> Optional[Tuple[str, str, datetime]]:
+        with self._lock:
+            entry = self.feeds.get(key)
+            if entry and entry[0] == versions and time.monotonic() - entry[4] < ICS_FEED_MAX_AGE:
+                return entry[1], entry[2], entry[3]
+        return None
+
+    def previous_feed(self, key: str) -> Optional[Tuple[str, datetime]]:
+        """(etag, last_modified) do último corpo montado para o feed, mesmo vencido"""
+        with self._lock:
+            entry = self.feeds.get(key)
+        return (entry[2], entry[3]) if entry else None
+
+    def store_feed(self, key: str, versions: Tuple, body: str, etag: str, last_modified: datetime):
+        with self._lock:
+            self.feeds[key] = (versions, body, etag, last_modified, time.monotonic())
+
+    def vevent(self, row: Dict[str, Any]) -> str:
+        with self._lock:
+            cached = self.vevents.get(row["id"])
+        if cached and cached[0] == row["updated_at"]:
+            return cached[1]
+        text = serialize_event(row)
+        with self._lock:
+            self.vevents[row["id"]] = (row["updated_at"], text)
+            self.serialized += 1
+        return text
+
+
+ics_feed_cache = IcsFeedCache()
+
+
+# ===== Hooks de escrita =====
+
+def _collect_previous_projects(session, flush_context, instances):
+    # Evento movido de projeto: o feed do projeto anterior também muda
+    touched = session.info.setdefault(_TOUCHED_PROJECTS, set())
+    for obj in session.dirty:
+        if isinstance(obj, AgendaEvent):
+            touched.update(inspect(obj).attrs.project_id.history.deleted or ())
+
+
+def _collect_touched(session, flush_context):
+    events = session.info.setdefault(_TOUCHED_EVENTS, set())
+    projects = session.info.setdefault(_TOUCHED_PROJECTS, set())
+    memberships = session.info.setdefault(_TOUCHED_MEMBERSHIPS, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, AgendaEvent):
+            events.add(obj.id)
+            projects.add(obj.project_id)
+        elif isinstance(obj, UserProject):
+            memberships.add(obj.user_id)
+        elif isinstance(obj, User):
+            # Papel (admin) ou desativação mudam o escopo do feed do usuário
+            memberships.add(obj.id)
+
+
+def _clear_on_bulk_dml(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (AgendaEvent, UserProject, User):
+        orm_execute_state.session.info[_TOUCHED_EVENTS + "_bulk"] = True
+
+
+def _apply_touched(session):
+    events = session.info.pop(_TOUCHED_EVENTS, set())
+    projects = session.info.pop(_TOUCHED_PROJECTS, set())
+    memberships = session.info.pop(_TOUCHED_MEMBERSHIPS, set())
+    if session.info.pop(_TOUCHED_EVENTS + "_bulk", False):
+        # Escrita em massa não diz o que mudou: todos os feeds e VEVENTs são refeitos
+        ics_feed_cache.clear()
+    elif events or memberships:
+        ics_feed_cache.touch(events, projects, memberships)
+
+
+def _discard_touched(session):
+    for key in (_TOUCHED_EVENTS, _TOUCHED_PROJECTS, _TOUCHED_MEMBERSHIPS, _TOUCHED_EVENTS + "_bulk"):
+        session.info.pop(key, None)
+
+
+def register_ics_feed_hooks():
+    """Chamado por services.hooks.register_hooks"""
+    event.listen(Session, "before_flush", _collect_previous_projects)
+    event.listen(Session, "after_flush", _collect_touched)
+    event.listen(Session, "do_orm_execute", _clear_on_bulk_dml)
+    event.listen(Session, "after_commit", _apply_touched)
+    event.listen(Session, "after_rollback", _discard_touched)
+
+
+# ===== Serviço =====
+
+EVENT_COLUMNS = (
+    AgendaEvent.id, AgendaEvent.title, AgendaEvent.description, AgendaEvent.status,
+    AgendaEvent.start_date, AgendaEvent.end_date, AgendaEvent.start_at, AgendaEvent.end_at,
+    AgendaEvent.all_day, AgendaEvent.updated_at,
+    AgendaEvent.recurrence_rule, AgendaEvent.recurrence_exceptions, AgendaEvent.recurrence_overrides,
+)
+
+
+class IcsFeed:
+    def __init__(self, body: str, etag: str, last_modified: datetime):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def last_modified_header(self) -> str:
+        return format_datetime(self.last_modified.astimezone(timezone.utc), usegmt=True)
+
+    def not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        if if_none_match is not None:
+            return self.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return self.last_modified.replace(microsecond=0) <= since
+        return False
+
+
+class IcsFeedService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def feed_urls(self, user: User, base_url: str = "") -> Dict[str, Any]:
+        """URLs de assinatura do usuário: feed geral e um por projeto acessível"""
+        project_ids = self.accessible_projects(user)
+        return {
+            "user": f"{base_url}/api/v1/agenda-events/feeds/{feed_token(USER_FEED, user.id)}.ics",
+            "projects": {
+                project_id: f"{base_url}/api/v1/agenda-events/feeds/{feed_token(PROJECT_FEED, user.id, project_id)}.ics"
+                for project_id in (project_ids or [])
+            },
+        }
+
+    def accessible_projects(self, user: User) -> Optional[List[int]]:
+        """Projetos do usuário via UserProject; None = todos (administradores)"""
+        if user.role == UserRole.ADMIN:
+            return None
+        return sorted(self.db.execute(
+            select(UserProject.project_id).where(UserProject.user_id == user.id)
+        ).scalars())
+
+    def get_feed(self, token: str, today: Optional[date] = None) -> Optional[IcsFeed]:
+        """Feed do token; None para token inválido, usuário inativo ou projeto sem acesso"""
+        parsed = parse_feed_token(token)
+        if parsed is None:
+            return None
+        kind, user_id, project_id = parsed
+        user = self.db.get(User, user_id)
+        if not user or not user.is_active:
+            return None
+        accessible = self.accessible_projects(user)
+        if kind == PROJECT_FEED:
+            if accessible is not None and project_id not in accessible:
+                return None
+            scope = [project_id]
+        else:
+            scope = accessible
+
+        versions = ics_feed_cache.versions(scope, user_id)
+        cached = ics_feed_cache.cached_feed(token, versions)
+        if cached:
+            return IcsFeed(*cached)
+
+        rows = self._rows(scope, today or date.today())
+        vevents = [ics_feed_cache.vevent(row) for row in rows]
+        name = f"Agenda - projeto {project_id}" if kind == PROJECT_FEED else f"Agenda - {user.full_name}"
+        body = _calendar(name, vevents)
+        etag = '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+        # max(updated_at) não avança quando um evento é excluído ou sai do escopo: o corpo mudou,
+        # vale o horário da montagem (monotônico por feed); corpo igual mantém o anterior
+        previous = ics_feed_cache.previous_feed(token)
+        if previous and previous[0] == etag:
+            last_modified = previous[1]
+        else:
+            stamps = [
+                stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc)
+                for stamp in (row["updated_at"] for row in rows) if stamp
+            ]
+            if previous:
+                # Cabeçalho HTTP tem resolução de segundos: o novo valor precisa superar o anterior
+                stamps.append(previous[1].replace(microsecond=0) + timedelta(seconds=1))
+            last_modified = max([datetime.now(timezone.utc), *stamps])
+        ics_feed_cache.store_feed(token, versions, body, etag, last_modified)
+        return IcsFeed(body, etag, last_modified)
+
+    def _rows(self, project_ids: Optional[List[int]], today: date) -> List[Dict[str, Any]]:
+        if project_ids is not None and not project_ids:
+            return []
+        since = today - timedelta(days=ICS_FEED_PAST_DAYS)
+        # Séries vão inteiras (RRULE): o cliente de calendário expande as ocorrências
+        query = select(*EVENT_COLUMNS).where(or_(
+            overlapping_window(since, date.max),
+            series_window(since, date.max),
+        ))
+        if project_ids is not None:
+            query = query.where(AgendaEvent.project_id.in_(project_ids))
+        query = query.order_by(AgendaEvent.start_date, AgendaEvent.id)
+        return [dict(row._mapping) for row in self.db.execute(query)]
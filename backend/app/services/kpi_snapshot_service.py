@@ -0,0 +1,300 @@
+"""
+Snapshot de KPIs mantido incrementalmente
+Hooks de flush convertem cada inclusão/alteração/exclusão de Project, Location, AgendaEvent,
+ProjectLocationStage e User em deltas nos contadores da tabela kpi_snapshot, na mesma transação
+da escrita. Uma reconciliação periódica recalcula tudo e corrige desvios.
+Só os contadores lidos pelo dashboard são mantidos; as quebras das locações
+(/locations/stats/overview) vêm de location_stats_service.
+"""
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from ..core.flush_tracking import Contribution, ContributionsFn, FlushDeltaTracker, add_contributions, upsert_increment
+from ..core.jobs import Job, job_registry, periodic_scheduler
+from ..models.agenda_event import AgendaEvent
+from ..models.kpi_snapshot import KpiSnapshot
+from ..models.location import Location, LocationStatus
+from ..models.project import Project, ProjectStatus
+from ..models.project_location_stage import ProjectLocationStage, StageStatus
+from ..models.user import User
+
+# Intervalo da reconciliação periódica em segundos (0 desativa)
+KPI_RECONCILE_INTERVAL = float(os.getenv("KPI_RECONCILE_INTERVAL", "900"))
+KPI_RECONCILE_JOB = "kpi_snapshot_reconcile"
+
+PROJECTS_BY_STATUS = "projects_by_status"
+ACTIVE_BUDGET_TOTAL = "active_budget_total"
+ACTIVE_BUDGET_SPENT = "active_budget_spent"
+PROJECTS_OVER_BUDGET = "projects_over_budget"
+LOCATIONS_BY_STATUS = "locations_by_status"
+EVENTS_BY_DAY = "events_by_day"
+OPEN_STAGES_BY_DUE_DAY = "open_stages_by_due_day"
+ACTIVE_USERS = "active_users"
+
+# Linhas de controle: valor > 0 indica que a tabela derivada precisa ser recalculada antes da leitura
+# ("_meta", "stale") é a do próprio snapshot
+META_METRIC = "_meta"
+STALE_DIMENSION = "stale"
+
+
+def _dim(value: Any) -> str:
+    """Valor de dimensão armazenado (enums pelo valor, None como string vazia)"""
+    if value is None:
+        return ""
+    if hasattr(value, "value"):
+        return str(value.value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _day(value: Any) -> Optional[str]:
+    """Dia (YYYY-MM-DD) de uma data/hora ou string ISO"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value[:10]
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.date().isoformat()
+    return value.isoformat()
+
+
+# ===== Contribuição de cada modelo para os contadores =====
+
+def _project_contributions(v: Dict[str, Any]) -> Iterator[Contribution]:
+    yield (PROJECTS_BY_STATUS, _dim(v["status"])), 1
+    if v["status"] == ProjectStatus.ACTIVE:
+        total, spent = v["budget_total"] or 0, v["budget_spent"] or 0
+        yield (ACTIVE_BUDGET_TOTAL, ""), total
+        yield (ACTIVE_BUDGET_SPENT, ""), spent
+        if spent > total:
+            yield (PROJECTS_OVER_BUDGET, ""), 1
+
+
+def _location_contributions(v: Dict[str, Any]) -> Iterator[Contribution]:
+    yield (LOCATIONS_BY_STATUS, _dim(v["status"])), 1
+
+
+def _event_contributions(v: Dict[str, Any]) -> Iterator[Contribution]:
+    day = _day(v["start_date"])
+    if day:
+        yield (EVENTS_BY_DAY, day), 1
+
+
+def _stage_contributions(v: Dict[str, Any]) -> Iterator[Contribution]:
+    day = _day(v["planned_end_date"])
+    if day and v["status"] != StageStatus.COMPLETED:
+        yield (OPEN_STAGES_BY_DUE_DAY, day), 1
+
+
+def _user_contributions(v: Dict[str, Any]) -> Iterator[Contribution]:
+    if v["is_active"]:
+        yield (ACTIVE_USERS, ""), 1
+
+
+TRACKED_MODELS: Dict[type, Tuple[Sequence[str], ContributionsFn]] = {
+    Project: (("status", "budget_total", "budget_spent"), _project_contributions),
+    Location: (("status",), _location_contributions),
+    AgendaEvent: (("start_date",), _event_contributions),
+    ProjectLocationStage: (("status", "planned_end_date"), _stage_contributions),
+    User: (("is_active",), _user_contributions),
+}
+
+
+def apply_deltas(connection, deltas: Dict[Tuple[str, str], float]):
+    """Soma os deltas nos contadores (upsert na mesma conexão/transação da escrita)"""
+    rows = [
+        {"metric": metric, "dimension": dimension, "value": value}
+        for (metric, dimension), value in deltas.items()
+        if value
+    ]
+    upsert_increment(connection, KpiSnapshot.__table__, ("metric", "dimension"), ("value",), rows)
+
+
+def apply_external_changes(connection, model: type, changes: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]):
+    """
+    Deltas de alterações gravadas fora do ORM (ex.: UPDATE direto dentro de outro hook de flush),
+    informadas como pares (valores antigos, valores novos) dos campos acompanhados do modelo.
+    """
+    contributions = TRACKED_MODELS[model][1]
+    deltas: Dict[Tuple[str, str], float] = {}
+    for old, new in changes:
+        add_contributions(deltas, contributions(old), -1)
+        add_contributions(deltas, contributions(new), +1)
+    apply_deltas(connection, deltas)
+
+
+def mark_stale(connection, dimension: str = STALE_DIMENSION):
+    """Marca uma linha de controle (_meta) para recálculo antes da próxima leitura"""
+    apply_deltas(connection, {(META_METRIC, dimension): 1})
+
+
+# Registrado por services.hooks.register_hooks
+kpi_snapshot_tracker = FlushDeltaTracker("kpi_snapshot", TRACKED_MODELS, apply_deltas, mark_stale)
+
+
+class KpiSnapshotService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    # ----- Recalculo completo -----
+
+    def compute_counters(self) -> Dict[Tuple[str, str], float]:
+        """Recalcula todos os contadores a partir das tabelas (consultas agrupadas, uma por modelo)"""
+        counters: Dict[Tuple[str, str], float] = defaultdict(float)
+
+        project_rows = self.db.execute(
+            select(
+                Project.status,
+                func.count(Project.id),
+                func.coalesce(func.sum(Project.budget_total), 0),
+                func.coalesce(func.sum(Project.budget_spent), 0),
+                func.coalesce(func.sum(case((Project.budget_spent > Project.budget_total, 1), else_=0)), 0),
+            ).group_by(Project.status)
+        )
+        for status, count, budget_total, budget_spent, over_budget in project_rows:
+            counters[(PROJECTS_BY_STATUS, _dim(status))] += count
+            if status == ProjectStatus.ACTIVE:
+                counters[(ACTIVE_BUDGET_TOTAL, "")] += float(budget_total or 0)
+                counters[(ACTIVE_BUDGET_SPENT, "")] += float(budget_spent or 0)
+                counters[(PROJECTS_OVER_BUDGET, "")] += int(over_budget or 0)
+
+        for status, count in self.db.execute(select(Location.status, func.count(Location.id)).group_by(Location.status)):
+            counters[(LOCATIONS_BY_STATUS, _dim(status))] += count
+
+        for day, count in self.db.execute(
+            select(AgendaEvent.start_date, func.count(AgendaEvent.id)).group_by(AgendaEvent.start_date)
+        ):
+            counters[(EVENTS_BY_DAY, _dim(day))] += count
+
+        # Dia do prazo via _day (UTC), como nos hooks; date() no banco seguiria o fuso da sessão
+        for due, count in self.db.execute(
+            select(ProjectLocationStage.planned_end_date, func.count(ProjectLocationStage.id))
+            .where(
+                ProjectLocationStage.planned_end_date.isnot(None),
+                or_(ProjectLocationStage.status.is_(None), ProjectLocationStage.status != StageStatus.COMPLETED),
+            )
+            .group_by(ProjectLocationStage.planned_end_date)
+        ):
+            counters[(OPEN_STAGES_BY_DUE_DAY, _day(due))] += count
+
+        active_users = self.db.execute(select(func.count(User.id)).where(User.is_active == True)).scalar() or 0
+        if active_users:
+            counters[(ACTIVE_USERS, "")] = active_users
+
+        return {key: value for key, value in counters.items() if value}
+
+    def reconcile(self) -> Dict[str, Any]:
+        """
+        Substitui o snapshot pelos valores recalculados e retorna os desvios encontrados.
+        Escritas concorrentes durante a reconciliação podem gerar um desvio pequeno,
+        corrigido na execução seguinte.
+        """
+        expected = self.compute_counters()
+        current = {
+            (row.metric, row.dimension): row.value
+            for row in self.db.execute(select(KpiSnapshot.metric, KpiSnapshot.dimension, KpiSnapshot.value))
+            if row.metric != META_METRIC
+        }
+        drift = {
+            f"{metric}:{dimension}": {"expected": expected.get((metric, dimension), 0), "actual": current.get((metric, dimension), 0)}
+            for metric, dimension in set(expected) | set(current)
+            if abs(expected.get((metric, dimension), 0) - current.get((metric, dimension), 0)) > 1e-6
+        }
+
+        rows = [{"metric": metric, "dimension": dimension, "value": value} for (metric, dimension), value in expected.items()]
+        rows.append({"metric": META_METRIC, "dimension": STALE_DIMENSION, "value": 0})
+        # Outras linhas _meta sinalizam tabelas derivadas de outros serviços e são preservadas
+        self.db.execute(delete(KpiSnapshot).where(
+            or_(KpiSnapshot.metric != META_METRIC, KpiSnapshot.dimension == STALE_DIMENSION)
+        ))
+        self.db.execute(insert(KpiSnapshot), rows)
+        self.db.commit()
+
+        if drift:
+            print(f"⚠️ Snapshot de KPIs reconciliado com {len(drift)} desvios")
+            from .dashboard_service import dashboard_cache
+            dashboard_cache.invalidate()
+        return {"counters": len(expected), "drift": drift}
+
+    # ----- Leitura -----
+
+    def _read(self, condition) -> Dict[str, Dict[str, float]]:
+        rows = self.db.execute(
+            select(KpiSnapshot.metric, KpiSnapshot.dimension, KpiSnapshot.value).where(
+                or_(condition, and_(KpiSnapshot.metric == META_METRIC, KpiSnapshot.dimension == STALE_DIMENSION))
+            )
+        )
+        result: Dict[str, Dict[str, float]] = defaultdict(dict)
+        fresh = False
+        for metric, dimension, value in rows:
+            if metric == META_METRIC:
+                fresh = value <= 0
+            else:
+                result[metric][dimension] = value
+        if not fresh:
+            # Nunca reconciliado ou marcado após escrita em massa: a leitura devolve o último snapshot
+            # e a reconciliação roda na tarefa periódica (sessão própria, uma execução por vez)
+            periodic_scheduler.trigger(KPI_RECONCILE_JOB)
+        return result
+
+    def get_metrics(self, metrics: Sequence[str]) -> Dict[str, Dict[Optional[str], float]]:
+        """Contadores por dimensão das métricas pedidas (dimensão vazia volta como None)"""
+        data = self._read(KpiSnapshot.metric.in_(metrics))
+        return {metric: {(dim or None): value for dim, value in data.get(metric, {}).items()} for metric in metrics}
+
+    def dashboard_kpis(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """KPIs do dashboard lidos do snapshot (nenhuma varredura das tabelas de origem)"""
+        today = today or date.today()
+        next_week = today + timedelta(days=7)
+        data = self._read(or_(
+            KpiSnapshot.metric.in_([
+                PROJECTS_BY_STATUS, ACTIVE_BUDGET_TOTAL, ACTIVE_BUDGET_SPENT, PROJECTS_OVER_BUDGET,
+                LOCATIONS_BY_STATUS, ACTIVE_USERS,
+            ]),
+            and_(
+                KpiSnapshot.metric == EVENTS_BY_DAY,
+                KpiSnapshot.dimension >= today.isoformat(),
+                KpiSnapshot.dimension <= next_week.isoformat(),
+            ),
+            and_(KpiSnapshot.metric == OPEN_STAGES_BY_DUE_DAY, KpiSnapshot.dimension < today.isoformat()),
+        ))
+
+        def total(metric: str) -> float:
+            return sum(data.get(metric, {}).values())
+
+        projects = data.get(PROJECTS_BY_STATUS, {})
+        total_budget = float(total(ACTIVE_BUDGET_TOTAL))
+        budget_spent = float(total(ACTIVE_BUDGET_SPENT))
+        return {
+            "total_projects": int(total(PROJECTS_BY_STATUS)),
+            "active_projects": int(projects.get(ProjectStatus.ACTIVE.value, 0)),
+            "total_locations": int(total(LOCATIONS_BY_STATUS)),
+            "approved_locations": int(data.get(LOCATIONS_BY_STATUS, {}).get(LocationStatus.APPROVED.value, 0)),
+            "total_budget": total_budget,
+            "budget_spent": budget_spent,
+            "budget_remaining": total_budget - budget_spent,
+            "projects_over_budget": int(total(PROJECTS_OVER_BUDGET)),
+            "upcoming_events": int(total(EVENTS_BY_DAY)),
+            "overdue_stages": int(total(OPEN_STAGES_BY_DUE_DAY)),
+            "active_users": int(total(ACTIVE_USERS)),
+        }
+
+
+def run_kpi_reconcile(job: Job, bind):
+    """Tarefa periódica: reconcilia o snapshot com uma sessão própria"""
+    job_registry.start(job, total=1, message="Recalculando contadores")
+    db = Session(bind=bind)
+    try:
+        result = KpiSnapshotService(db).reconcile()
+    finally:
+        db.close()
+    job_registry.advance(job)
+    job_registry.complete(job, result={"counters": result["counters"], "drift": len(result["drift"])})
@@ -5,6 +5,7 @@ from datetime import datetime, timezone
 
 from ..models.location_demand import LocationDemand, DemandPriority, DemandStatus
 from ..models.agenda_event import AgendaEvent, EventType, EventStatus
+from .overdue_service import DEMANDS, overdue_filter
 from ..schemas.location_demand import (
     LocationDemandCreate,
     LocationDemandUpdate,
@@ -71,14 +72,7 @@ class LocationDemandService:
             if filters.due_date_to:
                 query = query.filter(LocationDemand.due_date <= filters.due_date_to)
             if filters.overdue_only:
-                now = datetime.now(timezone.utc)
-                query = query.filter(
-                    and_(
-                        LocationDemand.due_date < now,
-                        LocationDemand.status != DemandStatus.COMPLETED,
-                        LocationDemand.status != DemandStatus.CANCELLED
-                    )
-                )
+                query = query.filter(overdue_filter(self.db, DEMANDS))
 
         # Count total before pagination
         total = query.count()
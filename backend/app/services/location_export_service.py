@@ -0,0 +1,151 @@
+"""
+Exportação em streaming do catálogo de locações (CSV, NDJSON e XLSX)
+Memória constante: linhas lidas com cursor no servidor (yield_per) e escritas incrementalmente.
+"""
+import csv
+import enum
+import io
+import json
+import tempfile
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from openpyxl import Workbook
+from sqlalchemy.orm import Session
+
+from ..models.location import Location
+from .location_service import LocationService
+
+# Linhas buscadas por ida ao banco
+EXPORT_BATCH_SIZE = 1000
+# Tamanho dos blocos enviados ao cliente
+EXPORT_CHUNK_BYTES = 64 * 1024
+# Acima disso o arquivo XLSX temporário vai para disco
+XLSX_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# (cabeçalho, coluna) na ordem exportada
+EXPORT_COLUMNS: List[Tuple[str, Any]] = [
+    ("id", Location.id),
+    ("title", Location.title),
+    ("slug", Location.slug),
+    ("status", Location.status),
+    ("sector_type", Location.sector_type),
+    ("space_type", Location.space_type),
+    ("project_id", Location.project_id),
+    ("supplier_id", Location.supplier_id),
+    ("price_day_cinema", Location.price_day_cinema),
+    ("price_hour_cinema", Location.price_hour_cinema),
+    ("price_day_publicidade", Location.price_day_publicidade),
+    ("price_hour_publicidade", Location.price_hour_publicidade),
+    ("currency", Location.currency),
+    ("street", Location.street),
+    ("number", Location.number),
+    ("complement", Location.complement),
+    ("neighborhood", Location.neighborhood),
+    ("city", Location.city),
+    ("state", Location.state),
+    ("country", Location.country),
+    ("postal_code", Location.postal_code),
+    ("supplier_name", Location.supplier_name),
+    ("supplier_phone", Location.supplier_phone),
+    ("supplier_email", Location.supplier_email),
+    ("contact_person", Location.contact_person),
+    ("contact_phone", Location.contact_phone),
+    ("contact_email", Location.contact_email),
+    ("capacity", Location.capacity),
+    ("area_size", Location.area_size),
+    ("parking_spots", Location.parking_spots),
+    ("cover_photo_url", Location.cover_photo_url),
+    ("created_at", Location.created_at),
+    ("updated_at", Location.updated_at),
+]
+EXPORT_HEADERS = [header for header, _ in EXPORT_COLUMNS]
+
+
+def _plain(value: Any) -> Any:
+    """Converte enums e datas para tipos simples (CSV/JSON/Excel)"""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        # openpyxl não aceita datetimes com timezone
+        return value.replace(tzinfo=None) if value.tzinfo else value
+    return value
+
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+class LocationExportService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def iter_rows(self, filters: Optional[Dict[str, Any]] = None) -> Iterator[List[Any]]:
+        """Itera as linhas exportadas (valores simples) sem carregar entidades nem relacionamentos"""
+        query = (
+            LocationService(self.db)
+            .build_filtered_query(**(filters or {}))
+            .with_entities(*[column for _, column in EXPORT_COLUMNS])
+            .order_by(Location.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for row in query:
+            yield [_plain(value) for value in row]
+
+    def iter_csv(self, filters: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+        """Gera o CSV em blocos (UTF-8 com BOM para abrir corretamente no Excel)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write("\ufeff")
+        writer.writerow(EXPORT_HEADERS)
+        for row in self.iter_rows(filters):
+            writer.writerow(["" if value is None else value for value in row])
+            if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+    def iter_ndjson(self, filters: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+        """Gera NDJSON (um objeto JSON por linha) em blocos"""
+        buffer = io.StringIO()
+        for row in self.iter_rows(filters):
+            buffer.write(json.dumps(dict(zip(EXPORT_HEADERS, row)), ensure_ascii=False, default=_json_default))
+            buffer.write("\n")
+            if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+    def write_xlsx(self, filters: Optional[Dict[str, Any]] = None) -> tempfile.SpooledTemporaryFile:
+        """
+        Gera o XLSX com openpyxl em modo write-only (linhas não ficam em memória)
+        e devolve um arquivo temporário posicionado no início.
+        """
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Locações")
+        sheet.append(EXPORT_HEADERS)
+        for row in self.iter_rows(filters):
+            sheet.append(row)
+
+        output = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_BYTES)
+        workbook.save(output)
+        output.seek(0)
+        return output
+
+
+def iter_file(fileobj, chunk_size: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    """Lê um arquivo em blocos e o fecha ao final"""
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
@@ -199,10 +199,8 @@ class LocationService:
             return None
         return LocationResponse.model_validate(self._serialize_location(location))
 
-    def get_locations(
+    def build_filtered_query(
         self,
-        skip: int = 0,
-        limit: int = 100,
         status: Optional[str] = None,
         space_type: Optional[str] = None,
         city: Optional[str] = None,
@@ -210,8 +208,8 @@ class LocationService:
         supplier_id: Optional[int] = None,
         sector_type: Optional[str] = None,
         search: Optional[str] = None,
-    ) -> List[LocationResponse]:
-        """Lista locações com filtros"""
+    ):
+        """Monta a query de Location com os filtros da listagem (reutilizada pelas exportações)"""
         query = self.db.query(Location)
 
         # Map string filters to enums where applicable, ignoring invalid values
@@ -265,6 +263,31 @@ class LocationService:
                 )
             )
 
+        return query
+
+    def get_locations(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        status: Optional[str] = None,
+        space_type: Optional[str] = None,
+        city: Optional[str] = None,
+        project_id: Optional[int] = None,
+        supplier_id: Optional[int] = None,
+        sector_type: Optional[str] = None,
+        search: Optional[str] = None,
+    ) -> List[LocationResponse]:
+        """Lista locações com filtros"""
+        query = self.build_filtered_query(
+            status=status,
+            space_type=space_type,
+            city=city,
+            project_id=project_id,
+            supplier_id=supplier_id,
+            sector_type=sector_type,
+            search=search,
+        )
+
         locations = (
             query.options(
                 joinedload(Location.photos),
@@ -0,0 +1,129 @@
+"""
+Estatísticas gerais das locações (status, tipo de espaço, cidade e faixa de preço)
+Todas as quebras saem de uma única varredura da tabela: GROUPING SETS no PostgreSQL e,
+nos demais bancos, um GROUP BY pelas quatro dimensões somado em memória.
+O resultado fica em cache no processo e é invalidado quando alguma locação é gravada.
+"""
+import os
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+from sqlalchemy import case, func, select, tuple_
+from sqlalchemy.orm import Session
+
+from ..core.cache import SingleFlightCache, invalidate_on_write
+from ..models.location import Location
+
+# Invalidação por escrita mantém o valor correto; o TTL só limita a vida de entradas esquecidas
+LOCATION_STATS_CACHE_TTL = float(os.getenv("LOCATION_STATS_CACHE_TTL", "300"))
+TOP_CITIES = 10
+
+STATUS = "status"
+SPACE_TYPE = "space_type"
+CITY = "city"
+PRICE_RANGE = "price_range"
+
+PRICE_RANGES = [
+    (1000, "Até R$ 1.000"),
+    (5000, "R$ 1.001 - R$ 5.000"),
+    (10000, "R$ 5.001 - R$ 10.000"),
+]
+PRICE_RANGE_ABOVE = "Acima de R$ 10.000"
+
+location_stats_cache = SingleFlightCache(ttl=LOCATION_STATS_CACHE_TTL)
+
+
+def register_location_stats_hooks():
+    """Chamado por services.hooks.register_hooks"""
+    invalidate_on_write(location_stats_cache, (Location,), "location_stats_cache_dirty")
+
+
+def price_range_label(price: Optional[float]) -> Optional[str]:
+    """Faixa de preço da diária (cinema tem prioridade sobre publicidade)"""
+    if price is None:
+        return None
+    for limit, label in PRICE_RANGES:
+        if price <= limit:
+            return label
+    return PRICE_RANGE_ABOVE
+
+
+def price_range_expression():
+    """Equivalente SQL de price_range_label"""
+    price = func.coalesce(Location.price_day_cinema, Location.price_day_publicidade)
+    return case(
+        *[(price <= limit, label) for limit, label in PRICE_RANGES],
+        (price.isnot(None), PRICE_RANGE_ABOVE),
+        else_=None,
+    )
+
+
+class LocationStatsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def breakdowns(self) -> Dict[str, Dict[Any, int]]:
+        """
+        Contagem de locações por dimensão em uma varredura.
+        Chaves são os valores da coluna (enums, strings ou None); locações sem preço
+        ficam fora das faixas.
+        """
+        if self.db.get_bind().dialect.name == "postgresql":
+            return self._breakdowns_grouping_sets()
+        return self._breakdowns_single_group_by()
+
+    def _breakdowns_grouping_sets(self) -> Dict[str, Dict[Any, int]]:
+        located = select(
+            Location.status.label(STATUS),
+            Location.space_type.label(SPACE_TYPE),
+            Location.city.label(CITY),
+            price_range_expression().label(PRICE_RANGE),
+        ).subquery()
+        dimensions = [located.c[name] for name in (STATUS, SPACE_TYPE, CITY, PRICE_RANGE)]
+        # GROUPING(coluna) = 0 indica o conjunto da linha (distingue NULL real de subtotal)
+        rows = self.db.execute(
+            select(*dimensions, *[func.grouping(column) for column in dimensions], func.count())
+            .group_by(func.grouping_sets(*[tuple_(column) for column in dimensions]))
+        )
+        result: Dict[str, Dict[Any, int]] = {column.name: {} for column in dimensions}
+        for row in rows:
+            values, flags, count = row[:4], row[4:8], row[8]
+            for column, value, grouped in zip(dimensions, values, flags):
+                if grouped == 0:
+                    result[column.name][value] = count
+        result[PRICE_RANGE].pop(None, None)
+        return result
+
+    def _breakdowns_single_group_by(self) -> Dict[str, Dict[Any, int]]:
+        price_range = price_range_expression()
+        rows = self.db.execute(
+            select(Location.status, Location.space_type, Location.city, price_range, func.count(Location.id))
+            .group_by(Location.status, Location.space_type, Location.city, price_range)
+        )
+        result: Dict[str, Dict[Any, int]] = {name: defaultdict(int) for name in (STATUS, SPACE_TYPE, CITY, PRICE_RANGE)}
+        for status, space_type, city, price_label, count in rows:
+            result[STATUS][status] += count
+            result[SPACE_TYPE][space_type] += count
+            result[CITY][city] += count
+            if price_label:
+                result[PRICE_RANGE][price_label] += count
+        return {name: dict(counts) for name, counts in result.items()}
+
+    def compute_overview(self) -> Dict[str, Any]:
+        data = self.breakdowns()
+
+        def keyed(counts: Dict[Any, int]) -> Dict[Any, int]:
+            return {(key.value if hasattr(key, "value") else key): count for key, count in counts.items()}
+
+        # Top cidades por quantidade
+        by_city = dict(sorted(data[CITY].items(), key=lambda item: item[1], reverse=True)[:TOP_CITIES])
+        return {
+            "total_locations": sum(data[STATUS].values()),
+            "by_status": keyed(data[STATUS]),
+            "by_space_type": keyed(data[SPACE_TYPE]),
+            "by_city": by_city,
+            "price_ranges": data[PRICE_RANGE],
+        }
+
+    def get_overview(self) -> Dict[str, Any]:
+        return location_stats_cache.get_or_compute("overview", self.compute_overview)
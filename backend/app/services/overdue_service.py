@@ -0,0 +1,237 @@
+"""
+Varredura periódica de atrasos
+Etapas, locações (fim da locação) e demandas em aberto com prazo vencido ganham overdue_at numa
+consulta por faixa de prazo (índices (overdue_at, prazo)) e UPDATEs em lote; o que foi resolvido
+é desmarcado no mesmo passo. Cada responsável recebe uma única notificação com o que atrasou
+desde a varredura anterior. Os filtros de atraso passam a ser overdue_at IS [NOT] NULL; com a
+varredura desativada ou ainda sem execução, comparam o prazo direto (overdue_filter).
+"""
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, delete, event, func, insert, not_, or_, select
+from sqlalchemy.orm import Session
+
+from ..core.jobs import Job, job_registry
+from ..models.kpi_snapshot import KpiSnapshot
+from ..models.location import Location
+from ..models.location_demand import DemandStatus, LocationDemand
+from ..models.notification import Notification, NotificationSettings, NotificationType
+from ..models.project import Project
+from ..models.project_location import ProjectLocation, RentalStatus
+from ..models.project_location_stage import ProjectLocationStage, StageStatus
+from ..models.user import User
+from .kpi_snapshot_service import META_METRIC
+
+# Intervalo da varredura em segundos (0 desativa); os filtros de atraso refletem a última varredura
+OVERDUE_SCAN_INTERVAL = float(os.getenv("OVERDUE_SCAN_INTERVAL", "300"))
+
+# Itens listados na notificação de resumo (o restante vira "e mais N")
+OVERDUE_DIGEST_MAX_ITEMS = int(os.getenv("OVERDUE_DIGEST_MAX_ITEMS", "20"))
+
+OVERDUE_UPDATE_BATCH = 500
+
+# Linha de controle em kpi_snapshot: horário (timestamp) da última varredura
+SCAN_DIMENSION = "overdue_scan_at"
+
+
+class OverdueKind(NamedTuple):
+    key: str
+    label: str
+    model: Any
+    due: Any  # Coluna do prazo
+    closed: Tuple  # Status que encerram o prazo
+    date_only: bool  # Prazo em dia (atrasa no dia seguinte) ou data/hora
+
+
+STAGES = OverdueKind("stages", "Etapa", ProjectLocationStage, ProjectLocationStage.planned_end_date, (StageStatus.COMPLETED,), False)
+RENTALS = OverdueKind("rentals", "Locação", ProjectLocation, ProjectLocation.rental_end, (RentalStatus.RETURNED, RentalStatus.CANCELLED), True)
+DEMANDS = OverdueKind("demands", "Demanda", LocationDemand, LocationDemand.due_date, (DemandStatus.COMPLETED, DemandStatus.CANCELLED), False)
+OVERDUE_KINDS = (STAGES, RENTALS, DEMANDS)
+
+
+def overdue_predicate(kind: OverdueKind, now: datetime):
+    """Em aberto e com prazo anterior a agora (ou a hoje, para prazos em dia)"""
+    threshold = now.date() if kind.date_only else now
+    status = kind.model.status
+    return and_(kind.due.isnot(None), kind.due < threshold, or_(status.is_(None), status.notin_(kind.closed)))
+
+
+def is_overdue_now(kind: OverdueKind, obj: Any, now: datetime) -> bool:
+    """Mesma regra de overdue_predicate aplicada a um objeto carregado"""
+    due = getattr(obj, kind.due.key)
+    if due is None or obj.status in kind.closed:
+        return False
+    if kind.date_only:
+        return due < now.date()
+    if due.tzinfo is None:
+        due = due.replace(tzinfo=timezone.utc)
+    return due < now
+
+
+def _clear_resolved(kind: OverdueKind):
+    # Conclusão ou prazo adiado desmarcam na própria escrita; marcar fica só com a varredura (que notifica)
+    def listener(mapper, connection, target):
+        if target.overdue_at is not None and not is_overdue_now(kind, target, datetime.now(timezone.utc)):
+            target.overdue_at = None
+    return listener
+
+
+def register_overdue_hooks():
+    """Chamado por services.hooks.register_hooks"""
+    for kind in OVERDUE_KINDS:
+        event.listen(kind.model, "before_update", _clear_resolved(kind))
+
+
+def overdue_filter(db: Session, kind: OverdueKind, overdue: bool = True):
+    """Condição dos filtros de atraso: a marcação da varredura ou, sem varredura ativa e executada, o prazo"""
+    if OVERDUE_SCAN_INTERVAL > 0 and OverdueService(db).last_scan() is not None:
+        condition = kind.model.overdue_at.isnot(None)
+    else:
+        condition = overdue_predicate(kind, datetime.now(timezone.utc))
+    return condition if overdue else not_(condition)
+
+
+class OverdueService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def last_scan(self) -> Optional[datetime]:
+        value = self.db.execute(
+            select(KpiSnapshot.value).where(KpiSnapshot.metric == META_METRIC, KpiSnapshot.dimension == SCAN_DIMENSION)
+        ).scalar()
+        return datetime.fromtimestamp(value, timezone.utc) if value is not None else None
+
+    def _newly_overdue(self, kind: OverdueKind, now: datetime):
+        """(id, título, prazo, responsável, projeto) dos itens atrasados ainda não marcados"""
+        pending = and_(kind.model.overdue_at.is_(None), overdue_predicate(kind, now))
+        if kind is STAGES:
+            return (
+                select(
+                    ProjectLocationStage.id, ProjectLocationStage.title, ProjectLocationStage.planned_end_date.label("due"),
+                    ProjectLocationStage.responsible_user_id.label("responsible_user_id"), ProjectLocation.project_id,
+                )
+                .join(ProjectLocation, ProjectLocation.id == ProjectLocationStage.project_location_id)
+                .where(pending)
+            )
+        if kind is RENTALS:
+            return (
+                select(
+                    ProjectLocation.id, func.coalesce(Location.title, "Locação").label("title"), ProjectLocation.rental_end.label("due"),
+                    ProjectLocation.responsible_user_id.label("responsible_user_id"), ProjectLocation.project_id,
+                )
+                .outerjoin(Location, Location.id == ProjectLocation.location_id)
+                .where(pending)
+            )
+        return select(
+            LocationDemand.id, LocationDemand.title, LocationDemand.due_date.label("due"),
+            LocationDemand.assigned_user_id.label("responsible_user_id"), LocationDemand.project_id,
+        ).where(pending)
+
+    def _claim(self, connection, kind: OverdueKind, ids: List[int], now: datetime) -> List[int]:
+        """
+        Marca os ids ainda não marcados e devolve só os que esta varredura marcou
+        (UPDATE ... WHERE overdue_at IS NULL RETURNING id): com varreduras concorrentes,
+        cada item é notificado por quem o marcou.
+        """
+        table = kind.model.__table__
+        pending = and_(table.c.overdue_at.is_(None), overdue_predicate(kind, now))
+        claimed: List[int] = []
+        if connection.dialect.update_returning:
+            for offset in range(0, len(ids), OVERDUE_UPDATE_BATCH):
+                claimed += connection.execute(
+                    table.update()
+                    .where(table.c.id.in_(ids[offset:offset + OVERDUE_UPDATE_BATCH]), pending)
+                    .values(overdue_at=now)
+                    .returning(table.c.id)
+                ).scalars().all()
+            return claimed
+        for item_id in ids:
+            if connection.execute(table.update().where(table.c.id == item_id, pending).values(overdue_at=now)).rowcount:
+                claimed.append(item_id)
+        return claimed
+
+    def scan(self, now: Optional[datetime] = None, notify: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Marca os itens que atrasaram, desmarca os resolvidos e envia um resumo por responsável.
+        Sem responsável no item, o resumo vai para o gerente (ou criador) do projeto.
+        Na primeira varredura (nenhuma anterior) os atrasos existentes são só marcados, sem notificar.
+        """
+        now = now or datetime.now(timezone.utc)
+        if notify is None:
+            notify = self.last_scan() is not None
+        connection = self.db.connection()
+        result: Dict[str, Any] = {"cleared": 0}
+        newly: List[Tuple[OverdueKind, Any]] = []
+
+        for kind in OVERDUE_KINDS:
+            rows = self.db.execute(self._newly_overdue(kind, now)).all()
+            table = kind.model.__table__
+            claimed = set(self._claim(connection, kind, [row.id for row in rows], now))
+            cleared = connection.execute(
+                table.update().where(table.c.overdue_at.isnot(None), not_(overdue_predicate(kind, now))).values(overdue_at=None)
+            )
+            result[kind.key] = len(claimed)
+            result["cleared"] += cleared.rowcount or 0
+            newly += [(kind, row) for row in rows if row.id in claimed]
+
+        notifications = self._digests(newly) if notify else []
+        self.db.add_all(notifications)
+        self.db.execute(delete(KpiSnapshot).where(KpiSnapshot.metric == META_METRIC, KpiSnapshot.dimension == SCAN_DIMENSION))
+        self.db.execute(insert(KpiSnapshot).values(metric=META_METRIC, dimension=SCAN_DIMENSION, value=now.timestamp()))
+        self.db.commit()
+
+        result["notifications"] = len(notifications)
+        if newly:
+            print(f"⏰ Varredura de atrasos: {len(newly)} novos itens atrasados, {len(notifications)} notificações")
+        return result
+
+    def _digests(self, newly: List[Tuple[OverdueKind, Any]]) -> List[Notification]:
+        """Uma notificação por responsável (usuários ativos que não desligaram avisos)"""
+        if not newly:
+            return []
+        project_ids = {row.project_id for _, row in newly if row.responsible_user_id is None}
+        fallback = dict(self.db.execute(
+            select(Project.id, func.coalesce(Project.manager_id, Project.created_by)).where(Project.id.in_(project_ids))
+        ).all()) if project_ids else {}
+
+        by_user: Dict[int, List[Tuple[OverdueKind, Any]]] = defaultdict(list)
+        for kind, row in newly:
+            user_id = row.responsible_user_id or fallback.get(row.project_id)
+            if user_id is not None:
+                by_user[user_id].append((kind, row))
+
+        active = set(self.db.execute(select(User.id).where(User.id.in_(list(by_user)), User.is_active == True)).scalars())
+        for user_id, types in self.db.execute(
+            select(NotificationSettings.user_id, NotificationSettings.notification_types).where(NotificationSettings.user_id.in_(list(active)))
+        ):
+            if types is not None and NotificationType.WARNING.value not in types.split(','):
+                active.discard(user_id)
+
+        notifications = []
+        for user_id in sorted(active):
+            items = sorted(by_user[user_id], key=lambda item: (str(item[1].due), item[0].key, item[1].id))
+            lines = [f"• {kind.label}: {row.title} — prazo {row.due:%d/%m/%Y}" for kind, row in items[:OVERDUE_DIGEST_MAX_ITEMS]]
+            if len(items) > OVERDUE_DIGEST_MAX_ITEMS:
+                lines.append(f"… e mais {len(items) - OVERDUE_DIGEST_MAX_ITEMS}")
+            notifications.append(Notification(
+                title=f"{len(items)} {'item atrasado' if len(items) == 1 else 'itens atrasados'}",
+                message="\n".join(lines),
+                type=NotificationType.WARNING,
+                user_id=user_id,
+            ))
+        return notifications
+
+
+def run_overdue_scan(job: Job, bind):
+    """Tarefa periódica: varredura de atrasos com uma sessão própria"""
+    job_registry.start(job, total=1, message="Verificando prazos vencidos")
+    db = Session(bind=bind)
+    try:
+        result = OverdueService(db).scan()
+    finally:
+        db.close()
+    job_registry.advance(job)
+    job_registry.complete(job, result=result)
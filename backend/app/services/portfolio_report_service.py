@@ -0,0 +1,303 @@
+"""
+Exportação em lote dos relatórios de projeto (portfólio)
+Os dados de todos os projetos são carregados com poucas consultas agregadas; a renderização
+de cada projeto (Excel e PDF) roda no pool de processos e os arquivos são gravados em um zip
+à medida que ficam prontos.
+"""
+import os
+import re
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from ..core.executors import CPU_WORKERS, get_cpu_executor
+from ..core.jobs import Job, job_registry
+from ..models.location import Location
+from ..models.project import Project, ProjectStatus
+from ..models.project_location import ProjectLocation, RentalStatus
+from .project_report_service import (
+    REPORT_BATCH_SIZE,
+    ProjectReportService,
+    location_table_row,
+    render_project_workbook,
+)
+
+# Diretório dos zips gerados (removidos quando a tarefa sai do histórico)
+PORTFOLIO_REPORT_DIR = os.getenv("PORTFOLIO_REPORT_DIR") or tempfile.gettempdir()
+# Projetos enviados ao pool ao mesmo tempo (limita a memória ocupada por resultados pendentes)
+PORTFOLIO_MAX_IN_FLIGHT = int(os.getenv("PORTFOLIO_MAX_IN_FLIGHT", str(CPU_WORKERS * 2)))
+
+JOB_KIND = "portfolio_report"
+
+# Colunas da tabela de locações no PDF (índices em LOCATION_HEADERS)
+PDF_LOCATION_COLUMNS = [
+    ("Locação", 0),
+    ("Cidade", 1),
+    ("Período de Locação", 4),
+    ("Status", 9),
+    ("Valor Total (R$)", 3),
+    ("Progresso (%)", 10),
+]
+
+
+def pdf_available() -> bool:
+    try:
+        import reportlab  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+@dataclass
+class ProjectReportPayload:
+    """Dados de um projeto já formatados (sem sessão), enviados ao processo que renderiza"""
+    project_id: int
+    filename_base: str
+    project_info: Dict[str, Any]
+    resumo: Dict[str, Any]
+    gerado_em: str
+    location_rows: List[List[Any]] = field(default_factory=list)
+
+
+def _safe_filename(name: str) -> str:
+    return re.sub(r"[^\w\-]+", "_", name).strip("_")[:30] or "projeto"
+
+
+def render_project_pdf(payload: ProjectReportPayload) -> bytes:
+    """PDF do relatório de um projeto (reportlab)"""
+    from io import BytesIO
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    info = payload.project_info
+    resumo = payload.resumo
+    output = BytesIO()
+    doc = SimpleDocTemplate(
+        output, pagesize=landscape(A4),
+        leftMargin=1.5 * cm, rightMargin=1.5 * cm, topMargin=1.5 * cm, bottomMargin=1.5 * cm,
+        title=f"Relatório do Projeto: {info['nome']}",
+    )
+
+    label_table = Table([
+        ["Cliente:", info['cliente']],
+        ["Status:", info['status']],
+        ["Período:", f"{info['data_inicio']} até {info['data_fim']}"],
+        ["Orçamento Total:", f"R$ {info['orcamento_total']:,.2f}"],
+        ["Orçamento Gasto:", f"R$ {info['orcamento_gasto']:,.2f}"],
+        ["Orçamento Restante:", f"R$ {info['orcamento_restante']:,.2f}"],
+        ["Total de Locações:", resumo['total_locacoes']],
+        ["Locações Ativas:", resumo['locacoes_ativas']],
+        ["Locações Concluídas:", resumo['locacoes_concluidas']],
+        ["Custo Total:", f"R$ {resumo['custo_total_locacoes']:,.2f}"],
+    ], colWidths=[5 * cm, 12 * cm], hAlign="LEFT")
+    label_table.setStyle(TableStyle([("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold")]))
+
+    cell_style = styles["BodyText"]
+    rows = [[header for header, _ in PDF_LOCATION_COLUMNS]]
+    for row in payload.location_rows:
+        rows.append([Paragraph(str(row[0]), cell_style)] + [row[index] for _, index in PDF_LOCATION_COLUMNS[1:]])
+    locations_table = Table(rows, colWidths=[8 * cm, 3.5 * cm, 5 * cm, 3 * cm, 3.5 * cm, 3 * cm], repeatRows=1)
+    locations_table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#E0E7FF")),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]))
+
+    doc.build([
+        Paragraph(f"RELATÓRIO DO PROJETO: {info['nome']}", styles["Title"]),
+        label_table,
+        Spacer(1, 0.6 * cm),
+        Paragraph("DETALHAMENTO DAS LOCAÇÕES", styles["Heading2"]),
+        locations_table,
+        Spacer(1, 0.6 * cm),
+        Paragraph(f"Relatório gerado em: {payload.gerado_em}", styles["Italic"]),
+    ])
+    return output.getvalue()
+
+
+def render_project_files(payload: ProjectReportPayload, include_pdf: bool = True) -> List[Tuple[str, bytes]]:
+    """
+    Renderiza os arquivos de um projeto. Função de módulo para poder rodar no pool
+    de processos (payload e retorno são serializáveis).
+    """
+    files = [(
+        f"{payload.filename_base}.xlsx",
+        render_project_workbook(
+            payload.project_info, payload.resumo, payload.location_rows, payload.gerado_em
+        ).save_to_bytes(),
+    )]
+    if include_pdf:
+        files.append((f"{payload.filename_base}.pdf", render_project_pdf(payload)))
+    return files
+
+
+class PortfolioReportService:
+    def __init__(self, db: Session):
+        self.db = db
+        self.report_service = ProjectReportService(db)
+
+    def _project_filter(self, project_ids: Optional[Sequence[int]], status: Optional[ProjectStatus]):
+        conditions = []
+        if project_ids:
+            conditions.append(Project.id.in_(project_ids))
+        if status:
+            conditions.append(Project.status == status)
+        return conditions
+
+    def load_payloads(
+        self,
+        project_ids: Optional[Sequence[int]] = None,
+        status: Optional[ProjectStatus] = None,
+    ) -> List[ProjectReportPayload]:
+        """
+        Carrega os dados de todos os projetos selecionados em três consultas
+        (projetos, totais agrupados por projeto e locações), independente da quantidade de projetos.
+        """
+        conditions = self._project_filter(project_ids, status)
+        projects = self.db.scalars(select(Project).where(*conditions).order_by(Project.id)).all()
+        if not projects:
+            return []
+
+        selected_ids = select(Project.id).where(*conditions)
+        gerado_em = datetime.now().strftime("%d/%m/%Y %H:%M")
+        payloads: Dict[int, ProjectReportPayload] = {}
+        for project in projects:
+            info = self.report_service._build_project_info(project)
+            payloads[project.id] = ProjectReportPayload(
+                project_id=project.id,
+                filename_base=f"{project.id:05d}_relatorio_{_safe_filename(info['nome'])}",
+                project_info=info,
+                resumo={
+                    "total_locacoes": 0,
+                    "locacoes_ativas": 0,
+                    "locacoes_concluidas": 0,
+                    "custo_total_locacoes": 0.0,
+                },
+                gerado_em=gerado_em,
+            )
+
+        summary_rows = self.db.execute(
+            select(
+                ProjectLocation.project_id,
+                func.count(ProjectLocation.id),
+                func.coalesce(func.sum(ProjectLocation.total_cost), 0),
+                func.coalesce(func.sum(case((ProjectLocation.status.in_([RentalStatus.CONFIRMED, RentalStatus.IN_USE]), 1), else_=0)), 0),
+                func.coalesce(func.sum(case((ProjectLocation.status == RentalStatus.RETURNED, 1), else_=0)), 0),
+            )
+            .where(ProjectLocation.project_id.in_(selected_ids))
+            .group_by(ProjectLocation.project_id)
+        )
+        for project_id, total, cost, active, returned in summary_rows:
+            payloads[project_id].resumo = {
+                "total_locacoes": total or 0,
+                "locacoes_ativas": int(active or 0),
+                "locacoes_concluidas": int(returned or 0),
+                "custo_total_locacoes": float(cost or 0),
+            }
+
+        location_stmt = (
+            select(ProjectLocation, Location)
+            .outerjoin(Location, Location.id == ProjectLocation.location_id)
+            .where(ProjectLocation.project_id.in_(selected_ids))
+            .order_by(ProjectLocation.project_id, ProjectLocation.rental_start, ProjectLocation.id)
+            .execution_options(yield_per=REPORT_BATCH_SIZE)
+        )
+        for pl, location in self.db.execute(location_stmt):
+            payloads[pl.project_id].location_rows.append(
+                location_table_row(self.report_service._build_location_info(pl, location))
+            )
+
+        return list(payloads.values())
+
+
+def _render_all(
+    executor: Executor,
+    payloads: List[ProjectReportPayload],
+    include_pdf: bool,
+) -> Iterator[Tuple[int, Optional[List[Tuple[str, bytes]]], Optional[str]]]:
+    """Envia os projetos ao pool em uma janela limitada e devolve (id, arquivos, erro) na ordem de conclusão"""
+    pending = {}
+
+    def drain(return_when):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            project_id = pending.pop(future)
+            try:
+                yield project_id, future.result(), None
+            except Exception as e:
+                yield project_id, None, str(e)
+
+    for payload in payloads:
+        pending[executor.submit(render_project_files, payload, include_pdf)] = payload.project_id
+        if len(pending) >= PORTFOLIO_MAX_IN_FLIGHT:
+            yield from drain(FIRST_COMPLETED)
+    while pending:
+        yield from drain(FIRST_COMPLETED)
+
+
+def run_portfolio_export(
+    job: Job,
+    bind,
+    project_ids: Optional[Sequence[int]] = None,
+    status: Optional[ProjectStatus] = None,
+    include_pdf: bool = True,
+    executor: Optional[Executor] = None,
+):
+    """
+    Tarefa em segundo plano: gera o zip com os relatórios do portfólio.
+    Usa uma sessão própria (a da requisição já foi encerrada) e reporta o progresso por projeto.
+    """
+    pdf_skipped = include_pdf and not pdf_available()
+    include_pdf = include_pdf and not pdf_skipped
+
+    db = Session(bind=bind)
+    try:
+        payloads = PortfolioReportService(db).load_payloads(project_ids, status)
+    finally:
+        db.close()
+
+    job_registry.start(job, total=len(payloads), message=f"Gerando relatórios de {len(payloads)} projetos")
+
+    fd, path = tempfile.mkstemp(prefix="portfolio_", suffix=".zip", dir=PORTFOLIO_REPORT_DIR)
+    os.close(fd)
+    errors = []
+    files_written = 0
+    try:
+        # xlsx e pdf já são comprimidos: gravar sem compressão evita gastar CPU à toa
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+            for project_id, files, error in _render_all(executor or get_cpu_executor(), payloads, include_pdf):
+                if error:
+                    print(f"⚠️ Falha ao gerar relatório do projeto {project_id}: {error}")
+                    errors.append({"project_id": project_id, "error": error})
+                else:
+                    for name, content in files:
+                        archive.writestr(name, content)
+                    files_written += len(files)
+                job_registry.advance(job)
+    except Exception:
+        os.remove(path)
+        raise
+
+    job_registry.complete(
+        job,
+        result={
+            "projects": len(payloads),
+            "files": files_written,
+            "errors": errors,
+            "pdf_skipped": pdf_skipped,
+        },
+        file_path=path,
+        filename=f"relatorios_portfolio_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+        media_type="application/zip",
+    )
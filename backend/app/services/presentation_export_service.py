@@ -1,6 +1,9 @@
 """
 Export Service - Geração de apresentações PowerPoint
 """
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import List, Optional
 from io import BytesIO
 from pptx import Presentation
@@ -15,11 +18,51 @@ from ..models.location import Location
 from ..models.location_photo import LocationPhoto
 from ..schemas.presentation_export import PresentationExportRequest
 
+# Downloads de fotos em paralelo por apresentação
+PHOTO_DOWNLOAD_WORKERS = int(os.getenv("EXPORT_PHOTO_DOWNLOAD_WORKERS", "6"))
+# Foto principal + até 4 miniaturas por slide
+MAX_PHOTOS_PER_SLIDE = 5
+
+
+@dataclass
+class LocationSlideData:
+    """Dados de uma locação já carregados (sem sessão), prontos para renderização"""
+    id: int
+    title: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    sector_type: Optional[str] = None
+    space_type: Optional[str] = None
+    capacity: Optional[int] = None
+    daily_rate: Optional[float] = None
+    description: Optional[str] = None
+    photos: List[bytes] = field(default_factory=list)
+
+
+@dataclass
+class PresentationSnapshot:
+    """Entrada serializável (pickle) da renderização, usada no pool de processos"""
+    title: str
+    subtitle: Optional[str] = None
+    include_summary: bool = True
+    locations: List[LocationSlideData] = field(default_factory=list)
+
+
+def render_presentation(snapshot: PresentationSnapshot) -> bytes:
+    """Renderiza o PPTX a partir de um snapshot (CPU-bound, sem banco nem rede)"""
+    return PresentationExportService(None).render(snapshot)
+
+
+def _enum_value(value) -> Optional[str]:
+    if value is None:
+        return None
+    return value.value if hasattr(value, 'value') else str(value)
+
 
 class PresentationExportService:
     """Serviço para exportar locações para PowerPoint"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Optional[Session]):
         self.db = db
         # Cores do tema escuro
         self.colors = {
@@ -32,7 +75,14 @@ class PresentationExportService:
         }
 
     def create_presentation(self, request: PresentationExportRequest) -> bytes:
-        """Cria apresentação PowerPoint das locações"""
+        """Cria apresentação PowerPoint das locações (síncrono: coleta + renderização)"""
+        return self.render(self.build_snapshot(request))
+
+    def build_snapshot(self, request: PresentationExportRequest) -> PresentationSnapshot:
+        """
+        Etapa de I/O: carrega as locações e baixa as fotos.
+        O resultado não depende da sessão e pode ser enviado ao pool de processos.
+        """
 
         # Reordenar IDs conforme order
         ordered_ids = [request.location_ids[i] for i in request.order]
@@ -52,19 +102,9 @@ class PresentationExportService:
             for sel in request.selected_photos:
                 selected_photos_map[sel.location_id] = sel.photo_ids
 
-        # Criar apresentação
-        prs = Presentation()
-        prs.slide_width = Inches(13.33)
-        prs.slide_height = Inches(7.5)
-
-        # Slide de capa
-        title = request.title or "Apresentação de Locações"
-        subtitle = request.subtitle
-        self._add_cover_slide(prs, title, subtitle)
-
-        # Slides de locações
+        # Selecionar fotos de cada locação
+        photo_urls_by_location = []
         for location in ordered_locations:
-            # Filtrar fotos se seleção específica
             photos = []
             if request.include_photos and location.photos:
                 if location.id in selected_photos_map:
@@ -72,12 +112,73 @@ class PresentationExportService:
                     photos = [p for p in location.photos if p.id in photo_ids]
                 else:
                     photos = list(location.photos)
+            urls = [p.url for p in photos[:MAX_PHOTOS_PER_SLIDE] if getattr(p, 'url', None)]
+            photo_urls_by_location.append(urls)
+
+        downloaded = self._download_photos([url for urls in photo_urls_by_location for url in urls])
+
+        slides = []
+        for location, urls in zip(ordered_locations, photo_urls_by_location):
+            slides.append(LocationSlideData(
+                id=location.id,
+                title=location.title,
+                city=location.city,
+                state=location.state,
+                sector_type=_enum_value(getattr(location, 'sector_type', None)),
+                space_type=_enum_value(getattr(location, 'space_type', None)),
+                capacity=location.capacity,
+                daily_rate=getattr(location, 'daily_rate', None) or getattr(location, 'price_day_cinema', None),
+                description=location.description,
+                photos=[downloaded[url] for url in urls if downloaded.get(url)],
+            ))
+
+        return PresentationSnapshot(
+            title=request.title or "Apresentação de Locações",
+            subtitle=request.subtitle,
+            include_summary=request.include_summary,
+            locations=slides,
+        )
 
-            self._add_location_slide(prs, location, photos, request.include_summary)
+    def _download_photos(self, urls: List[str]) -> dict:
+        """Baixa as fotos em paralelo com um único cliente HTTP (reuso de conexões)"""
+        unique_urls = list(dict.fromkeys(urls))
+        if not unique_urls:
+            return {}
+
+        results = {}
+        with httpx.Client(timeout=10.0) as client:
+            def fetch(url: str):
+                try:
+                    response = client.get(url)
+                    if response.status_code == 200:
+                        return url, response.content
+                except Exception as e:
+                    print(f"Erro ao baixar imagem: {e}")
+                return url, None
+
+            with ThreadPoolExecutor(max_workers=min(PHOTO_DOWNLOAD_WORKERS, len(unique_urls))) as pool:
+                for url, content in pool.map(fetch, unique_urls):
+                    results[url] = content
+        return results
+
+    def render(self, snapshot: PresentationSnapshot) -> bytes:
+        """Etapa de CPU: monta os slides e serializa o PPTX"""
+
+        # Criar apresentação
+        prs = Presentation()
+        prs.slide_width = Inches(13.33)
+        prs.slide_height = Inches(7.5)
+
+        # Slide de capa
+        self._add_cover_slide(prs, snapshot.title, snapshot.subtitle)
+
+        # Slides de locações
+        for location in snapshot.locations:
+            self._add_location_slide(prs, location, location.photos, snapshot.include_summary)
 
         # Slide de resumo se solicitado
-        if request.include_summary:
-            self._add_summary_slide(prs, ordered_locations)
+        if snapshot.include_summary:
+            self._add_summary_slide(prs, snapshot.locations)
 
         # Slide final
         self._add_closing_slide(prs)
@@ -137,7 +238,7 @@ class PresentationExportService:
         line.fill.fore_color.rgb = self.colors['primary']
         line.line.fill.background()
 
-    def _add_location_slide(self, prs: Presentation, location: Location, photos: List, include_info: bool):
+    def _add_location_slide(self, prs: Presentation, location: LocationSlideData, photos: List[bytes], include_info: bool):
         """Adiciona slide de locação"""
         slide_layout = prs.slide_layouts[6]  # Blank
         slide = prs.slides.add_slide(slide_layout)
@@ -186,44 +287,28 @@ class PresentationExportService:
 
         # Área de fotos (se disponível)
         if photos:
-            photo = photos[0]
-            photo_url = photo.url if hasattr(photo, 'url') and photo.url else None
-
-            if photo_url:
-                try:
-                    # Baixar imagem
-                    with httpx.Client(timeout=10.0) as client:
-                        response = client.get(photo_url)
-                        if response.status_code == 200:
-                            image_bytes = BytesIO(response.content)
-                            # Adicionar imagem grande
-                            slide.shapes.add_picture(
-                                image_bytes,
-                                Inches(0.5), Inches(content_top),
-                                width=Inches(7)
-                            )
-                except Exception as e:
-                    print(f"Erro ao baixar imagem: {e}")
+            try:
+                # Adicionar imagem grande
+                slide.shapes.add_picture(
+                    BytesIO(photos[0]),
+                    Inches(0.5), Inches(content_top),
+                    width=Inches(7)
+                )
+            except Exception as e:
+                print(f"Erro ao inserir imagem: {e}")
 
             # Miniaturas adicionais
             if len(photos) > 1:
                 thumb_left = 7.8
                 thumb_top = content_top
                 thumb_size = 1.5
-                for i, p in enumerate(photos[1:5]):  # Max 4 thumbnails
-                    p_url = p.url if hasattr(p, 'url') and p.url else None
-                    if not p_url:
-                        continue
+                for i, image in enumerate(photos[1:5]):  # Max 4 thumbnails
                     try:
-                        with httpx.Client(timeout=10.0) as client:
-                            resp = client.get(p_url)
-                            if resp.status_code == 200:
-                                img_bytes = BytesIO(resp.content)
-                                slide.shapes.add_picture(
-                                    img_bytes,
-                                    Inches(thumb_left), Inches(thumb_top + i * (thumb_size + 0.2)),
-                                    width=Inches(thumb_size)
-                                )
+                        slide.shapes.add_picture(
+                            BytesIO(image),
+                            Inches(thumb_left), Inches(thumb_top + i * (thumb_size + 0.2)),
+                            width=Inches(thumb_size)
+                        )
                     except Exception:
                         pass
 
@@ -241,19 +326,14 @@ class PresentationExportService:
 
             # Adicionar informações
             infos = []
-            sector = getattr(location, 'sector_type', None)
-            if sector:
-                sector_val = sector.value if hasattr(sector, 'value') else str(sector)
-                infos.append(f"Setor: {sector_val}")
-            space = getattr(location, 'space_type', None)
-            if space:
-                space_val = space.value if hasattr(space, 'value') else str(space)
-                infos.append(f"Tipo: {space_val}")
+            if location.sector_type:
+                infos.append(f"Setor: {location.sector_type}")
+            if location.space_type:
+                infos.append(f"Tipo: {location.space_type}")
             if location.capacity:
                 infos.append(f"Capacidade: {location.capacity} pessoas")
-            daily_rate = getattr(location, 'daily_rate', None) or getattr(location, 'price_day_cinema', None)
-            if daily_rate:
-                infos.append(f"Diária: R$ {daily_rate:,.2f}")
+            if location.daily_rate:
+                infos.append(f"Diária: R$ {location.daily_rate:,.2f}")
             if location.description:
                 desc = location.description[:200] + "..." if len(location.description or "") > 200 else location.description
                 infos.append(f"\n{desc}")
@@ -268,7 +348,7 @@ class PresentationExportService:
                 p.font.color.rgb = self.colors['text_secondary']
                 p.space_after = Pt(8)
 
-    def _add_summary_slide(self, prs: Presentation, locations: List[Location]):
+    def _add_summary_slide(self, prs: Presentation, locations: List[LocationSlideData]):
         """Adiciona slide de resumo"""
         slide_layout = prs.slide_layouts[6]
         slide = prs.slides.add_slide(slide_layout)
@@ -9,7 +9,7 @@ Este service é responsável por:
 """
 
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import date, datetime
 
 from ..models.project_location import ProjectLocation
@@ -18,18 +18,33 @@ from ..models.location import Location
 from ..models.project import Project
 
 
+# Tipos de evento gerados a partir das datas da ProjectLocation (um por tipo)
+GENERATED_EVENT_TYPES = (
+    EventType.VISIT_SCHEDULED,
+    EventType.TECHNICAL_VISIT,
+    EventType.FILMING_START,
+    EventType.FILMING_END,
+    EventType.FILMING_PERIOD,
+    EventType.DELIVERY,
+    EventType.LOCATION_RENTAL_FULL,
+)
+
+# Campos derivados da ProjectLocation; cor, status e prioridade podem ser editados no calendário
+SYNCED_FIELDS = ("title", "description", "start_date", "end_date", "all_day", "project_id", "location_id", "metadata_json")
+
+
 class ProjectLocationCalendarService:
     """Service para gerenciar eventos do calendário relacionados a ProjectLocations"""
 
     @staticmethod
-    def create_all_events(
+    def desired_events(
         db: Session,
         project_location: ProjectLocation
-    ) -> List[AgendaEvent]:
+    ) -> Dict[EventType, Dict[str, Any]]:
         """
-        Cria todos os eventos do calendário para uma ProjectLocation.
+        Eventos que a ProjectLocation deve ter no calendário, por tipo.
 
-        Eventos criados automaticamente:
+        Eventos gerados:
         - Visitação (se visit_date preenchido)
         - Visita Técnica (se technical_visit_date preenchido)
         - Início de Filmagem (se filming_start_date preenchido)
@@ -38,192 +53,139 @@ class ProjectLocationCalendarService:
         - Entrega (se delivery_date preenchido)
         - Período de Locação (rental_start e rental_end)
         """
-        created_events = []
-
-        # Buscar location e project para títulos
-        location = db.query(Location).filter(Location.id == project_location.location_id).first()
-        project = db.query(Project).filter(Project.id == project_location.project_id).first()
+        # db.get usa o identity map: sem consulta quando location e project já estão na sessão
+        location = db.get(Location, project_location.location_id)
+        project = db.get(Project, project_location.project_id)
 
         if not location or not project:
-            return created_events
+            return {}
 
-        location_name = location.title
-        project_name = project.name
+        return ProjectLocationCalendarService.build_desired_events(project_location, location.title, project.name)
 
-        # 1. Visitação Inicial
-        if project_location.visit_date:
-            event = AgendaEvent(
-                title=f"Visitação: {location_name}",
-                description=f"Visitação inicial da locação '{location_name}' para o projeto '{project_name}'",
-                event_type=EventType.VISIT_SCHEDULED,
-                status=EventStatus.SCHEDULED,
-                start_date=project_location.visit_date.isoformat(),
-                end_date=None,
-                all_day=project_location.visit_time is None,
-                project_id=project_location.project_id,
-                location_id=project_location.location_id,
-                project_location_id=project_location.id,
-                color="#4CAF50",  # Verde
-                priority=2,
-                metadata_json={
+    @staticmethod
+    def build_desired_events(
+        project_location: Any,
+        location_name: str,
+        project_name: str
+    ) -> Dict[EventType, Dict[str, Any]]:
+        """
+        Eventos desejados a partir dos campos da locação e dos nomes já carregados.
+        Aceita a ProjectLocation ou uma linha de consulta com os mesmos atributos (regeneração em lote).
+        """
+        pl = project_location
+
+        def event_data(title, description, start, end, all_day, color, priority, **metadata):
+            return {
+                "title": title,
+                "description": description,
+                "start_date": start,
+                "end_date": end,
+                "all_day": all_day,
+                "project_id": pl.project_id,
+                "location_id": pl.location_id,
+                "color": color,
+                "priority": priority,
+                "metadata_json": {
                     "project_name": project_name,
                     "location_name": location_name,
+                    **metadata,
                     "event_source": "project_location_dates"
-                }
+                },
+            }
+
+        events: Dict[EventType, Dict[str, Any]] = {}
+
+        # 1. Visitação Inicial
+        if pl.visit_date:
+            events[EventType.VISIT_SCHEDULED] = event_data(
+                f"Visitação: {location_name}",
+                f"Visitação inicial da locação '{location_name}' para o projeto '{project_name}'",
+                pl.visit_date, None, pl.visit_time is None,
+                "#4CAF50", 2,  # Verde
             )
-            db.add(event)
-            created_events.append(event)
 
         # 2. Visitação Técnica
-        if project_location.technical_visit_date:
-            event = AgendaEvent(
-                title=f"Visita Técnica: {location_name}",
-                description=f"Avaliação técnica detalhada da locação '{location_name}' para o projeto '{project_name}'",
-                event_type=EventType.TECHNICAL_VISIT,
-                status=EventStatus.SCHEDULED,
-                start_date=project_location.technical_visit_date.isoformat(),
-                end_date=None,
-                all_day=project_location.technical_visit_time is None,
-                project_id=project_location.project_id,
-                location_id=project_location.location_id,
-                project_location_id=project_location.id,
-                color="#2196F3",  # Azul
-                priority=2,
-                metadata_json={
-                    "project_name": project_name,
-                    "location_name": location_name,
-                    "event_source": "project_location_dates"
-                }
+        if pl.technical_visit_date:
+            events[EventType.TECHNICAL_VISIT] = event_data(
+                f"Visita Técnica: {location_name}",
+                f"Avaliação técnica detalhada da locação '{location_name}' para o projeto '{project_name}'",
+                pl.technical_visit_date, None, pl.technical_visit_time is None,
+                "#2196F3", 2,  # Azul
             )
-            db.add(event)
-            created_events.append(event)
 
         # 3. Início de Gravação
-        if project_location.filming_start_date:
-            event = AgendaEvent(
-                title=f"Início de Gravação: {location_name}",
-                description=f"Início da filmagem na locação '{location_name}' para o projeto '{project_name}'",
-                event_type=EventType.FILMING_START,
-                status=EventStatus.SCHEDULED,
-                start_date=project_location.filming_start_date.isoformat(),
-                end_date=None,
-                all_day=project_location.filming_start_time is None,
-                project_id=project_location.project_id,
-                location_id=project_location.location_id,
-                project_location_id=project_location.id,
-                color="#FF9800",  # Laranja
-                priority=3,  # Alta prioridade
-                metadata_json={
-                    "project_name": project_name,
-                    "location_name": location_name,
-                    "event_source": "project_location_dates"
-                }
+        if pl.filming_start_date:
+            events[EventType.FILMING_START] = event_data(
+                f"Início de Gravação: {location_name}",
+                f"Início da filmagem na locação '{location_name}' para o projeto '{project_name}'",
+                pl.filming_start_date, None, pl.filming_start_time is None,
+                "#FF9800", 3,  # Laranja, alta prioridade
             )
-            db.add(event)
-            created_events.append(event)
 
         # 4. Fim de Gravação
-        if project_location.filming_end_date:
-            event = AgendaEvent(
-                title=f"Fim de Gravação: {location_name}",
-                description=f"Fim da filmagem na locação '{location_name}' para o projeto '{project_name}'",
-                event_type=EventType.FILMING_END,
-                status=EventStatus.SCHEDULED,
-                start_date=project_location.filming_end_date.isoformat(),
-                end_date=None,
-                all_day=project_location.filming_end_time is None,
-                project_id=project_location.project_id,
-                location_id=project_location.location_id,
-                project_location_id=project_location.id,
-                color="#FF5722",  # Laranja escuro
-                priority=3,  # Alta prioridade
-                metadata_json={
-                    "project_name": project_name,
-                    "location_name": location_name,
-                    "event_source": "project_location_dates"
-                }
+        if pl.filming_end_date:
+            events[EventType.FILMING_END] = event_data(
+                f"Fim de Gravação: {location_name}",
+                f"Fim da filmagem na locação '{location_name}' para o projeto '{project_name}'",
+                pl.filming_end_date, None, pl.filming_end_time is None,
+                "#FF5722", 3,  # Laranja escuro, alta prioridade
             )
-            db.add(event)
-            created_events.append(event)
 
         # 5. Período Completo de Gravação (se ambos start e end existem)
-        if project_location.filming_start_date and project_location.filming_end_date:
-            days = (project_location.filming_end_date - project_location.filming_start_date).days + 1
-            event = AgendaEvent(
-                title=f"Gravação: {location_name}",
-                description=f"Período completo de filmagem ({days} dias) na locação '{location_name}' para o projeto '{project_name}'",
-                event_type=EventType.FILMING_PERIOD,
-                status=EventStatus.SCHEDULED,
-                start_date=project_location.filming_start_date.isoformat(),
-                end_date=project_location.filming_end_date.isoformat(),
-                all_day=True,
-                project_id=project_location.project_id,
-                location_id=project_location.location_id,
-                project_location_id=project_location.id,
-                color="#FFC107",  # Âmbar
-                priority=3,
-                metadata_json={
-                    "project_name": project_name,
-                    "location_name": location_name,
-                    "duration_days": days,
-                    "event_source": "project_location_dates"
-                }
+        if pl.filming_start_date and pl.filming_end_date:
+            days = (pl.filming_end_date - pl.filming_start_date).days + 1
+            events[EventType.FILMING_PERIOD] = event_data(
+                f"Gravação: {location_name}",
+                f"Período completo de filmagem ({days} dias) na locação '{location_name}' para o projeto '{project_name}'",
+                pl.filming_start_date, pl.filming_end_date, True,
+                "#FFC107", 3,  # Âmbar
+                duration_days=days,
             )
-            db.add(event)
-            created_events.append(event)
 
         # 6. Entrega
-        if project_location.delivery_date:
-            event = AgendaEvent(
-                title=f"Entrega: {location_name}",
-                description=f"Entrega final da locação '{location_name}' para o projeto '{project_name}'",
-                event_type=EventType.DELIVERY,
-                status=EventStatus.SCHEDULED,
-                start_date=project_location.delivery_date.isoformat(),
-                end_date=None,
-                all_day=project_location.delivery_time is None,
-                project_id=project_location.project_id,
-                location_id=project_location.location_id,
-                project_location_id=project_location.id,
-                color="#F44336",  # Vermelho
-                priority=3,
-                metadata_json={
-                    "project_name": project_name,
-                    "location_name": location_name,
-                    "event_source": "project_location_dates"
-                }
+        if pl.delivery_date:
+            events[EventType.DELIVERY] = event_data(
+                f"Entrega: {location_name}",
+                f"Entrega final da locação '{location_name}' para o projeto '{project_name}'",
+                pl.delivery_date, None, pl.delivery_time is None,
+                "#F44336", 3,  # Vermelho
             )
-            db.add(event)
-            created_events.append(event)
 
         # 7. Período de Locação (sempre criado - campos obrigatórios)
-        if project_location.rental_start and project_location.rental_end:
-            days = (project_location.rental_end - project_location.rental_start).days + 1
-            event = AgendaEvent(
-                title=f"Locação: {location_name}",
-                description=f"Período completo de locação ({days} dias) da '{location_name}' para o projeto '{project_name}'",
-                event_type=EventType.LOCATION_RENTAL_FULL,
-                status=EventStatus.SCHEDULED,
-                start_date=project_location.rental_start.isoformat(),
-                end_date=project_location.rental_end.isoformat(),
-                all_day=True,
-                project_id=project_location.project_id,
-                location_id=project_location.location_id,
-                project_location_id=project_location.id,
-                color="#9C27B0",  # Roxo
-                priority=2,
-                metadata_json={
-                    "project_name": project_name,
-                    "location_name": location_name,
-                    "daily_rate": float(project_location.daily_rate) if project_location.daily_rate else 0,
-                    "total_cost": float(project_location.total_cost) if project_location.total_cost else 0,
-                    "duration_days": days,
-                    "event_source": "project_location_dates"
-                }
+        if pl.rental_start and pl.rental_end:
+            days = (pl.rental_end - pl.rental_start).days + 1
+            events[EventType.LOCATION_RENTAL_FULL] = event_data(
+                f"Locação: {location_name}",
+                f"Período completo de locação ({days} dias) da '{location_name}' para o projeto '{project_name}'",
+                pl.rental_start, pl.rental_end, True,
+                "#9C27B0", 2,  # Roxo
+                daily_rate=float(pl.daily_rate) if pl.daily_rate else 0,
+                total_cost=float(pl.total_cost) if pl.total_cost else 0,
+                duration_days=days,
             )
-            db.add(event)
-            created_events.append(event)
 
+        return events
+
+    @staticmethod
+    def _new_event(project_location: ProjectLocation, event_type: EventType, data: Dict[str, Any]) -> AgendaEvent:
+        return AgendaEvent(
+            event_type=event_type,
+            status=EventStatus.SCHEDULED,
+            project_location_id=project_location.id,
+            **data
+        )
+
+    @staticmethod
+    def create_all_events(
+        db: Session,
+        project_location: ProjectLocation
+    ) -> List[AgendaEvent]:
+        """Cria todos os eventos do calendário para uma ProjectLocation recém-criada"""
+        created_events = [
+            ProjectLocationCalendarService._new_event(project_location, event_type, data)
+            for event_type, data in ProjectLocationCalendarService.desired_events(db, project_location).items()
+        ]
+        db.add_all(created_events)
         db.commit()
         return created_events
 
@@ -233,15 +195,46 @@ class ProjectLocationCalendarService:
         project_location: ProjectLocation
     ) -> List[AgendaEvent]:
         """
-        Atualiza todos os eventos vinculados a uma ProjectLocation.
+        Sincroniza os eventos vinculados a uma ProjectLocation com as datas atuais.
 
-        Remove eventos antigos e cria novos baseados nas datas atuais.
+        Compara o conjunto desejado com os eventos existentes por (project_location_id, event_type)
+        e só insere, altera ou remove o que mudou, em uma transação. Ids dos eventos e edições
+        manuais (cor, status, prioridade) são preservados; eventos de outros tipos vinculados à
+        locação não são tocados. Sem mudanças, nada é gravado.
         """
-        # Deletar eventos existentes
-        ProjectLocationCalendarService.delete_events(db, project_location.id)
-
-        # Criar novos eventos
-        return ProjectLocationCalendarService.create_all_events(db, project_location)
+        desired = ProjectLocationCalendarService.desired_events(db, project_location)
+        existing = db.query(AgendaEvent).filter(
+            AgendaEvent.project_location_id == project_location.id,
+            AgendaEvent.event_type.in_(GENERATED_EVENT_TYPES)
+        ).order_by(AgendaEvent.id).all()
+
+        current: Dict[EventType, AgendaEvent] = {}
+        changed = False
+        for event in existing:
+            if event.event_type in desired and event.event_type not in current:
+                current[event.event_type] = event
+            else:
+                # Data removida da locação (ou duplicata de sincronizações antigas)
+                db.delete(event)
+                changed = True
+
+        events = []
+        for event_type, data in desired.items():
+            event = current.get(event_type)
+            if event is None:
+                event = ProjectLocationCalendarService._new_event(project_location, event_type, data)
+                db.add(event)
+                changed = True
+            else:
+                for field in SYNCED_FIELDS:
+                    if getattr(event, field) != data[field]:
+                        setattr(event, field, data[field])
+                        changed = True
+            events.append(event)
+
+        if changed:
+            db.commit()
+        return events
 
     @staticmethod
     def delete_events(
@@ -279,41 +272,41 @@ class ProjectLocationCalendarService:
         # Mapear tipo de evento para campo de data
         if event.event_type == EventType.VISIT_SCHEDULED:
             if event.start_date:
-                project_location.visit_date = datetime.fromisoformat(event.start_date).date()
+                project_location.visit_date = event.start_date
                 updated = True
 
         elif event.event_type == EventType.TECHNICAL_VISIT:
             if event.start_date:
-                project_location.technical_visit_date = datetime.fromisoformat(event.start_date).date()
+                project_location.technical_visit_date = event.start_date
                 updated = True
 
         elif event.event_type == EventType.FILMING_START:
             if event.start_date:
-                project_location.filming_start_date = datetime.fromisoformat(event.start_date).date()
+                project_location.filming_start_date = event.start_date
                 updated = True
 
         elif event.event_type == EventType.FILMING_END:
             if event.start_date:
-                project_location.filming_end_date = datetime.fromisoformat(event.start_date).date()
+                project_location.filming_end_date = event.start_date
                 updated = True
 
         elif event.event_type == EventType.FILMING_PERIOD:
             if event.start_date:
-                project_location.filming_start_date = datetime.fromisoformat(event.start_date).date()
+                project_location.filming_start_date = event.start_date
             if event.end_date:
-                project_location.filming_end_date = datetime.fromisoformat(event.end_date).date()
+                project_location.filming_end_date = event.end_date
             updated = True
 
         elif event.event_type == EventType.DELIVERY:
             if event.start_date:
-                project_location.delivery_date = datetime.fromisoformat(event.start_date).date()
+                project_location.delivery_date = event.start_date
                 updated = True
 
         elif event.event_type == EventType.LOCATION_RENTAL_FULL:
             if event.start_date:
-                project_location.rental_start = datetime.fromisoformat(event.start_date).date()
+                project_location.rental_start = event.start_date
             if event.end_date:
-                project_location.rental_end = datetime.fromisoformat(event.end_date).date()
+                project_location.rental_end = event.end_date
             updated = True
 
         if updated:
@@ -12,14 +12,33 @@ from ..schemas.project_location import (
     ProjectLocationFilter
 )
 from .project_location_stage_service import ProjectLocationStageService
+from .booking_conflict_service import BookingConflictService
+from .overdue_service import RENTALS, overdue_filter
+from .stage_progress_service import StageProgressService
+from .stage_schedule_service import StageScheduleService
+
+# Campos que definem as janelas de ocupação da locação (e o status, que libera a reserva se cancelada)
+BOOKING_FIELDS = ("rental_start", "rental_end", "filming_start_date", "filming_end_date", "technical_visit_date", "status")
 
 class ProjectLocationService:
     def __init__(self, db: Session):
         self.db = db
         self.stage_service = ProjectLocationStageService(db)
+        self.conflict_service = BookingConflictService(db)
+
+    def create_project_location(self, location_data: ProjectLocationCreate, allow_conflicts: bool = False) -> ProjectLocation:
+        """
+        Cria uma nova locação em um projeto
+        Reserva que se sobrepõe à de outro projeto na mesma locação lança BookingConflictError;
+        com `allow_conflicts` é gravada e os conflitos ficam em `booking_conflicts`.
+        """
+        conflicts = self.conflict_service.check(
+            location_data.location_id,
+            location_data.project_id,
+            location_data.dict(),
+            allow_conflicts=allow_conflicts,
+        )
 
-    def create_project_location(self, location_data: ProjectLocationCreate) -> ProjectLocation:
-        """Cria uma nova locação em um projeto"""
         # Calcula o custo total automaticamente
         location_data.total_cost = self._calculate_total_cost(
             location_data.daily_rate,
@@ -32,12 +51,14 @@ class ProjectLocationService:
 
         project_location = ProjectLocation(**location_data.dict())
         self.db.add(project_location)
+        self.db.flush()
+
+        # Cria etapas padrão automaticamente, no mesmo commit da locação
+        self.stage_service.create_default_stages(project_location.id, commit=False)
         self.db.commit()
         self.db.refresh(project_location)
 
-        # Cria etapas padrão automaticamente
-        self.stage_service.create_default_stages(project_location.id)
-
+        project_location.booking_conflicts = conflicts
         return project_location
 
     def get_project_location(self, location_id: int) -> Optional[ProjectLocation]:
@@ -84,20 +105,7 @@ class ProjectLocationService:
             query = query.filter(ProjectLocation.responsible_user_id.in_(filters.responsible_user_ids))
 
         if filters.is_overdue is not None:
-            if filters.is_overdue:
-                query = query.filter(
-                    and_(
-                        ProjectLocation.rental_end < date.today(),
-                        ProjectLocation.status != RentalStatus.RETURNED
-                    )
-                )
-            else:
-                query = query.filter(
-                    or_(
-                        ProjectLocation.rental_end >= date.today(),
-                        ProjectLocation.status == RentalStatus.RETURNED
-                    )
-                )
+            query = query.filter(overdue_filter(self.db, RENTALS, filters.is_overdue))
 
         if filters.is_active is not None:
             if filters.is_active:
@@ -119,14 +127,25 @@ class ProjectLocationService:
 
         return query.order_by(ProjectLocation.rental_start.asc()).offset(skip).limit(limit).all()
 
-    def update_project_location(self, location_id: int, location_data: ProjectLocationUpdate) -> Optional[ProjectLocation]:
-        """Atualiza uma locação de projeto"""
+    def update_project_location(self, location_id: int, location_data: ProjectLocationUpdate, allow_conflicts: bool = False) -> Optional[ProjectLocation]:
+        """Atualiza uma locação de projeto (datas conferidas contra reservas de outros projetos)"""
         project_location = self.get_project_location(location_id)
         if not project_location:
             return None
 
         update_data = location_data.dict(exclude_unset=True)
 
+        conflicts = []
+        if any(field in update_data for field in BOOKING_FIELDS):
+            values = {field: update_data.get(field, getattr(project_location, field)) for field in BOOKING_FIELDS}
+            conflicts = self.conflict_service.check(
+                project_location.location_id,
+                project_location.project_id,
+                values,
+                project_location_id=project_location.id,
+                allow_conflicts=allow_conflicts,
+            )
+
         # Se mudou datas ou preços, recalcula o custo total
         if any(field in update_data for field in ['daily_rate', 'hourly_rate', 'rental_start', 'rental_end', 'rental_start_time', 'rental_end_time']):
             update_data['total_cost'] = self._calculate_total_cost(
@@ -144,6 +163,7 @@ class ProjectLocationService:
         self.db.commit()
         self.db.refresh(project_location)
 
+        project_location.booking_conflicts = conflicts
         return project_location
 
     def delete_project_location(self, location_id: int) -> bool:
@@ -224,18 +244,16 @@ class ProjectLocationService:
 
         milestones.sort(key=lambda x: x['date'] or datetime.max.replace(tzinfo=timezone.utc))
 
-        # Caminho crítico (etapas críticas em sequência)
-        critical_path = []
-        for loc in locations:
-            critical_stages = [s for s in loc.stages if s.is_critical]
-            critical_stages.sort(key=lambda x: x.planned_start_date or datetime.min.replace(tzinfo=timezone.utc))
-            critical_path.extend(critical_stages)
+        # Caminho crítico (CPM sobre as dependências das etapas)
+        schedule = StageScheduleService(self.db).project_schedule(project_id)
+        critical_path = [stage for stage in schedule['stages'] if stage['on_critical_path']]
 
         return {
             'project_id': project_id,
             'locations': location_timeline,
             'milestones': milestones,
-            'critical_path': critical_path
+            'critical_path': critical_path,
+            'schedule': schedule
         }
 
     def _calculate_total_cost(self, daily_rate: float, hourly_rate: Optional[float],
@@ -253,8 +271,5 @@ class ProjectLocationService:
             return duration_days * daily_rate
 
     def update_location_progress(self, location_id: int):
-        """Atualiza o progresso de uma locação"""
-        project_location = self.get_project_location(location_id)
-        if project_location:
-            project_location.update_completion_percentage()
-            self.db.commit()
+        """Recalcula o progresso de uma locação a partir das etapas (e ajusta o do projeto)"""
+        StageProgressService(self.db).recalculate_location(location_id)
@@ -5,7 +5,12 @@ from datetime import datetime, timezone
 from ..models.project_location_stage import ProjectLocationStage, LocationStageType, StageStatus
 from ..models.project_location_stage_history import ProjectLocationStageHistory
 from ..models.project_location import ProjectLocation
+from ..models.project import Project
 from ..models.user import User
+from .overdue_service import STAGES, overdue_filter
+from .stage_progress_service import StageProgressService
+from .stage_templates import location_stage_templates
+from .stage_schedule_service import StageScheduleService
 from ..schemas.project_location_stage import (
     ProjectLocationStageCreate,
     ProjectLocationStageUpdate,
@@ -14,6 +19,10 @@ from ..schemas.project_location_stage import (
 )
 import json
 
+# Campos que mudam o cronograma das etapas dependentes
+SCHEDULE_FIELDS = {'planned_start_date', 'planned_end_date', 'dependencies_json', 'status', 'actual_start_date', 'actual_end_date'}
+
+
 class ProjectLocationStageService:
     def __init__(self, db: Session):
         self.db = db
@@ -21,13 +30,17 @@ class ProjectLocationStageService:
     def create_stage(self, stage_data: ProjectLocationStageCreate) -> ProjectLocationStage:
         """Cria uma nova etapa de locação"""
         stage = ProjectLocationStage(**stage_data.dict())
+        schedule = StageScheduleService(self.db)
+        if stage.dependencies_json:
+            schedule.validate_dependencies(stage.project_location_id, stage.dependencies_json)
         self.db.add(stage)
+        if stage.dependencies_json:
+            # Começa depois dos predecessores (e empurra o que vier depois), no mesmo commit
+            self.db.flush()
+            schedule.propagate([stage.id])
         self.db.commit()
         self.db.refresh(stage)
 
-        # Atualiza o progresso da locação
-        self._update_location_progress(stage.project_location_id)
-
         return stage
 
     def get_stage(self, stage_id: int) -> Optional[ProjectLocationStage]:
@@ -97,15 +110,21 @@ class ProjectLocationStageService:
             if modified_by_user_id:
                 update_data['completion_changed_by_user_id'] = modified_by_user_id
 
+        schedule = StageScheduleService(self.db)
+        if update_data.get('dependencies_json'):
+            schedule.validate_dependencies(stage.project_location_id, update_data['dependencies_json'], stage_id=stage.id)
+
         for field, value in update_data.items():
             setattr(stage, field, value)
 
+        # Datas, dependências ou conclusão mudaram: reprograma só as etapas seguintes
+        if SCHEDULE_FIELDS & update_data.keys():
+            self.db.flush()
+            schedule.propagate([stage.id])
+
         self.db.commit()
         self.db.refresh(stage)
 
-        # Atualiza o progresso da locação
-        self._update_location_progress(stage.project_location_id)
-
         return stage
 
     def delete_stage(self, stage_id: int) -> bool:
@@ -114,13 +133,11 @@ class ProjectLocationStageService:
         if not stage:
             return False
 
-        project_location_id = stage.project_location_id
+        # O progresso da locação e do projeto é ajustado pelos hooks de flush (stage_progress_service)
+        StageScheduleService(self.db).detach(stage)
         self.db.delete(stage)
         self.db.commit()
 
-        # Atualiza o progresso da locação
-        self._update_location_progress(project_location_id)
-
         return True
 
     def update_stage_status(
@@ -167,16 +184,17 @@ class ProjectLocationStageService:
         )
 
         self.db.add(history_entry)
+        if new_status == StageStatus.COMPLETED:
+            # Datas reais passam a valer no cronograma
+            self.db.flush()
+            StageScheduleService(self.db).propagate([stage.id])
         self.db.commit()
         self.db.refresh(stage)
 
-        # Atualiza o progresso da locação
-        self._update_location_progress(stage.project_location_id)
-
         return stage
 
     def get_stage_history(self, stage_id: int) -> List[ProjectLocationStageHistory]:
-        """Retorna o histórico completo de mudanças de uma etapa"""
+        """Retorna o histórico de mudanças de uma etapa (o que passou da retenção está compactado; ver StageStatusAnalyticsService)"""
         return self.db.query(ProjectLocationStageHistory).options(
             joinedload(ProjectLocationStageHistory.changed_by)
         ).filter(
@@ -185,14 +203,29 @@ class ProjectLocationStageService:
             ProjectLocationStageHistory.changed_at.desc()
         ).all()
 
-    def create_default_stages(self, project_location_id: int, templates: List[ProjectLocationStageTemplate] = None) -> List[ProjectLocationStage]:
-        """Cria etapas padrão para uma locação"""
-        if not templates:
-            templates = self._get_default_templates()
-
-        stages = []
-        current_date = datetime.now(timezone.utc)
+    def create_stages_bulk(self, stages_data: List[ProjectLocationStageCreate], commit: bool = True) -> List[ProjectLocationStage]:
+        """
+        Cria várias etapas com um único add_all e um único flush
+        O progresso das locações é ajustado uma vez, pelos deltas somados no flush.
+        Com commit=False as etapas ficam na transação do chamador.
+        """
+        stages = [ProjectLocationStage(**stage_data.dict()) for stage_data in stages_data]
+        if not stages:
+            return []
+        self.db.add_all(stages)
+        self.db.flush()
+        if not commit:
+            return stages
+
+        ids = [stage.id for stage in stages]
+        self.db.commit()
+        # Uma consulta recarrega as etapas expiradas pelo commit (em vez de um refresh por etapa)
+        loaded = {stage.id: stage for stage in self.db.query(ProjectLocationStage).filter(ProjectLocationStage.id.in_(ids))}
+        return [loaded[stage_id] for stage_id in ids]
 
+    def _default_stages_data(self, project_location_id: int, templates: List[ProjectLocationStageTemplate], current_date: datetime) -> List[ProjectLocationStageCreate]:
+        """Etapas dos templates com o encadeamento de datas a partir de current_date"""
+        stages_data = []
         for i, template in enumerate(templates):
             planned_start = current_date if i == 0 else None
             planned_end = None
@@ -202,7 +235,7 @@ class ProjectLocationStageService:
                 if planned_start:
                     planned_end = planned_start.replace(hour=18, minute=0, second=0, microsecond=0)
 
-            stage_data = ProjectLocationStageCreate(
+            stages_data.append(ProjectLocationStageCreate(
                 project_location_id=project_location_id,
                 stage_type=template.stage_type,
                 title=template.title,
@@ -212,16 +245,42 @@ class ProjectLocationStageService:
                 weight=template.weight,
                 is_milestone=template.is_milestone,
                 is_critical=template.is_critical
-            )
-
-            stage = self.create_stage(stage_data)
-            stages.append(stage)
+            ))
 
             # Ajusta as datas das próximas etapas
             if planned_end:
                 current_date = planned_end.replace(hour=9, minute=0, second=0, microsecond=0)
 
-        return stages
+        return stages_data
+
+    def _project_types(self, project_location_ids: List[int]) -> Dict[int, Optional[str]]:
+        """Tipo do projeto de cada locação (uma consulta)"""
+        return dict(self.db.query(ProjectLocation.id, Project.project_type).join(
+            Project, Project.id == ProjectLocation.project_id
+        ).filter(ProjectLocation.id.in_(project_location_ids)).all())
+
+    def create_default_stages(
+        self,
+        project_location_id: int,
+        templates: List[ProjectLocationStageTemplate] = None,
+        commit: bool = True
+    ) -> List[ProjectLocationStage]:
+        """Cria etapas padrão para uma locação (templates do tipo do projeto se não informados)"""
+        if not templates:
+            templates = location_stage_templates(self._project_types([project_location_id]).get(project_location_id))
+
+        stages_data = self._default_stages_data(project_location_id, templates, datetime.now(timezone.utc))
+        return self.create_stages_bulk(stages_data, commit=commit)
+
+    def create_default_stages_for_locations(self, project_location_ids: List[int], commit: bool = True) -> List[ProjectLocationStage]:
+        """Cria as etapas padrão de várias locações numa única transação (seeds, importações)"""
+        project_types = self._project_types(project_location_ids)
+        current_date = datetime.now(timezone.utc)
+        stages_data = []
+        for project_location_id in project_location_ids:
+            templates = location_stage_templates(project_types.get(project_location_id))
+            stages_data.extend(self._default_stages_data(project_location_id, templates, current_date))
+        return self.create_stages_bulk(stages_data, commit=commit)
 
     def get_stages_with_filters(self, filters: ProjectLocationStageFilter, skip: int = 0, limit: int = 100) -> List[ProjectLocationStage]:
         """Busca etapas com filtros"""
@@ -245,21 +304,7 @@ class ProjectLocationStageService:
             query = query.filter(ProjectLocationStage.responsible_user_id.in_(filters.responsible_user_ids))
 
         if filters.is_overdue is not None:
-            if filters.is_overdue:
-                query = query.filter(
-                    and_(
-                        ProjectLocationStage.planned_end_date < datetime.now(timezone.utc),
-                        ProjectLocationStage.status != StageStatus.COMPLETED
-                    )
-                )
-            else:
-                query = query.filter(
-                    or_(
-                        ProjectLocationStage.planned_end_date >= datetime.now(timezone.utc),
-                        ProjectLocationStage.status == StageStatus.COMPLETED,
-                        ProjectLocationStage.planned_end_date.is_(None)
-                    )
-                )
+            query = query.filter(overdue_filter(self.db, STAGES, filters.is_overdue))
 
         if filters.is_critical is not None:
             query = query.filter(ProjectLocationStage.is_critical == filters.is_critical)
@@ -273,146 +318,29 @@ class ProjectLocationStageService:
         return query.order_by(ProjectLocationStage.planned_start_date.asc()).offset(skip).limit(limit).all()
 
     def get_project_progress_summary(self, project_id: int) -> Dict[str, Any]:
-        """Obtém resumo do progresso de um projeto"""
-        stages = self.get_stages_by_project(project_id)
+        """
+        Obtém resumo do progresso de um projeto
+        Contagens e progresso ponderado vêm das somas mantidas em Project (stage_progress_service).
+        """
+        summary = StageProgressService(self.db).project_summary(project_id)
+        if summary is None:
+            summary = {
+                'total_stages': 0, 'completed_stages': 0, 'in_progress_stages': 0, 'overdue_stages': 0,
+                'critical_stages': 0, 'overall_progress': 0, 'completion_rate': 0,
+            }
 
-        total_stages = len(stages)
-        completed_stages = len([s for s in stages if s.status == StageStatus.COMPLETED])
-        in_progress_stages = len([s for s in stages if s.status == StageStatus.IN_PROGRESS])
-        overdue_stages = len([s for s in stages if s.is_overdue])
-        critical_stages = len([s for s in stages if s.is_critical])
+        # Próximas etapas críticas
+        summary['upcoming_critical_stages'] = self.db.query(ProjectLocationStage).join(ProjectLocation).filter(
+            ProjectLocation.project_id == project_id,
+            ProjectLocationStage.is_critical == True,
+            ProjectLocationStage.status == StageStatus.PENDING,
+            ProjectLocationStage.planned_start_date.isnot(None)
+        ).order_by(
+            ProjectLocationStage.planned_start_date.asc()
+        ).limit(5).all()  # Próximas 5 etapas críticas
 
-        # Calcula progresso médio ponderado
-        total_weight = sum(s.weight for s in stages)
-        weighted_progress = sum(s.completion_percentage * s.weight for s in stages)
-        overall_progress = (weighted_progress / total_weight) if total_weight > 0 else 0
+        return summary
 
-        # Próximas etapas críticas
-        upcoming_critical = [
-            s for s in stages
-            if s.is_critical and s.status == StageStatus.PENDING and s.planned_start_date
-        ]
-        upcoming_critical.sort(key=lambda x: x.planned_start_date or datetime.max.replace(tzinfo=timezone.utc))
-
-        return {
-            'total_stages': total_stages,
-            'completed_stages': completed_stages,
-            'in_progress_stages': in_progress_stages,
-            'overdue_stages': overdue_stages,
-            'critical_stages': critical_stages,
-            'overall_progress': round(overall_progress, 2),
-            'upcoming_critical_stages': upcoming_critical[:5],  # Próximas 5 etapas críticas
-            'completion_rate': round((completed_stages / total_stages * 100), 2) if total_stages > 0 else 0
-        }
-
-    def _update_location_progress(self, project_location_id: int):
-        """Atualiza o progresso de uma locação baseado nas etapas"""
-        location = self.db.query(ProjectLocation).filter(ProjectLocation.id == project_location_id).first()
-        if location:
-            location.update_completion_percentage()
-            self.db.commit()
-
-    def _get_default_templates(self) -> List[ProjectLocationStageTemplate]:
+    def _get_default_templates(self, project_type: Optional[str] = None) -> List[ProjectLocationStageTemplate]:
         """Retorna templates padrão para etapas de locação"""
-        return [
-            ProjectLocationStageTemplate(
-                stage_type=LocationStageType.VISITACAO,
-                title="Visitação Inicial",
-                description="Primeira visita ao local para avaliação geral",
-                default_duration_days=1,
-                weight=1.0,
-                is_milestone=True,
-                is_critical=True,
-                default_responsible_role="coordinator"
-            ),
-            ProjectLocationStageTemplate(
-                stage_type=LocationStageType.AVALIACAO_TECNICA,
-                title="Avaliação Técnica",
-                description="Avaliação técnica detalhada do local e equipamentos",
-                default_duration_days=1,
-                weight=1.5,
-                is_milestone=False,
-                is_critical=True,
-                default_responsible_role="coordinator"
-            ),
-            ProjectLocationStageTemplate(
-                stage_type=LocationStageType.APROVACAO_CLIENTE,
-                title="Aprovação do Cliente",
-                description="Apresentação do local para aprovação do cliente",
-                default_duration_days=1,
-                weight=2.0,
-                is_milestone=True,
-                is_critical=True,
-                default_responsible_role="manager"
-            ),
-            ProjectLocationStageTemplate(
-                stage_type=LocationStageType.NEGOCIACAO,
-                title="Negociação",
-                description="Negociação de preços e condições contratuais",
-                default_duration_days=2,
-                weight=2.0,
-                is_milestone=False,
-                is_critical=True,
-                default_responsible_role="manager"
-            ),
-            ProjectLocationStageTemplate(
-                stage_type=LocationStageType.CONTRATACAO,
-                title="Contratação",
-                description="Assinatura do contrato e formalização",
-                default_duration_days=1,
-                weight=1.5,
-                is_milestone=True,
-                is_critical=True,
-                default_responsible_role="manager"
-            ),
-            ProjectLocationStageTemplate(
-                stage_type=LocationStageType.PREPARACAO,
-                title="Preparação",
-                description="Preparação do local para a gravação",
-                default_duration_days=1,
-                weight=1.0,
-                is_milestone=False,
-                is_critical=False,
-                default_responsible_role="coordinator"
-            ),
-            ProjectLocationStageTemplate(
-                stage_type=LocationStageType.SETUP,
-                title="Setup e Montagem",
-                description="Montagem de equipamentos e configuração",
-                default_duration_days=1,
-                weight=1.0,
-                is_milestone=False,
-                is_critical=False,
-                default_responsible_role="coordinator"
-            ),
-            ProjectLocationStageTemplate(
-                stage_type=LocationStageType.GRAVACAO,
-                title="Gravação/Filmagem",
-                description="Período de gravação ou filmagem",
-                default_duration_days=1,
-                weight=3.0,
-                is_milestone=True,
-                is_critical=True,
-                default_responsible_role="coordinator"
-            ),
-            ProjectLocationStageTemplate(
-                stage_type=LocationStageType.DESMONTAGEM,
-                title="Desmontagem",
-                description="Desmontagem de equipamentos e limpeza",
-                default_duration_days=1,
-                weight=1.0,
-                is_milestone=False,
-                is_critical=False,
-                default_responsible_role="coordinator"
-            ),
-            ProjectLocationStageTemplate(
-                stage_type=LocationStageType.ENTREGA,
-                title="Entrega Final",
-                description="Entrega do local e finalização do processo",
-                default_duration_days=1,
-                weight=1.5,
-                is_milestone=True,
-                is_critical=True,
-                default_responsible_role="coordinator"
-            )
-        ]
+        return location_stage_templates(project_type)
@@ -2,14 +2,141 @@
 Serviço de Relatório de Projeto
 Gera relatórios detalhados com informações do projeto e suas locações
 """
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, Iterator, List, Optional
 from datetime import date, datetime
+from sqlalchemy import func, case, select
 from sqlalchemy.orm import Session, joinedload
-from io import BytesIO
+import tempfile
 
 from ..models.project import Project, ProjectStatus
+from ..models.location import Location
 from ..models.project_location import ProjectLocation, RentalStatus
 from ..models.project_location_stage import ProjectLocationStage, LocationStageType, StageStatus
+from ..models.financial import FinancialMovement
+
+# Linhas buscadas por ida ao banco ao gerar planilhas
+REPORT_BATCH_SIZE = 500
+
+LOCATION_HEADERS = [
+    "Nome da Locação",
+    "Cidade",
+    "Valor Diária (R$)",
+    "Valor Total (R$)",
+    "Período de Locação",
+    "Data da Visita",
+    "Visita Técnica",
+    "Período Filmagem",
+    "Data Entrega",
+    "Status",
+    "Progresso (%)",
+    "Observações"
+]
+LOCATION_COLUMN_WIDTHS = [30, 15, 15, 15, 25, 15, 15, 25, 15, 15, 12, 40]
+
+STAGE_HEADERS = [
+    "Locação",
+    "Etapa",
+    "Tipo",
+    "Status",
+    "Progresso (%)",
+    "Peso",
+    "Início Planejado",
+    "Fim Planejado",
+    "Início Real",
+    "Fim Real",
+    "Crítica",
+]
+STAGE_COLUMN_WIDTHS = [30, 30, 18, 15, 12, 8, 18, 18, 18, 18, 10]
+
+MOVEMENT_HEADERS = [
+    "Data",
+    "Tipo",
+    "Status",
+    "Descrição",
+    "Locação",
+    "Valor",
+    "Moeda",
+    "Câmbio",
+    "Referência",
+]
+MOVEMENT_COLUMN_WIDTHS = [18, 15, 12, 40, 30, 15, 8, 10, 20]
+
+
+def location_table_row(loc: Dict[str, Any]) -> List[Any]:
+    """Linha da tabela de locações (ordem de LOCATION_HEADERS) a partir de _build_location_info"""
+    return [
+        loc['nome'],
+        loc['cidade'],
+        loc['valor_diaria'],
+        loc['valor_total'],
+        loc['periodo_locacao'],
+        loc['data_visita'],
+        loc['data_visita_tecnica'],
+        loc['periodo_filmagem'],
+        loc['data_entrega'],
+        loc['status'],
+        loc['progresso'],
+        loc['observacoes'],
+    ]
+
+
+def append_project_header(writer, ws, project_info: Dict[str, Any], resumo: Dict[str, Any]):
+    """Cabeçalho do relatório: título, informações do projeto e resumo das locações"""
+    # ===== CABEÇALHO DO PROJETO =====
+    writer.append_title(ws, f"RELATÓRIO DO PROJETO: {project_info['nome']}")
+    writer.append_blank(ws)
+
+    # Informações do Projeto
+    writer.append_section(ws, "INFORMAÇÕES DO PROJETO")
+    writer.append_label_rows(ws, [
+        ("Cliente:", project_info['cliente']),
+        ("Status:", project_info['status']),
+        ("Período:", f"{project_info['data_inicio']} até {project_info['data_fim']}"),
+        ("Orçamento Total:", f"R$ {project_info['orcamento_total']:,.2f}"),
+        ("Orçamento Gasto:", f"R$ {project_info['orcamento_gasto']:,.2f}"),
+        ("Orçamento Restante:", f"R$ {project_info['orcamento_restante']:,.2f}"),
+    ])
+    writer.append_blank(ws)
+
+    # ===== RESUMO =====
+    writer.append_section(ws, "RESUMO DAS LOCAÇÕES")
+    writer.append_label_rows(ws, [
+        ("Total de Locações:", resumo['total_locacoes']),
+        ("Locações Ativas:", resumo['locacoes_ativas']),
+        ("Locações Concluídas:", resumo['locacoes_concluidas']),
+        ("Custo Total:", f"R$ {resumo['custo_total_locacoes']:,.2f}"),
+    ])
+
+
+def render_project_workbook(
+    project_info: Dict[str, Any],
+    resumo: Dict[str, Any],
+    location_rows: Iterable[List[Any]],
+    gerado_em: str,
+):
+    """
+    Relatório de aba única a partir de dados já carregados (sem sessão).
+    Usado pela exportação individual e, em processos separados, pela exportação em lote.
+    """
+    try:
+        from .report_workbook_writer import ReportWorkbookWriter
+    except ImportError:
+        raise ImportError("openpyxl é necessário para exportar Excel. Instale com: pip install openpyxl")
+
+    writer = ReportWorkbookWriter()
+    ws = writer.create_sheet("Relatório do Projeto", LOCATION_COLUMN_WIDTHS)
+    append_project_header(writer, ws, project_info, resumo)
+    writer.append_blank(ws, 2)
+
+    # ===== TABELA DE LOCAÇÕES =====
+    writer.append_section(ws, "DETALHAMENTO DAS LOCAÇÕES")
+    writer.append_table_header(ws, LOCATION_HEADERS)
+    writer.append_table_rows(ws, location_rows)
+
+    # Rodapé
+    writer.append_blank(ws, 2)
+    writer.append_footer(ws, f"Relatório gerado em: {gerado_em}")
+    return writer
 
 
 class ProjectReportService:
@@ -51,18 +178,47 @@ class ProjectReportService:
         }
         return labels.get(status, str(status.value))
 
-    def get_project_report(self, project_id: int) -> Dict[str, Any]:
-        """Gera relatório completo do projeto"""
-        project = self.db.query(Project).options(
-            joinedload(Project.project_locations).joinedload(ProjectLocation.location),
-            joinedload(Project.project_locations).joinedload(ProjectLocation.stages),
-        ).filter(Project.id == project_id).first()
+    def _build_location_info(self, pl: ProjectLocation, location: Optional[Location]) -> Dict[str, Any]:
+        """Monta os dados de uma locação do projeto para o relatório"""
+        # Período de locação formatado
+        periodo_locacao = f"{self._format_date(pl.rental_start)} até {self._format_date(pl.rental_end)}"
 
-        if not project:
-            return None
+        # Período de filmagem
+        if pl.filming_start_date and pl.filming_end_date:
+            periodo_filmagem = f"{self._format_date(pl.filming_start_date)} até {self._format_date(pl.filming_end_date)}"
+        elif pl.filming_start_date:
+            periodo_filmagem = self._format_date(pl.filming_start_date)
+        else:
+            periodo_filmagem = "-"
 
-        # Informações do projeto
-        project_info = {
+        return {
+            "id": pl.id,
+            "nome": location.title if location else f"Locação #{pl.location_id}",
+            "cidade": location.city if location else "-",
+            "estado": location.state if location else "-",
+            "endereco": f"{location.street or ''}, {location.number or ''}".strip(", ") if location else "-",
+            "valor_diaria": pl.daily_rate or 0,
+            "valor_hora": pl.hourly_rate,
+            "valor_total": pl.total_cost or 0,
+            "moeda": pl.currency or "BRL",
+            "periodo_locacao": periodo_locacao,
+            "data_inicio": self._format_date(pl.rental_start),
+            "data_fim": self._format_date(pl.rental_end),
+            "duracao_dias": pl.duration_days,
+            "data_visita": self._format_date(pl.visit_date),
+            "data_visita_tecnica": self._format_date(pl.technical_visit_date),
+            "periodo_filmagem": periodo_filmagem,
+            "data_entrega": self._format_date(pl.delivery_date),
+            "status": self._get_status_label(pl.status),
+            "progresso": round(pl.completion_percentage or 0, 1),
+            "observacoes": pl.notes or "-",
+            "requisitos_especiais": pl.special_requirements or "-",
+            "equipamentos": pl.equipment_needed or "-",
+        }
+
+    def _build_project_info(self, project: Project) -> Dict[str, Any]:
+        """Monta as informações gerais do projeto para o relatório"""
+        return {
             "id": project.id,
             "nome": project.title or project.name,
             "descricao": project.description or "-",
@@ -79,6 +235,19 @@ class ProjectReportService:
             "criado_em": self._format_datetime(project.created_at) if project.created_at else "-",
         }
 
+    def get_project_report(self, project_id: int) -> Dict[str, Any]:
+        """Gera relatório completo do projeto"""
+        project = self.db.query(Project).options(
+            joinedload(Project.project_locations).joinedload(ProjectLocation.location),
+            joinedload(Project.project_locations).joinedload(ProjectLocation.stages),
+        ).filter(Project.id == project_id).first()
+
+        if not project:
+            return None
+
+        # Informações do projeto
+        project_info = self._build_project_info(project)
+
         # Calcular totais
         total_locacoes = len(project.project_locations)
         total_custo_locacoes = sum(pl.total_cost or 0 for pl in project.project_locations)
@@ -86,46 +255,7 @@ class ProjectReportService:
         locacoes_concluidas = sum(1 for pl in project.project_locations if pl.status == RentalStatus.RETURNED)
 
         # Informações das locações
-        locacoes = []
-        for pl in project.project_locations:
-            location = pl.location
-
-            # Período de locação formatado
-            periodo_locacao = f"{self._format_date(pl.rental_start)} até {self._format_date(pl.rental_end)}"
-
-            # Período de filmagem
-            if pl.filming_start_date and pl.filming_end_date:
-                periodo_filmagem = f"{self._format_date(pl.filming_start_date)} até {self._format_date(pl.filming_end_date)}"
-            elif pl.filming_start_date:
-                periodo_filmagem = self._format_date(pl.filming_start_date)
-            else:
-                periodo_filmagem = "-"
-
-            locacao_info = {
-                "id": pl.id,
-                "nome": location.title if location else f"Locação #{pl.location_id}",
-                "cidade": location.city if location else "-",
-                "estado": location.state if location else "-",
-                "endereco": f"{location.street or ''}, {location.number or ''}".strip(", ") if location else "-",
-                "valor_diaria": pl.daily_rate or 0,
-                "valor_hora": pl.hourly_rate,
-                "valor_total": pl.total_cost or 0,
-                "moeda": pl.currency or "BRL",
-                "periodo_locacao": periodo_locacao,
-                "data_inicio": self._format_date(pl.rental_start),
-                "data_fim": self._format_date(pl.rental_end),
-                "duracao_dias": pl.duration_days,
-                "data_visita": self._format_date(pl.visit_date),
-                "data_visita_tecnica": self._format_date(pl.technical_visit_date),
-                "periodo_filmagem": periodo_filmagem,
-                "data_entrega": self._format_date(pl.delivery_date),
-                "status": self._get_status_label(pl.status),
-                "progresso": round(pl.completion_percentage or 0, 1),
-                "observacoes": pl.notes or "-",
-                "requisitos_especiais": pl.special_requirements or "-",
-                "equipamentos": pl.equipment_needed or "-",
-            }
-            locacoes.append(locacao_info)
+        locacoes = [self._build_location_info(pl, pl.location) for pl in project.project_locations]
 
         # Ordenar por data de início
         locacoes.sort(key=lambda x: x.get("data_inicio", ""))
@@ -142,158 +272,150 @@ class ProjectReportService:
             "gerado_em": datetime.now().strftime("%d/%m/%Y %H:%M"),
         }
 
-    def export_to_excel(self, project_id: int) -> Optional[BytesIO]:
-        """Exporta relatório para Excel"""
+    def get_project_name(self, project_id: int) -> Optional[str]:
+        """Nome do projeto (consulta leve, usada para nomear arquivos)"""
+        row = self.db.query(Project.title, Project.name).filter(Project.id == project_id).first()
+        if not row:
+            return None
+        return row.title or row.name
+
+    def _get_location_summary(self, project_id: int) -> Dict[str, Any]:
+        """Totais das locações do projeto em uma única consulta agregada"""
+        row = self.db.query(
+            func.count(ProjectLocation.id),
+            func.coalesce(func.sum(ProjectLocation.total_cost), 0),
+            func.coalesce(func.sum(case((ProjectLocation.status.in_([RentalStatus.CONFIRMED, RentalStatus.IN_USE]), 1), else_=0)), 0),
+            func.coalesce(func.sum(case((ProjectLocation.status == RentalStatus.RETURNED, 1), else_=0)), 0),
+        ).filter(ProjectLocation.project_id == project_id).one()
+        return {
+            "total_locacoes": row[0] or 0,
+            "locacoes_ativas": int(row[2] or 0),
+            "locacoes_concluidas": int(row[3] or 0),
+            "custo_total_locacoes": float(row[1] or 0),
+        }
+
+    def _iter_location_rows(self, project_id: int) -> Iterator[List[Any]]:
+        """Linhas da tabela de locações, lidas em lotes e ordenadas por início da locação"""
+        stmt = (
+            select(ProjectLocation, Location)
+            .outerjoin(Location, Location.id == ProjectLocation.location_id)
+            .where(ProjectLocation.project_id == project_id)
+            .order_by(ProjectLocation.rental_start, ProjectLocation.id)
+            .execution_options(yield_per=REPORT_BATCH_SIZE)
+        )
+        for pl, location in self.db.execute(stmt):
+            yield location_table_row(self._build_location_info(pl, location))
+
+    def _iter_stage_rows(self, project_id: int) -> Iterator[List[Any]]:
+        """Linhas da tabela de etapas de todas as locações do projeto"""
+        query = (
+            self.db.query(
+                Location.title,
+                ProjectLocation.location_id,
+                ProjectLocationStage.title,
+                ProjectLocationStage.stage_type,
+                ProjectLocationStage.status,
+                ProjectLocationStage.completion_percentage,
+                ProjectLocationStage.weight,
+                ProjectLocationStage.planned_start_date,
+                ProjectLocationStage.planned_end_date,
+                ProjectLocationStage.actual_start_date,
+                ProjectLocationStage.actual_end_date,
+                ProjectLocationStage.is_critical,
+            )
+            .join(ProjectLocation, ProjectLocation.id == ProjectLocationStage.project_location_id)
+            .outerjoin(Location, Location.id == ProjectLocation.location_id)
+            .filter(ProjectLocation.project_id == project_id)
+            .order_by(ProjectLocation.rental_start, ProjectLocation.id, ProjectLocationStage.planned_start_date, ProjectLocationStage.id)
+            .execution_options(yield_per=REPORT_BATCH_SIZE)
+        )
+        for row in query:
+            yield [
+                row[0] or f"Locação #{row[1]}",
+                row[2],
+                row[3].value if row[3] else "-",
+                row[4].value if row[4] else "-",
+                round(row[5] or 0, 1),
+                row[6],
+                self._format_datetime(row[7]),
+                self._format_datetime(row[8]),
+                self._format_datetime(row[9]),
+                self._format_datetime(row[10]),
+                "Sim" if row[11] else "Não",
+            ]
+
+    def _iter_movement_rows(self, project_id: int) -> Iterator[List[Any]]:
+        """Linhas das movimentações financeiras do projeto"""
+        query = (
+            self.db.query(
+                FinancialMovement.movement_date,
+                FinancialMovement.movement_type,
+                FinancialMovement.status,
+                FinancialMovement.description,
+                Location.title,
+                FinancialMovement.amount,
+                FinancialMovement.currency,
+                FinancialMovement.exchange_rate,
+                FinancialMovement.reference,
+            )
+            .outerjoin(Location, Location.id == FinancialMovement.location_id)
+            .filter(FinancialMovement.project_id == project_id)
+            .order_by(FinancialMovement.movement_date, FinancialMovement.id)
+            .execution_options(yield_per=REPORT_BATCH_SIZE)
+        )
+        for row in query:
+            yield [
+                self._format_datetime(row[0]),
+                row[1].value if row[1] else "-",
+                row[2].value if row[2] else "-",
+                row[3],
+                row[4] or "-",
+                row[5] or 0,
+                row[6] or "BRL",
+                row[7],
+                row[8] or "-",
+            ]
+
+    def export_to_excel(self, project_id: int, multi_sheet: bool = False) -> Optional[tempfile.SpooledTemporaryFile]:
+        """
+        Exporta relatório para Excel em modo write-only (streaming).
+        Com multi_sheet=True gera abas separadas para resumo, locações, etapas e movimentações financeiras.
+        Retorna um arquivo temporário posicionado no início (ou None se o projeto não existir).
+        """
         try:
-            import openpyxl
-            from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-            from openpyxl.utils import get_column_letter
+            from .report_workbook_writer import ReportWorkbookWriter
         except ImportError:
             raise ImportError("openpyxl é necessário para exportar Excel. Instale com: pip install openpyxl")
 
-        report = self.get_project_report(project_id)
-        if not report:
+        project = self.db.query(Project).filter(Project.id == project_id).first()
+        if not project:
             return None
 
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Relatório do Projeto"
-
-        # Estilos
-        header_font = Font(bold=True, size=14, color="FFFFFF")
-        header_fill = PatternFill(start_color="4F46E5", end_color="4F46E5", fill_type="solid")
-        subheader_font = Font(bold=True, size=11)
-        subheader_fill = PatternFill(start_color="E0E7FF", end_color="E0E7FF", fill_type="solid")
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+        project_info = self._build_project_info(project)
+        resumo = self._get_location_summary(project_id)
+        gerado_em = datetime.now().strftime("%d/%m/%Y %H:%M")
 
-        row = 1
-
-        # ===== CABEÇALHO DO PROJETO =====
-        ws.merge_cells(f'A{row}:L{row}')
-        ws[f'A{row}'] = f"RELATÓRIO DO PROJETO: {report['projeto']['nome']}"
-        ws[f'A{row}'].font = Font(bold=True, size=16, color="4F46E5")
-        ws[f'A{row}'].alignment = Alignment(horizontal='center')
-        row += 2
-
-        # Informações do Projeto
-        ws[f'A{row}'] = "INFORMAÇÕES DO PROJETO"
-        ws[f'A{row}'].font = header_font
-        ws[f'A{row}'].fill = header_fill
-        ws.merge_cells(f'A{row}:D{row}')
-        row += 1
-
-        info_fields = [
-            ("Cliente:", report['projeto']['cliente']),
-            ("Status:", report['projeto']['status']),
-            ("Período:", f"{report['projeto']['data_inicio']} até {report['projeto']['data_fim']}"),
-            ("Orçamento Total:", f"R$ {report['projeto']['orcamento_total']:,.2f}"),
-            ("Orçamento Gasto:", f"R$ {report['projeto']['orcamento_gasto']:,.2f}"),
-            ("Orçamento Restante:", f"R$ {report['projeto']['orcamento_restante']:,.2f}"),
-        ]
-
-        for label, value in info_fields:
-            ws[f'A{row}'] = label
-            ws[f'A{row}'].font = Font(bold=True)
-            ws[f'B{row}'] = value
-            row += 1
-
-        row += 1
-
-        # ===== RESUMO =====
-        ws[f'A{row}'] = "RESUMO DAS LOCAÇÕES"
-        ws[f'A{row}'].font = header_font
-        ws[f'A{row}'].fill = header_fill
-        ws.merge_cells(f'A{row}:D{row}')
-        row += 1
-
-        resumo_fields = [
-            ("Total de Locações:", report['resumo']['total_locacoes']),
-            ("Locações Ativas:", report['resumo']['locacoes_ativas']),
-            ("Locações Concluídas:", report['resumo']['locacoes_concluidas']),
-            ("Custo Total:", f"R$ {report['resumo']['custo_total_locacoes']:,.2f}"),
-        ]
-
-        for label, value in resumo_fields:
-            ws[f'A{row}'] = label
-            ws[f'A{row}'].font = Font(bold=True)
-            ws[f'B{row}'] = value
-            row += 1
-
-        row += 2
-
-        # ===== TABELA DE LOCAÇÕES =====
-        ws[f'A{row}'] = "DETALHAMENTO DAS LOCAÇÕES"
-        ws[f'A{row}'].font = header_font
-        ws[f'A{row}'].fill = header_fill
-        ws.merge_cells(f'A{row}:L{row}')
-        row += 1
-
-        # Cabeçalhos da tabela
-        headers = [
-            "Nome da Locação",
-            "Cidade",
-            "Valor Diária (R$)",
-            "Valor Total (R$)",
-            "Período de Locação",
-            "Data da Visita",
-            "Visita Técnica",
-            "Período Filmagem",
-            "Data Entrega",
-            "Status",
-            "Progresso (%)",
-            "Observações"
-        ]
-
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=row, column=col, value=header)
-            cell.font = subheader_font
-            cell.fill = subheader_fill
-            cell.border = thin_border
-            cell.alignment = Alignment(horizontal='center', wrap_text=True)
-
-        row += 1
-
-        # Dados das locações
-        for loc in report['locacoes']:
-            data = [
-                loc['nome'],
-                loc['cidade'],
-                loc['valor_diaria'],
-                loc['valor_total'],
-                loc['periodo_locacao'],
-                loc['data_visita'],
-                loc['data_visita_tecnica'],
-                loc['periodo_filmagem'],
-                loc['data_entrega'],
-                loc['status'],
-                loc['progresso'],
-                loc['observacoes'],
-            ]
+        if not multi_sheet:
+            return render_project_workbook(
+                project_info, resumo, self._iter_location_rows(project_id), gerado_em
+            ).save_to_tempfile()
 
-            for col, value in enumerate(data, 1):
-                cell = ws.cell(row=row, column=col, value=value)
-                cell.border = thin_border
-                cell.alignment = Alignment(wrap_text=True, vertical='top')
+        writer = ReportWorkbookWriter()
+        ws = writer.create_sheet("Resumo", [30, 40])
+        append_project_header(writer, ws, project_info, resumo)
+        writer.append_blank(ws, 2)
+        writer.append_footer(ws, f"Relatório gerado em: {gerado_em}")
 
-            row += 1
+        ws = writer.create_sheet("Locações", LOCATION_COLUMN_WIDTHS)
+        writer.append_table_header(ws, LOCATION_HEADERS)
+        writer.append_table_rows(ws, self._iter_location_rows(project_id))
 
-        # Ajustar largura das colunas
-        column_widths = [30, 15, 15, 15, 25, 15, 15, 25, 15, 15, 12, 40]
-        for i, width in enumerate(column_widths, 1):
-            ws.column_dimensions[get_column_letter(i)].width = width
+        ws = writer.create_sheet("Etapas", STAGE_COLUMN_WIDTHS)
+        writer.append_table_header(ws, STAGE_HEADERS)
+        writer.append_table_rows(ws, self._iter_stage_rows(project_id))
 
-        # Rodapé
-        row += 2
-        ws[f'A{row}'] = f"Relatório gerado em: {report['gerado_em']}"
-        ws[f'A{row}'].font = Font(italic=True, size=9, color="666666")
+        ws = writer.create_sheet("Movimentações Financeiras", MOVEMENT_COLUMN_WIDTHS)
+        writer.append_table_header(ws, MOVEMENT_HEADERS)
+        writer.append_table_rows(ws, self._iter_movement_rows(project_id))
 
-        # Salvar em buffer
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-        return output
+        return writer.save_to_tempfile()
@@ -47,7 +47,8 @@ class ProjectService:
 
             # Remover campos que não existem no modelo Project
             # e campos computados que não devem ser gravados diretamente
-            fields_to_remove = ['title', 'budget', 'responsibleUserId', 'budget_remaining']
+            # (budget_spent é mantido pelo ledger de movimentações financeiras)
+            fields_to_remove = ['title', 'budget', 'responsibleUserId', 'budget_remaining', 'budget_spent']
             for field in fields_to_remove:
                 project_dict.pop(field, None)
 
@@ -100,7 +101,8 @@ class ProjectService:
             update_data['budget_total'] = update_data.pop('budget')
 
         # Remover campos que não devem ser atualizados diretamente
-        for field in ['budget_remaining', 'responsibleUserId']:
+        # (budget_spent é mantido pelo ledger de movimentações financeiras)
+        for field in ['budget_remaining', 'budget_spent', 'responsibleUserId']:
             update_data.pop(field, None)
 
         for field, value in update_data.items():
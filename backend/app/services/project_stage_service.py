@@ -5,14 +5,15 @@ from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from datetime import datetime, timezone
 
+from ..models.project import Project
 from ..models.project_stage import ProjectStage, StageTask, ProjectStageStatus, ProjectStageType
 from ..schemas.project_stage import (
     ProjectStageCreate,
     ProjectStageUpdate,
     StageTaskCreate,
     StageTaskUpdate,
-    DEFAULT_STAGES,
 )
+from .stage_templates import project_stage_templates
 
 
 class ProjectStageService:
@@ -44,22 +45,31 @@ class ProjectStageService:
         return stage
 
     def create_default_stages(self, project_id: int) -> List[ProjectStage]:
-        """Cria as etapas padrão para um novo projeto"""
-        stages = []
-        for stage_data in DEFAULT_STAGES:
-            stage = ProjectStage(
+        """Cria as etapas padrão para um novo projeto (templates do tipo do projeto, um único commit)"""
+        project_type = self.db.query(Project.project_type).filter(Project.id == project_id).scalar()
+        stages = [
+            ProjectStage(
                 project_id=project_id,
                 name=stage_data["name"],
                 stage_type=ProjectStageType(stage_data["stage_type"].value),
                 order_index=stage_data["order_index"],
                 status=ProjectStageStatus.PENDING,
             )
-            self.db.add(stage)
-            stages.append(stage)
+            for stage_data in project_stage_templates(project_type)
+        ]
+        self.db.add_all(stages)
+        self.db.flush()
+        ids = [stage.id for stage in stages]
         self.db.commit()
-        for stage in stages:
-            self.db.refresh(stage)
-        return stages
+
+        # Uma consulta recarrega as etapas (com tarefas) em vez de um refresh por etapa
+        return (
+            self.db.query(ProjectStage)
+            .options(joinedload(ProjectStage.tasks))
+            .filter(ProjectStage.id.in_(ids))
+            .order_by(ProjectStage.order_index)
+            .all()
+        )
 
     def get_stage(self, stage_id: int) -> Optional[ProjectStage]:
         """Obtém uma etapa por ID"""
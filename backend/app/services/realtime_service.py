@@ -0,0 +1,80 @@
+"""
+Tópicos de atualização em tempo real (SSE)
+- kpis: indicadores do dashboard mudaram (mesmo hook que invalida o cache do dashboard)
+- notifications:<user_id>: notificações de um usuário
+- agenda / agenda:project:<project_id>: eventos da agenda (geral e por projeto)
+Os eventos só avisam o que mudou; o cliente busca os dados pelos endpoints REST.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..core.events import publish_on_write
+from ..models.agenda_event import AgendaEvent
+from ..models.notification import Notification
+from ..models.user import User, UserRole
+
+KPIS_TOPIC = "kpis"
+AGENDA_TOPIC = "agenda"
+NOTIFICATIONS_PREFIX = "notifications:"
+AGENDA_PROJECT_PREFIX = "agenda:project:"
+
+
+def notifications_topic(user_id: int) -> str:
+    return f"{NOTIFICATIONS_PREFIX}{user_id}"
+
+
+def agenda_project_topic(project_id: int) -> str:
+    return f"{AGENDA_PROJECT_PREFIX}{project_id}"
+
+
+def _enum(value: Any) -> Any:
+    return value.value if hasattr(value, "value") else value
+
+
+def _notification_messages(notification: Notification, action: str) -> Iterable[Tuple[str, str, Dict[str, Any]]]:
+    yield notifications_topic(notification.user_id), f"notification.{action}", {
+        "id": notification.id,
+        "type": _enum(notification.type),
+        "is_read": notification.is_read,
+    }
+
+
+def _agenda_messages(agenda_event: AgendaEvent, action: str) -> Iterable[Tuple[str, str, Dict[str, Any]]]:
+    data = {
+        "id": agenda_event.id,
+        "project_id": agenda_event.project_id,
+        "project_location_id": agenda_event.project_location_id,
+        "start_date": agenda_event.start_date,
+    }
+    yield AGENDA_TOPIC, f"agenda.{action}", data
+    if agenda_event.project_id:
+        yield agenda_project_topic(agenda_event.project_id), f"agenda.{action}", data
+
+
+def _agenda_bulk_messages(model: type) -> Iterable[Tuple[str, str, Dict[str, Any]]]:
+    # Escrita em massa não identifica os eventos: o cliente recarrega a agenda
+    yield AGENDA_TOPIC, "agenda.changed", {}
+
+
+def register_realtime_hooks():
+    """Chamado por services.hooks.register_hooks"""
+    publish_on_write((Notification,), "realtime_notifications", _notification_messages)
+    publish_on_write((AgendaEvent,), "realtime_agenda", _agenda_messages, _agenda_bulk_messages)
+
+
+def resolve_topics(user: User, requested: Optional[List[str]]) -> Set[str]:
+    """
+    Tópicos da assinatura: os pedidos (ou kpis, agenda e as notificações do usuário).
+    Notificações de outro usuário só podem ser assinadas por administradores.
+    """
+    topics = set(requested or [KPIS_TOPIC, AGENDA_TOPIC, notifications_topic(user.id)])
+    for topic in topics:
+        if topic in (KPIS_TOPIC, AGENDA_TOPIC):
+            continue
+        if topic.startswith(AGENDA_PROJECT_PREFIX) and topic[len(AGENDA_PROJECT_PREFIX):].isdigit():
+            continue
+        if topic.startswith(NOTIFICATIONS_PREFIX) and topic[len(NOTIFICATIONS_PREFIX):].isdigit():
+            if topic == notifications_topic(user.id) or user.role == UserRole.ADMIN:
+                continue
+            raise PermissionError(f"Sem permissão para o tópico {topic}")
+        raise ValueError(f"Tópico inválido: {topic}")
+    return topics
@@ -0,0 +1,118 @@
+"""
+Escrita de relatórios Excel em modo write-only (streaming)
+Estilos nomeados são registrados uma única vez por workbook e referenciados por nome,
+em vez de criar Font/Fill/Border por célula.
+"""
+import io
+import tempfile
+from typing import Any, Iterable, List, Optional, Sequence
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+# Acima disso o arquivo temporário vai para disco
+REPORT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+STYLE_TITLE = "report_title"
+STYLE_SECTION = "report_section"
+STYLE_LABEL = "report_label"
+STYLE_TABLE_HEADER = "report_table_header"
+STYLE_TABLE_CELL = "report_table_cell"
+STYLE_FOOTER = "report_footer"
+
+
+def _build_named_styles() -> List[NamedStyle]:
+    thin = Side(style='thin')
+    thin_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+
+    title = NamedStyle(name=STYLE_TITLE)
+    title.font = Font(bold=True, size=16, color="4F46E5")
+
+    section = NamedStyle(name=STYLE_SECTION)
+    section.font = Font(bold=True, size=14, color="FFFFFF")
+    section.fill = PatternFill(start_color="4F46E5", end_color="4F46E5", fill_type="solid")
+
+    label = NamedStyle(name=STYLE_LABEL)
+    label.font = Font(bold=True)
+
+    table_header = NamedStyle(name=STYLE_TABLE_HEADER)
+    table_header.font = Font(bold=True, size=11)
+    table_header.fill = PatternFill(start_color="E0E7FF", end_color="E0E7FF", fill_type="solid")
+    table_header.border = thin_border
+    table_header.alignment = Alignment(horizontal='center', wrap_text=True)
+
+    table_cell = NamedStyle(name=STYLE_TABLE_CELL)
+    table_cell.border = thin_border
+    table_cell.alignment = Alignment(wrap_text=True, vertical='top')
+
+    footer = NamedStyle(name=STYLE_FOOTER)
+    footer.font = Font(italic=True, size=9, color="666666")
+
+    return [title, section, label, table_header, table_cell, footer]
+
+
+class ReportWorkbookWriter:
+    """
+    Workbook write-only: as linhas são serializadas à medida que são adicionadas,
+    então o consumo de memória não cresce com o tamanho do relatório.
+    """
+
+    def __init__(self):
+        self.workbook = Workbook(write_only=True)
+        for style in _build_named_styles():
+            self.workbook.add_named_style(style)
+
+    def create_sheet(self, title: str, column_widths: Optional[Sequence[float]] = None):
+        # Larguras precisam ser definidas antes da primeira linha no modo write-only
+        sheet = self.workbook.create_sheet(title[:31])
+        for i, width in enumerate(column_widths or [], 1):
+            sheet.column_dimensions[get_column_letter(i)].width = width
+        return sheet
+
+    def styled(self, sheet, value: Any, style: str) -> WriteOnlyCell:
+        cell = WriteOnlyCell(sheet, value=value)
+        # Estilo já registrado no workbook: a atribuição só procura o nome
+        cell.style = style
+        return cell
+
+    def append_title(self, sheet, text: str):
+        sheet.append([self.styled(sheet, text, STYLE_TITLE)])
+
+    def append_section(self, sheet, text: str):
+        sheet.append([self.styled(sheet, text, STYLE_SECTION)])
+
+    def append_label_rows(self, sheet, rows: Iterable[Sequence[Any]]):
+        for label, value in rows:
+            sheet.append([self.styled(sheet, label, STYLE_LABEL), value])
+
+    def append_table_header(self, sheet, headers: Sequence[str]):
+        sheet.append([self.styled(sheet, header, STYLE_TABLE_HEADER) for header in headers])
+
+    def append_table_rows(self, sheet, rows: Iterable[Sequence[Any]]) -> int:
+        count = 0
+        for row in rows:
+            sheet.append([self.styled(sheet, value, STYLE_TABLE_CELL) for value in row])
+            count += 1
+        return count
+
+    def append_footer(self, sheet, text: str):
+        sheet.append([self.styled(sheet, text, STYLE_FOOTER)])
+
+    def append_blank(self, sheet, count: int = 1):
+        for _ in range(count):
+            sheet.append([])
+
+    def save_to_tempfile(self) -> tempfile.SpooledTemporaryFile:
+        """Salva em arquivo temporário (memória até 8 MB, depois disco) posicionado no início"""
+        output = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_BYTES)
+        self.workbook.save(output)
+        output.seek(0)
+        return output
+
+    def save_to_bytes(self) -> bytes:
+        """Conteúdo do workbook em memória (ex.: para devolver de um processo separado)"""
+        output = io.BytesIO()
+        self.workbook.save(output)
+        return output.getvalue()
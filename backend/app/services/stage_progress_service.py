@@ -0,0 +1,380 @@
+"""
+Progresso das etapas de locação mantido de forma incremental
+Hooks de flush convertem cada inclusão/alteração/exclusão de ProjectLocationStage em deltas
+(contagem, Σpeso, Σpeso×conclusão, contagem por status e críticas) nas colunas de
+StageProgressMixin da locação e do projeto, na mesma transação da escrita; completion_percentage
+da locação é recalculado no mesmo UPDATE. Etapas em aberto com prazo vão para
+stage_deadline_rollups por dia, porque atraso depende do relógio e não de escritas.
+Leituras de progresso viram leitura de uma linha; a reconciliação periódica corrige desvios.
+Toda escrita trava antes as linhas das locações afetadas (ordem de id), e a reconciliação trava
+todas: as duas nunca se intercalam.
+"""
+import os
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, case, delete, event, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..core.flush_tracking import Contribution, FlushDeltaTracker, add_contributions, is_zero, upsert_increment
+from ..core.jobs import Job, job_registry, periodic_scheduler
+from ..models.kpi_snapshot import KpiSnapshot
+from ..models.project import Project
+from ..models.project_location import ProjectLocation
+from ..models.project_location_stage import ProjectLocationStage, StageStatus
+from ..models.stage_progress import StageDeadlineRollup
+from .kpi_snapshot_service import META_METRIC, mark_stale
+
+# Intervalo da reconciliação periódica em segundos (0 desativa)
+STAGE_PROGRESS_RECONCILE_INTERVAL = float(os.getenv("STAGE_PROGRESS_RECONCILE_INTERVAL", "3600"))
+STAGE_PROGRESS_RECONCILE_JOB = "stage_progress_reconcile"
+
+# Linha de controle em kpi_snapshot: valor > 0 antecipa a reconciliação periódica
+PROGRESS_STALE_DIMENSION = "stage_progress_stale"
+
+LOCATION = "location"
+DEADLINE = "deadline"
+
+STATUS_COLUMNS = {status: f"stages_{status.value}" for status in StageStatus}
+
+# Ordem dos valores das contribuições de LOCATION
+PROGRESS_COLUMNS = (
+    "stage_count", "stage_weight_total", "stage_weighted_completion",
+    *STATUS_COLUMNS.values(), "stages_critical",
+)
+
+TRACKED_FIELDS = ("project_location_id", "status", "completion_percentage", "weight", "is_critical", "planned_end_date")
+
+
+def due_day(value: Any) -> Optional[date]:
+    """Dia (UTC) do prazo de uma etapa"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.date()
+    return value
+
+
+def _progress_vector(status: Optional[StageStatus], completion: Optional[float], weight: Optional[float], is_critical: Optional[bool]) -> Tuple:
+    # Valores nulos seguem os defaults das colunas (peso 1.0, status pendente)
+    weight = 1.0 if weight is None else weight
+    status = status or StageStatus.PENDING
+    return (
+        1, weight, weight * (completion or 0.0),
+        *(1 if status == candidate else 0 for candidate in STATUS_COLUMNS),
+        1 if is_critical else 0,
+    )
+
+
+def _stage_contributions(v: Dict[str, Any]) -> Iterator[Contribution]:
+    if v["project_location_id"] is None:
+        return
+    yield (LOCATION, v["project_location_id"]), _progress_vector(v["status"], v["completion_percentage"], v["weight"], v["is_critical"])
+    day = due_day(v["planned_end_date"])
+    if day is not None and v["status"] != StageStatus.COMPLETED:
+        yield (DEADLINE, v["project_location_id"], day), 1
+
+
+def _increment(connection, table, deltas: Dict[int, Tuple], with_completion: bool = False):
+    """Soma os vetores de deltas nas colunas de progresso (um UPDATE executado em lote)"""
+    if not deltas:
+        return
+    values = {name: table.c[name] + bindparam(f"d_{name}") for name in PROGRESS_COLUMNS}
+    if with_completion:
+        weight = table.c.stage_weight_total + bindparam("d_stage_weight_total")
+        weighted = table.c.stage_weighted_completion + bindparam("d_stage_weighted_completion")
+        values["completion_percentage"] = case((weight > 1e-9, weighted / weight), else_=0.0)
+    connection.execute(
+        update(table).where(table.c.id == bindparam("target_id")).values(**values),
+        [{"target_id": target_id, **{f"d_{name}": value for name, value in zip(PROGRESS_COLUMNS, vector)}}
+         for target_id, vector in deltas.items()],
+    )
+
+
+def apply_deltas(connection, deltas: Dict[Hashable, Any]):
+    """Aplica os deltas na locação, no projeto dela e nos baldes de prazo"""
+    location_ids = {key[1] for key in deltas}
+    # Locação excluída no mesmo flush fica de fora: suas somas já saíram do projeto (_subtract_deleted_locations)
+    projects = dict(connection.execute(
+        select(ProjectLocation.id, ProjectLocation.project_id)
+        .where(ProjectLocation.id.in_(location_ids))
+        .order_by(ProjectLocation.id)
+        .with_for_update()
+    ).all())
+
+    locations: Dict[int, Tuple] = {}
+    project_deltas: Dict[Hashable, Tuple] = {}
+    deadlines: List[Dict[str, Any]] = []
+    for key, value in deltas.items():
+        project_id = projects.get(key[1])
+        if project_id is None:
+            continue
+        if key[0] == LOCATION:
+            locations[key[1]] = value
+            add_contributions(project_deltas, [(project_id, value)])
+        else:
+            deadlines.append({"project_location_id": key[1], "due_day": key[2], "project_id": project_id, "open_stages": value})
+
+    _increment(connection, ProjectLocation.__table__, locations, with_completion=True)
+    _increment(connection, Project.__table__, {k: v for k, v in project_deltas.items() if not is_zero(v)})
+    upsert_increment(connection, StageDeadlineRollup.__table__, ("project_location_id", "due_day"), ("open_stages",), deadlines)
+
+
+def mark_progress_stale(connection):
+    mark_stale(connection, PROGRESS_STALE_DIMENSION)
+
+
+def _subtract_deleted_locations(session, flush_context, instances):
+    """
+    Antes de excluir locações, tira do projeto as somas gravadas nelas e descarta seus baldes de prazo
+    (uma leitura e um UPDATE em lote), em vez de pedir o recálculo completo.
+    """
+    ids = [obj.id for obj in session.deleted if isinstance(obj, ProjectLocation) and obj.id is not None]
+    if not ids:
+        return
+    connection = session.connection()
+    table = ProjectLocation.__table__
+    project_deltas: Dict[Hashable, Tuple] = {}
+    for row in connection.execute(
+        select(table.c.project_id, *[table.c[name] for name in PROGRESS_COLUMNS])
+        .where(table.c.id.in_(ids))
+        .order_by(table.c.id)
+        .with_for_update()
+    ):
+        add_contributions(project_deltas, [(row.project_id, tuple(value or 0 for value in row[1:]))], -1)
+    _increment(connection, Project.__table__, {k: v for k, v in project_deltas.items() if not is_zero(v)})
+    connection.execute(delete(StageDeadlineRollup).where(StageDeadlineRollup.project_location_id.in_(ids)))
+
+
+stage_progress_tracker = FlushDeltaTracker(
+    "stage_progress",
+    {ProjectLocationStage: (TRACKED_FIELDS, _stage_contributions)},
+    apply_deltas,
+    mark_progress_stale,
+)
+
+
+def register_stage_progress_hooks():
+    """Chamado por services.hooks.register_hooks"""
+    stage_progress_tracker.listen()
+    event.listen(Session, "before_flush", _subtract_deleted_locations)
+
+
+def _summary(row, overdue: int, overdue_as_of: date) -> Dict[str, Any]:
+    total = row.stage_count or 0
+    completed = row.stages_completed or 0
+    weight = row.stage_weight_total or 0
+    return {
+        "total_stages": total,
+        **{column: getattr(row, column) or 0 for column in STATUS_COLUMNS.values()},
+        "completed_stages": completed,
+        "in_progress_stages": row.stages_in_progress or 0,
+        "overdue_stages": overdue,
+        "overdue_as_of": overdue_as_of,
+        "critical_stages": row.stages_critical or 0,
+        "total_weight": round(weight, 4),
+        "overall_progress": round(row.stage_weighted_completion / weight, 2) if weight > 1e-9 else 0,
+        "completion_rate": round(completed / total * 100, 2) if total > 0 else 0,
+    }
+
+
+class StageProgressService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    # ----- Recálculo -----
+
+    def compute(self, project_location_ids: Optional[List[int]] = None) -> Tuple[Dict[int, Tuple], Dict[Tuple[int, date], int]]:
+        """Somas por locação e etapas em aberto por (locação, dia do prazo), direto das etapas"""
+        weight = func.coalesce(ProjectLocationStage.weight, 1.0)
+        status = func.coalesce(ProjectLocationStage.status, StageStatus.PENDING)
+        columns = [
+            func.count(ProjectLocationStage.id),
+            func.sum(weight),
+            func.sum(weight * func.coalesce(ProjectLocationStage.completion_percentage, 0.0)),
+            *(func.sum(case((status == candidate, 1), else_=0)) for candidate in STATUS_COLUMNS),
+            func.sum(case((ProjectLocationStage.is_critical == True, 1), else_=0)),
+        ]
+        filters = []
+        if project_location_ids is not None:
+            filters.append(ProjectLocationStage.project_location_id.in_(project_location_ids))
+
+        locations = {
+            row[0]: tuple(value or 0 for value in row[1:])
+            for row in self.db.execute(
+                select(ProjectLocationStage.project_location_id, *columns)
+                .where(*filters)
+                .group_by(ProjectLocationStage.project_location_id)
+            )
+        }
+        # Dia do prazo via due_day (UTC), como nos hooks; date() no banco seguiria o fuso da sessão
+        deadlines: Dict[Tuple[int, date], int] = {}
+        for location_id, due, count in self.db.execute(
+            select(ProjectLocationStage.project_location_id, ProjectLocationStage.planned_end_date, func.count(ProjectLocationStage.id))
+            .where(
+                ProjectLocationStage.planned_end_date.isnot(None),
+                or_(ProjectLocationStage.status.is_(None), ProjectLocationStage.status != StageStatus.COMPLETED),
+                *filters,
+            )
+            .group_by(ProjectLocationStage.project_location_id, ProjectLocationStage.planned_end_date)
+        ):
+            key = (location_id, due_day(due))
+            deadlines[key] = deadlines.get(key, 0) + count
+        return locations, deadlines
+
+    def recalculate_location(self, project_location_id: int):
+        """Recalcula uma locação a partir das etapas e propaga a diferença ao projeto"""
+        table = ProjectLocation.__table__
+        stored = self.db.execute(
+            select(*[table.c[name] for name in PROGRESS_COLUMNS]).where(table.c.id == project_location_id).with_for_update()
+        ).first()
+        if stored is None:
+            return
+        locations, deadlines = self.compute([project_location_id])
+        diffs: Dict[Hashable, Any] = {}
+        add_contributions(diffs, [((LOCATION, project_location_id), locations.get(project_location_id, (0,) * len(PROGRESS_COLUMNS)))])
+        add_contributions(diffs, [((LOCATION, project_location_id), tuple(value or 0 for value in stored))], -1)
+        for (location_id, day), count in deadlines.items():
+            add_contributions(diffs, [((DEADLINE, location_id, day), count)])
+        for day, count in self.db.execute(
+            select(StageDeadlineRollup.due_day, StageDeadlineRollup.open_stages)
+            .where(StageDeadlineRollup.project_location_id == project_location_id)
+        ):
+            add_contributions(diffs, [((DEADLINE, project_location_id, day), count)], -1)
+        diffs = {key: value for key, value in diffs.items() if not is_zero(value)}
+        if diffs:
+            apply_deltas(self.db.connection(), diffs)
+        self.db.commit()
+
+    def rebuild(self) -> Dict[str, Any]:
+        """
+        Reescreve as somas de todas as locações e projetos e os baldes de prazo.
+        Só as linhas com desvio são atualizadas. As locações são travadas antes de ler as etapas:
+        escritas já confirmadas entram na soma e as seguintes aplicam seus deltas depois do commit.
+        """
+        zero = (0,) * len(PROGRESS_COLUMNS)
+        connection = self.db.connection()
+
+        def differs(current, expected) -> bool:
+            return any(abs((a or 0) - (b or 0)) > 1e-6 for a, b in zip(current, expected))
+
+        location_table = ProjectLocation.__table__
+        projects: Dict[int, Tuple] = {}
+        project_of: Dict[int, int] = {}
+        location_rows = []
+        stored = connection.execute(
+            select(
+                location_table.c.id, location_table.c.project_id, location_table.c.completion_percentage,
+                *[location_table.c[name] for name in PROGRESS_COLUMNS],
+            ).order_by(location_table.c.id).with_for_update()
+        ).all()
+        locations, deadlines = self.compute()
+        for row in stored:
+            expected = locations.get(row.id, zero)
+            project_of[row.id] = row.project_id
+            add_contributions(projects, [(row.project_id, expected)])
+            progress = expected[2] / expected[1] if expected[1] > 1e-9 else 0.0
+            if differs(row[3:], expected) or abs((row.completion_percentage or 0) - progress) > 1e-6:
+                location_rows.append({"target_id": row.id, "completion_percentage": progress, **dict(zip(PROGRESS_COLUMNS, expected))})
+
+        project_table = Project.__table__
+        project_rows = []
+        project_count = 0
+        for row in connection.execute(select(project_table.c.id, *[project_table.c[name] for name in PROGRESS_COLUMNS])):
+            project_count += 1
+            expected = projects.get(row.id, zero)
+            if differs(row[1:], expected):
+                project_rows.append({"target_id": row.id, **dict(zip(PROGRESS_COLUMNS, expected))})
+
+        if location_rows:
+            connection.execute(
+                update(location_table).where(location_table.c.id == bindparam("target_id")).values(
+                    completion_percentage=bindparam("completion_percentage"),
+                    **{name: bindparam(name) for name in PROGRESS_COLUMNS},
+                ),
+                location_rows,
+            )
+        if project_rows:
+            connection.execute(
+                update(project_table).where(project_table.c.id == bindparam("target_id")).values(
+                    **{name: bindparam(name) for name in PROGRESS_COLUMNS}
+                ),
+                project_rows,
+            )
+
+        deadline_rows = [
+            {"project_location_id": location_id, "due_day": day, "project_id": project_of[location_id], "open_stages": count}
+            for (location_id, day), count in deadlines.items()
+            if location_id in project_of
+        ]
+        self.db.execute(delete(StageDeadlineRollup))
+        if deadline_rows:
+            self.db.execute(insert(StageDeadlineRollup), deadline_rows)
+        self.db.execute(delete(KpiSnapshot).where(
+            KpiSnapshot.metric == META_METRIC, KpiSnapshot.dimension == PROGRESS_STALE_DIMENSION
+        ))
+        self.db.execute(insert(KpiSnapshot).values(metric=META_METRIC, dimension=PROGRESS_STALE_DIMENSION, value=0))
+        self.db.commit()
+
+        drift = len(location_rows) + len(project_rows)
+        if drift:
+            print(f"⚠️ Progresso das etapas reconciliado com {drift} desvios")
+        return {"project_locations": len(project_of), "projects": project_count, "drift": drift}
+
+    def ensure_fresh(self):
+        """
+        Somas nunca montadas ou marcadas (escrita em massa): antecipa a reconciliação periódica,
+        que roda com sessão própria; a leitura segue com as somas gravadas.
+        """
+        stale = self.db.execute(
+            select(KpiSnapshot.value).where(
+                KpiSnapshot.metric == META_METRIC, KpiSnapshot.dimension == PROGRESS_STALE_DIMENSION
+            )
+        ).scalar()
+        if stale is None or stale > 0:
+            periodic_scheduler.trigger(STAGE_PROGRESS_RECONCILE_JOB)
+
+    # ----- Leitura -----
+
+    def _overdue(self, condition, today: Optional[date] = None) -> Tuple[int, date]:
+        today = today or datetime.now(timezone.utc).date()
+        overdue = self.db.execute(
+            select(func.coalesce(func.sum(StageDeadlineRollup.open_stages), 0))
+            .where(condition, StageDeadlineRollup.due_day < today)
+        ).scalar()
+        return int(overdue or 0), today
+
+    def location_summary(self, project_location_id: int, today: Optional[date] = None) -> Optional[Dict[str, Any]]:
+        self.ensure_fresh()
+        row = self.db.execute(
+            select(*[ProjectLocation.__table__.c[name] for name in PROGRESS_COLUMNS])
+            .where(ProjectLocation.id == project_location_id)
+        ).first()
+        if row is None:
+            return None
+        return _summary(row, *self._overdue(StageDeadlineRollup.project_location_id == project_location_id, today))
+
+    def project_summary(self, project_id: int, today: Optional[date] = None) -> Optional[Dict[str, Any]]:
+        self.ensure_fresh()
+        row = self.db.execute(
+            select(*[Project.__table__.c[name] for name in PROGRESS_COLUMNS]).where(Project.id == project_id)
+        ).first()
+        if row is None:
+            return None
+        return _summary(row, *self._overdue(StageDeadlineRollup.project_id == project_id, today))
+
+
+def run_stage_progress_reconcile(job: Job, bind):
+    """Tarefa periódica: reconcilia o progresso das etapas com uma sessão própria"""
+    job_registry.start(job, total=1, message="Recalculando progresso das etapas")
+    db = Session(bind=bind)
+    try:
+        result = StageProgressService(db).rebuild()
+    finally:
+        db.close()
+    job_registry.advance(job)
+    job_registry.complete(job, result=result)
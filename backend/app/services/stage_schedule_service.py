@@ -0,0 +1,201 @@
+"""
+Cronograma das etapas de locação (CPM sobre dependencies_json)
+dependencies_json guarda os ids das etapas que precisam terminar antes da etapa começar;
+podem ser de qualquer locação do mesmo projeto. O grafo do projeto é lido com colunas
+leves numa consulta; ao mudar datas ou dependências só o subgrafo descendente é
+reprogramado e só as etapas deslocadas são carregadas e gravadas (na transação do chamador).
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..core.scheduling import ScheduleTask, Timing, critical_path, propagate, topological_order
+from ..models.location import Location
+from ..models.project_location import ProjectLocation
+from ..models.project_location_stage import ProjectLocationStage, StageStatus
+
+# Duração assumida para etapas sem início e fim planejados
+STAGE_DEFAULT_DURATION_HOURS = float(os.getenv("STAGE_DEFAULT_DURATION_HOURS", "24"))
+
+GRAPH_COLUMNS = (
+    ProjectLocationStage.id,
+    ProjectLocationStage.project_location_id,
+    ProjectLocationStage.title,
+    ProjectLocationStage.status,
+    ProjectLocationStage.completion_percentage,
+    ProjectLocationStage.is_milestone,
+    ProjectLocationStage.is_critical,
+    ProjectLocationStage.planned_start_date,
+    ProjectLocationStage.planned_end_date,
+    ProjectLocationStage.actual_start_date,
+    ProjectLocationStage.actual_end_date,
+    ProjectLocationStage.dependencies_json,
+)
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Datas sem fuso (SQLite) são tratadas como UTC, como em is_overdue"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _dependencies(value: Any) -> tuple:
+    return tuple(int(item) for item in (value or []))
+
+
+def schedule_task(row) -> ScheduleTask:
+    """Tarefa CPM de uma etapa (linha com GRAPH_COLUMNS ou objeto ProjectLocationStage)"""
+    default = timedelta(hours=STAGE_DEFAULT_DURATION_HOURS)
+    start, end = _utc(row.planned_start_date), _utc(row.planned_end_date)
+    fixed = row.status == StageStatus.COMPLETED
+    if fixed:
+        start = _utc(row.actual_start_date) or start
+        end = _utc(row.actual_end_date) or end
+    if start is not None and end is not None and end >= start:
+        duration = end - start
+    else:
+        duration = default
+        if start is None and end is not None:
+            start = end - duration
+    return ScheduleTask(row.id, duration, _dependencies(row.dependencies_json), start, fixed and start is not None)
+
+
+def _days(value: timedelta) -> float:
+    return round(value.total_seconds() / 86400, 2)
+
+
+class StageScheduleService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _project_id(self, project_location_id: int) -> Optional[int]:
+        return self.db.execute(
+            select(ProjectLocation.project_id).where(ProjectLocation.id == project_location_id)
+        ).scalar()
+
+    def _graph_rows(self, project_id: int, with_location: bool = False) -> List[Any]:
+        columns = [*GRAPH_COLUMNS, Location.title.label("location_title")] if with_location else GRAPH_COLUMNS
+        stmt = select(*columns).join(ProjectLocation, ProjectLocation.id == ProjectLocationStage.project_location_id)
+        if with_location:
+            stmt = stmt.outerjoin(Location, Location.id == ProjectLocation.location_id)
+        return self.db.execute(
+            stmt.where(ProjectLocation.project_id == project_id).order_by(ProjectLocationStage.id)
+        ).all()
+
+    def _tasks(self, project_id: int) -> Dict[int, ScheduleTask]:
+        return {row.id: schedule_task(row) for row in self._graph_rows(project_id)}
+
+    # ----- Validação e propagação -----
+
+    def validate_dependencies(self, project_location_id: int, dependencies: Iterable[int], stage_id: Optional[int] = None):
+        """ValueError se alguma dependência não existir, for de outro projeto, for a própria etapa ou fechar um ciclo"""
+        dependencies = _dependencies(dependencies)
+        if not dependencies:
+            return
+        if stage_id is not None and stage_id in dependencies:
+            raise ValueError("Uma etapa não pode depender de si mesma")
+        project_id = self._project_id(project_location_id)
+        tasks = self._tasks(project_id) if project_id is not None else {}
+        unknown = [dependency for dependency in dependencies if dependency not in tasks]
+        if unknown:
+            raise ValueError(f"Dependências inexistentes ou de outro projeto: {', '.join(map(str, unknown))}")
+        if stage_id is not None:
+            node = tasks.get(stage_id) or ScheduleTask(stage_id, timedelta())
+            tasks[stage_id] = ScheduleTask(node.id, node.duration, dependencies, node.start, node.fixed)
+            topological_order(tasks)
+
+    def propagate(self, stage_ids: Iterable[int]) -> List[ProjectLocationStage]:
+        """
+        Reprograma os descendentes das etapas alteradas (já gravadas com flush na sessão).
+        Só as etapas deslocadas são carregadas e alteradas; o commit fica com o chamador.
+        """
+        stage_ids = list(stage_ids)
+        if not stage_ids:
+            return []
+        project_ids = {
+            project_id for (project_id,) in self.db.execute(
+                select(ProjectLocation.project_id)
+                .join(ProjectLocationStage, ProjectLocationStage.project_location_id == ProjectLocation.id)
+                .where(ProjectLocationStage.id.in_(stage_ids))
+            )
+        }
+        moved: Dict[int, datetime] = {}
+        durations: Dict[int, timedelta] = {}
+        for project_id in project_ids:
+            tasks = self._tasks(project_id)
+            for task_id, start in propagate(tasks, stage_ids).items():
+                moved[task_id] = start
+                durations[task_id] = tasks[task_id].duration
+        if not moved:
+            return []
+
+        stages = self.db.query(ProjectLocationStage).filter(ProjectLocationStage.id.in_(list(moved))).all()
+        for stage in stages:
+            stage.planned_start_date = moved[stage.id]
+            stage.planned_end_date = moved[stage.id] + durations[stage.id]
+        return stages
+
+    def detach(self, stage: ProjectLocationStage):
+        """Remove a etapa das dependências das demais (antes de excluí-la)"""
+        project_id = self._project_id(stage.project_location_id)
+        if project_id is None:
+            return
+        dependents = [row.id for row in self._graph_rows(project_id) if stage.id in _dependencies(row.dependencies_json)]
+        if not dependents:
+            return
+        for dependent in self.db.query(ProjectLocationStage).filter(ProjectLocationStage.id.in_(dependents)):
+            dependent.dependencies_json = [item for item in _dependencies(dependent.dependencies_json) if item != stage.id]
+
+    # ----- Cronograma (Gantt) -----
+
+    def _schedule(self, rows: List[Any]) -> Dict[str, Any]:
+        tasks = {row.id: schedule_task(row) for row in rows}
+        known = [task.start for task in tasks.values() if task.start is not None]
+        anchor = min(known) if known else datetime.now(timezone.utc)
+        timings: Dict[int, Timing] = critical_path(tasks, anchor)
+
+        items = []
+        for row in rows:
+            timing = timings[row.id]
+            items.append({
+                "id": row.id,
+                "project_location_id": row.project_location_id,
+                "location_title": getattr(row, "location_title", None),
+                "title": row.title,
+                "status": (row.status or StageStatus.PENDING).value,
+                "completion_percentage": row.completion_percentage or 0.0,
+                "is_milestone": bool(row.is_milestone),
+                "is_critical": bool(row.is_critical),
+                "dependencies": [d for d in tasks[row.id].predecessors if d in tasks],
+                "start": tasks[row.id].start,
+                "end": tasks[row.id].start + tasks[row.id].duration if tasks[row.id].start else None,
+                "earliest_start": timing.earliest_start,
+                "earliest_finish": timing.earliest_finish,
+                "latest_start": timing.latest_start,
+                "latest_finish": timing.latest_finish,
+                "slack_days": _days(timing.slack),
+                "on_critical_path": timing.critical,
+            })
+        items.sort(key=lambda item: (item["earliest_start"], item["id"]))
+        return {
+            "start": min((item["earliest_start"] for item in items), default=None),
+            "finish": max((item["earliest_finish"] for item in items), default=None),
+            "critical_path": [item["id"] for item in items if item["on_critical_path"]],
+            "stages": items,
+        }
+
+    def project_schedule(self, project_id: int) -> Dict[str, Any]:
+        """Cronograma CPM de todas as etapas do projeto (dependências entre locações incluídas)"""
+        return {"project_id": project_id, **self._schedule(self._graph_rows(project_id, with_location=True))}
+
+    def location_schedule(self, project_location_id: int) -> Optional[Dict[str, Any]]:
+        """Cronograma CPM das etapas de uma locação (dependências de outras locações ignoradas)"""
+        project_id = self._project_id(project_location_id)
+        if project_id is None:
+            return None
+        rows = [row for row in self._graph_rows(project_id, with_location=True) if row.project_location_id == project_location_id]
+        return {"project_id": project_id, "project_location_id": project_location_id, **self._schedule(rows)}
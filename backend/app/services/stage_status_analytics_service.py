@@ -0,0 +1,551 @@
+"""
+Tempo em status, tempo de ciclo e gargalos das etapas de locação
+Os períodos de cada etapa saem do histórico de status com funções de janela (LEAD/ROW_NUMBER):
+cada mudança abre um período que termina na mudança seguinte. O histórico antigo é compactado
+em stage_status_intervals (períodos fechados, mesma fidelidade para as análises) e as métricas
+ficam materializadas por dia em stage_status_daily. As leituras servem a última materialização
+(as_of); mudanças novas no histórico recalculam só os projetos afetados, fora da requisição.
+O dia corrente é parcial até o próximo recálculo.
+"""
+import os
+import threading
+import zlib
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from ..core.jobs import Job, job_registry, periodic_scheduler
+from ..models.kpi_snapshot import KpiSnapshot
+from ..models.project_location import ProjectLocation
+from ..models.project_location_stage import LocationStageType, ProjectLocationStage, StageStatus
+from ..models.project_location_stage_history import ProjectLocationStageHistory
+from ..models.stage_status_analytics import StageStatusDaily, StageStatusInterval
+from .kpi_snapshot_service import META_METRIC
+
+# Histórico mais antigo que isso é compactado em períodos (a última mudança de cada etapa fica)
+STAGE_HISTORY_RETENTION_DAYS = int(os.getenv("STAGE_HISTORY_RETENTION_DAYS", "180"))
+
+# Intervalo da compactação + recálculo periódico em segundos (0 desativa)
+STAGE_STATUS_ANALYTICS_INTERVAL = float(os.getenv("STAGE_STATUS_ANALYTICS_INTERVAL", "3600"))
+STAGE_STATUS_ANALYTICS_JOB = "stage_status_analytics"
+
+# Intervalo do recálculo incremental (projetos com histórico novo) em segundos (0 desativa)
+STAGE_STATUS_REFRESH_INTERVAL = float(os.getenv("STAGE_STATUS_REFRESH_INTERVAL", "60"))
+STAGE_STATUS_REFRESH_JOB = "stage_status_analytics_refresh"
+
+# Linhas de controle em kpi_snapshot: horário (timestamp) da última materialização e
+# maior id do histórico já incorporado
+ANALYTICS_AS_OF_DIMENSION = "stage_status_analytics_as_of"
+ANALYTICS_HISTORY_DIMENSION = "stage_status_analytics_history_id"
+
+# Status em que a etapa está parada esperando trabalho (base do ranking de gargalos)
+WAITING_STATUSES = (StageStatus.IN_PROGRESS, StageStatus.ON_HOLD)
+OPEN_STATUSES = (StageStatus.PENDING, StageStatus.IN_PROGRESS, StageStatus.ON_HOLD)
+
+COMPACT_BATCH = int(os.getenv("STAGE_HISTORY_COMPACT_BATCH", "500"))
+
+# Recálculos (completos e incrementais) e a compactação não se sobrepõem no processo: os recálculos
+# reescrevem stage_status_daily e leem períodos compactados + histórico em consultas separadas
+_materialize_lock = threading.Lock()
+
+# Entre processos (PostgreSQL): trava de transação com a mesma finalidade
+_ADVISORY_LOCK_KEY = zlib.crc32(b"stage_status_analytics")
+
+
+class Period(NamedTuple):
+    status: str
+    started_at: datetime
+    ended_at: Optional[datetime]  # None: período em aberto (status atual)
+    changes: int
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Datas sem fuso (SQLite) são tratadas como UTC"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _status(value: Any) -> str:
+    if isinstance(value, StageStatus):
+        return value.value
+    return StageStatus(value).value if value else StageStatus.PENDING.value
+
+
+def _merge(periods: Iterable[Period]) -> List[Period]:
+    """Junta períodos consecutivos no mesmo status (mudanças só de percentual)"""
+    merged: List[Period] = []
+    for period in periods:
+        if period.ended_at is not None and period.ended_at < period.started_at:
+            continue
+        if merged and merged[-1].status == period.status:
+            last = merged[-1]
+            merged[-1] = Period(last.status, last.started_at, period.ended_at, last.changes + period.changes)
+        else:
+            merged.append(period)
+    return merged
+
+
+def split_days(start: datetime, end: datetime) -> Iterable[Tuple[date, float]]:
+    """Segundos de [start, end) em cada dia UTC"""
+    start, end = start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+    while start < end:
+        midnight = datetime.combine(start.date() + timedelta(days=1), time.min, tzinfo=timezone.utc)
+        stop = min(midnight, end)
+        yield start.date(), (stop - start).total_seconds()
+        start = stop
+
+
+def cycle_time(periods: List[Period]) -> Optional[Tuple[datetime, float]]:
+    """(conclusão, segundos) do primeiro início de andamento até a conclusão seguinte"""
+    started = None
+    for period in periods:
+        if period.status == StageStatus.IN_PROGRESS.value and started is None:
+            started = period.started_at
+        elif period.status == StageStatus.COMPLETED.value and started is not None:
+            return period.started_at, (period.started_at - started).total_seconds()
+    return None
+
+
+def _history_window():
+    """Linhas do histórico com o fim do período (LEAD) e a posição na etapa, do início e do fim"""
+    h = ProjectLocationStageHistory
+    forward = dict(partition_by=h.stage_id, order_by=(h.changed_at, h.id))
+    return select(
+        h.id,
+        h.stage_id,
+        h.previous_status,
+        h.new_status,
+        h.changed_at,
+        func.lead(h.changed_at, type_=h.changed_at.type).over(**forward).label("ended_at"),
+        func.row_number().over(**forward).label("position"),
+        func.row_number().over(partition_by=h.stage_id, order_by=(h.changed_at.desc(), h.id.desc())).label("from_end"),
+    )
+
+
+class StageStatusAnalyticsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _lock(self):
+        """Trava de transação entre processos (PostgreSQL); liberada no commit/rollback"""
+        if self.db.get_bind().dialect.name == "postgresql":
+            self.db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+
+    # ----- Períodos por etapa -----
+
+    def _stages(self, stage_ids: Optional[List[int]] = None, project_ids: Optional[List[int]] = None) -> Dict[int, Any]:
+        stmt = select(
+            ProjectLocationStage.id,
+            ProjectLocationStage.stage_type,
+            ProjectLocationStage.status,
+            ProjectLocationStage.created_at,
+            ProjectLocationStage.status_changed_at,
+            ProjectLocation.project_id,
+        ).join(ProjectLocation, ProjectLocation.id == ProjectLocationStage.project_location_id)
+        if stage_ids is not None:
+            stmt = stmt.where(ProjectLocationStage.id.in_(stage_ids))
+        if project_ids is not None:
+            stmt = stmt.where(ProjectLocation.project_id.in_(project_ids))
+        return {row.id: row for row in self.db.execute(stmt)}
+
+    def timelines(self, stage_ids: Optional[List[int]] = None) -> Dict[int, List[Period]]:
+        """
+        Períodos de cada etapa: compactados + derivados do histórico atual.
+        Antes da primeira mudança registrada, a etapa conta no status anterior desde a criação;
+        etapas sem histórico contam no status atual desde a última mudança (ou a criação).
+        """
+        stages = self._stages(stage_ids)
+        periods: Dict[int, List[Period]] = defaultdict(list)
+
+        stored = select(StageStatusInterval).order_by(StageStatusInterval.stage_id, StageStatusInterval.started_at)
+        if stage_ids is not None:
+            stored = stored.where(StageStatusInterval.stage_id.in_(stage_ids))
+        for interval in self.db.execute(stored).scalars():
+            periods[interval.stage_id].append(
+                Period(interval.status, _as_utc(interval.started_at), _as_utc(interval.ended_at), interval.changes)
+            )
+
+        history = _history_window()
+        if stage_ids is not None:
+            history = history.where(ProjectLocationStageHistory.stage_id.in_(stage_ids))
+        history = history.subquery()
+        for row in self.db.execute(select(history).order_by(history.c.stage_id, history.c.position)):
+            stage = stages.get(row.stage_id)
+            if stage is None:
+                continue
+            changed_at = _as_utc(row.changed_at)
+            if row.position == 1 and not periods[row.stage_id] and stage.created_at is not None:
+                periods[row.stage_id].append(
+                    Period(_status(row.previous_status or row.new_status), _as_utc(stage.created_at), changed_at, 0)
+                )
+            periods[row.stage_id].append(Period(_status(row.new_status), changed_at, _as_utc(row.ended_at), 1))
+
+        for stage_id, stage in stages.items():
+            if stage_id not in periods:
+                since = _as_utc(stage.status_changed_at or stage.created_at)
+                if since is not None:
+                    periods[stage_id].append(Period(_status(stage.status), since, None, 0))
+        return {stage_id: _merge(items) for stage_id, items in periods.items() if stage_id in stages}
+
+    def stage_timeline(self, stage_id: int) -> List[Dict[str, Any]]:
+        """Períodos de uma etapa (inclui os já compactados do histórico)"""
+        now = datetime.now(timezone.utc)
+        return [
+            {
+                "status": period.status,
+                "started_at": period.started_at,
+                "ended_at": period.ended_at,
+                "days": round(((period.ended_at or now) - period.started_at).total_seconds() / 86400, 2),
+                "changes": period.changes,
+            }
+            for period in self.timelines([stage_id]).get(stage_id, [])
+        ]
+
+    # ----- Materialização diária -----
+
+    def compute_daily(self, now: Optional[datetime] = None, project_ids: Optional[List[int]] = None) -> Dict[Tuple, List[float]]:
+        """(dia, projeto, tipo, status) -> [segundos, entradas, conclusões, segundos de ciclo]"""
+        now = now or datetime.now(timezone.utc)
+        stages = self._stages(project_ids=project_ids)
+        daily: Dict[Tuple, List[float]] = defaultdict(lambda: [0.0, 0, 0, 0.0])
+        timelines = self.timelines(list(stages) if project_ids is not None else None)
+        for stage_id, periods in timelines.items():
+            stage = stages[stage_id]
+            stage_type = stage.stage_type.value if stage.stage_type else ""
+            for period in periods:
+                key = (stage.project_id, stage_type, period.status)
+                daily[(period.started_at.astimezone(timezone.utc).date(), *key)][1] += 1
+                for day, seconds in split_days(period.started_at, period.ended_at or now):
+                    daily[(day, *key)][0] += seconds
+            cycle = cycle_time(periods)
+            if cycle is not None:
+                totals = daily[(cycle[0].astimezone(timezone.utc).date(), stage.project_id, stage_type, StageStatus.COMPLETED.value)]
+                totals[2] += 1
+                totals[3] += cycle[1]
+        return daily
+
+    def _markers(self) -> Dict[str, float]:
+        return dict(self.db.execute(
+            select(KpiSnapshot.dimension, KpiSnapshot.value).where(
+                KpiSnapshot.metric == META_METRIC,
+                KpiSnapshot.dimension.in_((ANALYTICS_AS_OF_DIMENSION, ANALYTICS_HISTORY_DIMENSION)),
+            )
+        ).all())
+
+    def _last_history_id(self) -> int:
+        return self.db.execute(select(func.coalesce(func.max(ProjectLocationStageHistory.id), 0))).scalar() or 0
+
+    def _materialize(self, now: datetime, project_ids: Optional[List[int]] = None) -> int:
+        """Reescreve stage_status_daily (tudo ou só os projetos informados) e grava as linhas de controle"""
+        self._lock()
+        # Marca d'água lida antes do cálculo: o que chegar durante ele entra no próximo recálculo
+        history_id = self._last_history_id()
+        rows = [
+            {
+                "day": day, "project_id": project_id, "stage_type": stage_type, "status": status,
+                "seconds": seconds, "entries": int(entries), "completions": int(completions), "cycle_seconds": cycle_seconds,
+            }
+            for (day, project_id, stage_type, status), (seconds, entries, completions, cycle_seconds)
+            in self.compute_daily(now, project_ids).items()
+        ]
+        if project_ids is None:
+            self.db.execute(delete(StageStatusDaily))
+        else:
+            self.db.execute(delete(StageStatusDaily).where(StageStatusDaily.project_id.in_(project_ids)))
+        if rows:
+            self.db.execute(insert(StageStatusDaily), rows)
+        self.db.execute(delete(KpiSnapshot).where(
+            KpiSnapshot.metric == META_METRIC,
+            KpiSnapshot.dimension.in_((ANALYTICS_AS_OF_DIMENSION, ANALYTICS_HISTORY_DIMENSION)),
+        ))
+        self.db.execute(insert(KpiSnapshot), [
+            {"metric": META_METRIC, "dimension": ANALYTICS_AS_OF_DIMENSION, "value": now.timestamp()},
+            {"metric": META_METRIC, "dimension": ANALYTICS_HISTORY_DIMENSION, "value": history_id},
+        ])
+        self.db.commit()
+        return len(rows)
+
+    def rebuild(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Recalcula stage_status_daily inteira a partir dos períodos (compactados + histórico)"""
+        now = now or datetime.now(timezone.utc)
+        with _materialize_lock:
+            return {"daily_rows": self._materialize(now)}
+
+    def refresh(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Recalcula só os projetos com histórico novo desde a última materialização.
+        Sem materialização anterior ou com o dia virado, recalcula tudo.
+        """
+        now = now or datetime.now(timezone.utc)
+        with _materialize_lock:
+            markers = self._markers()
+            as_of = markers.get(ANALYTICS_AS_OF_DIMENSION)
+            if as_of is None or datetime.fromtimestamp(as_of, timezone.utc).date() != now.date():
+                return {"projects": None, "daily_rows": self._materialize(now)}
+            h = ProjectLocationStageHistory
+            project_ids = list(self.db.execute(
+                select(ProjectLocation.project_id).distinct()
+                .join(ProjectLocationStage, ProjectLocationStage.project_location_id == ProjectLocation.id)
+                .join(h, h.stage_id == ProjectLocationStage.id)
+                .where(h.id > markers.get(ANALYTICS_HISTORY_DIMENSION, 0))
+            ).scalars())
+            if not project_ids:
+                return {"projects": 0, "daily_rows": 0}
+            return {"projects": len(project_ids), "daily_rows": self._materialize(now, project_ids)}
+
+    def as_of(self) -> Optional[datetime]:
+        """
+        Horário da materialização servida nas leituras (None se nunca houve).
+        Histórico novo ou dia virado antecipam o recálculo incremental, que roda com sessão própria.
+        """
+        markers = self._markers()
+        as_of = markers.get(ANALYTICS_AS_OF_DIMENSION)
+        if (
+            as_of is None
+            or datetime.fromtimestamp(as_of, timezone.utc).date() != datetime.now(timezone.utc).date()
+            or self._last_history_id() > markers.get(ANALYTICS_HISTORY_DIMENSION, 0)
+        ):
+            periodic_scheduler.trigger(STAGE_STATUS_REFRESH_JOB)
+        return datetime.fromtimestamp(as_of, timezone.utc) if as_of is not None else None
+
+    # ----- Compactação -----
+
+    def compact(self, before: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Converte o histórico anterior a `before` (padrão: retenção) em períodos fechados e o remove.
+        A última mudança de cada etapa é mantida: ela abre o período do status atual.
+        Autor e notas das linhas compactadas não são preservados.
+        Roda com as mesmas travas dos recálculos: duas compactações simultâneas gravariam os mesmos períodos.
+        """
+        before = before or datetime.now(timezone.utc) - timedelta(days=STAGE_HISTORY_RETENTION_DAYS)
+        with _materialize_lock:
+            self._lock()
+            return self._compact(before)
+
+    def _compact(self, before: datetime) -> Dict[str, Any]:
+        history = _history_window().subquery()
+        rows = self.db.execute(
+            select(history)
+            .where(history.c.changed_at < before, history.c.from_end > 1)
+            .order_by(history.c.stage_id, history.c.position)
+        ).all()
+        if not rows:
+            self.db.commit()  # Libera a trava
+            return {"compacted_rows": 0, "intervals": 0}
+
+        by_stage: Dict[int, List[Any]] = defaultdict(list)
+        for row in rows:
+            by_stage[row.stage_id].append(row)
+        created = dict(self.db.execute(
+            select(ProjectLocationStage.id, ProjectLocationStage.created_at).where(ProjectLocationStage.id.in_(list(by_stage)))
+        ).all())
+        last_intervals: Dict[int, StageStatusInterval] = {}
+        for interval in self.db.execute(
+            select(StageStatusInterval).where(StageStatusInterval.stage_id.in_(list(by_stage))).order_by(StageStatusInterval.started_at)
+        ).scalars():
+            last_intervals[interval.stage_id] = interval
+
+        new_rows = []
+        for stage_id, stage_rows in by_stage.items():
+            periods = []
+            first = stage_rows[0]
+            if first.position == 1 and stage_id not in last_intervals and created.get(stage_id) is not None:
+                periods.append(Period(_status(first.previous_status or first.new_status), _as_utc(created[stage_id]), _as_utc(first.changed_at), 0))
+            periods += [Period(_status(row.new_status), _as_utc(row.changed_at), _as_utc(row.ended_at), 1) for row in stage_rows]
+            periods = _merge(periods)
+
+            # Continua o último período compactado quando o status não mudou
+            previous = last_intervals.get(stage_id)
+            if previous is not None and periods and previous.status == periods[0].status and _as_utc(previous.ended_at) == periods[0].started_at:
+                previous.ended_at = periods[0].ended_at
+                previous.changes += periods[0].changes
+                periods = periods[1:]
+            new_rows += [
+                {"stage_id": stage_id, "status": p.status, "started_at": p.started_at, "ended_at": p.ended_at, "changes": p.changes}
+                for p in periods
+            ]
+
+        ids = [row.id for row in rows]
+        removed = 0
+        for offset in range(0, len(ids), COMPACT_BATCH):
+            removed += self.db.execute(delete(ProjectLocationStageHistory).where(
+                ProjectLocationStageHistory.id.in_(ids[offset:offset + COMPACT_BATCH])
+            )).rowcount
+        if removed != len(ids):
+            # Outra compactação (sem a trava do PostgreSQL) levou parte das linhas: nada é gravado
+            self.db.rollback()
+            print(f"⚠️ Compactação do histórico abortada: {len(ids) - removed} linhas já removidas por outra execução")
+            return {"compacted_rows": 0, "intervals": 0}
+        if new_rows:
+            self.db.execute(insert(StageStatusInterval), new_rows)
+        self.db.commit()
+        print(f"📦 Histórico de etapas compactado: {len(ids)} linhas em {len(new_rows)} períodos")
+        return {"compacted_rows": len(ids), "intervals": len(new_rows)}
+
+    # ----- Consultas -----
+
+    def _daily_filters(self, start: date, end: date, project_id: Optional[int], stage_type: Optional[LocationStageType]) -> List[Any]:
+        if start > end:
+            raise ValueError("A data inicial deve ser anterior à final")
+        filters = [StageStatusDaily.day >= start, StageStatusDaily.day <= end]
+        if project_id is not None:
+            filters.append(StageStatusDaily.project_id == project_id)
+        if stage_type is not None:
+            filters.append(StageStatusDaily.stage_type == stage_type.value)
+        return filters
+
+    def time_in_status(
+        self,
+        start: date,
+        end: date,
+        project_id: Optional[int] = None,
+        stage_type: Optional[LocationStageType] = None,
+    ) -> Dict[str, Any]:
+        """Dias somados em cada status (total e por tipo de etapa) no intervalo [start, end]"""
+        filters = self._daily_filters(start, end, project_id, stage_type)
+        as_of = self.as_of()
+        rows = self.db.execute(
+            select(
+                StageStatusDaily.stage_type,
+                StageStatusDaily.status,
+                func.sum(StageStatusDaily.seconds),
+                func.sum(StageStatusDaily.entries),
+            ).where(*filters).group_by(StageStatusDaily.stage_type, StageStatusDaily.status)
+        ).all()
+
+        by_status: Dict[str, List[float]] = {status.value: [0.0, 0] for status in StageStatus}
+        by_type: Dict[str, Dict[str, float]] = defaultdict(dict)
+        for row_type, status, seconds, entries in rows:
+            by_status[status][0] += seconds or 0
+            by_status[status][1] += entries or 0
+            by_type[row_type][status] = round((seconds or 0) / 86400, 2)
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "as_of": as_of,
+            "by_status": [
+                {"status": status, "days": round(seconds / 86400, 2), "entries": int(entries)}
+                for status, (seconds, entries) in by_status.items()
+            ],
+            "by_stage_type": [{"stage_type": key, "days": by_type[key]} for key in sorted(by_type)],
+        }
+
+    def cycle_times(self, start: date, end: date, project_id: Optional[int] = None) -> Dict[str, Any]:
+        """Tempo médio do início do andamento até a conclusão, por tipo (conclusões no intervalo)"""
+        filters = self._daily_filters(start, end, project_id, None)
+        as_of = self.as_of()
+        rows = self.db.execute(
+            select(
+                StageStatusDaily.stage_type,
+                func.sum(StageStatusDaily.completions),
+                func.sum(StageStatusDaily.cycle_seconds),
+            ).where(*filters, StageStatusDaily.completions > 0).group_by(StageStatusDaily.stage_type)
+        ).all()
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "as_of": as_of,
+            "stage_types": sorted(
+                (
+                    {"stage_type": row_type, "completions": int(count), "avg_cycle_days": round(seconds / count / 86400, 2)}
+                    for row_type, count, seconds in rows
+                ),
+                key=lambda item: -item["avg_cycle_days"],
+            ),
+        }
+
+    def bottlenecks(self, start: date, end: date, limit: int = 10) -> Dict[str, Any]:
+        """
+        Tipos de etapa com mais tempo em andamento/espera somado entre projetos, e as etapas
+        abertas há mais tempo no status atual
+        """
+        filters = self._daily_filters(start, end, None, None)
+        as_of = self.as_of()
+        waiting = [status.value for status in WAITING_STATUSES]
+        rows = self.db.execute(
+            select(
+                StageStatusDaily.stage_type,
+                StageStatusDaily.status,
+                func.sum(StageStatusDaily.seconds),
+                func.count(func.distinct(StageStatusDaily.project_id)),
+            ).where(*filters, StageStatusDaily.status.in_(waiting), StageStatusDaily.seconds > 0)
+            .group_by(StageStatusDaily.stage_type, StageStatusDaily.status)
+        ).all()
+        cycles = {item["stage_type"]: item for item in self.cycle_times(start, end)["stage_types"]}
+
+        by_type: Dict[str, Dict[str, Any]] = {}
+        for row_type, status, seconds, projects in rows:
+            item = by_type.setdefault(row_type, {"stage_type": row_type, "projects": 0, **{f"{s}_days": 0.0 for s in waiting}})
+            item[f"{status}_days"] = round(seconds / 86400, 2)
+            item["projects"] = max(item["projects"], projects)
+        for row_type, item in by_type.items():
+            item["waiting_days"] = round(sum(item[f"{s}_days"] for s in waiting), 2)
+            item["avg_cycle_days"] = cycles.get(row_type, {}).get("avg_cycle_days")
+
+        since = func.coalesce(ProjectLocationStage.status_changed_at, ProjectLocationStage.created_at)
+        stuck_rows = self.db.execute(
+            select(
+                ProjectLocationStage.id,
+                ProjectLocationStage.title,
+                ProjectLocationStage.stage_type,
+                ProjectLocationStage.status,
+                ProjectLocationStage.project_location_id,
+                ProjectLocation.project_id,
+                since.label("since"),
+            )
+            .join(ProjectLocation, ProjectLocation.id == ProjectLocationStage.project_location_id)
+            .where(ProjectLocationStage.status.in_(OPEN_STATUSES))
+            .order_by(since, ProjectLocationStage.id)
+            .limit(limit)
+        ).all()
+        now = datetime.now(timezone.utc)
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "as_of": as_of,
+            "stage_types": sorted(by_type.values(), key=lambda item: -item["waiting_days"])[:limit],
+            "stuck_stages": [
+                {
+                    "id": row.id,
+                    "title": row.title,
+                    "stage_type": row.stage_type.value if row.stage_type else None,
+                    "status": _status(row.status),
+                    "project_id": row.project_id,
+                    "project_location_id": row.project_location_id,
+                    "since": row.since,
+                    "days_in_status": round((now - _as_utc(row.since)).total_seconds() / 86400, 2) if row.since else None,
+                }
+                for row in stuck_rows
+            ],
+        }
+
+
+def run_stage_status_refresh(job: Job, bind):
+    """Tarefa periódica: incorpora o histórico novo recalculando só os projetos afetados"""
+    job_registry.start(job, total=1, message="Atualizando métricas de status das etapas")
+    db = Session(bind=bind)
+    try:
+        result = StageStatusAnalyticsService(db).refresh()
+    finally:
+        db.close()
+    job_registry.advance(job)
+    job_registry.complete(job, result=result)
+
+
+def run_stage_status_analytics(job: Job, bind):
+    """Tarefa periódica: compacta o histórico antigo e rematerializa as métricas diárias"""
+    job_registry.start(job, total=2, message="Compactando histórico das etapas")
+    db = Session(bind=bind)
+    try:
+        service = StageStatusAnalyticsService(db)
+        compacted = service.compact()
+        job_registry.advance(job)
+        result = {**compacted, **service.rebuild()}
+    finally:
+        db.close()
+    job_registry.advance(job)
+    job_registry.complete(job, result=result)
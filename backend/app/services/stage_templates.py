@@ -0,0 +1,169 @@
+"""
+Templates das etapas padrão por tipo de projeto (Project.project_type)
+Os templates embutidos valem para qualquer tipo. STAGE_TEMPLATES_PATH aponta para um JSON que
+substitui a lista de tipos específicos, lido uma vez por processo:
+{"project_location_stages": {"publicidade": [{"stage_type": "visitacao", "title": ..., ...}]},
+ "project_stages": {"publicidade": [{"name": ..., "stage_type": "pre_production"}]}}
+"""
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from ..models.project_location_stage import LocationStageType
+from ..schemas.project_location_stage import ProjectLocationStageTemplate
+from ..schemas.project_stage import DEFAULT_STAGES, ProjectStageTypeEnum
+
+STAGE_TEMPLATES_PATH = os.getenv("STAGE_TEMPLATES_PATH", "")
+
+DEFAULT_PROJECT_TYPE = "default"
+
+DEFAULT_LOCATION_STAGE_TEMPLATES: List[ProjectLocationStageTemplate] = [
+    ProjectLocationStageTemplate(
+        stage_type=LocationStageType.VISITACAO,
+        title="Visitação Inicial",
+        description="Primeira visita ao local para avaliação geral",
+        default_duration_days=1,
+        weight=1.0,
+        is_milestone=True,
+        is_critical=True,
+        default_responsible_role="coordinator"
+    ),
+    ProjectLocationStageTemplate(
+        stage_type=LocationStageType.AVALIACAO_TECNICA,
+        title="Avaliação Técnica",
+        description="Avaliação técnica detalhada do local e equipamentos",
+        default_duration_days=1,
+        weight=1.5,
+        is_milestone=False,
+        is_critical=True,
+        default_responsible_role="coordinator"
+    ),
+    ProjectLocationStageTemplate(
+        stage_type=LocationStageType.APROVACAO_CLIENTE,
+        title="Aprovação do Cliente",
+        description="Apresentação do local para aprovação do cliente",
+        default_duration_days=1,
+        weight=2.0,
+        is_milestone=True,
+        is_critical=True,
+        default_responsible_role="manager"
+    ),
+    ProjectLocationStageTemplate(
+        stage_type=LocationStageType.NEGOCIACAO,
+        title="Negociação",
+        description="Negociação de preços e condições contratuais",
+        default_duration_days=2,
+        weight=2.0,
+        is_milestone=False,
+        is_critical=True,
+        default_responsible_role="manager"
+    ),
+    ProjectLocationStageTemplate(
+        stage_type=LocationStageType.CONTRATACAO,
+        title="Contratação",
+        description="Assinatura do contrato e formalização",
+        default_duration_days=1,
+        weight=1.5,
+        is_milestone=True,
+        is_critical=True,
+        default_responsible_role="manager"
+    ),
+    ProjectLocationStageTemplate(
+        stage_type=LocationStageType.PREPARACAO,
+        title="Preparação",
+        description="Preparação do local para a gravação",
+        default_duration_days=1,
+        weight=1.0,
+        is_milestone=False,
+        is_critical=False,
+        default_responsible_role="coordinator"
+    ),
+    ProjectLocationStageTemplate(
+        stage_type=LocationStageType.SETUP,
+        title="Setup e Montagem",
+        description="Montagem de equipamentos e configuração",
+        default_duration_days=1,
+        weight=1.0,
+        is_milestone=False,
+        is_critical=False,
+        default_responsible_role="coordinator"
+    ),
+    ProjectLocationStageTemplate(
+        stage_type=LocationStageType.GRAVACAO,
+        title="Gravação/Filmagem",
+        description="Período de gravação ou filmagem",
+        default_duration_days=1,
+        weight=3.0,
+        is_milestone=True,
+        is_critical=True,
+        default_responsible_role="coordinator"
+    ),
+    ProjectLocationStageTemplate(
+        stage_type=LocationStageType.DESMONTAGEM,
+        title="Desmontagem",
+        description="Desmontagem de equipamentos e limpeza",
+        default_duration_days=1,
+        weight=1.0,
+        is_milestone=False,
+        is_critical=False,
+        default_responsible_role="coordinator"
+    ),
+    ProjectLocationStageTemplate(
+        stage_type=LocationStageType.ENTREGA,
+        title="Entrega Final",
+        description="Entrega do local e finalização do processo",
+        default_duration_days=1,
+        weight=1.5,
+        is_milestone=True,
+        is_critical=True,
+        default_responsible_role="coordinator"
+    )
+]
+
+
+def _project_stage_template(index: int, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": data["name"],
+        "stage_type": ProjectStageTypeEnum(data["stage_type"]),
+        "order_index": data.get("order_index", index),
+    }
+
+
+@lru_cache(maxsize=1)
+def configured_templates() -> Dict[str, Dict[str, List[Any]]]:
+    """Templates do arquivo de configuração por tipo de projeto (vazio se não houver arquivo)"""
+    configured: Dict[str, Dict[str, List[Any]]] = {"project_location_stages": {}, "project_stages": {}}
+    if not STAGE_TEMPLATES_PATH:
+        return configured
+    try:
+        with open(STAGE_TEMPLATES_PATH, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Não foi possível ler os templates de etapas em {STAGE_TEMPLATES_PATH}: {e}")
+        return configured
+
+    # Tipo com template inválido é ignorado (usa o padrão) para não travar a criação de etapas
+    for project_type, items in (data.get("project_location_stages") or {}).items():
+        try:
+            configured["project_location_stages"][project_type] = [ProjectLocationStageTemplate(**item) for item in items]
+        except (ValidationError, TypeError) as e:
+            print(f"⚠️ Templates de etapas de locação inválidos para '{project_type}': {e}")
+    for project_type, items in (data.get("project_stages") or {}).items():
+        try:
+            configured["project_stages"][project_type] = [_project_stage_template(i, item) for i, item in enumerate(items)]
+        except (KeyError, ValueError, TypeError) as e:
+            print(f"⚠️ Templates de etapas de projeto inválidos para '{project_type}': {e}")
+    return configured
+
+
+def location_stage_templates(project_type: Optional[str] = None) -> List[ProjectLocationStageTemplate]:
+    """Etapas padrão de uma locação para o tipo de projeto"""
+    return configured_templates()["project_location_stages"].get(project_type or DEFAULT_PROJECT_TYPE) or DEFAULT_LOCATION_STAGE_TEMPLATES
+
+
+def project_stage_templates(project_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Etapas padrão de um projeto para o tipo de projeto"""
+    return configured_templates()["project_stages"].get(project_type or DEFAULT_PROJECT_TYPE) or DEFAULT_STAGES
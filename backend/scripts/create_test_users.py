@@ -13,6 +13,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.core.database import SessionLocal, create_tables
 from app.models.user import User, UserRole
 from app.core.auth import get_password_hash
+from app.services.hooks import register_hooks
+
+register_hooks()
 
 def create_test_users():
     """Cria usuários de teste com senhas funcionais"""
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Regenera os eventos de calendário de todas as locações de projeto (após migrações de datas)
+
+Uso:
+    python scripts/regenerate_calendar.py [--after-id N] [--chunk-size N]
+
+Cada lote é confirmado antes do próximo; se o script for interrompido, rode de novo com
+--after-id igual ao último id impresso.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Adicionar o diretório raiz ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.calendar_regeneration_service import CALENDAR_REGENERATION_CHUNK, CalendarRegenerationService
+from app.services.hooks import register_hooks
+
+register_hooks()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenera eventos de calendário das locações de projeto")
+    parser.add_argument("--after-id", type=int, default=0, help="Começar após este id de locação")
+    parser.add_argument("--chunk-size", type=int, default=CALENDAR_REGENERATION_CHUNK, help="Locações por lote")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        service = CalendarRegenerationService(db)
+        total = service.count(args.after_id)
+        print(f"🗓️ Regenerando eventos de {total} locações (após id {args.after_id})")
+        started = time.monotonic()
+        done = 0
+
+        def on_chunk(last_id, counts):
+            nonlocal done
+            done += counts["locations"]
+            print(
+                f"  {done}/{total} locações | +{counts['inserted']} ~{counts['updated']} -{counts['deleted']} eventos"
+                f" | último id {last_id} | {time.monotonic() - started:.1f}s"
+            )
+
+        result = service.regenerate(args.after_id, args.chunk_size, on_chunk)
+        print(
+            f"✅ Concluído em {time.monotonic() - started:.1f}s: {result['inserted']} criados, "
+            f"{result['updated']} atualizados, {result['deleted']} removidos"
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
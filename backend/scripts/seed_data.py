@@ -15,6 +15,9 @@ from app.models.user import User
 from app.models.project import Project, ProjectStatus
 from app.models.location import Location
 from app.models.visit import Visit, VisitParticipant, VisitEtapa, VisitStatus
+from app.services.hooks import register_hooks
+
+register_hooks()
 
 def seed_database():
     """Popula o banco de dados com dados de exemplo"""
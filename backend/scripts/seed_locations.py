@@ -13,6 +13,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.core.database import get_db
 from app.models.location import Location, LocationStatus, SpaceType, SectorType
 from app.models.supplier import Supplier
+from app.services.hooks import register_hooks
+
+register_hooks()
 
 def seed_locations():
     """Popular dados de exemplo de locações"""
@@ -16,6 +16,9 @@ from app.models.project_location import ProjectLocation, ProjectLocationStatus
 from app.models.project import Project
 from app.models.location import Location
 from app.models.user import User
+from app.services.hooks import register_hooks
+
+register_hooks()
 
 def seed_project_locations():
     """Popular dados de exemplo de locações de projetos"""
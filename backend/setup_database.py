@@ -18,6 +18,9 @@ from app.models.project import Project, ProjectStatus
 from app.models.user import User, UserRole
 from app.models.project_location import ProjectLocation, RentalStatus
 from app.models.project_location_stage import ProjectLocationStage, StageStatus, LocationStageType
+from app.services.hooks import register_hooks
+
+register_hooks()
 
 def setup_database():
     """Configurar banco de dados e criar dados de exemplo"""
@@ -0,0 +1,58 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base, User, UserRole
+from app.services.hooks import register_hooks
+
+register_hooks()
+
+
+@pytest.fixture
+def db_engine():
+    """Banco SQLite em memória com todas as tabelas"""
+    engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(db_engine):
+    TestingSession = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+    session = TestingSession()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def test_user(db_session):
+    user = User(
+        email="teste@cinema.com",
+        full_name="Usuário Teste",
+        password_hash="x",
+        role=UserRole.ADMIN,
+        is_active=True,
+    )
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+@pytest.fixture
+def api_client(db_session, test_user):
+    """TestClient usando o banco em memória e um usuário autenticado"""
+    from app.main import app
+    from app.core.auth import get_current_user
+    from app.core.database import get_db
+
+    app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_current_user] = lambda: test_user
+    yield TestClient(app)
+    app.dependency_overrides.clear()
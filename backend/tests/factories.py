@@ -0,0 +1,110 @@
+"""
+Helpers para criar dados de teste no banco em memória
+"""
+from datetime import date, datetime, timedelta, timezone
+from itertools import count
+
+from app.models import (
+    AgendaEvent,
+    EventType,
+    FinancialMovement,
+    Location,
+    LocationStageType,
+    MovementStatus,
+    MovementType,
+    Project,
+    ProjectLocation,
+    ProjectLocationStage,
+    ProjectStatus,
+    StageStatus,
+)
+
+_sequence = count(1)
+
+
+def create_project(db, user, **kwargs) -> Project:
+    n = next(_sequence)
+    data = {
+        "name": f"Projeto {n}",
+        "status": ProjectStatus.ACTIVE,
+        "budget_total": 100000.0,
+        "budget_spent": 0.0,
+        "created_by": user.id,
+    }
+    data.update(kwargs)
+    project = Project(**data)
+    db.add(project)
+    db.commit()
+    return project
+
+
+def create_location(db, **kwargs) -> Location:
+    n = next(_sequence)
+    data = {"title": f"Locação {n}", "slug": f"locacao-{n}", "city": "São Paulo", "state": "SP"}
+    data.update(kwargs)
+    location = Location(**data)
+    db.add(location)
+    db.commit()
+    return location
+
+
+def create_project_location(db, project, location, **kwargs) -> ProjectLocation:
+    start = kwargs.pop("rental_start", date(2025, 1, 10))
+    data = {
+        "project_id": project.id,
+        "location_id": location.id,
+        "rental_start": start,
+        "rental_end": kwargs.pop("rental_end", start + timedelta(days=4)),
+        "daily_rate": 1000.0,
+        "total_cost": 5000.0,
+    }
+    data.update(kwargs)
+    project_location = ProjectLocation(**data)
+    db.add(project_location)
+    db.commit()
+    return project_location
+
+
+def create_stage(db, project_location, **kwargs) -> ProjectLocationStage:
+    data = {
+        "project_location_id": project_location.id,
+        "stage_type": LocationStageType.VISITACAO,
+        "title": "Visitação",
+        "status": StageStatus.PENDING,
+        "weight": 1.0,
+    }
+    data.update(kwargs)
+    stage = ProjectLocationStage(**data)
+    db.add(stage)
+    db.commit()
+    return stage
+
+
+def create_movement(db, project, user, **kwargs) -> FinancialMovement:
+    data = {
+        "project_id": project.id,
+        "user_id": user.id,
+        "movement_type": MovementType.GASTO,
+        "status": MovementStatus.PENDING,
+        "amount": 100.0,
+        "description": "Despesa",
+        "movement_date": datetime(2025, 1, 15, 12, 0, tzinfo=timezone.utc),
+    }
+    data.update(kwargs)
+    movement = FinancialMovement(**data)
+    db.add(movement)
+    db.commit()
+    return movement
+
+
+def create_agenda_event(db, **kwargs) -> AgendaEvent:
+    data = {
+        "title": "Visita técnica",
+        "event_type": EventType.CUSTOM,
+        "start_date": date(2025, 1, 10),
+    }
+    data.update(kwargs)
+    event = AgendaEvent(**data)
+    db.add(event)
+    db.commit()
+    return event
@@ -0,0 +1,57 @@
+from datetime import date
+
+from sqlalchemy import text
+
+from app.models import AgendaEvent
+from app.services.agenda_event_service import AGENDA_SHORT_SPAN_DAYS, AgendaEventService
+
+from factories import create_agenda_event, create_project
+
+
+def test_overlap_window_includes_events_in_progress(db_session, test_user):
+    project = create_project(db_session, test_user)
+    long_rental = create_agenda_event(db_session, start_date=date(2025, 1, 20), end_date=date(2025, 2, 10), project_id=project.id)
+    inside = create_agenda_event(db_session, start_date=date(2025, 2, 14), project_id=project.id)
+    create_agenda_event(db_session, start_date=date(2025, 1, 31), end_date=date(2025, 1, 31), project_id=project.id)
+    create_agenda_event(db_session, start_date=date(2025, 3, 1))
+    assert long_rental.span_days == 21
+
+    service = AgendaEventService(db_session)
+    february = service.get_events_by_date_range(date(2025, 2, 1), date(2025, 2, 28), project_id=project.id)
+    assert [e.id for e in february] == [long_rental.id, inside.id]
+    starting = service.get_events_by_date_range(date(2025, 2, 1), date(2025, 2, 28), overlap=False)
+    assert [e.id for e in starting] == [inside.id]
+
+    # Evento de meses fica fora da faixa dos curtos, mas ainda aparece na janela
+    season = create_agenda_event(db_session, start_date=date(2024, 11, 1), end_date=date(2025, 3, 31), project_id=project.id)
+    assert season.span_days > AGENDA_SHORT_SPAN_DAYS
+    february = service.get_events_by_date_range(date(2025, 2, 1), date(2025, 2, 28), project_id=project.id)
+    assert [e.id for e in february] == [season.id, long_rental.id, inside.id]
+
+
+def test_api_accepts_iso_datetimes_and_returns_typed_dates(api_client, db_session):
+    response = api_client.post("/api/v1/agenda-events/", json={
+        "title": "Visita técnica", "event_type": "technical_visit",
+        "start_date": "2025-02-03T14:30:00", "end_date": "2025-02-03",
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["start_date"], data["start_at"]) == ("2025-02-03", "2025-02-03T14:30:00")
+
+    event = db_session.get(AgendaEvent, data["id"])
+    event.start_date = date(2025, 2, 4)
+    db_session.commit()
+    assert event.start_at is None
+
+    found = api_client.get("/api/v1/agenda-events/date-range", params={"start_date": "2025-02-01", "end_date": "2025-02-28"})
+    assert [e["id"] for e in found.json()] == [data["id"]]
+    invalid = api_client.get("/api/v1/agenda-events/date-range", params={"start_date": "2025-02-28", "end_date": "2025-02-01"})
+    assert invalid.status_code == 400
+
+
+def test_month_view_uses_start_date_index(db_session):
+    plan = db_session.execute(text(
+        "EXPLAIN QUERY PLAN SELECT id FROM agenda_events "
+        "WHERE start_date <= '2025-02-28' AND start_date >= '2025-01-01' AND project_id = 1"
+    )).fetchall()
+    assert any("ix_agenda_events_start_date" in row[-1] for row in plan)
@@ -0,0 +1,71 @@
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from app.models.agenda_event import AgendaEvent, EventType
+
+from factories import create_agenda_event
+
+
+def _density(api_client, start, end, group="day"):
+    response = api_client.get("/api/v1/agenda-events/density", params={"from": start, "to": end, "group": group})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_density_matches_per_day_expansion(api_client, db_engine, db_session):
+    rng = random.Random(7)
+    types = [EventType.CUSTOM, EventType.FILMING_PERIOD, EventType.PAYMENT_DUE]
+    events = []
+    for _ in range(300):
+        start = date(2025, 1, 1) + timedelta(days=rng.randint(-20, 80))
+        end = start + timedelta(days=rng.choice([0, 0, 1, 3, 12])) if rng.random() < 0.6 else None
+        events.append(AgendaEvent(title="e", event_type=rng.choice(types), start_date=start, end_date=end, priority=rng.randint(1, 3)))
+    db_session.add_all(events)
+    db_session.commit()
+
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db_engine, "before_cursor_execute", record)
+    density = _density(api_client, "2025-01-01", "2025-02-28")
+    event.remove(db_engine, "before_cursor_execute", record)
+    assert sum("GROUP BY" in statement for statement in statements) == 1
+
+    window = (date(2025, 1, 1), date(2025, 2, 28))
+    expected = {}
+    for e in events:
+        day = max(e.start_date, window[0])
+        while day <= min(e.end_date or e.start_date, window[1]):
+            expected.setdefault(day.isoformat(), []).append(e)
+            day += timedelta(days=1)
+    assert {b["start"]: b["total"] for b in density["buckets"]} == {k: len(v) for k, v in expected.items()}
+    february_3 = next(b for b in density["buckets"] if b["start"] == "2025-02-03")
+    assert february_3["by_type"] == {
+        t.value: n for t in types if (n := sum(e.event_type == t for e in expected["2025-02-03"]))
+    }
+    assert sum(february_3["by_priority"].values()) == february_3["total"]
+
+    weeks = _density(api_client, "2025-01-01", "2025-02-28", group="week")
+    monday = date(2025, 1, 27)
+    touching = [e for e in events if e.start_date <= monday + timedelta(days=6) and (e.end_date or e.start_date) >= monday]
+    assert next(b for b in weeks["buckets"] if b["start"] == "2025-01-27")["total"] == len(touching)
+
+
+def test_density_spreads_multi_day_and_recurring_events(api_client, db_session):
+    create_agenda_event(db_session, start_date=date(2025, 3, 30), end_date=date(2025, 4, 2), event_type=EventType.FILMING_PERIOD)
+    api_client.post("/api/v1/agenda-events/", json={
+        "title": "Pagamento", "event_type": "payment_due", "start_date": "2025-04-01",
+        "priority": 3, "recurrence_rule": "FREQ=WEEKLY;COUNT=3",
+    })
+
+    density = _density(api_client, "2025-04-01", "2025-04-30")
+    assert [(b["start"], b["total"]) for b in density["buckets"]] == [
+        ("2025-04-01", 2), ("2025-04-02", 1), ("2025-04-08", 1), ("2025-04-15", 1),
+    ]
+    assert density["buckets"][0]["by_type"] == {"filming_period": 1, "payment_due": 1}
+    assert density["buckets"][0]["by_priority"]["3"] == 1
+    assert density["total_events"] == 4
+
+    assert api_client.get("/api/v1/agenda-events/density", params={"from": "2025-01-01", "to": "2030-01-01"}).status_code == 400
+    assert api_client.get("/api/v1/agenda-events/density", params={"from": "2025-01-01", "to": "2025-01-31", "group": "hour"}).status_code == 400
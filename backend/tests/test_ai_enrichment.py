@@ -0,0 +1,160 @@
+import asyncio
+import json
+
+from app.services.ai_enrichment import AIEnrichmentService, EnrichmentCache
+
+OPTIONS = {
+    "improveTitles": True,
+    "generateNotes": True,
+    "fillMissingCaptions": True,
+    "executiveSummary": False,
+}
+
+
+class StubProvider:
+    """Provider local: devolve títulos em maiúsculas e registra as chamadas"""
+
+    model = "stub"
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def complete(self, system_prompt: str, user_content: str):
+        body = json.loads(user_content)
+        self.calls.append(body)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        presentation = body["presentation"]
+        response = {}
+        if "cover" in presentation:
+            response["cover"] = {"title": presentation["cover"]["title"].upper()}
+            response["meta"] = {"executive_summary": "Resumo"}
+        if "pages" in presentation and "cover" not in presentation:
+            response["pages"] = [
+                {"id": p["id"], "title": p["title"].upper(), "notes": f"nota {p['id']}"}
+                for p in presentation["pages"]
+            ]
+        if "photos" in presentation:
+            response["photos"] = [
+                {"id": ph["id"], "caption": f"legenda {ph['id']}"} for ph in presentation["photos"]
+            ]
+        return json.dumps(response)
+
+
+def _payload(page_count: int = 3, photo_count: int = 2):
+    return {
+        "cover": {"title": "Apresentação", "subtitle": None},
+        "pages": [
+            {"id": f"p{i}", "title": f"página {i}", "notes": None, "layout": "single"}
+            for i in range(page_count)
+        ],
+        "photos": [{"id": i, "caption": None} for i in range(photo_count)],
+        "summary": {"enabled": False},
+    }
+
+
+def _sent_page_ids(provider: StubProvider):
+    return [
+        p["id"]
+        for call in provider.calls
+        if "cover" not in call["presentation"]
+        for p in call["presentation"].get("pages", [])
+    ]
+
+
+def test_disabled_returns_payload_unchanged():
+    service = AIEnrichmentService(provider=None)
+    service.enabled = False
+    result = asyncio.run(service.enrich_presentation(_payload(), OPTIONS))
+    assert result["meta"]["ai_enriched"] is False
+    assert result["pages"][0]["title"] == "página 0"
+
+
+def test_enriches_and_serves_repeat_exports_from_cache():
+    provider = StubProvider()
+    service = AIEnrichmentService(provider=provider, cache=EnrichmentCache())
+
+    first = asyncio.run(service.enrich_presentation(_payload(), OPTIONS))
+    assert first["meta"]["ai_enriched"] is True
+    assert first["cover"]["title"] == "APRESENTAÇÃO"
+    assert first["pages"][1]["title"] == "PÁGINA 1"
+    assert first["photos"][0]["caption"] == "legenda 0"
+    calls_after_first = len(provider.calls)
+
+    second = asyncio.run(service.enrich_presentation(_payload(), OPTIONS))
+    assert len(provider.calls) == calls_after_first
+    assert second["pages"][1]["title"] == "PÁGINA 1"
+    assert second["meta"]["ai_requests"] == 0
+
+
+def test_only_changed_pages_are_sent():
+    provider = StubProvider()
+    service = AIEnrichmentService(provider=provider, cache=EnrichmentCache())
+    asyncio.run(service.enrich_presentation(_payload(), OPTIONS))
+    provider.calls.clear()
+
+    changed = _payload()
+    changed["pages"][2]["title"] = "nova página"
+    result = asyncio.run(service.enrich_presentation(changed, OPTIONS))
+
+    assert _sent_page_ids(provider) == ["p2"]
+    assert result["pages"][2]["title"] == "NOVA PÁGINA"
+
+
+def test_already_enriched_content_is_not_resent():
+    provider = StubProvider()
+    service = AIEnrichmentService(provider=provider, cache=EnrichmentCache())
+    enriched = asyncio.run(service.enrich_presentation(_payload(), OPTIONS))
+    provider.calls.clear()
+
+    asyncio.run(service.enrich_presentation(enriched, OPTIONS))
+    assert _sent_page_ids(provider) == []
+
+
+def test_large_decks_are_chunked_in_parallel_without_truncation():
+    provider = StubProvider(delay=0.05)
+    service = AIEnrichmentService(
+        provider=provider, cache=EnrichmentCache(), pages_per_chunk=20, photos_per_chunk=40, max_concurrency=3
+    )
+    result = asyncio.run(service.enrich_presentation(_payload(page_count=100, photo_count=200), OPTIONS))
+
+    assert all(p["title"].isupper() for p in result["pages"])
+    assert all(ph["caption"] for ph in result["photos"])
+    page_calls = [c for c in provider.calls if "pages" in c["presentation"] and "cover" not in c["presentation"]]
+    assert len(page_calls) == 5
+    assert max(len(c["presentation"]["pages"]) for c in page_calls) == 20
+    assert 1 < provider.max_in_flight <= 3
+
+
+def test_timeout_leaves_items_unchanged_and_uncached():
+    provider = StubProvider(delay=0.5)
+    service = AIEnrichmentService(provider=provider, cache=EnrichmentCache(), timeout=0.05)
+    result = asyncio.run(service.enrich_presentation(_payload(), OPTIONS))
+
+    assert result["meta"]["ai_enriched"] is False
+    assert result["pages"][0]["title"] == "página 0"
+    assert len(service.cache) == 0
+
+
+def test_photo_cache_follows_content_and_skips_items_without_id():
+    provider = StubProvider()
+    service = AIEnrichmentService(provider=provider, cache=EnrichmentCache())
+    payload = _payload(photo_count=2)
+    payload["photos"][0]["url"] = "https://fotos/a.jpg"
+    payload["photos"].append({"id": None, "caption": None})
+    result = asyncio.run(service.enrich_presentation(payload, OPTIONS))
+    assert result["photos"][2]["caption"] is None
+    provider.calls.clear()
+
+    changed = _payload(photo_count=2)
+    changed["photos"][0]["url"] = "https://fotos/b.jpg"
+    asyncio.run(service.enrich_presentation(changed, OPTIONS))
+    sent = [ph["id"] for call in provider.calls for ph in call["presentation"].get("photos", [])]
+    assert sent == [0]
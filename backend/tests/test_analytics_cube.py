@@ -0,0 +1,175 @@
+import time
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import event, func, insert, select
+
+from app.models import FinancialMovement, Location, LocationStatus, MovementStatus, MovementType, SpaceType
+from app.services.analytics_cube_service import AnalyticsService, analytics_cube
+
+from factories import create_location, create_movement, create_project, create_project_location
+
+
+@pytest.fixture(autouse=True)
+def reset_analytics_cube():
+    analytics_cube.invalidate()
+    yield
+    analytics_cube.invalidate()
+
+
+def _count_statements(engine, func):
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        result = func()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return result, len(statements)
+
+
+def test_group_by_and_filters_match_sql(db_engine, db_session, test_user):
+    sp = create_location(db_session, city="São Paulo", price_day_cinema=800.0)
+    rio = create_location(db_session, city="Rio de Janeiro", state="RJ", price_day_cinema=6000.0)
+    project = create_project(db_session, test_user)
+    create_movement(db_session, project, test_user, amount=100.0, location_id=sp.id, status=MovementStatus.APPROVED)
+    create_movement(db_session, project, test_user, amount=50.0, currency="USD", exchange_rate=5.0,
+                    location_id=rio.id, status=MovementStatus.APPROVED)
+    create_movement(db_session, project, test_user, amount=30.0, location_id=rio.id)
+    create_movement(db_session, project, test_user, amount=20.0, movement_type=MovementType.REEMBOLSO,
+                    status=MovementStatus.APPROVED)
+
+    service = AnalyticsService(db_session)
+    service.query("financial_movements")
+    result, statements = _count_statements(db_engine, lambda: service.query(
+        "financial_movements",
+        group_by=["location_city"],
+        aggregates=[("count", None), ("sum", "amount")],
+        filters={"status": ["approved"], "movement_type": ["gasto"]},
+        order_by="sum_amount",
+    ))
+    assert statements == 0
+    assert result["rows"] == [
+        {"location_city": "Rio de Janeiro", "count": 1, "sum_amount": 250.0},
+        {"location_city": "São Paulo", "count": 1, "sum_amount": 100.0},
+    ]
+
+    expected = db_session.execute(
+        select(func.count(), func.sum(FinancialMovement.amount))
+        .where(FinancialMovement.status == MovementStatus.APPROVED)
+    ).one()
+    total = service.query("financial_movements", aggregates=[("count", None), ("sum", "amount_original")],
+                          filters={"status": ["approved"]})["rows"]
+    assert total == [{"count": expected[0], "sum_amount_original": expected[1]}]
+
+    bands = service.query("locations", group_by=["price_band"], ranges={"price_day": (None, 1000.0)})["rows"]
+    assert bands == [{"price_band": "Até R$ 1.000", "count": 1}]
+
+
+def test_committed_writes_update_cube_incrementally(db_engine, db_session, test_user):
+    location = create_location(db_session, city="Recife", space_type=SpaceType.HOUSE)
+    project = create_project(db_session, test_user)
+    service = AnalyticsService(db_session)
+    assert service.query("project_locations")["rows"] == [{"count": 0}]
+
+    rental = create_project_location(db_session, project, location, rental_start=date(2025, 3, 1))
+    location.city = "Olinda"
+    db_session.commit()
+
+    result, statements = _count_statements(db_engine, lambda: service.query(
+        "project_locations", group_by=["location_city", "month"],
+        aggregates=[("count", None), ("sum", "total_cost"), ("avg", "rental_days")],
+    ))
+    assert statements == 0
+    assert result["rows"] == [{"location_city": "Olinda", "month": "2025-03", "count": 1,
+                               "sum_total_cost": 5000.0, "avg_rental_days": 5.0}]
+
+    # Transação desfeita não chega ao cubo
+    rental.total_cost = 1.0
+    db_session.flush()
+    db_session.rollback()
+    assert service.query("project_locations", aggregates=[("sum", "total_cost")])["rows"] == [{"sum_total_cost": 5000.0}]
+
+    db_session.delete(rental)
+    db_session.commit()
+    assert service.query("project_locations")["rows"] == [{"count": 0}]
+
+
+def test_changes_committed_during_a_rebuild_are_replayed(db_session, test_user, monkeypatch):
+    create_location(db_session, city="Recife")
+    removed = create_location(db_session, city="Natal")
+    load = analytics_cube._load
+
+    def load_then_commit_elsewhere(db):
+        # A carga leu o banco; as gravações abaixo são confirmadas antes da troca das tabelas
+        tables = load(db)
+        db_session.delete(removed)
+        create_location(db_session, city="Olinda")
+        return tables
+
+    monkeypatch.setattr(analytics_cube, "_load", load_then_commit_elsewhere)
+    rows = AnalyticsService(db_session).query("locations", group_by=["city"])["rows"]
+    assert sorted(row["city"] for row in rows) == ["Olinda", "Recife"]
+
+
+def test_bulk_insert_triggers_rebuild_and_api_validates(api_client, db_session):
+    AnalyticsService(db_session).query("locations")
+    db_session.execute(insert(Location), [
+        {"title": f"Galpão {i}", "slug": f"galpao-{i}", "city": "Santos", "status": LocationStatus.APPROVED}
+        for i in range(3)
+    ])
+    db_session.commit()
+
+    response = api_client.post("/api/v1/analytics/query", json={
+        "dataset": "locations", "group_by": ["city", "status"], "filters": {"city": ["Santos"]},
+    })
+    assert response.status_code == 200
+    assert response.json()["rows"] == [{"city": "Santos", "status": "approved", "count": 3}]
+
+    assert api_client.get("/api/v1/analytics/datasets").json()["locations"]["rows"] == 3
+    invalid = api_client.post("/api/v1/analytics/query", json={"dataset": "locations", "group_by": ["budget"]})
+    assert invalid.status_code == 400
+    assert api_client.post("/api/v1/analytics/query", json={"dataset": "locations", "measures": ["sum"]}).status_code == 422
+
+
+@pytest.mark.slow
+def test_benchmark_cross_filter_on_200k_movements(db_session, test_user):
+    project = create_project(db_session, test_user)
+    locations = [create_location(db_session, city=f"Cidade {n % 20}") for n in range(50)]
+    types, statuses = list(MovementType), list(MovementStatus)
+    for start in range(0, 200_000, 20_000):
+        db_session.execute(insert(FinancialMovement), [
+            {
+                "project_id": project.id, "user_id": test_user.id, "description": "Carga",
+                "location_id": locations[i % len(locations)].id,
+                "movement_type": types[i % len(types)], "status": statuses[i % len(statuses)],
+                "amount": float(i % 900 + 1),
+                "movement_date": datetime(2024 + i % 2, i % 12 + 1, 1, tzinfo=timezone.utc),
+            }
+            for i in range(start, start + 20_000)
+        ])
+    db_session.commit()
+    service = AnalyticsService(db_session)
+
+    started = time.perf_counter()
+    service.query("financial_movements")
+    build_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(20):
+        result = service.query(
+            "financial_movements",
+            group_by=["location_city", "month"],
+            aggregates=[("count", None), ("sum", "amount")],
+            filters={"status": ["approved"], "movement_type": ["gasto", "ajuste"]},
+        )
+    query_elapsed = (time.perf_counter() - started) / 20
+
+    print(f"\nCubo (200k movimentações): carga {build_elapsed * 1000:.0f}ms, "
+          f"consulta agrupada {query_elapsed * 1000:.1f}ms")
+    assert sum(row["count"] for row in result["rows"]) == db_session.scalar(
+        select(func.count()).select_from(FinancialMovement)
+        .where(FinancialMovement.status == MovementStatus.APPROVED)
+        .where(FinancialMovement.movement_type.in_([MovementType.GASTO, MovementType.AJUSTE]))
+    )
+    assert query_elapsed < 0.05
@@ -0,0 +1,120 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app.core.intervals import IntervalIndex, sweep_overlaps
+from app.models.project_location import ProjectLocation, RentalStatus
+from app.services.booking_conflict_service import BookingConflictError, BookingConflictService, booking_index_cache
+
+from factories import create_location, create_project, create_project_location
+
+
+@pytest.fixture(autouse=True)
+def clear_booking_index():
+    booking_index_cache.clear()
+    yield
+    booking_index_cache.clear()
+
+
+def _payload(project, location, start, days=4, **extra):
+    return {
+        "project_id": project.id,
+        "location_id": location.id,
+        "rental_start": start.isoformat(),
+        "rental_end": (start + timedelta(days=days)).isoformat(),
+        "daily_rate": 1000.0,
+        **extra,
+    }
+
+
+def test_create_and_update_reject_double_booking(api_client, db_session, test_user):
+    first, second = create_project(db_session, test_user), create_project(db_session, test_user)
+    location = create_location(db_session)
+    create_project_location(db_session, first, location, rental_start=date(2025, 3, 10))
+
+    response = api_client.post("/api/v1/project-locations/", json=_payload(second, location, date(2025, 3, 13)))
+    assert response.status_code == 409
+    conflict = response.json()["detail"]["conflicts"][0]
+    assert conflict["other_project_id"] == first.id
+    assert (conflict["overlap_start"], conflict["overlap_end"]) == ("2025-03-13", "2025-03-14")
+
+    # Visita técnica dentro do aluguel do outro projeto também ocupa a locação
+    response = api_client.post(
+        "/api/v1/project-locations/",
+        json=_payload(second, location, date(2025, 4, 1), technical_visit_date="2025-03-12"),
+    )
+    assert response.status_code == 409
+    assert response.json()["detail"]["conflicts"][0]["window"] == "technical_visit"
+
+    # Mesmo projeto pode reservar de novo; datas livres passam
+    assert api_client.post("/api/v1/project-locations/", json=_payload(first, location, date(2025, 3, 12))).status_code == 200
+    free = api_client.post("/api/v1/project-locations/", json=_payload(second, location, date(2025, 3, 20)))
+    assert free.status_code == 200 and free.json()["booking_conflicts"] == []
+
+    booking_id = free.json()["id"]
+    moved = api_client.put(f"/api/v1/project-locations/{booking_id}", json={"rental_start": "2025-03-14"})
+    assert moved.status_code == 409
+    flagged = api_client.put(f"/api/v1/project-locations/{booking_id}?allow_conflicts=true", json={"rental_start": "2025-03-14"})
+    assert flagged.status_code == 200 and len(flagged.json()["booking_conflicts"]) == 2
+
+    cancelled = api_client.put(f"/api/v1/project-locations/{booking_id}", json={"status": RentalStatus.CANCELLED.value})
+    assert cancelled.status_code == 200
+    other = create_project(db_session, test_user)
+    assert api_client.post("/api/v1/project-locations/", json=_payload(other, location, date(2025, 3, 20))).status_code == 200
+
+
+def test_conflict_report_by_project_and_range(api_client, db_session, test_user):
+    first, second, third = (create_project(db_session, test_user) for _ in range(3))
+    studio, house = create_location(db_session), create_location(db_session)
+    mine = create_project_location(db_session, first, studio, rental_start=date(2025, 5, 1))
+    theirs = create_project_location(db_session, second, studio, rental_start=date(2025, 5, 3),
+                                     filming_start_date=date(2025, 5, 4))
+    create_project_location(db_session, second, house, rental_start=date(2025, 6, 1))
+    create_project_location(db_session, third, house, rental_start=date(2025, 6, 2))
+
+    report = api_client.get("/api/v1/project-locations/conflicts", params={"project_id": first.id}).json()
+    assert {(c["project_location_id"], c["other_project_location_id"], c["other_window"]) for c in report} == {
+        (mine.id, theirs.id, "rental"), (mine.id, theirs.id, "filming"),
+    }
+    assert len(api_client.get("/api/v1/project-locations/conflicts").json()) == 3
+    june = api_client.get("/api/v1/project-locations/conflicts", params={"date_from": "2025-06-01", "date_to": "2025-06-30"}).json()
+    assert [c["location_id"] for c in june] == [house.id]
+    assert api_client.get("/api/v1/project-locations/conflicts", params={"date_from": "2025-06-30", "date_to": "2025-06-01"}).status_code == 400
+
+
+def test_interval_index_and_sweep_match_pairwise_comparison():
+    rng = random.Random(42)
+    intervals = []
+    for key in range(400):
+        start = rng.randint(0, 2000)
+        intervals.append((start, start + rng.randint(0, rng.choice([3, 30, 200])), key, None))
+
+    overlaps = lambda a, b: a[0] <= b[1] and b[0] <= a[1]
+    expected = {frozenset((a[2], b[2])) for i, a in enumerate(intervals) for b in intervals[i + 1:] if overlaps(a, b)}
+    assert {frozenset((a[2], b[2])) for a, b in sweep_overlaps(intervals)} == expected
+
+    index = IntervalIndex(intervals[:200])
+    for interval in intervals[200:]:
+        index.add(*interval)
+    for start in range(0, 2200, 37):
+        window = (start, start + 10)
+        assert {i[2] for i in index.overlapping(*window)} == {i[2] for i in intervals if overlaps(i, window)}
+
+
+def test_check_reads_current_bookings_instead_of_cached_index(db_session, test_user):
+    first, second = create_project(db_session, test_user), create_project(db_session, test_user)
+    location = create_location(db_session)
+    service = BookingConflictService(db_session)
+    values = {"rental_start": date(2025, 5, 1), "rental_end": date(2025, 5, 5)}
+    assert service.check(location.id, second.id, values, allow_conflicts=True) == []  # Índice em cache, vazio
+
+    # Reserva gravada por fora dos hooks (outro processo): o cache não fica sabendo
+    db_session.connection().execute(insert(ProjectLocation.__table__).values(
+        project_id=first.id, location_id=location.id, rental_start=date(2025, 5, 3), rental_end=date(2025, 5, 8),
+    ))
+    db_session.commit()
+    assert service.check(location.id, second.id, values, allow_conflicts=True) == []
+    with pytest.raises(BookingConflictError):
+        service.check(location.id, second.id, values)
@@ -0,0 +1,116 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import event, insert
+
+from app.models import FinancialMovement, MovementStatus, MovementType, Project
+from app.services.budget_ledger_service import BudgetLedgerService
+from app.services.dashboard_service import DashboardService, dashboard_cache
+from app.services.financial_movement_service import FinancialMovementService
+from app.services.kpi_snapshot_service import KpiSnapshotService
+
+from factories import create_movement, create_project
+
+
+def test_transitions_adjust_budget_spent_in_the_same_transaction(db_engine, db_session, test_user):
+    KpiSnapshotService(db_session).reconcile()
+    service = FinancialMovementService(db_session)
+    project = create_project(db_session, test_user, budget_total=1000.0)
+
+    spend = create_movement(db_session, project, test_user, amount=400.0)
+    dollars = create_movement(db_session, project, test_user, amount=100.0, currency="USD", exchange_rate=5.0)
+    refund = create_movement(db_session, project, test_user, amount=150.0, movement_type=MovementType.REEMBOLSO)
+    income = create_movement(db_session, project, test_user, amount=999.0, movement_type=MovementType.RECEITA_EXTRA)
+    rejected = create_movement(db_session, project, test_user, amount=70.0)
+
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db_engine, "before_cursor_execute", record)
+    service.approve_movement(spend.id, test_user.id)
+    event.remove(db_engine, "before_cursor_execute", record)
+    # Ajuste relativo, sem somar de novo as movimentações do projeto
+    assert not any("sum(" in statement.lower() for statement in statements)
+
+    for movement in (dollars, refund, income):
+        service.approve_movement(movement.id, test_user.id)
+    service.reject_movement(rejected.id, test_user.id)
+    db_session.refresh(project)
+    assert (project.budget_spent, project.budget_remaining) == (750.0, 250.0)
+
+    service.cancel_movement(dollars.id, test_user.id)
+    db_session.refresh(project)
+    assert (project.budget_spent, project.budget_remaining) == (250.0, 750.0)
+
+    # Contadores do snapshot acompanharam o UPDATE feito fora do ORM
+    assert KpiSnapshotService(db_session).reconcile()["drift"] == {}
+    assert BudgetLedgerService(db_session).verify()["mismatches"] == []
+
+
+def test_approval_refreshes_cached_dashboard_kpis(db_session, test_user):
+    dashboard_cache.invalidate()
+    project = create_project(db_session, test_user, budget_total=500.0)
+    movement = create_movement(db_session, project, test_user, amount=600.0)
+    assert DashboardService(db_session).get_kpis()["projects_over_budget"] == 0
+
+    FinancialMovementService(db_session).approve_movement(movement.id, test_user.id)
+
+    kpis = DashboardService(db_session).get_kpis()
+    assert (kpis["budget_spent"], kpis["projects_over_budget"]) == (600.0, 1)
+    dashboard_cache.invalidate()
+
+
+def test_verification_rederives_totals_after_bulk_insert(api_client, db_session, test_user):
+    first = create_project(db_session, test_user)
+    second = create_project(db_session, test_user)
+    db_session.execute(insert(FinancialMovement), [
+        {
+            "project_id": project.id, "user_id": test_user.id, "movement_type": MovementType.GASTO,
+            "status": MovementStatus.APPROVED, "amount": amount, "description": "Importação",
+            "movement_date": datetime(2025, 1, 15, 12, 0, tzinfo=timezone.utc),
+        }
+        for project, amount in [(first, 100.0), (first, 50.0), (second, 30.0)]
+    ])
+    db_session.commit()
+
+    report = api_client.post("/api/v1/financial-movements/ledger/verify", params={"fix": False}).json()
+    assert {m["project_id"]: m["expected"] for m in report["mismatches"]} == {first.id: 150.0, second.id: 30.0}
+    assert report["fixed"] is False
+
+    assert api_client.post("/api/v1/financial-movements/ledger/verify").json()["fixed"] is True
+    db_session.expire_all()
+    assert [db_session.get(Project, p.id).budget_spent for p in (first, second)] == [150.0, 30.0]
+
+
+def test_verification_fix_keeps_approvals_committed_after_the_comparison(db_session, test_user, monkeypatch):
+    project = create_project(db_session, test_user)
+    db_session.execute(insert(FinancialMovement).values(
+        project_id=project.id, user_id=test_user.id, movement_type=MovementType.GASTO, status=MovementStatus.APPROVED,
+        amount=100.0, description="Importação", movement_date=datetime(2025, 1, 15, 12, 0, tzinfo=timezone.utc),
+    ))
+    db_session.commit()
+    service = BudgetLedgerService(db_session)
+    stale = service.expected_spent()
+    # Aprovação confirmada depois da comparação: a correção soma no banco em vez de gravar o valor lido antes
+    FinancialMovementService(db_session).approve_movement(create_movement(db_session, project, test_user, amount=40.0).id, test_user.id)
+    monkeypatch.setattr(service, "expected_spent", lambda: stale)
+
+    assert service.verify()["fixed"] is True
+    db_session.expire_all()
+    assert db_session.get(Project, project.id).budget_spent == 140.0
+
+
+def test_register_hooks_installs_ledger_and_rollup_listeners():
+    from sqlalchemy.orm import Session
+
+    from app.services.budget_ledger_service import budget_ledger_tracker
+    from app.services.financial_rollup_service import financial_rollup_tracker
+    from app.services.hooks import register_hooks
+
+    register_hooks()  # conftest já registrou: chamada repetida não faz nada
+    for tracker in (budget_ledger_tracker, financial_rollup_tracker):
+        assert event.contains(Session, "before_flush", tracker._capture_previous_values)
+        assert event.contains(Session, "after_flush", tracker._apply_flush_deltas)
+    # Caches do processo também entram pelo registro explícito, não pelo import do serviço
+    from app.services import analytics_cube_service, booking_conflict_service, ics_feed_service
+    assert event.contains(Session, "after_commit", analytics_cube_service._apply_cube_changes)
+    assert event.contains(Session, "after_commit", booking_conflict_service._invalidate_touched_locations)
+    assert event.contains(Session, "after_commit", ics_feed_service._apply_touched)
@@ -0,0 +1,111 @@
+import time
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app.core.jobs import job_registry
+from app.models.agenda_event import AgendaEvent, EventType
+from app.models.project_location import ProjectLocation
+from app.models.user import UserRole
+from app.services.calendar_regeneration_service import CalendarRegenerationService
+from app.services.project_location_calendar_service import GENERATED_EVENT_TYPES, project_location_calendar_service
+
+from factories import create_location, create_project, create_project_location
+
+
+def _generated(db_session):
+    return {
+        (e.project_location_id, e.event_type): (e.title, e.start_date, e.end_date, e.span_days)
+        for e in db_session.query(AgendaEvent).filter(AgendaEvent.event_type.in_(GENERATED_EVENT_TYPES))
+    }
+
+
+def test_regeneration_repairs_drift_in_chunks_and_resumes(db_session, test_user):
+    project = create_project(db_session, test_user)
+    rentals = [
+        create_project_location(db_session, project, create_location(db_session), rental_start=date(2025, 5, 1) + timedelta(days=i),
+                                filming_start_date=date(2025, 5, 2), filming_end_date=date(2025, 5, 4))
+        for i in range(5)
+    ]
+    for rental in rentals[:3]:
+        project_location_calendar_service.create_all_events(db_session, rental)
+    # Deriva: datas migradas sem sincronizar, duplicata antiga e cor editada no calendário
+    rentals[0].rental_end = date(2025, 5, 20)
+    db_session.commit()
+    filming = db_session.query(AgendaEvent).filter_by(project_location_id=rentals[1].id, event_type=EventType.FILMING_PERIOD).one()
+    filming.color = "#000000"
+    db_session.add(AgendaEvent(title="Duplicada", event_type=EventType.DELIVERY, start_date=date(2025, 1, 1), project_location_id=rentals[2].id))
+    db_session.commit()
+
+    service = CalendarRegenerationService(db_session)
+    chunks = []
+    result = service.regenerate(after_id=0, chunk_size=2, on_chunk=lambda last_id, counts: chunks.append(last_id))
+    assert chunks == [rentals[1].id, rentals[3].id, rentals[4].id]
+    assert (result["updated"], result["deleted"]) == (1, 1)
+    assert result["last_project_location_id"] == rentals[4].id
+
+    db_session.expire_all()
+    expected = {}
+    for rental in rentals:
+        for event_type, data in project_location_calendar_service.desired_events(db_session, rental).items():
+            span = (data["end_date"] - data["start_date"]).days if data["end_date"] else 0
+            expected[(rental.id, event_type)] = (data["title"], data["start_date"], data["end_date"], span)
+    assert _generated(db_session) == expected
+    assert db_session.get(AgendaEvent, filming.id).color == "#000000"
+
+    # Nada mudou: nenhuma escrita; retomada só olha as locações seguintes
+    again = service.regenerate()
+    assert (again["inserted"], again["updated"], again["deleted"]) == (0, 0, 0)
+    assert service.regenerate(after_id=rentals[3].id)["locations"] == 1
+
+
+def test_regeneration_job_reports_progress(api_client, db_session, test_user):
+    project = create_project(db_session, test_user)
+    for i in range(3):
+        create_project_location(db_session, project, create_location(db_session), rental_start=date(2025, 6, 1) + timedelta(days=i))
+
+    response = api_client.post("/api/v1/project-locations/calendar/regenerate", params={"chunk_size": 2})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    for _ in range(100):
+        job = api_client.get(f"/api/v1/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "completed", job
+    assert (job["completed"], job["total"]) == (3, 3)
+    assert job["result"]["inserted"] == 3
+
+    resumed = api_client.post("/api/v1/project-locations/calendar/regenerate", params={"resume_job_id": job_id})
+    assert resumed.status_code == 202
+    assert api_client.post("/api/v1/project-locations/calendar/regenerate", params={"resume_job_id": "x"}).status_code == 404
+
+    # Reescreve o calendário inteiro: só administradores
+    test_user.role = UserRole.MANAGER
+    assert api_client.post("/api/v1/project-locations/calendar/regenerate", params={"resume_job_id": job_id}).status_code == 403
+
+
+@pytest.mark.slow
+def test_regeneration_benchmark_50k(db_session, test_user):
+    project = create_project(db_session, test_user)
+    location = create_location(db_session)
+    db_session.execute(insert(ProjectLocation), [
+        {
+            "project_id": project.id, "location_id": location.id,
+            "rental_start": date(2025, 1, 1) + timedelta(days=i % 300),
+            "rental_end": date(2025, 1, 5) + timedelta(days=i % 300),
+            "filming_start_date": date(2025, 1, 2) + timedelta(days=i % 300),
+            "filming_end_date": date(2025, 1, 3) + timedelta(days=i % 300),
+            "daily_rate": 1000.0, "total_cost": 5000.0,
+        }
+        for i in range(50_000)
+    ])
+    db_session.commit()
+
+    started = time.perf_counter()
+    result = CalendarRegenerationService(db_session).regenerate()
+    elapsed = time.perf_counter() - started
+    print(f"\n50k locações: {result['inserted']} eventos criados em {elapsed:.1f}s")
+    assert result["inserted"] == 200_000
+    assert elapsed < 300
@@ -0,0 +1,62 @@
+from datetime import date
+
+from sqlalchemy import event
+
+from app.models import AgendaEvent
+from app.models.agenda_event import EventStatus, EventType
+from app.services.project_location_calendar_service import ProjectLocationCalendarService
+
+from factories import create_agenda_event, create_location, create_project, create_project_location
+
+
+def _writes(engine, func):
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        result = func()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    # Só escritas no calendário (hooks de snapshot gravam nas próprias tabelas)
+    return result, [s for s in statements if "agenda_events" in s and not s.lstrip().upper().startswith("SELECT")]
+
+
+def _events(db, project_location):
+    return {
+        e.event_type: e
+        for e in db.query(AgendaEvent).filter(AgendaEvent.project_location_id == project_location.id)
+    }
+
+
+def test_update_events_only_writes_what_changed(db_engine, db_session, test_user):
+    project = create_project(db_session, test_user)
+    location = create_location(db_session)
+    pl = create_project_location(db_session, project, location, visit_date=date(2025, 1, 5))
+    ProjectLocationCalendarService.create_all_events(db_session, pl)
+    manual = create_agenda_event(db_session, project_location_id=pl.id, project_id=project.id)
+
+    rental = _events(db_session, pl)[EventType.LOCATION_RENTAL_FULL]
+    rental.color, rental.status = "#000000", EventStatus.COMPLETED
+    db_session.commit()
+    rental_id = rental.id
+
+    # Edição que não mexe em datas: nenhuma escrita no calendário
+    pl.notes = "Levar gerador"
+    db_session.commit()
+    _, writes = _writes(db_engine, lambda: ProjectLocationCalendarService.update_events(db_session, pl))
+    assert writes == []
+
+    pl.visit_date = None
+    pl.delivery_date = date(2025, 1, 20)
+    pl.rental_end = date(2025, 1, 18)
+    db_session.commit()
+    synced, writes = _writes(db_engine, lambda: ProjectLocationCalendarService.update_events(db_session, pl))
+    assert sorted(w.split()[0] for w in writes) == ["DELETE", "INSERT", "UPDATE"]
+    assert {e.event_type for e in synced} == {EventType.LOCATION_RENTAL_FULL, EventType.DELIVERY}
+
+    events = _events(db_session, pl)
+    assert set(events) == {EventType.LOCATION_RENTAL_FULL, EventType.DELIVERY, EventType.CUSTOM}
+    rental = events[EventType.LOCATION_RENTAL_FULL]
+    assert (rental.id, rental.color, rental.status) == (rental_id, "#000000", EventStatus.COMPLETED)
+    assert (rental.end_date, rental.metadata_json["duration_days"]) == (date(2025, 1, 18), 9)
+    assert events[EventType.CUSTOM].id == manual.id
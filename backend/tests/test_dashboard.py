@@ -0,0 +1,143 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import event
+
+from app.core.aggregates import with_count
+from app.core.cache import SingleFlightCache
+from app.models import LocationStatus, ProjectLocation, ProjectLocationStage, ProjectStatus
+from app.services.dashboard_service import DashboardService, dashboard_cache
+from app.services.kpi_snapshot_service import KpiSnapshotService
+
+from factories import create_location, create_project, create_project_location, create_stage
+
+
+@pytest.fixture(autouse=True)
+def clear_dashboard_cache():
+    dashboard_cache.invalidate()
+    yield
+    dashboard_cache.invalidate()
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+
+def test_kpis_are_computed_in_a_single_query(db_engine, db_session, test_user):
+    create_project(db_session, test_user, budget_total=1000.0, budget_spent=1500.0)
+    create_project(db_session, test_user, budget_total=2000.0, budget_spent=500.0)
+    create_project(db_session, test_user, status=ProjectStatus.ARCHIVED, budget_total=9999.0)
+    create_location(db_session, status=LocationStatus.APPROVED)
+    create_location(db_session)
+
+    with QueryCounter(db_engine) as counter:
+        kpis = DashboardService(db_session).compute_kpis()
+
+    assert len(counter.statements) == 1
+    assert kpis["total_projects"] == 3
+    assert kpis["active_projects"] == 2
+    assert kpis["total_budget"] == 3000.0
+    assert kpis["budget_spent"] == 2000.0
+    assert kpis["projects_over_budget"] == 1
+    assert (kpis["total_locations"], kpis["approved_locations"]) == (2, 1)
+    assert kpis["active_users"] == 1
+
+
+def test_stats_endpoint_is_cached_and_invalidated_on_write(api_client, db_engine, db_session, test_user):
+    create_project(db_session, test_user)
+    KpiSnapshotService(db_session).reconcile()
+    assert api_client.get("/api/v1/dashboard/stats").json()["total_projects"] == 1
+    db_session.refresh(test_user)
+
+    with QueryCounter(db_engine) as counter:
+        cached = api_client.get("/api/v1/dashboard/stats").json()
+        summary = api_client.get("/api/v1/dashboard/financial-summary").json()
+    # KPIs vêm do cache; só a lista de maiores orçamentos é consultada
+    assert len(counter.statements) == 1
+    assert cached["total_projects"] == 1
+    assert summary["total_budget"] == 100000.0
+
+    create_project(db_session, test_user)
+    assert api_client.get("/api/v1/dashboard/stats").json()["total_projects"] == 2
+
+
+def test_single_flight_coalesces_concurrent_requests():
+    cache = SingleFlightCache(ttl=60)
+    calls = []
+
+    def slow_compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"total": 42}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("kpis", slow_compute)))
+        for _ in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"total": 42}] * 20
+
+
+def test_invalidation_during_compute_discards_stale_value():
+    cache = SingleFlightCache(ttl=60)
+
+    def compute():
+        cache.invalidate()
+        return "antigo"
+
+    assert cache.get_or_compute("kpis", compute) == "antigo"
+    assert cache.get("kpis") is None
+
+
+def _dashboard_projects_query_count(api_client, db_engine, db_session, test_user, projects: int) -> int:
+    for _ in range(projects):
+        project = create_project(db_session, test_user)
+        for _ in range(2):
+            create_project_location(db_session, project, create_location(db_session))
+    # Usuário autenticado já carregado: só as consultas do endpoint são contadas
+    db_session.refresh(test_user)
+
+    with QueryCounter(db_engine) as counter:
+        response = api_client.get("/api/v1/dashboard/projects", params={"limit": 50})
+    data = response.json()["projects"]
+    assert {p["location_count"] for p in data} == {2}
+    return len(counter.statements)
+
+
+def test_dashboard_projects_runs_constant_number_of_queries(api_client, db_engine, db_session, test_user):
+    few = _dashboard_projects_query_count(api_client, db_engine, db_session, test_user, 2)
+    many = _dashboard_projects_query_count(api_client, db_engine, db_session, test_user, 15)
+    assert few == many == 1
+
+
+def test_with_count_returns_zero_for_parents_without_children(db_session, test_user):
+    project = create_project(db_session, test_user)
+    first = create_project_location(db_session, project, create_location(db_session))
+    second = create_project_location(db_session, project, create_location(db_session))
+    create_stage(db_session, first)
+    create_stage(db_session, first, title="Contrato")
+
+    rows = with_count(
+        db_session.query(ProjectLocation).filter(ProjectLocation.project_id == project.id).order_by(ProjectLocation.id),
+        ProjectLocation.id, ProjectLocationStage.project_location_id,
+    ).all()
+    assert [(row[0].id, row.count) for row in rows] == [(first.id, 2), (second.id, 0)]
@@ -0,0 +1,81 @@
+import json
+
+from sqlalchemy import event
+
+from app.models import LocationStageType, ProjectLocationStage
+from app.services import stage_templates
+from app.services.project_location_stage_service import ProjectLocationStageService
+from app.services.project_stage_service import ProjectStageService
+from app.services.stage_progress_service import StageProgressService
+
+from factories import create_location, create_project, create_project_location
+
+
+def _count_commits(session):
+    commits = []
+    event.listen(session, "after_commit", lambda s: commits.append(1))
+    return commits
+
+
+def test_default_stages_are_created_with_a_single_commit(db_session, test_user):
+    project = create_project(db_session, test_user)
+    project_location = create_project_location(db_session, project, create_location(db_session))
+    others = [create_project_location(db_session, project, create_location(db_session)) for _ in range(3)]
+    StageProgressService(db_session).rebuild()
+    service = ProjectLocationStageService(db_session)
+
+    commits = _count_commits(db_session)
+    stages = service.create_default_stages(project_location.id)
+    assert len(commits) == 1
+    assert [s.title for s in stages] == [t.title for t in stage_templates.DEFAULT_LOCATION_STAGE_TEMPLATES]
+    assert stages[0].planned_start_date is not None
+
+    # Progresso ajustado uma vez no flush, igual ao recálculo
+    summary = StageProgressService(db_session).location_summary(project_location.id)
+    assert summary["total_stages"] == 10
+    assert summary["total_weight"] == sum(t.weight for t in stage_templates.DEFAULT_LOCATION_STAGE_TEMPLATES)
+
+    # Várias locações de uma vez (seeds): ainda um único commit
+    service.create_default_stages_for_locations([pl.id for pl in others])
+    assert len(commits) == 2
+    assert db_session.query(ProjectLocationStage).count() == 40
+    assert StageProgressService(db_session).project_summary(project.id)["total_stages"] == 40
+    assert StageProgressService(db_session).rebuild()["drift"] == 0
+
+
+def test_templates_follow_project_type(db_session, test_user, tmp_path, monkeypatch):
+    config = tmp_path / "stage_templates.json"
+    config.write_text(json.dumps({
+        "project_location_stages": {
+            "publicidade": [
+                {"stage_type": "visitacao", "title": "Visita", "description": "Visita rápida", "weight": 1.0},
+                {"stage_type": "gravacao", "title": "Gravação", "description": "Diária única", "weight": 2.0, "is_critical": True},
+            ],
+            "quebrado": [{"title": "Sem tipo"}],
+        },
+        "project_stages": {"publicidade": [{"name": "Produção", "stage_type": "production"}]},
+    }))
+    monkeypatch.setattr(stage_templates, "STAGE_TEMPLATES_PATH", str(config))
+    stage_templates.configured_templates.cache_clear()
+    try:
+        advertising = create_project(db_session, test_user, project_type="publicidade")
+        broken = create_project(db_session, test_user, project_type="quebrado")
+        location = create_location(db_session)
+
+        stages = ProjectLocationStageService(db_session).create_default_stages(
+            create_project_location(db_session, advertising, location).id
+        )
+        assert [(s.stage_type, s.title) for s in stages] == [
+            (LocationStageType.VISITACAO, "Visita"), (LocationStageType.GRAVACAO, "Gravação")
+        ]
+        # Template inválido no arquivo: cai no padrão
+        fallback = ProjectLocationStageService(db_session).create_default_stages(
+            create_project_location(db_session, broken, location).id
+        )
+        assert len(fallback) == 10
+
+        project_stages = ProjectStageService(db_session).create_default_stages(advertising.id)
+        assert [(s.name, s.order_index) for s in project_stages] == [("Produção", 0)]
+        assert len(ProjectStageService(db_session).create_default_stages(broken.id)) == 8
+    finally:
+        stage_templates.configured_templates.cache_clear()
@@ -0,0 +1,106 @@
+"""
+Benchmark de regressão: a latência da API deve permanecer estável durante exportações simultâneas.
+A geração do PPTX roda nos pools de I/O e de processos, então o event loop segue livre.
+"""
+import asyncio
+import statistics
+import time
+from io import BytesIO
+from unittest.mock import Mock
+
+import httpx
+import pytest
+from PIL import Image
+
+from app.main import app
+from app.core.auth import get_current_user
+from app.core.database import get_db
+from app.services.presentation_export_service import (
+    LocationSlideData,
+    PresentationExportService,
+    PresentationSnapshot,
+)
+
+CONCURRENT_EXPORTS = 6
+LOCATIONS_PER_EXPORT = 40
+
+
+def _sample_image() -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (1600, 1000), (120, 80, 200)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def heavy_snapshot(monkeypatch):
+    image = _sample_image()
+    snapshot = PresentationSnapshot(
+        title="Benchmark",
+        include_summary=True,
+        locations=[
+            LocationSlideData(
+                id=i,
+                title=f"Locação {i}",
+                city="São Paulo",
+                state="SP",
+                capacity=50,
+                daily_rate=1500.0,
+                description="Descrição " * 30,
+                photos=[image, image, image],
+            )
+            for i in range(LOCATIONS_PER_EXPORT)
+        ],
+    )
+    monkeypatch.setattr(PresentationExportService, "build_snapshot", lambda self, request: snapshot)
+
+    app.dependency_overrides[get_db] = lambda: None
+    app.dependency_overrides[get_current_user] = lambda: Mock()
+    yield snapshot
+    app.dependency_overrides.clear()
+
+
+async def _measure_health(client: httpx.AsyncClient, samples: int, interval: float = 0.02):
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        response = await client.get("/health")
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def _run_benchmark():
+    payload = {"location_ids": [1], "order": [0], "include_summary": True}
+    async with httpx.AsyncClient(app=app, base_url="http://test", timeout=120) as client:
+        baseline = await _measure_health(client, 20)
+
+        exports = [
+            asyncio.create_task(client.post("/api/v1/export/presentation/download", json=payload))
+            for _ in range(CONCURRENT_EXPORTS)
+        ]
+        # Dá tempo para as exportações começarem antes de medir
+        await asyncio.sleep(0.05)
+        during = await _measure_health(client, 40)
+        responses = await asyncio.gather(*exports)
+    return baseline, during, responses
+
+
+@pytest.mark.slow
+def test_health_latency_flat_during_concurrent_exports(heavy_snapshot):
+    baseline, during, responses = asyncio.run(_run_benchmark())
+
+    for response in responses:
+        assert response.status_code == 200, response.text
+        assert response.content[:2] == b"PK"  # PPTX é um zip
+
+    baseline_median = statistics.median(baseline)
+    during_median = statistics.median(during)
+    print(
+        f"\n/health mediana: {baseline_median * 1000:.1f}ms ocioso, "
+        f"{during_median * 1000:.1f}ms durante {CONCURRENT_EXPORTS} exportações "
+        f"(máx {max(during) * 1000:.1f}ms)"
+    )
+    # Com o render no event loop, cada /health esperaria uma exportação inteira (segundos)
+    assert during_median < max(0.05, baseline_median * 10)
+    assert max(during) < 0.5
@@ -0,0 +1,120 @@
+from datetime import date, datetime, timezone
+
+from sqlalchemy import insert
+
+from app.models import FinancialMovement, MovementStatus, MovementType
+from app.services.financial_movement_service import FinancialMovementService
+from app.services.financial_rollup_service import FinancialRollupService
+
+from factories import create_location, create_movement, create_project
+
+
+def _at(year, month, day):
+    return datetime(year, month, day, 12, 0, tzinfo=timezone.utc)
+
+
+def test_hooks_keep_rollups_equal_to_rebuild(db_session, test_user):
+    service = FinancialRollupService(db_session)
+    service.rebuild()
+    movements = FinancialMovementService(db_session)
+    project = create_project(db_session, test_user)
+    location = create_location(db_session)
+
+    approved = create_movement(db_session, project, test_user, amount=300.0, location_id=location.id)
+    dollars = create_movement(db_session, project, test_user, amount=100.0, currency="USD", exchange_rate=5.0)
+    cancelled = create_movement(db_session, project, test_user, amount=50.0, movement_date=_at(2025, 2, 3))
+    rejected = create_movement(db_session, project, test_user, amount=70.0)
+
+    movements.approve_movement(approved.id, test_user.id)
+    movements.approve_movement(dollars.id, test_user.id)
+    movements.approve_movement(cancelled.id, test_user.id)
+    movements.cancel_movement(cancelled.id, test_user.id)
+    movements.reject_movement(rejected.id, test_user.id)
+    # Correção de data depois do commit (atributos expirados) e exclusão
+    approved.movement_date = _at(2025, 1, 20)
+    db_session.commit()
+    db_session.delete(rejected)
+    db_session.commit()
+
+    data = service.series(date(2025, 1, 1), date(2025, 2, 28))
+    assert [(p["bucket"], p["count"], p["amount"]) for p in data["series"][0]["points"]] == [
+        ("2025-01-01", 2, 800.0),
+        ("2025-02-01", 0, 0.0),
+    ]
+    assert service.rebuild()["drift"] == 0
+
+
+def test_series_endpoint_buckets_and_groups(api_client, db_session, test_user):
+    first = create_project(db_session, test_user)
+    second = create_project(db_session, test_user)
+    for project, day, amount in [(first, _at(2025, 1, 6), 100.0), (first, _at(2025, 1, 8), 50.0),
+                                 (second, _at(2025, 1, 14), 200.0), (first, _at(2025, 3, 31), 10.0)]:
+        create_movement(db_session, project, test_user, amount=amount, movement_date=day, status=MovementStatus.APPROVED)
+    create_movement(db_session, first, test_user, amount=999.0, movement_date=_at(2025, 1, 7))  # pendente
+
+    weekly = api_client.get("/api/v1/financial-movements/series", params={
+        "start": "2025-01-06", "end": "2025-01-19", "granularity": "week", "group_by": "project",
+    }).json()
+    assert [(s["key"], [p["amount"] for p in s["points"]]) for s in weekly["series"]] == [
+        (first.id, [150.0, 0.0]),
+        (second.id, [0.0, 200.0]),
+    ]
+
+    # Mês parcial nas pontas: janeiro a partir do dia 8, fevereiro inteiro, março até o dia 30
+    monthly = api_client.get("/api/v1/financial-movements/series", params={
+        "start": "2025-01-08", "end": "2025-03-30",
+    }).json()
+    assert [(p["bucket"], p["amount"]) for p in monthly["series"][0]["points"]] == [
+        ("2025-01-01", 250.0), ("2025-02-01", 0.0), ("2025-03-01", 0.0),
+    ]
+
+    invalid = api_client.get("/api/v1/financial-movements/series", params={
+        "start": "2025-01-01", "end": "2025-01-31", "granularity": "year",
+    })
+    assert invalid.status_code == 400
+
+
+def test_approval_flow_via_api(api_client, db_session, test_user):
+    project = create_project(db_session, test_user)
+    created = api_client.post("/api/v1/financial-movements/", json={
+        "project_id": project.id,
+        "movement_type": MovementType.GASTO.value,
+        "amount": 20.0,
+        "currency": "EUR",
+        "exchange_rate": 6.0,
+        "description": "Gerador",
+        "movement_date": "2025-05-02T09:00:00+00:00",
+    }).json()
+    assert created["status"] == "pending"
+
+    approved = api_client.post(f"/api/v1/financial-movements/{created['id']}/approve").json()
+    assert approved["approved_by"] == test_user.id
+    assert api_client.post(f"/api/v1/financial-movements/{created['id']}/reject").status_code == 409
+
+    series = api_client.get("/api/v1/financial-movements/series", params={
+        "start": "2025-05-01", "end": "2025-05-31",
+    }).json()
+    assert series["series"][0]["total_amount"] == 120.0
+
+
+def test_bulk_insert_marks_rollups_stale(db_session, test_user):
+    service = FinancialRollupService(db_session)
+    service.rebuild()
+    project = create_project(db_session, test_user)
+
+    db_session.execute(insert(FinancialMovement), [
+        {
+            "project_id": project.id, "user_id": test_user.id, "movement_type": MovementType.GASTO,
+            "status": MovementStatus.APPROVED, "amount": 10.0, "description": "Lote",
+            "movement_date": _at(2025, 4, day),
+        }
+        for day in range(1, 6)
+    ])
+    db_session.commit()
+    # A leitura não recalcula na sessão da requisição; o recálculo periódico corrige
+    assert service.series(date(2025, 4, 1), date(2025, 4, 30), granularity="day")["series"][0]["total_count"] == 0
+    service.rebuild()
+
+    data = service.series(date(2025, 4, 1), date(2025, 4, 30), granularity="day")
+    assert data["series"][0]["total_count"] == 5
+    assert data["series"][0]["total_amount"] == 50.0
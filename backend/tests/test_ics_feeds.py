@@ -0,0 +1,91 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event
+
+from app.models import User, UserRole
+from app.models.user_project import UserProject
+from app.services.ics_feed_service import PROJECT_FEED, USER_FEED, feed_token, ics_feed_cache
+
+from factories import create_agenda_event, create_project
+
+
+@pytest.fixture(autouse=True)
+def clear_ics_cache():
+    ics_feed_cache.clear()
+    yield
+    ics_feed_cache.clear()
+
+
+def _coordinator(db, *projects):
+    user = User(email="coord@cinema.com", full_name="Coordenação", password_hash="x", role=UserRole.CONTRIBUTOR)
+    db.add(user)
+    db.flush()
+    db.add_all([UserProject(user_id=user.id, project_id=project.id) for project in projects])
+    db.commit()
+    return user
+
+
+def test_feed_is_scoped_cached_and_reserialises_only_touched_events(api_client, db_engine, db_session, test_user):
+    today = date.today()
+    mine, other = create_project(db_session, test_user), create_project(db_session, test_user)
+    visit = create_agenda_event(db_session, title="Visita; técnica", project_id=mine.id, start_date=today)
+    shoot = create_agenda_event(db_session, title="Gravação", project_id=mine.id, start_date=today,
+                                start_at=datetime(today.year, today.month, today.day, 9, 30))
+    create_agenda_event(db_session, title="Outro projeto", project_id=other.id, start_date=today)
+    user = _coordinator(db_session, mine)
+    url = f"/api/v1/agenda-events/feeds/{feed_token(USER_FEED, user.id)}.ics"
+
+    response = api_client.get(url)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/calendar")
+    body = response.text
+    assert body.count("BEGIN:VEVENT") == 2 and "SUMMARY:Visita\; técnica" in body
+    assert f"DTSTART:{today:%Y%m%d}T093000" in body and "Outro projeto" not in body
+
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db_engine, "before_cursor_execute", record)
+    cached = api_client.get(url, headers={"If-None-Match": response.headers["etag"]})
+    event.remove(db_engine, "before_cursor_execute", record)
+    assert cached.status_code == 304
+    assert not any("FROM agenda_events" in statement for statement in statements)
+
+    serialized = ics_feed_cache.serialized
+    shoot.title = "Gravação externa"
+    db_session.commit()
+    changed = api_client.get(url, headers={"If-None-Match": response.headers["etag"]})
+    assert changed.status_code == 200 and "SUMMARY:Gravação externa" in changed.text
+    assert changed.headers["etag"] != response.headers["etag"]
+    assert ics_feed_cache.serialized == serialized + 1
+
+
+def test_feed_requires_project_access_and_valid_token(api_client, db_session, test_user):
+    mine, other = create_project(db_session, test_user), create_project(db_session, test_user)
+    user = _coordinator(db_session, mine)
+
+    assert api_client.get(f"/api/v1/agenda-events/feeds/{feed_token(PROJECT_FEED, user.id, mine.id)}.ics").status_code == 200
+    assert api_client.get(f"/api/v1/agenda-events/feeds/{feed_token(PROJECT_FEED, user.id, other.id)}.ics").status_code == 404
+    forged = feed_token(USER_FEED, user.id).rsplit(".", 1)[0] + ".assinatura"
+    assert api_client.get(f"/api/v1/agenda-events/feeds/{forged}.ics").status_code == 404
+
+    urls = api_client.get("/api/v1/agenda-events/feeds").json()
+    assert urls["user"].endswith(f"/feeds/{feed_token(USER_FEED, test_user.id)}.ics")
+
+
+def test_last_modified_advances_when_an_event_leaves_the_feed(api_client, db_session, test_user):
+    project = create_project(db_session, test_user)
+    create_agenda_event(db_session, title="Visita", project_id=project.id, start_date=date.today())
+    doomed = create_agenda_event(db_session, title="Cancelada", project_id=project.id, start_date=date.today())
+    url = f"/api/v1/agenda-events/feeds/{feed_token(PROJECT_FEED, test_user.id, project.id)}.ics"
+    first = api_client.get(url)
+    since = {"If-Modified-Since": first.headers["last-modified"]}
+    assert api_client.get(url, headers=since).status_code == 304
+
+    # A exclusão não muda max(updated_at) dos eventos restantes, mas o corpo mudou
+    db_session.delete(doomed)
+    db_session.commit()
+    changed = api_client.get(url, headers=since)
+    assert changed.status_code == 200 and "Cancelada" not in changed.text
+    assert changed.headers["last-modified"] != first.headers["last-modified"]
+    assert api_client.get(url, headers={"If-Modified-Since": changed.headers["last-modified"]}).status_code == 304
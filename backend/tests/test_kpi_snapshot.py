@@ -0,0 +1,121 @@
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import insert, update
+
+from app.core.jobs import JobRegistry, JobStatus, PeriodicScheduler
+from app.models import KpiSnapshot, Location, LocationStatus, ProjectStatus, SpaceType, StageStatus
+from app.services.dashboard_service import DashboardService
+from app.services import kpi_snapshot_service
+from app.services.kpi_snapshot_service import (
+    KPI_RECONCILE_JOB,
+    LOCATIONS_BY_STATUS,
+    META_METRIC,
+    KpiSnapshotService,
+    run_kpi_reconcile,
+)
+
+from factories import (
+    create_agenda_event,
+    create_location,
+    create_project,
+    create_project_location,
+    create_stage,
+)
+
+
+def test_hooks_keep_snapshot_equal_to_live_aggregation(db_session, test_user):
+    service = KpiSnapshotService(db_session)
+    service.reconcile()
+    today = date.today()
+
+    active = create_project(db_session, test_user, budget_total=1000.0, budget_spent=200.0)
+    archived = create_project(db_session, test_user, status=ProjectStatus.ARCHIVED)
+    doomed = create_project(db_session, test_user, budget_total=50.0)
+    location = create_location(db_session, city="Santos", price_day_cinema=800.0)
+    create_location(db_session, status=LocationStatus.APPROVED, space_type=SpaceType.STUDIO)
+    project_location = create_project_location(db_session, active, location)
+    create_agenda_event(db_session, start_date=(today + timedelta(days=2)).isoformat() + "T10:00:00")
+    create_agenda_event(db_session, start_date=(today + timedelta(days=30)).isoformat())
+    late_stage = create_stage(
+        db_session, project_location, planned_end_date=datetime.now(timezone.utc) - timedelta(days=3)
+    )
+    create_stage(db_session, project_location, planned_end_date=datetime.now(timezone.utc) - timedelta(days=5))
+
+    # Alterações depois do commit (atributos expirados) e exclusões
+    active.budget_spent = 1500.0
+    archived.status = ProjectStatus.ACTIVE
+    location.city = "Rio de Janeiro"
+    location.price_day_cinema = 7000.0
+    late_stage.status = StageStatus.COMPLETED
+    test_user.is_active = False
+    db_session.commit()
+    db_session.delete(doomed)
+    db_session.commit()
+
+    snapshot = service.dashboard_kpis(today)
+    assert snapshot == DashboardService(db_session).compute_kpis(today)
+    assert snapshot["projects_over_budget"] == 1
+    assert snapshot["upcoming_events"] == 1
+    assert snapshot["overdue_stages"] == 1
+    assert snapshot["active_users"] == 0
+    # Nada para corrigir: os deltas incrementais bateram com o recálculo
+    assert service.reconcile()["drift"] == {}
+
+
+def test_bulk_writes_mark_snapshot_stale_and_read_defers_reconcile(db_engine, db_session, monkeypatch):
+    service = KpiSnapshotService(db_session)
+    service.reconcile()
+    registry = JobRegistry()
+    scheduler = PeriodicScheduler(registry)
+    scheduler.register(KPI_RECONCILE_JOB, 900, run_kpi_reconcile, db_engine)
+    monkeypatch.setattr(kpi_snapshot_service, "periodic_scheduler", scheduler)
+
+    db_session.execute(insert(Location), [
+        {"title": f"Galpão {i}", "slug": f"galpao-{i}", "city": "Campinas"} for i in range(5)
+    ])
+    db_session.commit()
+    stale = db_session.get(KpiSnapshot, (META_METRIC, "stale"))
+    assert stale.value > 0
+
+    # A leitura não recalcula na sessão da requisição: serve o último snapshot e antecipa a tarefa
+    assert service.get_metrics([LOCATIONS_BY_STATUS])[LOCATIONS_BY_STATUS] == {}
+    scheduler.run_due()
+    scheduler._tasks[KPI_RECONCILE_JOB]["running"].result(timeout=10)
+    assert registry.list(KPI_RECONCILE_JOB)[0].status == JobStatus.COMPLETED
+
+    db_session.expire_all()
+    assert service.get_metrics([LOCATIONS_BY_STATUS])[LOCATIONS_BY_STATUS] == {"draft": 5}
+
+
+def test_reconcile_reports_and_fixes_drift(db_session, test_user):
+    service = KpiSnapshotService(db_session)
+    create_project(db_session, test_user)
+    service.reconcile()
+
+    db_session.execute(
+        update(KpiSnapshot)
+        .where(KpiSnapshot.metric == "projects_by_status", KpiSnapshot.dimension == "active")
+        .values(value=40)
+    )
+    db_session.commit()
+
+    result = service.reconcile()
+    assert result["drift"] == {"projects_by_status:active": {"expected": 1, "actual": 40}}
+    assert service.dashboard_kpis()["active_projects"] == 1
+
+
+def test_periodic_scheduler_runs_reconciliation_job(db_engine, db_session, test_user):
+    create_project(db_session, test_user)
+    registry = JobRegistry()
+    scheduler = PeriodicScheduler(registry)
+    scheduler.register(KPI_RECONCILE_JOB, 60, run_kpi_reconcile, db_engine, run_at_start=True)
+
+    scheduler.run_due()
+    scheduler._tasks["kpi_snapshot_reconcile"]["running"].result(timeout=10)
+    scheduler.run_due()  # ainda não venceu de novo
+
+    jobs = registry.list("kpi_snapshot_reconcile")
+    assert len(jobs) == 1
+    assert jobs[0].status == JobStatus.COMPLETED
+    # Os hooks já mantiveram os contadores: nada a corrigir
+    assert jobs[0].result == {"counters": 3, "drift": 0}
@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+import tracemalloc
+
+import pytest
+from openpyxl import load_workbook
+from sqlalchemy import insert
+
+from app.models.location import Location, LocationStatus, SpaceType
+from app.services.location_export_service import EXPORT_HEADERS, LocationExportService
+
+
+def seed_locations(db_session, count: int, offset: int = 0):
+    rows = [
+        {
+            "title": f"Locação {i}",
+            "slug": f"locacao-{i}",
+            "status": LocationStatus.APPROVED if i % 2 else LocationStatus.DRAFT,
+            "space_type": SpaceType.HOUSE if i % 3 else SpaceType.STUDIO,
+            "city": "São Paulo" if i % 4 else "Rio de Janeiro",
+            "price_day_cinema": float(i),
+            "description": "x" * 200,
+        }
+        for i in range(offset, offset + count)
+    ]
+    db_session.execute(insert(Location), rows)
+    db_session.commit()
+
+
+def test_csv_export_streams_filtered_rows(api_client, db_session):
+    seed_locations(db_session, 40)
+
+    response = api_client.get("/api/v1/locations/export/csv", params={"city": "Rio de Janeiro"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.reader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assert rows[0] == EXPORT_HEADERS
+    assert len(rows) - 1 == 10
+    city_index = EXPORT_HEADERS.index("city")
+    assert {row[city_index] for row in rows[1:]} == {"Rio de Janeiro"}
+
+
+def test_ndjson_export_honours_enum_filters(api_client, db_session):
+    seed_locations(db_session, 30)
+
+    response = api_client.get(
+        "/api/v1/locations/export/ndjson", params={"status": "approved", "space_type": "studio"}
+    )
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    expected = [i for i in range(30) if i % 2 and not i % 3]
+    assert [r["title"] for r in records] == [f"Locação {i}" for i in expected]
+    assert all(r["status"] == "approved" and r["space_type"] == "studio" for r in records)
+
+
+def test_excel_export_is_write_only_workbook(api_client, db_session):
+    seed_locations(db_session, 25)
+
+    response = api_client.get("/api/v1/locations/export/excel", params={"search": "Locação 2"})
+    assert response.status_code == 200
+
+    workbook = load_workbook(io.BytesIO(response.content), read_only=True)
+    rows = list(workbook.active.iter_rows(values_only=True))
+    assert list(rows[0]) == EXPORT_HEADERS
+    # "Locação 2" e "Locação 20".."Locação 24"
+    assert len(rows) - 1 == 6
+
+
+def _peak_memory_for_export(db_session) -> int:
+    service = LocationExportService(db_session)
+    tracemalloc.start()
+    for _ in service.iter_csv():
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+@pytest.mark.slow
+def test_csv_export_memory_does_not_grow_with_row_count(db_session):
+    seed_locations(db_session, 2_000)
+    small_peak = _peak_memory_for_export(db_session)
+
+    seed_locations(db_session, 38_000, offset=2_000)
+    large_peak = _peak_memory_for_export(db_session)
+
+    # 20x mais linhas, pico de memória praticamente igual
+    assert large_peak < small_peak * 2
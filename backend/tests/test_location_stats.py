@@ -0,0 +1,94 @@
+import time
+
+import pytest
+from sqlalchemy import event, insert
+
+from app.models import Location, LocationStatus, SpaceType
+from app.services.location_stats_service import LocationStatsService, location_stats_cache
+
+from factories import create_location
+
+
+@pytest.fixture(autouse=True)
+def clear_location_stats_cache():
+    location_stats_cache.invalidate()
+    yield
+    location_stats_cache.invalidate()
+
+
+def _count_statements(engine, func):
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        result = func()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return result, len(statements)
+
+
+def test_overview_is_one_scan_cached_until_location_write(api_client, db_engine, db_session):
+    create_location(db_session, city="São Paulo", price_day_cinema=500.0, status=LocationStatus.APPROVED)
+    create_location(db_session, city="São Paulo", price_day_publicidade=12000.0)
+    create_location(db_session, city="Recife", space_type=SpaceType.HOUSE)
+
+    data, statements = _count_statements(db_engine, LocationStatsService(db_session).get_overview)
+    assert statements == 1
+    assert data["total_locations"] == 3
+    assert data["by_status"] == {"approved": 1, "draft": 2}
+    assert data["by_city"] == {"São Paulo": 2, "Recife": 1}
+    assert data["price_ranges"] == {"Até R$ 1.000": 1, "Acima de R$ 10.000": 1}
+
+    _, statements = _count_statements(db_engine, lambda: api_client.get("/api/v1/locations/stats/overview"))
+    assert statements == 0
+
+    create_location(db_session, city="Recife")
+    assert api_client.get("/api/v1/locations/stats/overview").json()["by_city"] == {"São Paulo": 2, "Recife": 2}
+
+
+def test_bulk_insert_invalidates_overview(db_session):
+    service = LocationStatsService(db_session)
+    assert service.get_overview()["total_locations"] == 0
+
+    db_session.execute(insert(Location), [{"title": f"Galpão {i}", "slug": f"galpao-{i}"} for i in range(4)])
+    db_session.commit()
+
+    assert service.get_overview()["total_locations"] == 4
+
+
+@pytest.mark.slow
+def test_benchmark_overview_on_100k_locations(db_engine, db_session):
+    cities = [f"Cidade {n}" for n in range(40)]
+    statuses = list(LocationStatus)
+    space_types = list(SpaceType)
+    for start in range(0, 100_000, 10_000):
+        db_session.execute(insert(Location), [
+            {
+                "title": f"Locação {i}",
+                "slug": f"locacao-{i}",
+                "status": statuses[i % len(statuses)],
+                "space_type": space_types[i % len(space_types)],
+                "city": cities[i % len(cities)],
+                "price_day_cinema": float(i % 15000) if i % 5 else None,
+            }
+            for i in range(start, start + 10_000)
+        ])
+    db_session.commit()
+    service = LocationStatsService(db_session)
+
+    started = time.perf_counter()
+    cold, statements = _count_statements(db_engine, service.get_overview)
+    cold_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        service.get_overview()
+    warm_elapsed = (time.perf_counter() - started) / 1000
+
+    print(f"\nVisão geral (100k locações): {cold_elapsed * 1000:.1f}ms na varredura, "
+          f"{warm_elapsed * 1_000_000:.1f}µs em cache")
+    assert statements == 1
+    assert cold["total_locations"] == 100_000
+    assert sum(cold["price_ranges"].values()) == 80_000
+    assert len(cold["by_city"]) == 10
+    assert warm_elapsed < 0.001
@@ -0,0 +1,141 @@
+from datetime import date, datetime, timedelta, timezone
+
+from app.models import (
+    DemandStatus,
+    LocationDemand,
+    Notification,
+    NotificationSettings,
+    ProjectLocation,
+    ProjectLocationStage,
+    RentalStatus,
+    StageStatus,
+    User,
+    UserRole,
+)
+from app.schemas.location_demand import LocationDemandFilter
+from app.schemas.project_location import ProjectLocationFilter
+from app.schemas.project_location_stage import ProjectLocationStageFilter, ProjectLocationStageUpdate
+from app.services.location_demand_service import LocationDemandService
+from app.services import overdue_service
+from app.services.overdue_service import RENTALS, OverdueService
+from app.services.project_location_service import ProjectLocationService
+from app.services.project_location_stage_service import ProjectLocationStageService
+
+from factories import create_location, create_project, create_project_location, create_stage
+
+NOW = datetime.now(timezone.utc)
+FUTURE = date.today() + timedelta(days=30)
+
+
+def _user(db, email):
+    user = User(email=email, full_name=email, password_hash="x", role=UserRole.ADMIN, is_active=True)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _demand(db, project_location, **kwargs):
+    demand = LocationDemand(project_location_id=project_location.id, project_id=project_location.project_id, title="Gerador", **kwargs)
+    db.add(demand)
+    db.commit()
+    return demand
+
+
+def test_scan_flags_new_overdue_items_and_sends_one_digest_per_user(db_session, test_user):
+    producer = _user(db_session, "producao@cinema.com")
+    muted = _user(db_session, "mudo@cinema.com")
+    db_session.add(NotificationSettings(user_id=muted.id, notification_types="info,error"))
+    project = create_project(db_session, test_user)
+    rental = create_project_location(db_session, project, create_location(db_session), rental_end=date.today() - timedelta(days=1))
+    on_time = create_project_location(db_session, project, create_location(db_session), rental_end=FUTURE)
+    service = OverdueService(db_session)
+    service.scan(notify=True)  # Varredura anterior: a próxima notifica
+    db_session.query(ProjectLocation).update({ProjectLocation.overdue_at: None})
+    db_session.commit()
+
+    late = create_stage(db_session, on_time, title="Montagem", responsible_user_id=producer.id, planned_end_date=NOW - timedelta(hours=2))
+    create_stage(db_session, on_time, responsible_user_id=producer.id, planned_end_date=NOW + timedelta(days=1))
+    create_stage(db_session, on_time, responsible_user_id=producer.id, planned_end_date=NOW - timedelta(days=3), status=StageStatus.COMPLETED)
+    create_stage(db_session, on_time, responsible_user_id=muted.id, planned_end_date=NOW - timedelta(days=1))
+    demand = _demand(db_session, on_time, assigned_user_id=producer.id, due_date=NOW - timedelta(days=1))
+    _demand(db_session, on_time, assigned_user_id=producer.id, due_date=NOW - timedelta(days=1), status=DemandStatus.CANCELLED)
+
+    result = service.scan()
+    assert (result["stages"], result["rentals"], result["demands"], result["notifications"]) == (2, 1, 1, 2)
+    digests = {n.user_id: n for n in db_session.query(Notification)}
+    assert set(digests) == {producer.id, test_user.id}  # Locação sem responsável vai para o criador do projeto
+    assert digests[producer.id].title == "2 itens atrasados" and "Etapa: Montagem" in digests[producer.id].message
+
+    # Filtros leem a marcação; nova varredura não repete avisos
+    stage_service = ProjectLocationStageService(db_session)
+    assert [s.id for s in stage_service.get_stages_with_filters(ProjectLocationStageFilter(is_overdue=True, responsible_user_ids=[producer.id]))] == [late.id]
+    demands, total = LocationDemandService(db_session).get_demands(filters=LocationDemandFilter(overdue_only=True))
+    assert [d.id for d in demands] == [demand.id] and rental.overdue_at is not None
+    assert service.scan()["notifications"] == 0
+
+    # Concluir desmarca na própria escrita
+    stage_service.update_stage(late.id, ProjectLocationStageUpdate(status=StageStatus.COMPLETED))
+    assert stage_service.get_stages_with_filters(ProjectLocationStageFilter(is_overdue=True, responsible_user_ids=[producer.id])) == []
+
+
+def test_first_scan_flags_silently_and_clears_resolved_bulk_changes(db_session, test_user):
+    project = create_project(db_session, test_user)
+    project_location = create_project_location(db_session, project, create_location(db_session), rental_end=FUTURE)
+    stage = create_stage(db_session, project_location, responsible_user_id=test_user.id, planned_end_date=NOW - timedelta(days=1))
+    service = OverdueService(db_session)
+
+    assert service.last_scan() is None
+    result = service.scan()
+    assert result["stages"] == 1 and result["notifications"] == 0
+    assert db_session.query(Notification).count() == 0 and service.last_scan() is not None
+
+    # Prazo adiado por UPDATE em massa (sem passar pelo objeto): a varredura desmarca
+    db_session.query(ProjectLocationStage).filter_by(id=stage.id).update(
+        {ProjectLocationStage.planned_end_date: NOW + timedelta(days=2)}, synchronize_session=False
+    )
+    db_session.commit()
+    assert service.scan()["cleared"] == 1
+    db_session.refresh(stage)
+    assert stage.overdue_at is None
+
+
+def test_cancelled_rentals_are_closed_and_only_the_claiming_scan_notifies(db_session, test_user):
+    project = create_project(db_session, test_user)
+    yesterday = date.today() - timedelta(days=1)
+    late = create_project_location(db_session, project, create_location(db_session), rental_end=yesterday)
+    create_project_location(db_session, project, create_location(db_session), rental_end=yesterday, status=RentalStatus.CANCELLED)
+    service = OverdueService(db_session)
+
+    # Outra varredura marcou o item entre a consulta e o UPDATE: esta não o reivindica
+    connection = db_session.connection()
+    assert service._claim(connection, RENTALS, [late.id], NOW) == [late.id]
+    assert service._claim(connection, RENTALS, [late.id], NOW) == []
+    db_session.commit()
+
+    assert service.scan(notify=True)["rentals"] == 0
+    assert db_session.query(ProjectLocation).filter(ProjectLocation.overdue_at.isnot(None)).count() == 1
+
+
+def test_filters_compare_due_dates_while_the_scan_is_disabled_or_has_not_run(db_session, test_user, monkeypatch):
+    project = create_project(db_session, test_user)
+    yesterday = date.today() - timedelta(days=1)
+    late = create_project_location(db_session, project, create_location(db_session), rental_end=yesterday)
+    cancelled = create_project_location(db_session, project, create_location(db_session), rental_end=yesterday, status=RentalStatus.CANCELLED)
+    demand = _demand(db_session, late, due_date=NOW - timedelta(days=1))
+    service = ProjectLocationService(db_session)
+
+    def overdue_ids(value):
+        return {pl.id for pl in service.get_project_locations_with_filters(ProjectLocationFilter(project_ids=[project.id], is_overdue=value))}
+
+    assert overdue_ids(True) == {late.id} and overdue_ids(False) == {cancelled.id}
+    assert not cancelled.is_overdue
+    demands, _ = LocationDemandService(db_session).get_demands(filters=LocationDemandFilter(overdue_only=True))
+    assert [d.id for d in demands] == [demand.id]
+
+    # Varredura desativada depois de já ter rodado: a marcação deixaria de acompanhar os prazos
+    OverdueService(db_session).scan()
+    db_session.query(ProjectLocation).update({ProjectLocation.overdue_at: None})
+    db_session.commit()
+    assert overdue_ids(True) == set()
+    monkeypatch.setattr(overdue_service, "OVERDUE_SCAN_INTERVAL", 0)
+    assert overdue_ids(True) == {late.id}
@@ -0,0 +1,108 @@
+import io
+import time
+import zipfile
+
+from openpyxl import load_workbook
+from sqlalchemy import event
+
+from app.core.jobs import JobStatus, job_registry
+from app.models import ProjectStatus
+from app.services.portfolio_report_service import PortfolioReportService
+
+from factories import create_location, create_project, create_project_location
+
+
+def wait_for_job(api_client, job_id: str, timeout: float = 60.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = api_client.get(f"/api/v1/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError("tarefa não terminou a tempo")
+
+
+def test_portfolio_export_job_produces_zip(api_client, db_session, test_user):
+    first = create_project(db_session, test_user, name="Filme A")
+    second = create_project(db_session, test_user, name="Série B")
+    create_project(db_session, test_user, name="Arquivado", status=ProjectStatus.ARCHIVED)
+    create_project_location(db_session, first, create_location(db_session, title="Casa Azul"))
+    create_project_location(db_session, second, create_location(db_session, title="Galpão"))
+    create_project_location(db_session, second, create_location(db_session, title="Praia"))
+
+    response = api_client.post("/api/v1/projects/reports/portfolio", json={})
+    assert response.status_code == 202
+    job = wait_for_job(api_client, response.json()["id"])
+
+    assert job["status"] == "completed", job["error"]
+    assert (job["completed"], job["total"], job["progress"]) == (2, 2, 100.0)
+    assert job["result"]["errors"] == []
+
+    download = api_client.get(job["download_url"])
+    assert download.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(download.content))
+    names = sorted(archive.namelist())
+    assert names == sorted([
+        f"{first.id:05d}_relatorio_Filme_A.xlsx",
+        f"{first.id:05d}_relatorio_Filme_A.pdf",
+        f"{second.id:05d}_relatorio_Série_B.xlsx",
+        f"{second.id:05d}_relatorio_Série_B.pdf",
+    ])
+    assert archive.read(f"{first.id:05d}_relatorio_Filme_A.pdf").startswith(b"%PDF")
+
+    workbook = load_workbook(io.BytesIO(archive.read(f"{second.id:05d}_relatorio_Série_B.xlsx")))
+    values = list(workbook.active.iter_rows(values_only=True))
+    assert values[0][0] == "RELATÓRIO DO PROJETO: Série B"
+    header_index = next(i for i, row in enumerate(values) if row[0] == "Nome da Locação")
+    assert [values[header_index + 1][0], values[header_index + 2][0]] == ["Galpão", "Praia"]
+
+
+def test_payload_loading_uses_fixed_number_of_queries(db_engine, db_session, test_user):
+    def count_queries(project_count: int) -> int:
+        for _ in range(project_count):
+            project = create_project(db_session, test_user)
+            for _ in range(3):
+                create_project_location(db_session, project, create_location(db_session))
+        db_session.expire_all()
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db_engine, "before_cursor_execute", listener)
+        try:
+            payloads = PortfolioReportService(db_session).load_payloads(status=ProjectStatus.ACTIVE)
+        finally:
+            event.remove(db_engine, "before_cursor_execute", listener)
+        assert all(p.resumo["total_locacoes"] == 3 for p in payloads)
+        return len(statements)
+
+    assert count_queries(2) == count_queries(20)
+
+
+def test_job_registry_marks_failures():
+    def broken(job):
+        raise RuntimeError("sem dados")
+
+    job = job_registry.create("teste")
+    job_registry.submit(job, broken).result(timeout=5)
+
+    assert job.status == JobStatus.FAILED
+    assert job.error == "sem dados"
+
+
+def test_jobs_are_visible_only_to_their_owner(api_client, db_session, test_user):
+    from app.core.auth import get_current_user
+    from app.main import app
+    from app.models import User, UserRole
+
+    job = job_registry.create("portfolio_report", owner_id=test_user.id)
+    other = User(email="outro@cinema.com", full_name="Outro", password_hash="x", role=UserRole.VIEWER, is_active=True)
+    db_session.add(other)
+    db_session.commit()
+
+    app.dependency_overrides[get_current_user] = lambda: other
+    assert api_client.get(f"/api/v1/jobs/{job.id}").status_code == 404
+    assert api_client.get(f"/api/v1/jobs/{job.id}/download").status_code == 404
+    assert job.id not in [item["id"] for item in api_client.get("/api/v1/jobs").json()]
+
+    app.dependency_overrides[get_current_user] = lambda: test_user  # Administrador vê todas
+    assert api_client.get(f"/api/v1/jobs/{job.id}").json()["owner_id"] == test_user.id
@@ -0,0 +1,140 @@
+import io
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from openpyxl import load_workbook
+from sqlalchemy import insert, select
+
+from app.models import (
+    FinancialMovement,
+    Location,
+    LocationStageType,
+    MovementStatus,
+    MovementType,
+    ProjectLocation,
+    ProjectLocationStage,
+    RentalStatus,
+    StageStatus,
+)
+from app.services.project_report_service import ProjectReportService
+
+from factories import create_location, create_movement, create_project, create_project_location, create_stage
+
+
+def seed_large_project(db, user, locations: int, stages_per_location: int, movements: int):
+    project = create_project(db, user, name="Produção Grande")
+    db.execute(insert(Location), [
+        {"title": f"Locação {i}", "slug": f"grande-{i}", "city": "São Paulo"} for i in range(locations)
+    ])
+    location_ids = db.scalars(select(Location.id).where(Location.slug.like("grande-%"))).all()
+    base = date(2025, 1, 1)
+    db.execute(insert(ProjectLocation), [
+        {
+            "project_id": project.id,
+            "location_id": location_id,
+            "rental_start": base + timedelta(days=i % 300),
+            "rental_end": base + timedelta(days=i % 300 + 3),
+            "daily_rate": 1000.0,
+            "total_cost": 4000.0,
+            "status": RentalStatus.CONFIRMED,
+            "notes": "Observação " * 5,
+        }
+        for i, location_id in enumerate(location_ids)
+    ])
+    pl_ids = db.scalars(select(ProjectLocation.id).where(ProjectLocation.project_id == project.id)).all()
+    stage_types = list(LocationStageType)
+    db.execute(insert(ProjectLocationStage), [
+        {
+            "project_location_id": pl_id,
+            "stage_type": stage_types[s % len(stage_types)],
+            "title": f"Etapa {s}",
+            "status": StageStatus.PENDING,
+            "weight": 1.0,
+        }
+        for pl_id in pl_ids
+        for s in range(stages_per_location)
+    ])
+    db.execute(insert(FinancialMovement), [
+        {
+            "project_id": project.id,
+            "location_id": location_ids[i % len(location_ids)],
+            "user_id": user.id,
+            "movement_type": MovementType.GASTO,
+            "status": MovementStatus.APPROVED,
+            "amount": 10.0 + i,
+            "description": f"Despesa {i}",
+            "movement_date": datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(hours=i),
+        }
+        for i in range(movements)
+    ])
+    db.commit()
+    return project
+
+
+def test_single_sheet_report_endpoint(api_client, db_session, test_user):
+    project = create_project(db_session, test_user, name="Filme X")
+    create_project_location(db_session, project, create_location(db_session, title="Casa B"), rental_start=date(2025, 3, 1))
+    create_project_location(db_session, project, create_location(db_session, title="Casa A"), rental_start=date(2025, 2, 1))
+
+    response = api_client.get(f"/api/v1/projects/{project.id}/report/excel")
+    assert response.status_code == 200
+    assert 'relatorio_Filme_X.xlsx' in response.headers["content-disposition"]
+
+    workbook = load_workbook(io.BytesIO(response.content))
+    sheet = workbook["Relatório do Projeto"]
+    values = [row for row in sheet.iter_rows(values_only=True)]
+    assert values[0][0] == "RELATÓRIO DO PROJETO: Filme X"
+    header_index = next(i for i, row in enumerate(values) if row[0] == "Nome da Locação")
+    assert [values[header_index + 1][0], values[header_index + 2][0]] == ["Casa A", "Casa B"]
+    assert sheet.cell(row=header_index + 1, column=1).style == "report_table_header"
+
+
+def test_multi_sheet_report_contains_stages_and_movements(db_session, test_user):
+    project = create_project(db_session, test_user)
+    project_location = create_project_location(db_session, project, create_location(db_session))
+    create_stage(db_session, project_location, title="Visitação inicial")
+    create_stage(db_session, project_location, title="Contrato", stage_type=LocationStageType.CONTRATACAO)
+    create_movement(db_session, project, test_user, description="Aluguel gerador", amount=350.0)
+
+    output = ProjectReportService(db_session).export_to_excel(project.id, multi_sheet=True)
+    workbook = load_workbook(output)
+
+    assert workbook.sheetnames == ["Resumo", "Locações", "Etapas", "Movimentações Financeiras"]
+    stage_titles = [row[1] for row in workbook["Etapas"].iter_rows(min_row=2, values_only=True)]
+    assert stage_titles == ["Visitação inicial", "Contrato"]
+    movements = list(workbook["Movimentações Financeiras"].iter_rows(min_row=2, values_only=True))
+    assert movements[0][3] == "Aluguel gerador"
+    assert movements[0][5] == 350.0
+
+
+def test_missing_project_returns_none(db_session):
+    assert ProjectReportService(db_session).export_to_excel(999) is None
+
+
+@pytest.mark.slow
+def test_benchmark_large_project_report(db_session, test_user):
+    project = seed_large_project(db_session, test_user, locations=800, stages_per_location=10, movements=4000)
+    service = ProjectReportService(db_session)
+
+    started = time.perf_counter()
+    output = service.export_to_excel(project.id, multi_sheet=True)
+    elapsed = time.perf_counter() - started
+
+    # Medição de memória separada (tracemalloc deixa a execução bem mais lenta)
+    tracemalloc.start()
+    service.export_to_excel(project.id).close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size = output.seek(0, io.SEEK_END)
+    output.seek(0)
+    print(f"\nRelatório (800 locações, 8000 etapas, 4000 movimentações): {elapsed:.2f}s, "
+          f"arquivo {size / 1024:.0f} KB; pico de memória (aba única) {peak / 1024 / 1024:.1f} MB")
+
+    workbook = load_workbook(output, read_only=True)
+    row_counts = {name: sum(1 for _ in workbook[name].iter_rows(values_only=True)) for name in workbook.sheetnames[1:]}
+    assert row_counts == {"Locações": 801, "Etapas": 8001, "Movimentações Financeiras": 4001}
+    # Linhas são serializadas à medida que são escritas: o pico não acompanha o volume de dados
+    assert peak < 20 * 1024 * 1024
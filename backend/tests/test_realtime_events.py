@@ -0,0 +1,93 @@
+import asyncio
+
+from app.core.events import EventBroker, event_broker, sse_stream
+from app.models import Notification
+from app.services.dashboard_service import dashboard_cache
+from app.services.realtime_service import KPIS_TOPIC, agenda_project_topic, notifications_topic
+
+from factories import create_agenda_event, create_location, create_project
+
+
+async def _drain(subscription, count, timeout=1.0):
+    return [await asyncio.wait_for(subscription.queue.get(), timeout) for _ in range(count)]
+
+
+def test_resume_replays_missed_events_and_resyncs_unknown_ids():
+    broker = EventBroker(buffer_size=3)
+
+    async def scenario():
+        first = broker.publish("kpis", "kpis.changed")
+        broker.publish("agenda", "agenda.created", {"id": 1})
+        broker.publish("kpis", "kpis.changed")
+        _, missed, resync = broker.subscribe({"kpis"}, first.id)
+        assert ([e.seq for e in missed], resync) == ([3], False)
+
+        broker.publish("kpis", "kpis.changed")
+        broker.publish("kpis", "kpis.changed")
+        # Evento 2 já saiu do buffer circular
+        assert broker.subscribe({"kpis"}, first.id)[1:] == ([], True)
+        assert broker.subscribe({"kpis"}, "outraexecucao-4")[1:] == ([], True)
+
+    asyncio.run(scenario())
+
+
+def test_committed_writes_publish_to_topics(db_session, test_user):
+    project = create_project(db_session, test_user)
+
+    async def scenario():
+        subscription, _, _ = event_broker.subscribe(
+            {KPIS_TOPIC, notifications_topic(test_user.id), agenda_project_topic(project.id)}
+        )
+        try:
+            db_session.add(Notification(title="Aviso", message="Nova locação", user_id=test_user.id))
+            db_session.flush()
+            db_session.rollback()
+            await asyncio.sleep(0)
+            assert subscription.queue.empty()
+
+            db_session.add(Notification(title="Aviso", message="Nova locação", user_id=test_user.id))
+            db_session.commit()
+            create_agenda_event(db_session, project_id=project.id)
+            received = await _drain(subscription, 3)
+            assert sorted(e.name for e in received) == ["agenda.created", "kpis.changed", "notification.created"]
+
+            # Escrita em notificação de outro usuário não chega a este assinante
+            create_location(db_session)
+            assert [e.name for e in await _drain(subscription, 1)] == ["kpis.changed"]
+            assert subscription.queue.empty()
+        finally:
+            subscription.close()
+            dashboard_cache.invalidate()
+
+    asyncio.run(scenario())
+
+
+def test_stream_sends_replay_heartbeats_and_stops_on_disconnect():
+    broker = EventBroker()
+
+    async def scenario():
+        first = broker.publish("kpis", "kpis.changed")
+        broker.publish("kpis", "kpis.changed")
+        subscription, missed, resync = broker.subscribe({"kpis"}, first.id)
+        polls = []
+
+        async def is_disconnected():
+            polls.append(1)
+            if len(polls) == 2:
+                broker.publish("kpis", "kpis.changed", {"id": 7})
+            return len(polls) > 3
+
+        chunks = [chunk async for chunk in sse_stream(subscription, missed, resync, is_disconnected, heartbeat=0.01)]
+        assert chunks[0].startswith("retry:")
+        assert chunks[1].startswith(f"id: {broker.boot}-2\nevent: kpis.changed\n")
+        assert chunks[2] == ": heartbeat\n\n"
+        assert chunks[3].startswith(f"id: {broker.boot}-3\n") and '"id": 7' in chunks[3]
+        assert broker.subscriber_count == 0
+
+    asyncio.run(scenario())
+
+
+def test_stream_endpoint_validates_topics(api_client):
+    response = api_client.get("/api/v1/events/stream", params={"topics": "kpis,projetos"})
+    assert response.status_code == 400
+    assert api_client.get("/api/v1/events/stats").json()["boot"] == event_broker.boot
@@ -0,0 +1,99 @@
+from datetime import date
+
+import pytest
+
+from app.core.recurrence import expansion_cache
+from app.models.agenda_event import AgendaEvent, EventType
+from app.services.ics_feed_service import USER_FEED, feed_token, ics_feed_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    expansion_cache.clear()
+    ics_feed_cache.clear()
+    yield
+    ics_feed_cache.clear()
+
+
+def _create_series(api_client, **extra):
+    payload = {
+        "title": "Reunião de produção",
+        "event_type": EventType.CUSTOM.value,
+        "start_date": "2025-01-06T10:00:00",
+        "end_date": "2025-01-06T11:00:00",
+        "recurrence_rule": "RRULE:FREQ=WEEKLY;BYDAY=MO",
+        **extra,
+    }
+    response = api_client.post("/api/v1/agenda-events/", json=payload)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _range(api_client, start, end, **params):
+    response = api_client.get("/api/v1/agenda-events/date-range", params={"start_date": start, "end_date": end, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_series_is_one_row_expanded_only_inside_the_window(api_client, db_session):
+    series = _create_series(api_client)
+    assert series["recurrence_rule"] == "FREQ=WEEKLY;BYDAY=MO"
+    assert db_session.query(AgendaEvent).count() == 1
+    assert db_session.get(AgendaEvent, series["id"]).recurrence_until == date.max
+
+    february = _range(api_client, "2025-02-01", "2025-02-28")
+    assert [e["start_date"] for e in february] == ["2025-02-03", "2025-02-10", "2025-02-17", "2025-02-24"]
+    assert {e["series_id"] for e in february} == {series["id"]}
+    assert february[1]["start_at"].startswith("2025-02-10T10:00") and february[1]["end_at"].startswith("2025-02-10T11:00")
+
+    misses = expansion_cache.misses
+    _range(api_client, "2025-02-01", "2025-02-28")
+    assert expansion_cache.misses == misses and expansion_cache.hits > 0
+
+    # Lista paginada intercala avulsos e ocorrências por data
+    api_client.post("/api/v1/agenda-events/", json={"title": "Avulso", "event_type": "custom", "start_date": "2025-02-12"})
+    listed = api_client.get("/api/v1/agenda-events/", params={"start_date": "2025-02-01", "end_date": "2025-02-28", "limit": 3}).json()
+    assert [e["title"] for e in listed["events"]] == ["Reunião de produção", "Reunião de produção", "Avulso"]
+
+
+def test_exceptions_and_overrides(api_client, db_session):
+    series = _create_series(api_client)
+    base = f"/api/v1/agenda-events/{series['id']}/occurrences"
+
+    assert api_client.delete(f"{base}/2025-02-10").status_code == 200
+    moved = api_client.put(f"{base}/2025-02-17", json={"title": "Reunião remarcada", "start_date": "2025-02-18T14:00:00"})
+    assert moved.status_code == 200 and moved.json()["occurrence_date"] == "2025-02-17"
+    # Ocorrência de março movida para fevereiro aparece na visão de fevereiro
+    api_client.put(f"{base}/2025-03-03", json={"start_date": "2025-02-28"})
+
+    february = _range(api_client, "2025-02-01", "2025-02-28")
+    assert [(e["start_date"], e["title"]) for e in february] == [
+        ("2025-02-03", "Reunião de produção"),
+        ("2025-02-18", "Reunião remarcada"),
+        ("2025-02-24", "Reunião de produção"),
+        ("2025-02-28", "Reunião de produção"),
+    ]
+    assert february[1]["start_at"].startswith("2025-02-18T14:00")
+    assert "2025-03-03" not in [e["start_date"] for e in _range(api_client, "2025-03-01", "2025-03-31")]
+
+    assert api_client.put(f"{base}/2025-02-11", json={"title": "x"}).status_code == 400
+    assert api_client.delete(f"{base}/2025-02-10").status_code == 400
+    assert db_session.query(AgendaEvent).count() == 1
+
+    body = api_client.get(f"/api/v1/agenda-events/feeds/{feed_token(USER_FEED, 1)}.ics").text
+    assert "RRULE:FREQ=WEEKLY;BYDAY=MO" in body and "EXDATE:20250210T100000" in body
+    assert "RECURRENCE-ID:20250217T100000" in body and "SUMMARY:Reunião remarcada" in body
+
+
+def test_finite_series_and_rule_validation(api_client, db_session):
+    payments = _create_series(
+        api_client, title="Parcela do aluguel", event_type=EventType.PAYMENT_DUE.value,
+        start_date="2025-01-31", end_date=None, all_day=True, recurrence_rule="FREQ=MONTHLY;BYMONTHDAY=-1;COUNT=3",
+    )
+    assert db_session.get(AgendaEvent, payments["id"]).recurrence_until == date(2025, 3, 31)
+    assert [e["start_date"] for e in _range(api_client, "2025-01-01", "2025-12-31")] == ["2025-01-31", "2025-02-28", "2025-03-31"]
+    assert _range(api_client, "2025-04-01", "2025-04-30") == []
+
+    invalid = {"title": "x", "event_type": "custom", "start_date": "2025-01-01"}
+    assert api_client.post("/api/v1/agenda-events/", json={**invalid, "recurrence_rule": "FREQ=HOURLY"}).status_code == 422
+    assert api_client.post("/api/v1/agenda-events/", json={**invalid, "recurrence_rule": "BYDAY=MO"}).status_code == 422
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from app.models import KpiSnapshot, Project, ProjectLocation, ProjectLocationStage, StageStatus
+from app.schemas.project_location_stage import ProjectLocationStageUpdate
+from app.services.project_location_service import ProjectLocationService
+from app.services.project_location_stage_service import ProjectLocationStageService
+from app.services.kpi_snapshot_service import META_METRIC
+from app.services.stage_progress_service import PROGRESS_STALE_DIMENSION, StageProgressService
+
+from factories import create_location, create_project, create_project_location, create_stage
+
+
+def _live_summary(db_session, project_id):
+    """Resumo recalculado etapa a etapa (mesma regra do resumo antigo)"""
+    stages = db_session.query(ProjectLocationStage).join(ProjectLocation).filter(ProjectLocation.project_id == project_id).all()
+    weight = sum(s.weight for s in stages)
+    return {
+        "total_stages": len(stages),
+        "completed_stages": sum(s.status == StageStatus.COMPLETED for s in stages),
+        "in_progress_stages": sum(s.status == StageStatus.IN_PROGRESS for s in stages),
+        "overdue_stages": sum(s.is_overdue for s in stages),
+        "critical_stages": sum(bool(s.is_critical) for s in stages),
+        "overall_progress": round(sum(s.completion_percentage * s.weight for s in stages) / weight, 2) if weight else 0,
+    }
+
+
+def test_stage_writes_keep_location_and_project_sums(db_session, test_user):
+    project = create_project(db_session, test_user)
+    first = create_project_location(db_session, project, create_location(db_session))
+    second = create_project_location(db_session, project, create_location(db_session))
+    service = ProjectLocationStageService(db_session)
+    progress = StageProgressService(db_session)
+    progress.rebuild()
+
+    late = create_stage(db_session, first, weight=2.0, is_critical=True, planned_end_date=datetime.now(timezone.utc) - timedelta(days=3))
+    moving = create_stage(db_session, first, weight=3.0)
+    doomed = create_stage(db_session, second, planned_end_date=datetime.now(timezone.utc) - timedelta(days=1))
+    create_stage(db_session, second, weight=0.5, status=StageStatus.ON_HOLD, completion_percentage=25.0)
+
+    service.update_stage_status(moving.id, StageStatus.IN_PROGRESS, test_user.id)
+    service.update_stage(late.id, ProjectLocationStageUpdate(status=StageStatus.COMPLETED))
+    moving.project_location_id = second.id
+    moving.weight = 4.0
+    db_session.commit()
+    service.delete_stage(doomed.id)
+
+    summary = service.get_project_progress_summary(project.id)
+    assert {key: summary[key] for key in _live_summary(db_session, project.id)} == _live_summary(db_session, project.id)
+    assert summary["overdue_stages"] == 0 and summary["completed_stages"] == 1
+
+    # completion_percentage da locação acompanha as somas no mesmo UPDATE
+    db_session.expire_all()
+    for project_location in (first, second):
+        expected = project_location.completion_percentage
+        project_location.update_completion_percentage()
+        assert abs(project_location.completion_percentage - expected) < 1e-9
+    db_session.rollback()
+
+    # Nada para corrigir: os deltas bateram com o recálculo
+    assert progress.rebuild()["drift"] == 0
+
+
+def test_reconcile_repairs_drift_and_deleted_locations(db_session, test_user):
+    project = create_project(db_session, test_user)
+    kept = create_project_location(db_session, project, create_location(db_session))
+    removed = create_project_location(db_session, project, create_location(db_session))
+    create_stage(db_session, kept, status=StageStatus.COMPLETED, completion_percentage=100.0)
+    create_stage(db_session, removed, planned_end_date=datetime.now(timezone.utc) - timedelta(days=2))
+    progress = StageProgressService(db_session)
+    progress.rebuild()
+    assert progress.project_summary(project.id)["overdue_stages"] == 1
+
+    # Excluir a locação leva as etapas em cascata: as somas dela saem do projeto no mesmo flush
+    db_session.delete(removed)
+    db_session.commit()
+    summary = progress.project_summary(project.id)
+    assert (summary["total_stages"], summary["overdue_stages"], summary["overall_progress"]) == (1, 0, 100.0)
+    assert db_session.get(KpiSnapshot, (META_METRIC, PROGRESS_STALE_DIMENSION)).value == 0
+
+    # Escrita fora do ORM: recálculo da locação e reconciliação completa corrigem
+    db_session.execute(update(ProjectLocation).where(ProjectLocation.id == kept.id).values(stage_count=7, completion_percentage=3.0))
+    db_session.execute(update(Project).where(Project.id == project.id).values(stages_completed=0))
+    db_session.commit()
+    assert progress.rebuild()["drift"] == 2
+    assert progress.location_summary(kept.id)["total_stages"] == 1
+    assert db_session.get(ProjectLocation, kept.id).completion_percentage == 100.0
+
+    db_session.execute(update(ProjectLocation).where(ProjectLocation.id == kept.id).values(stage_count=0, stages_completed=0))
+    db_session.commit()
+    ProjectLocationService(db_session).update_location_progress(kept.id)
+    assert progress.location_summary(kept.id)["completed_stages"] == 1
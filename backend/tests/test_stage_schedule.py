@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.scheduling import DependencyCycleError, ScheduleTask, critical_path, propagate
+from app.schemas.project_location_stage import ProjectLocationStageUpdate
+from app.services.project_location_stage_service import ProjectLocationStageService
+from app.services.stage_schedule_service import _utc
+
+from factories import create_location, create_project, create_project_location, create_stage
+
+DAY = timedelta(days=1)
+T0 = datetime(2025, 3, 3, 9, 0, tzinfo=timezone.utc)
+
+
+def test_critical_path_slack_and_push_forward():
+    tasks = {
+        "a": ScheduleTask("a", 2 * DAY, (), T0),
+        "b": ScheduleTask("b", 3 * DAY, ("a",)),
+        "c": ScheduleTask("c", 1 * DAY, ("a",)),
+        "d": ScheduleTask("d", 1 * DAY, ("b", "c")),
+        "x": ScheduleTask("x", 1 * DAY, (), T0),
+    }
+    timings = critical_path(tasks, T0)
+    assert [t for t in tasks if timings[t].critical] == ["a", "b", "d"]
+    assert timings["c"].slack == 2 * DAY and timings["x"].slack == 5 * DAY
+    assert timings["d"].earliest_finish == T0 + 6 * DAY
+
+    # Só os descendentes de "a" são deslocados; tarefas concluídas ficam onde estão
+    tasks["b"].start, tasks["c"].start, tasks["d"].start = T0 + 2 * DAY, T0 + 2 * DAY, T0 + 5 * DAY
+    tasks["a"].start = T0 + DAY
+    tasks["c"].fixed = True
+    assert propagate(tasks, ["a"]) == {"b": T0 + 3 * DAY, "d": T0 + 6 * DAY}
+
+    tasks["a"].predecessors = ("d",)
+    with pytest.raises(DependencyCycleError) as error:
+        critical_path(tasks, T0)
+    assert set(error.value.cycle) == {"a", "b", "d"}
+
+
+def test_stage_dependencies_shift_descendants_across_locations(db_session, test_user, api_client):
+    project = create_project(db_session, test_user)
+    first = create_project_location(db_session, project, create_location(db_session))
+    second = create_project_location(db_session, project, create_location(db_session))
+    other = create_project_location(db_session, create_project(db_session, test_user), create_location(db_session))
+    service = ProjectLocationStageService(db_session)
+
+    scout = create_stage(db_session, first, planned_start_date=T0, planned_end_date=T0 + 2 * DAY)
+    permit = create_stage(db_session, first, planned_start_date=T0 + 2 * DAY, planned_end_date=T0 + 4 * DAY, dependencies_json=[scout.id])
+    shoot = create_stage(db_session, second, planned_start_date=T0 + 4 * DAY, planned_end_date=T0 + 5 * DAY, dependencies_json=[permit.id])
+    loose = create_stage(db_session, second, planned_start_date=T0, planned_end_date=T0 + DAY)
+    foreign = create_stage(db_session, other, planned_start_date=T0, planned_end_date=T0 + DAY)
+
+    # Atrasar a primeira etapa empurra a cadeia inteira, inclusive na outra locação
+    service.update_stage(scout.id, ProjectLocationStageUpdate(planned_end_date=T0 + 3 * DAY))
+    db_session.expire_all()
+    assert _utc(permit.planned_start_date) == T0 + 3 * DAY and _utc(permit.planned_end_date) == T0 + 5 * DAY
+    assert _utc(shoot.planned_start_date) == T0 + 5 * DAY
+    assert _utc(loose.planned_start_date) == T0
+
+    with pytest.raises(ValueError):
+        service.update_stage(scout.id, ProjectLocationStageUpdate(dependencies_json=[shoot.id]))
+    with pytest.raises(ValueError):
+        service.update_stage(loose.id, ProjectLocationStageUpdate(dependencies_json=[foreign.id]))
+    response = api_client.put(f"/api/v1/project-location-stages/{scout.id}", json={"dependencies_json": [scout.id]})
+    assert response.status_code == 400
+
+    schedule = api_client.get(f"/api/v1/project-location-stages/project/{project.id}/schedule").json()
+    assert schedule["critical_path"] == [scout.id, permit.id, shoot.id]
+    by_id = {stage["id"]: stage for stage in schedule["stages"]}
+    assert by_id[loose.id]["slack_days"] == 5.0 and not by_id[loose.id]["on_critical_path"]
+
+    # Excluir uma etapa remove a dependência das seguintes
+    service.delete_stage(permit.id)
+    db_session.expire_all()
+    assert shoot.dependencies_json == []
+
+    location = api_client.get(f"/api/v1/project-location-stages/project-location/{second.id}/schedule")
+    assert location.status_code == 200 and {s["id"] for s in location.json()["stages"]} == {shoot.id, loose.id}
+    assert api_client.get("/api/v1/project-location-stages/project-location/999999/schedule").status_code == 404
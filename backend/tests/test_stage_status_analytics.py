@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+
+from app.core.jobs import JobRegistry, PeriodicScheduler
+from app.models import ProjectLocationStageHistory, StageStatus, StageStatusInterval
+from app.services import stage_status_analytics_service
+from app.services.project_location_stage_service import ProjectLocationStageService
+from app.services.stage_status_analytics_service import (
+    STAGE_STATUS_REFRESH_JOB,
+    StageStatusAnalyticsService,
+    run_stage_status_refresh,
+)
+
+from factories import create_location, create_project, create_project_location, create_stage
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+T0 = NOW - timedelta(days=30)
+
+
+def _record(db, stage, user, days, new_status, previous_status):
+    db.add(ProjectLocationStageHistory(
+        stage_id=stage.id, previous_status=previous_status, new_status=new_status,
+        previous_completion=0.0, new_completion=0.0, changed_by_user_id=user.id,
+        changed_at=T0 + timedelta(days=days),
+    ))
+
+
+def test_time_in_status_and_cycle_survive_compaction(db_session, test_user):
+    project = create_project(db_session, test_user)
+    project_location = create_project_location(db_session, project, create_location(db_session))
+    stage = create_stage(db_session, project_location, created_at=T0, status=StageStatus.COMPLETED)
+    other = create_stage(db_session, project_location, created_at=T0, title="Parada")
+    for days, new_status, previous_status in (
+        (1, StageStatus.IN_PROGRESS, StageStatus.PENDING),
+        (1.5, StageStatus.IN_PROGRESS, None),  # Só o percentual mudou
+        (3, StageStatus.ON_HOLD, StageStatus.IN_PROGRESS),
+        (4, StageStatus.IN_PROGRESS, StageStatus.ON_HOLD),
+        (6, StageStatus.COMPLETED, StageStatus.IN_PROGRESS),
+    ):
+        _record(db_session, stage, test_user, days, new_status, previous_status)
+    _record(db_session, other, test_user, 2, StageStatus.ON_HOLD, StageStatus.PENDING)
+    db_session.commit()
+
+    service = StageStatusAnalyticsService(db_session)
+    service.rebuild(now=NOW)
+    start, end = T0.date(), NOW.date()
+    before = service.time_in_status(start, end, project_id=project.id)
+    days = {item["status"]: item for item in before["by_status"]}
+    assert days["pending"]["days"] == 3.0 and days["in_progress"]["days"] == 4.0
+    assert days["in_progress"]["entries"] == 2 and days["on_hold"]["days"] == 1.0 + 28.0
+    assert service.cycle_times(start, end)["stage_types"] == [{"stage_type": "visitacao", "completions": 1, "avg_cycle_days": 5.0}]
+
+    # Tudo antes de agora vira período; sobra a última mudança de cada etapa
+    result = service.compact(before=NOW)
+    assert result["compacted_rows"] == 4
+    assert db_session.query(ProjectLocationStageHistory).count() == 2
+    assert [i.status for i in db_session.query(StageStatusInterval).filter_by(stage_id=stage.id).order_by(StageStatusInterval.started_at)] == [
+        "pending", "in_progress", "on_hold", "in_progress"
+    ]
+    service.rebuild(now=NOW)
+    assert service.time_in_status(start, end, project_id=project.id) == before
+    assert [p["status"] for p in service.stage_timeline(stage.id)] == ["pending", "in_progress", "on_hold", "in_progress", "completed"]
+
+    bottlenecks = service.bottlenecks(start, end)
+    assert bottlenecks["stage_types"][0]["waiting_days"] == 33.0
+    assert [s["id"] for s in bottlenecks["stuck_stages"]] == [other.id]
+
+
+def test_reads_serve_materialized_rows_and_refresh_only_touched_projects(db_engine, db_session, test_user, api_client, monkeypatch):
+    scheduler = PeriodicScheduler(JobRegistry())
+    scheduler.register(STAGE_STATUS_REFRESH_JOB, 900, run_stage_status_refresh, db_engine)
+    monkeypatch.setattr(stage_status_analytics_service, "periodic_scheduler", scheduler)
+    project = create_project(db_session, test_user)
+    stage = create_stage(db_session, create_project_location(db_session, project, create_location(db_session)))
+    other = create_project(db_session, test_user)
+    create_stage(db_session, create_project_location(db_session, other, create_location(db_session)))
+    service = StageStatusAnalyticsService(db_session)
+    service.rebuild()
+    params = {"start": (NOW - timedelta(days=1)).date().isoformat(), "end": NOW.date().isoformat()}
+
+    first = api_client.get("/api/v1/project-location-stages/analytics/time-in-status", params=params).json()
+    assert {item["status"]: item["entries"] for item in first["by_status"]}["in_progress"] == 0
+    assert first["as_of"] is not None
+
+    # A mudança não recalcula na requisição: a leitura segue com a materialização e antecipa o recálculo
+    ProjectLocationStageService(db_session).update_stage_status(stage.id, StageStatus.IN_PROGRESS, test_user.id)
+    scheduler._tasks[STAGE_STATUS_REFRESH_JOB]["next_run"] = float("inf")
+    stale = api_client.get("/api/v1/project-location-stages/analytics/time-in-status", params=params).json()
+    assert {item["status"]: item["entries"] for item in stale["by_status"]}["in_progress"] == 0
+    assert scheduler._tasks[STAGE_STATUS_REFRESH_JOB]["next_run"] != float("inf")
+
+    assert service.refresh()["projects"] == 1
+    second = api_client.get("/api/v1/project-location-stages/analytics/time-in-status", params=params).json()
+    assert {item["status"]: item["entries"] for item in second["by_status"]}["in_progress"] == 1
+    assert service.refresh()["projects"] == 0
+
+    timeline = api_client.get(f"/api/v1/project-location-stages/{stage.id}/timeline").json()
+    assert [period["status"] for period in timeline] == ["pending", "in_progress"]
+    bad = api_client.get("/api/v1/project-location-stages/analytics/cycle-times", params={"start": params["end"], "end": params["start"]})
+    assert bad.status_code == 400
+
+
+def test_compaction_that_loses_rows_to_another_run_writes_nothing(db_session, test_user):
+    stage = create_stage(db_session, create_project_location(db_session, create_project(db_session, test_user), create_location(db_session)), created_at=T0)
+    for days, new_status, previous_status in (
+        (1, StageStatus.IN_PROGRESS, StageStatus.PENDING),
+        (2, StageStatus.ON_HOLD, StageStatus.IN_PROGRESS),
+        (3, StageStatus.IN_PROGRESS, StageStatus.ON_HOLD),
+    ):
+        _record(db_session, stage, test_user, days, new_status, previous_status)
+    db_session.commit()
+    first = db_session.query(ProjectLocationStageHistory).order_by(ProjectLocationStageHistory.changed_at).first().id
+
+    # Outra compactação remove uma das linhas entre a leitura e o DELETE desta
+    def concurrent_delete(state):
+        if state.is_delete and not db_session.info.get("raced"):
+            db_session.info["raced"] = True
+            state.session.connection().execute(
+                ProjectLocationStageHistory.__table__.delete().where(ProjectLocationStageHistory.id == first)
+            )
+
+    event.listen(db_session, "do_orm_execute", concurrent_delete)
+    try:
+        assert StageStatusAnalyticsService(db_session).compact(before=NOW)["compacted_rows"] == 0
+    finally:
+        event.remove(db_session, "do_orm_execute", concurrent_delete)
+    assert db_session.query(StageStatusInterval).count() == 0
+    assert db_session.query(ProjectLocationStageHistory).count() == 3